@@ -0,0 +1,99 @@
+"""
+字符串表切分的基准测试：比较 bytes.split 快速路径和逐字节循环
+
+用法：
+    python bench_strtab_split.py                  # 使用合成数据（默认 2MB）
+    python bench_strtab_split.py --size 8000000   # 指定合成数据大小
+    python bench_strtab_split.py /usr/lib/libc.so.6  # 使用 ELF 文件中的字符串表
+"""
+
+import argparse
+import random
+import string
+import time
+
+from elf_reader import ELFReader
+from elf_sym_str import split_string_table, split_string_table_bytewise
+
+
+def make_synthetic_strtab(size, seed=0):
+    """生成一个类似 .strtab 的数据块：长短不一的符号名，用 NUL 分隔"""
+    rng = random.Random(seed)
+    alphabet = (string.ascii_letters + string.digits + "_").encode()
+    chunks = [b"\0"]
+    total = 1
+    while total < size:
+        # 混入少量很长的 C++ 修饰名，逐字节拼接在这种字符串上最慢
+        length = rng.randint(200, 2000) if rng.random() < 0.02 else rng.randint(4, 40)
+        name = bytes(rng.choice(alphabet) for _ in range(length))
+        chunks.append(name + b"\0")
+        total += length + 1
+    return b"".join(chunks)[:size]
+
+
+def load_strtabs(filename):
+    """读取 ELF 文件中所有字符串表的内容"""
+    tables = []
+    with ELFReader(filename) as elf:
+        for section in elf.sections:
+            if section.sh_type == "SHT_STRTAB":
+                tables.append((section.name, elf.section_data(section).tobytes()))
+    return tables
+
+
+def best_of(func, data, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(data)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(name, data, repeat):
+    fast_time, fast = best_of(split_string_table, data, repeat)
+    slow_time, slow = best_of(split_string_table_bytewise, data, repeat)
+    if fast != slow:
+        raise SystemExit(f"{name}: fast path output differs from bytewise loop")
+
+    speedup = slow_time / fast_time if fast_time > 0 else float("inf")
+    print(
+        f"{name:<24} {len(data):>12} {len(fast):>10} "
+        f"{slow_time * 1000:>12.2f} {fast_time * 1000:>12.2f} {speedup:>9.1f}x"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark string table splitting: bytes.split vs bytewise loop"
+    )
+    parser.add_argument("filename", nargs="?", help="ELF file to take strtabs from")
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=2_000_000,
+        help="Size of the synthetic string table in bytes (default: 2000000)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Repetitions, best time is reported"
+    )
+    args = parser.parse_args()
+
+    if args.filename:
+        tables = load_strtabs(args.filename)
+        if not tables:
+            raise SystemExit(f"No string tables found in {args.filename}")
+    else:
+        tables = [("synthetic", make_synthetic_strtab(args.size))]
+
+    print(
+        f"{'Table':<24} {'Bytes':>12} {'Strings':>10} "
+        f"{'Loop (ms)':>12} {'Split (ms)':>12} {'Speedup':>10}"
+    )
+    for name, data in tables:
+        run(name, data, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,756 @@
+"""
+各个脚本共享的 ELF 元数据持久缓存
+
+第一次打开一个文件时用 ELFReader 解析，把节表、段表、符号表、动态段和
+按类型统计的重定位数写成一个紧凑的二进制条目；之后的运行直接 mmap 条目，
+不再解析 ELF。
+
+条目格式（小端）：
+    头部    "ELFC" | 版本 u32 | 块数 u32
+    块目录  每块 (名字 4s, 偏移 u64, 大小 u64)
+    META    JSON：ELF 头、类别、构建 ID、解释器、动态段字符串、符号表索引
+    STRS    字符串池，所有名字以 NUL 结尾；同一个符号表的名字连续存放
+    SECT / SEGM / SYMS / DYNA / RELC
+            定长记录数组，用 struct.iter_unpack 直接在 mmap 上解码
+
+缓存目录下有两级索引：
+    by-stat/<dev>-<inode>-<size>-<mtime_ns>.elfc    只需 stat 即可命中
+    by-build-id/<build-id>-<size>.elfc               内容相同的副本（CI 中复制的
+                                                     产物）共享一份，硬链接到 by-stat
+构建 ID 相同但大小不同（如 strip 前后）的文件不会共用条目。
+
+写入新条目后（各进程合计至多每小时一次）清理缓存：先删除闲置超过 30 天的条目，
+再按最近使用时间从旧到新删除，直到总大小不超过 512 MiB。
+只是查看文件的工具用 ELFCache(write=False)，只读取已有的条目，不写入新条目。
+
+用法：
+    cache = ELFCache()
+    with cache.open("/usr/bin/python3") as elf:   # 接口与 ELFReader 相同
+        print(elf.needed(), len(elf.sections))
+
+    python elf_cache.py warm /usr/lib/x86_64-linux-gnu/*.so*
+    python elf_cache.py stats
+    python elf_cache.py prune --max-size 128 --max-age 7
+    python elf_cache.py clear
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from elf_reader import (
+    D_TAG,
+    E_MACHINE,
+    P_TYPE,
+    SH_TYPE,
+    SHN_SPECIAL,
+    ST_BIND,
+    ST_TYPE,
+    ST_VISIBILITY,
+    ELFError,
+    ELFReader,
+    ELFSection,
+    ELFSegment,
+    ELFSymbol,
+    reloc_type_name,
+)
+
+DEFAULT_CACHE_DIR = os.environ.get("ELF_CACHE_DIR") or os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+    "learning-malloc",
+    "elf",
+)
+
+# 缓存总大小和条目闲置时间的上限，以及两次自动清理之间的最短间隔
+DEFAULT_MAX_BYTES = 512 << 20
+DEFAULT_MAX_AGE = 30 * 86400
+PRUNE_INTERVAL = 3600
+_PRUNE_STAMP = ".last-prune"
+_KINDS = ("by-build-id", "by-stat")
+
+MAGIC = b"ELFC"
+# 条目格式变化时递增，旧条目会被视为未命中并重新生成
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sII")
+_CHUNK = struct.Struct("<4sQQ")
+# 名字偏移, sh_name, sh_type, sh_flags, sh_addr, sh_offset, sh_size,
+# sh_link, sh_info, sh_addralign, sh_entsize
+_SECTION = struct.Struct("<IIIQQQQIIQQ")
+# p_type, p_flags, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_align
+_SEGMENT = struct.Struct("<IIQQQQQQ")
+# 名字偏移, st_info, st_other, st_shndx, st_value, st_size
+_SYMBOL = struct.Struct("<IBBHQQ")
+_DYNAMIC = struct.Struct("<qQ")
+# 节下标, 重定位类型, 条数；SHT_RELR 节的类型记为 RELR_TYPE
+_RELOC_COUNT = struct.Struct("<IIQ")
+RELR_TYPE = 0xFFFFFFFF
+# iter_symbols 每次解码的符号数
+_SYMBOL_BATCH = 4096
+
+_CHUNK_NAMES = {b"META", b"STRS", b"SECT", b"SEGM", b"SYMS", b"DYNA", b"RELC"}
+
+# 缓存中保存字符串值的动态标签
+_STRING_TAGS = ("DT_NEEDED", "DT_SONAME", "DT_RPATH", "DT_RUNPATH")
+
+
+class CacheFormatError(ValueError):
+    """缓存条目损坏或版本不符"""
+
+
+def _codes(table):
+    """名称表的反查：名字 -> 数值"""
+    return {name: value for value, name in table.items()}
+
+
+_SH_TYPE_CODE = _codes(SH_TYPE)
+_P_TYPE_CODE = _codes(P_TYPE)
+_D_TAG_CODE = _codes(D_TAG)
+_ST_BIND_CODE = _codes(ST_BIND)
+_ST_TYPE_CODE = _codes(ST_TYPE)
+_ST_VISIBILITY_CODE = _codes(ST_VISIBILITY)
+_SHN_CODE = _codes(SHN_SPECIAL)
+
+
+# st_info（一个字节）和 st_other 低两位到名字的查表，解码符号时不再逐个查字典
+_INFO_NAMES = [
+    (ST_BIND.get(info >> 4, info >> 4), ST_TYPE.get(info & 0xF, info & 0xF))
+    for info in range(256)
+]
+_VISIBILITY_NAMES = [ST_VISIBILITY.get(v, v) for v in range(4)]
+
+
+def _code(codes, value):
+    # 未知值在 ELFReader 中本来就保留为整数
+    return value if isinstance(value, int) else codes[value]
+
+
+# ---- 写入 ----
+
+
+def build_entry(elf):
+    """把一个已打开的 ELFReader 的元数据编码成缓存条目（bytes）"""
+    blob = bytearray()
+
+    def add_string(value):
+        offset = len(blob)
+        blob.extend(value.encode() + b"\0")
+        return offset
+
+    sections = bytearray()
+    for sec in elf.sections:
+        sections += _SECTION.pack(
+            add_string(sec.name),
+            sec.sh_name,
+            _code(_SH_TYPE_CODE, sec.sh_type),
+            *sec[4:],
+        )
+
+    segments = bytearray()
+    for seg in elf.segments:
+        segments += _SEGMENT.pack(_code(_P_TYPE_CODE, seg.p_type), *seg[2:])
+
+    symbols = bytearray()
+    symtabs = {}
+    rows = 0
+    for sec in elf.sections:
+        if sec.sh_type not in ("SHT_SYMTAB", "SHT_DYNSYM"):
+            continue
+        first, names_start = rows, len(blob)
+        for sym in elf.iter_symbols(sec):
+            info = (_code(_ST_BIND_CODE, sym.bind) << 4) | _code(
+                _ST_TYPE_CODE, sym.type
+            )
+            symbols += _SYMBOL.pack(
+                add_string(sym.name),
+                info,
+                _code(_ST_VISIBILITY_CODE, sym.visibility),
+                _code(_SHN_CODE, sym.st_shndx),
+                sym.st_value,
+                sym.st_size,
+            )
+            rows += 1
+        symtabs[sec.index] = [first, rows - first, names_start, len(blob)]
+
+    dynamic = bytearray()
+    for tag, val in elf.iter_dynamic():
+        dynamic += _DYNAMIC.pack(_code(_D_TAG_CODE, tag), val)
+
+    relocations = bytearray()
+    type_mask = 0xFFFFFFFF if elf.elfclass == 64 else 0xFF
+    for sec in elf.sections:
+        if sec.sh_type not in ("SHT_REL", "SHT_RELA", "SHT_RELR"):
+            continue
+        offsets, infos = elf.relocation_fields(sec)
+        if infos is None:
+            counts = {RELR_TYPE: len(offsets)}
+        else:
+            counts = Counter(info & type_mask for info in infos)
+        for r_type, count in sorted(counts.items()):
+            relocations += _RELOC_COUNT.pack(sec.index, r_type, count)
+        del offsets, infos
+
+    meta = {
+        "header": elf.header,
+        "elfclass": elf.elfclass,
+        "little_endian": elf.little_endian,
+        "e_machine": elf.e_machine_value,
+        "build_id": elf.build_id(),
+        "interpreter": elf.interpreter(),
+        "dynamic_strings": {tag: elf.dynamic_strings(tag) for tag in _STRING_TAGS},
+        "symtabs": symtabs,
+    }
+    chunks = [
+        (b"META", json.dumps(meta).encode()),
+        (b"STRS", bytes(blob)),
+        (b"SECT", bytes(sections)),
+        (b"SEGM", bytes(segments)),
+        (b"SYMS", bytes(symbols)),
+        (b"DYNA", bytes(dynamic)),
+        (b"RELC", bytes(relocations)),
+    ]
+
+    out = bytearray(_HEADER.pack(MAGIC, FORMAT_VERSION, len(chunks)))
+    offset = len(out) + _CHUNK.size * len(chunks)
+    for name, data in chunks:
+        out += _CHUNK.pack(name, offset, len(data))
+        offset += len(data)
+    for _, data in chunks:
+        out += data
+    return bytes(out)
+
+
+# ---- 读取 ----
+
+
+class CachedELF:
+    """
+    一个缓存条目的只读视图。ELFReader 中与元数据有关的接口直接由缓存回答；
+    其他接口（节内容、哈希查找、逐条重定位等）在第一次用到时才打开原文件
+    """
+
+    def __init__(self, path, entry_path):
+        self.path = path
+        self._reader = None
+        with open(entry_path, "rb") as f:
+            try:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise CacheFormatError(f"{entry_path}: empty cache entry") from None
+        try:
+            self._chunks = self._parse_chunks(entry_path)
+            meta = json.loads(bytes(self._chunk(b"META")))
+        except (struct.error, ValueError) as e:
+            self._mm.close()
+            raise CacheFormatError(f"{entry_path}: {e}") from None
+
+        self.header = meta["header"]
+        self.elfclass = meta["elfclass"]
+        self.little_endian = meta["little_endian"]
+        self.ei_data = "ELFDATA2LSB" if self.little_endian else "ELFDATA2MSB"
+        self.e_machine_value = meta["e_machine"]
+        self._build_id = meta["build_id"]
+        self._interpreter = meta["interpreter"]
+        self._dynamic_strings = meta["dynamic_strings"]
+        self._symtabs = {int(k): v for k, v in meta["symtabs"].items()}
+
+        self._strings = self._chunks[b"STRS"][0]
+        self._sections = None
+        self._segments = None
+        self._section_by_name = None
+
+    # 节表和段表在第一次访问时才解码，只用动态段的调用方（elf_deps 等）不需要它们
+
+    @property
+    def sections(self):
+        if self._sections is None:
+            self._sections = [
+                ELFSection(
+                    index,
+                    self._string(name_off),
+                    sh_name,
+                    SH_TYPE.get(sh_type, sh_type),
+                    *rest,
+                )
+                for index, (name_off, sh_name, sh_type, *rest) in enumerate(
+                    _SECTION.iter_unpack(self._chunk(b"SECT"))
+                )
+            ]
+        return self._sections
+
+    @property
+    def segments(self):
+        if self._segments is None:
+            self._segments = [
+                ELFSegment(index, P_TYPE.get(p_type, p_type), *rest)
+                for index, (p_type, *rest) in enumerate(
+                    _SEGMENT.iter_unpack(self._chunk(b"SEGM"))
+                )
+            ]
+        return self._segments
+
+    def _parse_chunks(self, entry_path):
+        magic, version, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise CacheFormatError(f"{entry_path}: unsupported cache entry")
+        chunks = {}
+        for i in range(count):
+            name, offset, size = _CHUNK.unpack_from(
+                self._mm, _HEADER.size + i * _CHUNK.size
+            )
+            if offset + size > len(self._mm):
+                raise CacheFormatError(f"{entry_path}: truncated cache entry")
+            chunks[name] = (offset, size)
+        missing = _CHUNK_NAMES - chunks.keys()
+        if missing:
+            raise CacheFormatError(f"{entry_path}: missing chunks {sorted(missing)}")
+        return chunks
+
+    def _chunk(self, name):
+        offset, size = self._chunks[name]
+        return memoryview(self._mm)[offset : offset + size]
+
+    def _string(self, offset):
+        start = self._strings + offset
+        end = self._mm.find(b"\0", start)
+        return self._mm[start:end].decode(errors="replace")
+
+    # ---- 生命周期 ----
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        try:
+            self._mm.close()
+        except BufferError:
+            # 调用方还持有切片视图，交给垃圾回收关闭
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _file(self):
+        if self._reader is None:
+            self._reader = ELFReader(self.path)
+        return self._reader
+
+    def __getattr__(self, name):
+        # 缓存中没有的接口交给原文件的 ELFReader
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._file(), name)
+
+    # ---- 与 ELFReader 相同的接口 ----
+
+    def get_machine_arch(self):
+        machine = E_MACHINE.get(self.e_machine_value)
+        return machine[1] if machine else "<unknown>"
+
+    def get_section(self, index):
+        if 0 <= index < len(self.sections):
+            return self.sections[index]
+        return None
+
+    def get_section_by_name(self, name):
+        if self._section_by_name is None:
+            self._section_by_name = {}
+            for sec in self.sections:
+                self._section_by_name.setdefault(sec.name, sec)
+        return self._section_by_name.get(name)
+
+    def iter_sections(self, sh_type=None):
+        for sec in self.sections:
+            if sh_type is None or sec.sh_type == sh_type:
+                yield sec
+
+    def iter_segments(self, p_type=None):
+        for seg in self.segments:
+            if p_type is None or seg.p_type == p_type:
+                yield seg
+
+    def iter_symbols(self, section):
+        """
+        从缓存产出符号。名字连续存放，每批 _SYMBOL_BATCH 个符号的名字整段解码后
+        split，不逐个查找 NUL，内存只和一批的大小有关
+        """
+        entry = self._symtabs.get(section.index)
+        if entry is None:
+            yield from self._file().iter_symbols(section)
+            return
+        first, count, _, names_end = entry
+        base = self._strings
+        rows = self._chunk(b"SYMS")[
+            first * _SYMBOL.size : (first + count) * _SYMBOL.size
+        ]
+        make = ELFSymbol._make
+        shndx_name = SHN_SPECIAL.get
+        for start in range(0, count, _SYMBOL_BATCH):
+            stop = min(start + _SYMBOL_BATCH, count)
+            batch = list(
+                _SYMBOL.iter_unpack(rows[start * _SYMBOL.size : stop * _SYMBOL.size])
+            )
+            end = (
+                _SYMBOL.unpack_from(rows, stop * _SYMBOL.size)[0]
+                if stop < count
+                else names_end
+            )
+            names = (
+                self._mm[base + batch[0][0] : base + end]
+                .decode(errors="replace")
+                .split("\0")
+            )
+            for index, ((_, info, other, shndx, value, size), name) in enumerate(
+                zip(batch, names), start
+            ):
+                yield make(
+                    (
+                        index,
+                        name,
+                        value,
+                        size,
+                        *_INFO_NAMES[info],
+                        _VISIBILITY_NAMES[other & 0x3],
+                        shndx_name(shndx, shndx),
+                    )
+                )
+
+    def num_symbols(self, section):
+        entry = self._symtabs.get(section.index)
+        if entry is None:
+            return self._file().num_symbols(section)
+        return entry[1]
+
+    def iter_dynamic(self):
+        for d_tag, d_val in _DYNAMIC.iter_unpack(self._chunk(b"DYNA")):
+            yield D_TAG.get(d_tag, d_tag), d_val
+
+    def dynamic_strings(self, tag):
+        if tag in self._dynamic_strings:
+            return list(self._dynamic_strings[tag])
+        return self._file().dynamic_strings(tag)
+
+    def needed(self):
+        return self.dynamic_strings("DT_NEEDED")
+
+    def soname(self):
+        values = self.dynamic_strings("DT_SONAME")
+        return values[0] if values else None
+
+    def rpath(self):
+        values = self.dynamic_strings("DT_RPATH")
+        return values[0] if values else None
+
+    def runpath(self):
+        values = self.dynamic_strings("DT_RUNPATH")
+        return values[0] if values else None
+
+    def interpreter(self):
+        return self._interpreter
+
+    def build_id(self):
+        return self._build_id
+
+    # ---- 只有缓存提供的接口 ----
+
+    def relocation_counts(self):
+        """{(重定位节名, 类型名): 条数}，SHT_RELR 节的类型名为 'RELR'"""
+        counts = {}
+        for index, r_type, count in _RELOC_COUNT.iter_unpack(self._chunk(b"RELC")):
+            name = (
+                "RELR"
+                if r_type == RELR_TYPE
+                else reloc_type_name(self.e_machine_value, r_type)
+            )
+            key = (self.sections[index].name, name)
+            counts[key] = counts.get(key, 0) + count
+        return counts
+
+
+class ELFCache:
+    """
+    缓存目录的访问入口，可以在线程之间共享
+    write=False 时只读取已有的条目，未命中的文件直接交给 ELFReader，
+    不会在缓存目录里为每个看过的文件留下条目
+    """
+
+    def __init__(
+        self,
+        directory=DEFAULT_CACHE_DIR,
+        write=True,
+        max_bytes=DEFAULT_MAX_BYTES,
+        max_age=DEFAULT_MAX_AGE,
+    ):
+        self.directory = directory
+        self.write = write
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.shared = 0  # 通过构建 ID 复用了其他副本的条目
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _entry(self, kind, name):
+        return os.path.join(self.directory, kind, name + ".elfc")
+
+    def _count(self, attr):
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def _write(self, target, data=None, link_from=None):
+        """原子地写入条目：先写临时文件再 rename；link_from 时用硬链接代替写入"""
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if link_from is not None:
+                try:
+                    os.link(link_from, tmp)
+                except OSError:
+                    with open(link_from, "rb") as f:
+                        data = f.read()
+            if data is not None:
+                with open(tmp, "wb") as f:
+                    f.write(data)
+            os.replace(tmp, target)
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def open(self, path):
+        """
+        返回 path 的 CachedELF。stat 命中时不打开原文件；未命中时解析并写入缓存，
+        只读或缓存目录不可写时退化为直接返回 ELFReader
+        """
+        st = os.stat(path)
+        stamp = f"{st.st_dev:x}-{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"
+        by_stat = self._entry("by-stat", stamp)
+        try:
+            elf = CachedELF(path, by_stat)
+            self._count("hits")
+            return elf
+        except (FileNotFoundError, CacheFormatError):
+            pass
+
+        reader = ELFReader(path)
+        try:
+            build_id = reader.build_id()
+            by_id = (
+                self._entry("by-build-id", f"{build_id}-{st.st_size:x}")
+                if build_id
+                else None
+            )
+            if by_id is not None and os.path.exists(by_id):
+                try:
+                    if self.write:
+                        self._write(by_stat, link_from=by_id)
+                        elf = CachedELF(path, by_stat)
+                    else:
+                        elf = CachedELF(path, by_id)
+                    self._count("shared")
+                    reader.close()
+                    return elf
+                except (OSError, CacheFormatError):
+                    pass
+            if not self.write:
+                self._count("misses")
+                return reader
+            data = build_entry(reader)
+        except BaseException:
+            reader.close()
+            raise
+        reader.close()
+
+        self._count("misses")
+        try:
+            if by_id is not None:
+                self._write(by_id, data)
+                self._write(by_stat, link_from=by_id)
+            else:
+                self._write(by_stat, data)
+            elf = CachedELF(path, by_stat)
+        except (OSError, CacheFormatError):
+            return ELFReader(path)
+        self._maybe_prune()
+        return elf
+
+    def _maybe_prune(self):
+        """写入新条目后调用；目录下的时间戳文件让所有进程合计至多每 PRUNE_INTERVAL 秒清理一次"""
+        stamp = os.path.join(self.directory, _PRUNE_STAMP)
+        try:
+            if time.time() - os.stat(stamp).st_mtime < PRUNE_INTERVAL:
+                return
+        except FileNotFoundError:
+            pass
+        try:
+            with open(stamp, "a"):
+                pass
+            os.utime(stamp)
+        except OSError:
+            return
+        self.prune()
+
+    def prune(self, max_bytes=None, max_age=None):
+        """
+        删除闲置超过 max_age 秒的条目，再按最近使用时间从旧到新删除，
+        直到总大小不超过 max_bytes；同一条目在 by-stat 和 by-build-id 中的链接一起删除。
+        最近使用时间取 atime 和 mtime 中较晚的（relatime 下 atime 至少每天更新一次）。
+        返回 (删除的条目数, 释放的字节数)
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        max_age = self.max_age if max_age is None else max_age
+        groups = {}  # inode -> [链接路径, 大小, 最近使用时间]
+        for kind in _KINDS:
+            try:
+                it = os.scandir(os.path.join(self.directory, kind))
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    group = groups.setdefault(st.st_ino, [[], st.st_size, 0])
+                    group[0].append(entry.path)
+                    group[2] = max(group[2], st.st_atime, st.st_mtime)
+
+        now = time.time()
+        total = sum(size for _, size, _ in groups.values())
+        removed = freed = 0
+        for paths, size, used in sorted(groups.values(), key=lambda g: g[2]):
+            if now - used <= max_age and total <= max_bytes:
+                break
+            for path in paths:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            total -= size
+            removed += 1
+            freed += size
+        return removed, freed
+
+    def entries(self):
+        """[(条目路径, 大小)]，不含 by-stat 中指向同一 inode 的重复链接"""
+        result = []
+        seen = set()
+        for kind in _KINDS:
+            directory = os.path.join(self.directory, kind)
+            try:
+                it = os.scandir(directory)
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    st = entry.stat()
+                    if st.st_ino in seen:
+                        continue
+                    seen.add(st.st_ino)
+                    result.append((entry.path, st.st_size))
+        return result
+
+    def clear(self):
+        removed = 0
+        for kind in _KINDS:
+            directory = os.path.join(self.directory, kind)
+            try:
+                names = os.listdir(directory)
+            except OSError:
+                continue
+            for name in names:
+                os.unlink(os.path.join(directory, name))
+                removed += 1
+        return removed
+
+
+def open_elf(path, cache=None):
+    """cache 为 None 时与 ELFReader(path) 相同，否则经由缓存打开"""
+    if cache is None:
+        return ELFReader(path)
+    return cache.open(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Manage the shared cache of parsed ELF metadata"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help=f"Cache directory (default: {DEFAULT_CACHE_DIR}, or $ELF_CACHE_DIR)",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_warm = sub.add_parser("warm", help="Parse files into the cache")
+    p_warm.add_argument("files", nargs="+", help="ELF files")
+    p_warm.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of threads (default: CPU count)",
+    )
+    sub.add_parser("stats", help="Show cache size")
+    p_prune = sub.add_parser("prune", help="Remove idle entries and cap the size")
+    p_prune.add_argument(
+        "--max-size",
+        type=float,
+        default=DEFAULT_MAX_BYTES / 2**20,
+        metavar="MIB",
+        help=f"Size limit in MiB (default: {DEFAULT_MAX_BYTES >> 20})",
+    )
+    p_prune.add_argument(
+        "--max-age",
+        type=float,
+        default=DEFAULT_MAX_AGE / 86400,
+        metavar="DAYS",
+        help=f"Remove entries unused for this many days (default: {DEFAULT_MAX_AGE // 86400})",
+    )
+    sub.add_parser("clear", help="Remove all cache entries")
+    args = parser.parse_args()
+
+    cache = ELFCache(args.cache_dir)
+    if args.command == "warm":
+        start = time.perf_counter()
+
+        def warm(path):
+            # 目录里常有截断或损坏的文件，跳过它们而不是中断整个预热
+            try:
+                cache.open(path).close()
+                return True
+            except (OSError, ELFError, struct.error):
+                return False
+
+        with ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as pool:
+            skipped = sum(not ok for ok in pool.map(warm, args.files))
+        print(
+            f"{cache.hits} cached, {cache.shared} shared by build-id, "
+            f"{cache.misses} parsed, {skipped} skipped "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+    elif args.command == "stats":
+        entries = cache.entries()
+        total = sum(size for _, size in entries)
+        print(f"{cache.directory}: {len(entries)} entries, {total / 1024:.1f} KiB")
+    elif args.command == "prune":
+        removed, freed = cache.prune(int(args.max_size * 2**20), args.max_age * 86400)
+        print(
+            f"Removed {removed} entries ({freed / 1024:.1f} KiB) from {cache.directory}"
+        )
+    else:
+        print(f"Removed {cache.clear()} files from {cache.directory}")
+
+
+if __name__ == "__main__":
+    main()
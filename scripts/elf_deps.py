@@ -1,7 +1,10 @@
+import argparse
 import os
-import sys
+from concurrent.futures import ThreadPoolExecutor
 
-from elftools.elf.elffile import ELFFile
+from elf_cache import DEFAULT_CACHE_DIR, ELFCache, open_elf
+from elf_reader import ELFError
+from ldso_resolver import LibraryResolver, LoadedObject
 
 # 记录已解析的库，避免重复
 loaded = set()
@@ -11,40 +14,95 @@ nodes = set()
 edges = []  # 改为列表，保存 (src, dst, order) 的元组
 edge_order = 0  # 全局计数器，跟踪遍历顺序
 
-# 模拟系统中共享库文件的路径查找（简单版本）
-# 你可以根据需要扩展搜索路径
-SEARCH_PATHS = [
-    ".",  # 当前目录
-    "/lib",
-    "/usr/lib",
-    "/lib64",
-    "/usr/lib64",
-    # 更多路径可加
-]
-
-
-def find_library_path(libname):
-    for path in SEARCH_PATHS:
-        candidate = os.path.join(path, libname)
-        if os.path.isfile(candidate):
-            return candidate
-    return None  # 找不到
-
-
-def parse_needed_libraries(filepath):
-    """读取ELF文件，返回依赖库名列表"""
-    with open(filepath, "rb") as f:
-        elf = ELFFile(f)
-        dynamic = elf.get_section_by_name(".dynamic")
-        if not dynamic:
-            return []
-        needed = []
-        strtab = elf.get_section(dynamic["sh_link"])
-        for tag in dynamic.iter_tags():
-            if tag.entry.d_tag == "DT_NEEDED":
-                libname = strtab.get_string(tag.entry.d_val)
-                needed.append(libname)
-        return needed
+# 广度优先预取得到的 库名 -> 依赖列表（找不到的库为 None）
+needed_map = {}
+# 库名 -> (路径, 查找来源)
+library_paths = {}
+
+# 按 ld.so 规则查找库，目录索引和 ld.so.cache 在一次运行内复用
+resolver = LibraryResolver()
+
+
+def parse_dynamic_info(filepath, cache=None):
+    """
+    读取查找依赖所需的动态段信息：NEEDED、RPATH、RUNPATH、FLAGS_1 和 ELF 类别
+    cache 为 ELFCache 时从共享缓存读取，文件未变化就不重新解析
+    """
+    with open_elf(filepath, cache) as elf:
+        flags_1 = 0
+        for tag, val in elf.iter_dynamic():
+            if tag == "DT_FLAGS_1":
+                flags_1 = val
+        return {
+            "needed": elf.needed(),
+            "rpath": elf.rpath(),
+            "runpath": elf.runpath(),
+            "flags_1": flags_1,
+            "elfclass": elf.elfclass,
+            "machine": elf.e_machine_value,
+        }
+
+
+def _load_info(libpath, cache):
+    """解析 libpath 的动态段信息，无法解析时返回 None"""
+    try:
+        return parse_dynamic_info(libpath, cache)
+    except (OSError, ELFError) as e:
+        print(f"[Warning] Failed to parse {libpath}: {e}")
+        return None
+
+
+def _make_object(path, loader, info):
+    return LoadedObject(
+        path,
+        loader,
+        info["rpath"],
+        info["runpath"],
+        info["flags_1"],
+        info["elfclass"],
+        info["machine"],
+    )
+
+
+def prefetch_needed(root, root_deps, jobs, cache=None):
+    """
+    按 ld.so 的加载顺序（广度优先）遍历依赖：每一层先在主线程中查找路径
+    （目录索引命中，几乎没有系统调用），再用线程池并发解析这一层所有库。
+    每个库的 RPATH/$ORIGIN 上下文取第一个请求它的对象，与 ld.so 一致。
+    结果存入 needed_map，边的编号仍由之后的深度优先遍历决定，保证输出稳定
+    """
+    seen = set(loaded)
+    frontier = []
+    for dep in root_deps:
+        if dep not in seen:
+            seen.add(dep)
+            frontier.append((dep, root))
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+        while frontier:
+            resolved = []
+            for libname, loader in frontier:
+                path, how = resolver.resolve(libname, loader)
+                resolved.append((libname, loader, path, how))
+
+            infos = pool.map(
+                lambda item: _load_info(item[2], cache) if item[2] else None,
+                resolved,
+            )
+
+            next_frontier = []
+            for (libname, loader, path, how), info in zip(resolved, infos):
+                if info is None:
+                    needed_map[libname] = None
+                    continue
+                library_paths[libname] = (path, how)
+                needed_map[libname] = info["needed"]
+                obj = _make_object(path, loader, info)
+                for dep in info["needed"]:
+                    if dep not in seen:
+                        seen.add(dep)
+                        next_frontier.append((dep, obj))
+            frontier = next_frontier
 
 
 def build_dependency_graph(libname):
@@ -54,15 +112,14 @@ def build_dependency_graph(libname):
         return
     loaded.add(libname)
 
-    libpath = find_library_path(libname)
-    if libpath is None:
+    deps = needed_map.get(libname)
+    if deps is None:
         print(f"[Warning] Library {libname} not found in search paths.")
         # 仍然加入图节点
         nodes.add(libname)
         return
 
     nodes.add(libname)
-    deps = parse_needed_libraries(libpath)
     for dep in deps:
         edge_order += 1
         edges.append((libname, dep, edge_order))
@@ -91,12 +148,14 @@ def generate_dot_format(title):
     return "\n".join(dot_lines)
 
 
-def main(elf_path):
-    global nodes, edges, edge_order, loaded
+def main(elf_path, jobs=1, cache_dir=DEFAULT_CACHE_DIR):
+    global nodes, edges, edge_order, loaded, needed_map, library_paths
     nodes = set()
     edges = []
     edge_order = 0
     loaded = set()
+    needed_map = {}
+    library_paths = {}
 
     # 主程序用特殊名称，或者用文件名
     main_libname = os.path.basename(elf_path)
@@ -106,7 +165,15 @@ def main(elf_path):
     print(f"Analyzing dependencies for: {elf_path}")
     print("Using ELF parsing to analyze shared library dependencies...")
 
-    deps = parse_needed_libraries(elf_path)
+    cache = ELFCache(cache_dir) if cache_dir else None
+    root_info = _load_info(elf_path, cache)
+    if root_info is None:
+        return
+    root = _make_object(elf_path, None, root_info)
+    deps = root_info["needed"]
+
+    prefetch_needed(root, deps, jobs, cache)
+
     for dep in deps:
         edge_order += 1
         edges.append((main_libname, dep, edge_order))
@@ -124,11 +191,20 @@ def main(elf_path):
 
     print(f"\nDependency graph saved to {output_file}")
     print(f"Found {len(nodes)} libraries and {len(edges)} dependencies")
+    if cache is not None:
+        print(
+            f"ELF cache: {cache.hits} hits, {cache.shared} shared by build-id, "
+            f"{cache.misses} parsed ({cache.directory})"
+        )
 
     # 显示统计信息
     print("\nLibraries found:")
     for node in sorted(nodes):
-        print(f"  - {node}")
+        if node in library_paths:
+            path, how = library_paths[node]
+            print(f"  - {node} => {path} ({how})")
+        else:
+            print(f"  - {node}")
 
     print("\nDOT content preview:")
     print(dot_content)
@@ -141,7 +217,25 @@ def main(elf_path):
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python elf_deps.py <elf-file>")
-        sys.exit(1)
-    main(sys.argv[1])
+    parser = argparse.ArgumentParser(
+        description="Build a shared library dependency graph from DT_NEEDED entries"
+    )
+    parser.add_argument("elf_file", help="ELF file to analyze")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of threads used to parse libraries (default: CPU count)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help=f"Shared cache of parsed ELF metadata (default: {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Do not read or write the cache"
+    )
+    args = parser.parse_args()
+
+    main(args.elf_file, args.jobs, None if args.no_cache else args.cache_dir)
@@ -1,7 +1,12 @@
+import argparse
 import os
 import re
 import subprocess
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from elf_reader import ELFError, ELFReader
 
 # 记录已解析的库，避免重复
 loaded = set()
@@ -11,6 +16,11 @@ nodes = set()
 edges = []  # 保存 (src, dst, order) 的元组
 edge_order = 0  # 全局计数器，跟踪遍历顺序
 
+# 按真实路径缓存 ldd 的结果，同一个库只 fork 一次
+ldd_results = {}
+ldd_calls = 0
+_ldd_lock = threading.Lock()
+
 
 def parse_ldd_output(ldd_output):
     """解析ldd命令的输出，返回依赖库的路径列表"""
@@ -49,8 +59,31 @@ def parse_ldd_output(ldd_output):
     return dependencies
 
 
-def get_library_dependencies(lib_path):
-    """使用ldd命令获取库的依赖信息"""
+def parse_ldd_mapping(ldd_output):
+    """解析ldd（或 LD_TRACE_LOADED_OBJECTS）输出，返回 [(库名, 路径或None)]"""
+    mapping = []
+    for line in ldd_output.strip().split("\n"):
+        line = line.strip()
+        if not line or "linux-vdso.so" in line:
+            continue
+        if "=>" in line:
+            name, target = (part.strip() for part in line.split("=>", 1))
+            lib_path = target.split("(")[0].strip()
+            if not lib_path or lib_path == "not found":
+                lib_path = None
+            mapping.append((name, lib_path))
+        else:
+            lib_path = re.sub(r"\s*\(0x[0-9a-f]+\)\s*$", "", line).strip()
+            if lib_path and not lib_path.startswith("("):
+                mapping.append((os.path.basename(lib_path), lib_path))
+    return mapping
+
+
+def run_ldd(lib_path):
+    """实际运行一次ldd命令并解析结果"""
+    global ldd_calls
+    with _ldd_lock:
+        ldd_calls += 1
     try:
         # 运行ldd命令
         result = subprocess.run(
@@ -65,6 +98,112 @@ def get_library_dependencies(lib_path):
         return []
 
 
+def get_library_dependencies(lib_path):
+    """使用ldd命令获取库的依赖信息，结果按真实路径缓存"""
+    key = os.path.realpath(lib_path)
+    with _ldd_lock:
+        if key in ldd_results:
+            return ldd_results[key]
+    deps = run_ldd(lib_path)
+    with _ldd_lock:
+        ldd_results[key] = deps
+    return deps
+
+
+def prefetch_dependencies(root_deps, jobs):
+    """
+    用有界线程池按层并发运行ldd，把所有可达库的结果预先放进缓存。
+    边的编号仍由之后的深度优先遍历决定，输出与串行模式一致
+    """
+    seen = set()
+    frontier = []
+    for dep_path in root_deps:
+        key = os.path.realpath(dep_path)
+        if key not in seen and os.path.isfile(dep_path):
+            seen.add(key)
+            frontier.append(dep_path)
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while frontier:
+            next_frontier = []
+            for deps in pool.map(get_library_dependencies, frontier):
+                for dep_path in deps:
+                    key = os.path.realpath(dep_path)
+                    if key not in seen and os.path.isfile(dep_path):
+                        seen.add(key)
+                        next_frontier.append(dep_path)
+            frontier = next_frontier
+
+
+def get_interpreter(elf_path):
+    """读取 PT_INTERP，静态链接或无法解析时返回 None"""
+    try:
+        with ELFReader(elf_path) as elf:
+            return elf.interpreter()
+    except (OSError, ELFError):
+        return None
+
+
+def trace_loaded_objects(elf_path):
+    """
+    只调用一次动态加载器（LD_TRACE_LOADED_OBJECTS=1，即ldd的实现方式），
+    得到整个依赖闭包的 [(库名, 路径或None)]
+    """
+    global ldd_calls
+    interp = get_interpreter(elf_path)
+    if interp is None:
+        return None
+
+    env = dict(os.environ, LD_TRACE_LOADED_OBJECTS="1")
+    ldd_calls += 1
+    try:
+        result = subprocess.run(
+            [interp, elf_path], capture_output=True, text=True, check=True, env=env
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"[Warning] Failed to trace {elf_path} with {interp}: {e}")
+        return None
+    return parse_ldd_mapping(result.stdout)
+
+
+def build_graph_from_trace(elf_path, mapping):
+    """
+    用一次加载器跟踪得到的闭包建图：节点来自跟踪结果，
+    边取每个对象自己的 DT_NEEDED（直接依赖），不再逐个库 fork ldd
+    """
+    global edge_order
+
+    paths = {}
+    for name, lib_path in mapping:
+        paths.setdefault(name, lib_path)
+        if lib_path:
+            paths.setdefault(os.path.basename(lib_path), lib_path)
+
+    main_name = get_library_name(elf_path)
+    queue = [(main_name, elf_path)]
+    while queue:
+        lib_name, lib_path = queue.pop(0)
+        try:
+            with ELFReader(lib_path) as elf:
+                needed = elf.needed()
+        except (OSError, ELFError) as e:
+            print(f"[Warning] Failed to parse {lib_path}: {e}")
+            continue
+
+        for dep_name in needed:
+            edge_order += 1
+            edges.append((lib_name, dep_name, edge_order))
+            if dep_name in loaded:
+                continue
+            loaded.add(dep_name)
+            nodes.add(dep_name)
+            dep_path = paths.get(dep_name)
+            if dep_path is None:
+                print(f"[Warning] Library {dep_name} not found by the loader.")
+                continue
+            queue.append((dep_name, dep_path))
+
+
 def get_library_name(lib_path):
     """从库路径中提取库名"""
     return os.path.basename(lib_path)
@@ -121,14 +260,16 @@ def generate_dot_format(title):
     return "\n".join(dot_lines)
 
 
-def main(elf_path):
-    global nodes, edges, edge_order, loaded
+def main(elf_path, jobs=1, trace=False):
+    global nodes, edges, edge_order, loaded, ldd_results, ldd_calls
 
     # 重置全局状态
     nodes = set()
     edges = []
     edge_order = 0
     loaded = set()
+    ldd_results = {}
+    ldd_calls = 0
 
     # 检查输入文件是否存在
     if not os.path.isfile(elf_path):
@@ -141,17 +282,24 @@ def main(elf_path):
     loaded.add(main_name)
 
     print(f"Analyzing dependencies for: {elf_path}")
-    print("Using ldd to parse shared library dependencies...")
-
-    # 获取主程序的直接依赖
-    main_deps = get_library_dependencies(elf_path)
-
-    # 为主程序的每个依赖创建边并递归分析
-    for dep_path in main_deps:
-        dep_name = get_library_name(dep_path)
-        edge_order += 1
-        edges.append((main_name, dep_name, edge_order))
-        build_dependency_graph(dep_path)
+    mapping = trace_loaded_objects(elf_path) if trace else None
+    if mapping is not None:
+        print("Using one LD_TRACE_LOADED_OBJECTS run of the dynamic loader...")
+        build_graph_from_trace(elf_path, mapping)
+    else:
+        print("Using ldd to parse shared library dependencies...")
+
+        # 获取主程序的直接依赖
+        main_deps = get_library_dependencies(elf_path)
+        if jobs > 1:
+            prefetch_dependencies(main_deps, jobs)
+
+        # 为主程序的每个依赖创建边并递归分析
+        for dep_path in main_deps:
+            dep_name = get_library_name(dep_path)
+            edge_order += 1
+            edges.append((main_name, dep_name, edge_order))
+            build_dependency_graph(dep_path)
 
     # 生成DOT格式文本
     title = f"Dependency Graph for {os.path.basename(elf_path)}"
@@ -165,6 +313,7 @@ def main(elf_path):
 
     print(f"\nDependency graph saved to {output_file}")
     print(f"Found {len(nodes)} libraries and {len(edges)} dependencies")
+    print(f"Dynamic loader invocations: {ldd_calls}")
 
     # 显示统计信息
     print("\nLibraries found:")
@@ -182,12 +331,29 @@ def main(elf_path):
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python elf_deps_ldd.py <elf-file>")
-        print(
-            "\nThis script uses 'ldd' command to analyze shared library dependencies."
-        )
-        print("It performs depth-first traversal and maintains dependency order.")
+    parser = argparse.ArgumentParser(
+        description="Build a shared library dependency graph using ldd",
+        epilog="By default this performs a depth-first traversal, running ldd "
+        "once per library and keeping the dependency order.",
+    )
+    parser.add_argument("elf_file", help="ELF file to analyze")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Run up to N ldd processes concurrently (default: 1)",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="Run the dynamic loader once with LD_TRACE_LOADED_OBJECTS and "
+        "take edges from each object's DT_NEEDED",
+    )
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.elf_file):
+        print(f"Error: File {args.elf_file} does not exist.")
         sys.exit(1)
 
-    main(sys.argv[1])
+    main(args.elf_file, args.jobs, args.trace)
@@ -0,0 +1,412 @@
+"""
+整个目录树（例如容器的 rootfs）的 ELF 依赖索引
+
+scan 子命令遍历目录，通过魔数识别 ELF 文件，记录每个文件的 DT_NEEDED、
+DT_SONAME、DT_RPATH/DT_RUNPATH 以及 .dynsym 中导出/导入的符号，保存在
+SQLite 数据库中。再次扫描时只重新解析 mtime 或大小变化的文件，
+并删除已经不存在的文件。解析结果经由 elf_cache 共享，新建的索引库
+遇到已经缓存过的文件（例如 CI 中反复出现的同一批产物）不需要重新解析；
+默认只读取缓存，--write-cache 时才把新解析的文件写进去。
+
+用法：
+    python elf_index.py scan /path/to/rootfs --db rootfs.sqlite
+    python elf_index.py who-needs libssl.so.3 --db rootfs.sqlite
+    python elf_index.py what-breaks libssl.so.3 --db rootfs.sqlite
+    python elf_index.py provides SSL_new --db rootfs.sqlite
+"""
+
+import argparse
+import os
+import sqlite3
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from elf_cache import DEFAULT_CACHE_DIR, ELFCache, open_elf
+from elf_reader import ELFError
+
+DEFAULT_DB = "elf_index.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    is_elf INTEGER NOT NULL,
+    soname TEXT,
+    rpath TEXT,
+    runpath TEXT,
+    elfclass INTEGER,
+    machine INTEGER
+);
+CREATE TABLE IF NOT EXISTS needed (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    pos INTEGER NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    defined INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS needed_name ON needed(name);
+CREATE INDEX IF NOT EXISTS needed_file ON needed(file_id);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols(name, defined);
+CREATE INDEX IF NOT EXISTS symbols_file ON symbols(file_id);
+CREATE INDEX IF NOT EXISTS files_soname ON files(soname);
+CREATE INDEX IF NOT EXISTS files_name ON files(name);
+"""
+
+EXPORT_BINDS = ("STB_GLOBAL", "STB_WEAK", "STB_GNU_UNIQUE")
+EXPORT_VISIBILITY = ("STV_DEFAULT", "STV_PROTECTED")
+
+
+def open_db(filename):
+    conn = sqlite3.connect(filename)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def parse_elf(path, cache_dir=None, cache_write=False):
+    """
+    解析一个 ELF 文件，返回索引需要的信息；不是 ELF 时返回 None
+    在工作进程中运行，只返回可序列化的基本类型；cache_dir 为共享缓存目录，
+    cache_write 为 False 时只读取已有的条目
+    """
+    try:
+        cache = ELFCache(cache_dir, write=cache_write) if cache_dir else None
+        with open_elf(path, cache) as elf:
+            exported = set()
+            imported = set()
+            for section in elf.iter_sections("SHT_DYNSYM"):
+                for sym in elf.iter_symbols(section):
+                    if not sym.name or sym.bind == "STB_LOCAL":
+                        continue
+                    if sym.st_shndx == "SHN_UNDEF":
+                        imported.add(sym.name)
+                    elif (
+                        sym.visibility in EXPORT_VISIBILITY and sym.bind in EXPORT_BINDS
+                    ):
+                        exported.add(sym.name)
+            return {
+                "soname": elf.soname(),
+                "rpath": elf.rpath(),
+                "runpath": elf.runpath(),
+                "elfclass": elf.elfclass,
+                "machine": elf.e_machine_value,
+                "needed": elf.needed(),
+                "exported": sorted(exported),
+                "imported": sorted(imported - exported),
+            }
+    # 单个损坏的文件不能中断整个扫描
+    except (OSError, ELFError, ValueError, IndexError, struct.error):
+        return None
+
+
+def _read_magic(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(4) == b"\x7fELF"
+    except OSError:
+        return False
+
+
+def walk_files(root):
+    """产出 (路径, mtime_ns, 大小)，只包含普通文件，不跟随符号链接"""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            it = os.scandir(directory)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        yield entry.path, st.st_mtime_ns, st.st_size
+                except OSError:
+                    continue
+
+
+def _store(conn, path, mtime_ns, size, info):
+    conn.execute("DELETE FROM files WHERE path = ?", (path,))
+    if info is None:
+        conn.execute(
+            "INSERT INTO files (path, name, mtime_ns, size, is_elf) "
+            "VALUES (?, ?, ?, ?, 0)",
+            (path, os.path.basename(path), mtime_ns, size),
+        )
+        return
+
+    cur = conn.execute(
+        "INSERT INTO files (path, name, mtime_ns, size, is_elf, soname, rpath, "
+        "runpath, elfclass, machine) VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?)",
+        (
+            path,
+            os.path.basename(path),
+            mtime_ns,
+            size,
+            info["soname"],
+            info["rpath"],
+            info["runpath"],
+            info["elfclass"],
+            info["machine"],
+        ),
+    )
+    file_id = cur.lastrowid
+    conn.executemany(
+        "INSERT INTO needed (file_id, pos, name) VALUES (?, ?, ?)",
+        [(file_id, pos, name) for pos, name in enumerate(info["needed"])],
+    )
+    conn.executemany(
+        "INSERT INTO symbols (file_id, name, defined) VALUES (?, ?, 1)",
+        [(file_id, name) for name in info["exported"]],
+    )
+    conn.executemany(
+        "INSERT INTO symbols (file_id, name, defined) VALUES (?, ?, 0)",
+        [(file_id, name) for name in info["imported"]],
+    )
+
+
+def _parse_if_elf(path, cache_dir=None, cache_write=False):
+    return parse_elf(path, cache_dir, cache_write) if _read_magic(path) else None
+
+
+def scan(conn, root, jobs=1, batch_size=256, cache_dir=None, cache_write=False):
+    """增量扫描 root，返回 (新增或更新的文件数, 未变化的文件数, 删除的文件数)"""
+    root = os.path.abspath(root)
+    prefix = root.rstrip("/") + "/"
+    known = {
+        path: (mtime_ns, size)
+        for path, mtime_ns, size in conn.execute(
+            "SELECT path, mtime_ns, size FROM files WHERE path = ? OR substr(path, 1, ?) = ?",
+            (root, len(prefix), prefix),
+        )
+    }
+
+    seen = set()
+    changed = []
+    unchanged = 0
+    for path, mtime_ns, size in walk_files(root):
+        seen.add(path)
+        if known.get(path) == (mtime_ns, size):
+            unchanged += 1
+        else:
+            changed.append((path, mtime_ns, size))
+
+    parse = partial(_parse_if_elf, cache_dir=cache_dir, cache_write=cache_write)
+    pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    try:
+        for start in range(0, len(changed), batch_size):
+            batch = changed[start : start + batch_size]
+            paths = [path for path, _, _ in batch]
+            if pool is not None:
+                infos = pool.map(parse, paths, chunksize=16)
+            else:
+                infos = map(parse, paths)
+            with conn:
+                for (path, mtime_ns, size), info in zip(batch, infos):
+                    _store(conn, path, mtime_ns, size, info)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    removed = [path for path in known if path not in seen]
+    with conn:
+        conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in removed])
+
+    return len(changed), unchanged, len(removed)
+
+
+def _library_files(conn, name):
+    """
+    一个库可以被 soname 或文件名引用
+    返回 (可能出现在 DT_NEEDED 里的名字集合, 匹配到的文件 id 列表)
+    """
+    base = os.path.basename(name)
+    names = {base}
+    ids = []
+    rows = conn.execute(
+        "SELECT id, name, soname FROM files "
+        "WHERE is_elf = 1 AND (soname = ? OR name = ? OR path = ?)",
+        (base, base, os.path.abspath(name)),
+    )
+    for file_id, filename, soname in rows:
+        ids.append(file_id)
+        names.add(filename)
+        if soname:
+            names.add(soname)
+    return names, ids
+
+
+def who_needs(conn, name):
+    """直接在 DT_NEEDED 中引用 name 的文件"""
+    names = sorted(_library_files(conn, name)[0])
+    placeholders = ",".join("?" * len(names))
+    return [
+        row[0]
+        for row in conn.execute(
+            "SELECT DISTINCT f.path FROM needed n JOIN files f ON f.id = n.file_id "
+            f"WHERE n.name IN ({placeholders}) ORDER BY f.path",
+            names,
+        )
+    ]
+
+
+def what_breaks(conn, name):
+    """
+    删除 name 后会受影响的文件：直接依赖者以及通过它们间接依赖的文件。
+    返回 (直接依赖者, 间接依赖者, {直接依赖者: 将无法解析的符号})
+    """
+    removed_ids = _library_files(conn, name)[1]
+
+    direct = who_needs(conn, name)
+    broken = set(direct)
+    frontier = list(direct)
+    indirect = []
+    while frontier:
+        next_frontier = []
+        for path in frontier:
+            for dependent in who_needs(conn, path):
+                if dependent not in broken:
+                    broken.add(dependent)
+                    indirect.append(dependent)
+                    next_frontier.append(dependent)
+        frontier = next_frontier
+
+    # 只由被删除的库导出、不再有其他提供者的导入符号
+    lost = {}
+    if removed_ids:
+        id_marks = ",".join("?" * len(removed_ids))
+        for path in direct:
+            rows = conn.execute(
+                "SELECT DISTINCT s.name FROM symbols s "
+                "JOIN files f ON f.id = s.file_id "
+                "WHERE f.path = ? AND s.defined = 0 "
+                f"AND s.name IN (SELECT name FROM symbols WHERE defined = 1 AND file_id IN ({id_marks})) "
+                f"AND s.name NOT IN (SELECT name FROM symbols WHERE defined = 1 AND file_id NOT IN ({id_marks})) "
+                "ORDER BY s.name",
+                [path, *removed_ids, *removed_ids],
+            )
+            symbols = [row[0] for row in rows]
+            if symbols:
+                lost[path] = symbols
+
+    return direct, sorted(indirect), lost
+
+
+def providers(conn, symbol):
+    return [
+        row[0]
+        for row in conn.execute(
+            "SELECT f.path FROM symbols s JOIN files f ON f.id = s.file_id "
+            "WHERE s.name = ? AND s.defined = 1 ORDER BY f.path",
+            (symbol,),
+        )
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Index ELF dependencies of a directory tree in SQLite",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Examples:
+  python elf_index.py scan /srv/rootfs --db rootfs.sqlite
+  python elf_index.py who-needs libssl.so.3 --db rootfs.sqlite
+  python elf_index.py what-breaks libssl.so.3 --db rootfs.sqlite
+  python elf_index.py provides SSL_new --db rootfs.sqlite
+        """,
+    )
+    parser.add_argument(
+        "--db", default=DEFAULT_DB, help=f"Index file (default: {DEFAULT_DB})"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_scan = sub.add_parser("scan", help="Scan (or rescan) a directory tree")
+    p_scan.add_argument("root", help="Directory to scan, e.g. a container rootfs")
+    p_scan.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes used to parse ELF files (default: CPU count)",
+    )
+    p_scan.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help=f"Shared cache of parsed ELF metadata (default: {DEFAULT_CACHE_DIR})",
+    )
+    p_scan.add_argument(
+        "--no-cache", action="store_true", help="Do not read or write the cache"
+    )
+    p_scan.add_argument(
+        "--write-cache",
+        action="store_true",
+        help="Also store newly parsed files in the cache (default: only read it)",
+    )
+
+    p_who = sub.add_parser("who-needs", help="Files that list LIB in DT_NEEDED")
+    p_who.add_argument("library", help="Library soname, file name or path")
+
+    p_break = sub.add_parser(
+        "what-breaks", help="Files affected if LIB is removed, and symbols they lose"
+    )
+    p_break.add_argument("library", help="Library soname, file name or path")
+
+    p_prov = sub.add_parser("provides", help="Files that export SYMBOL")
+    p_prov.add_argument("symbol", help="Dynamic symbol name")
+
+    args = parser.parse_args()
+    conn = open_db(args.db)
+
+    if args.command == "scan":
+        start = time.perf_counter()
+        changed, unchanged, removed = scan(
+            conn,
+            args.root,
+            args.jobs,
+            cache_dir=None if args.no_cache else args.cache_dir,
+            cache_write=args.write_cache,
+        )
+        elapsed = time.perf_counter() - start
+        (elf_count,) = conn.execute(
+            "SELECT COUNT(*) FROM files WHERE is_elf = 1"
+        ).fetchone()
+        print(
+            f"Scanned {args.root} in {elapsed:.2f}s: {changed} parsed, "
+            f"{unchanged} unchanged, {removed} removed ({elf_count} ELF files indexed)"
+        )
+    elif args.command == "who-needs":
+        for path in who_needs(conn, args.library):
+            print(path)
+    elif args.command == "what-breaks":
+        direct, indirect, lost = what_breaks(conn, args.library)
+        print(f"Direct dependents of {args.library}: {len(direct)}")
+        for path in direct:
+            print(f"  {path}")
+            for symbol in lost.get(path, []):
+                print(f"      unresolved: {symbol}")
+        print(f"Indirect dependents: {len(indirect)}")
+        for path in indirect:
+            print(f"  {path}")
+    elif args.command == "provides":
+        paths = providers(conn, args.symbol)
+        if not paths:
+            print(f"No indexed file exports {args.symbol}", file=sys.stderr)
+            sys.exit(1)
+        for path in paths:
+            print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1035 @@
+"""
+基于 mmap 的 ELF 读取器
+
+整个文件只映射一次，头部、节表、段表、符号表、字符串表、动态段和重定位表
+都直接从 memoryview 上用 struct.unpack_from / struct.iter_unpack 解析，
+不做逐条 seek + read，也不把整段数据复制成 Python bytes。
+
+用法：
+    with ELFReader("/bin/ls") as elf:
+        for sec in elf.sections:
+            print(sec.name, sec.sh_type, sec.sh_size)
+        print(elf.needed())
+"""
+
+import mmap
+import struct
+import sys
+from collections import namedtuple
+
+ELFSection = namedtuple(
+    "ELFSection",
+    "index name sh_name sh_type sh_flags sh_addr sh_offset sh_size "
+    "sh_link sh_info sh_addralign sh_entsize",
+)
+ELFSegment = namedtuple(
+    "ELFSegment",
+    "index p_type p_flags p_offset p_vaddr p_paddr p_filesz p_memsz p_align",
+)
+ELFSymbol = namedtuple(
+    "ELFSymbol", "index name st_value st_size bind type visibility st_shndx"
+)
+ELFRelocation = namedtuple(
+    "ELFRelocation", "r_offset r_info r_info_sym r_info_type r_addend"
+)
+
+
+class ELFError(ValueError):
+    """不是合法的 ELF 文件或结构损坏"""
+
+
+# 名称表：与 pyelftools 的输出保持一致，未知值保留为整数
+E_TYPE = {0: "ET_NONE", 1: "ET_REL", 2: "ET_EXEC", 3: "ET_DYN", 4: "ET_CORE"}
+
+E_MACHINE = {
+    3: ("EM_386", "x86"),
+    8: ("EM_MIPS", "MIPS"),
+    20: ("EM_PPC", "PowerPC"),
+    21: ("EM_PPC64", "64-bit PowerPC"),
+    22: ("EM_S390", "IBM S/390"),
+    40: ("EM_ARM", "ARM"),
+    62: ("EM_X86_64", "x64"),
+    183: ("EM_AARCH64", "AArch64"),
+    243: ("EM_RISCV", "RISC-V"),
+    258: ("EM_LOONGARCH", "LoongArch"),
+}
+
+SH_TYPE = {
+    0: "SHT_NULL",
+    1: "SHT_PROGBITS",
+    2: "SHT_SYMTAB",
+    3: "SHT_STRTAB",
+    4: "SHT_RELA",
+    5: "SHT_HASH",
+    6: "SHT_DYNAMIC",
+    7: "SHT_NOTE",
+    8: "SHT_NOBITS",
+    9: "SHT_REL",
+    10: "SHT_SHLIB",
+    11: "SHT_DYNSYM",
+    14: "SHT_INIT_ARRAY",
+    15: "SHT_FINI_ARRAY",
+    16: "SHT_PREINIT_ARRAY",
+    17: "SHT_GROUP",
+    18: "SHT_SYMTAB_SHNDX",
+    19: "SHT_RELR",
+    0x6FFFFFF5: "SHT_GNU_ATTRIBUTES",
+    0x6FFFFFF6: "SHT_GNU_HASH",
+    0x6FFFFFF7: "SHT_GNU_LIBLIST",
+    0x6FFFFFFD: "SHT_GNU_verdef",
+    0x6FFFFFFE: "SHT_GNU_verneed",
+    0x6FFFFFFF: "SHT_GNU_versym",
+}
+
+P_TYPE = {
+    0: "PT_NULL",
+    1: "PT_LOAD",
+    2: "PT_DYNAMIC",
+    3: "PT_INTERP",
+    4: "PT_NOTE",
+    5: "PT_SHLIB",
+    6: "PT_PHDR",
+    7: "PT_TLS",
+    0x6474E550: "PT_GNU_EH_FRAME",
+    0x6474E551: "PT_GNU_STACK",
+    0x6474E552: "PT_GNU_RELRO",
+    0x6474E553: "PT_GNU_PROPERTY",
+    0x6474E554: "PT_GNU_SFRAME",
+    0x70000001: "PT_ARM_EXIDX",
+}
+
+ST_BIND = {0: "STB_LOCAL", 1: "STB_GLOBAL", 2: "STB_WEAK", 10: "STB_GNU_UNIQUE"}
+ST_TYPE = {
+    0: "STT_NOTYPE",
+    1: "STT_OBJECT",
+    2: "STT_FUNC",
+    3: "STT_SECTION",
+    4: "STT_FILE",
+    5: "STT_COMMON",
+    6: "STT_TLS",
+    10: "STT_GNU_IFUNC",
+}
+ST_VISIBILITY = {
+    0: "STV_DEFAULT",
+    1: "STV_INTERNAL",
+    2: "STV_HIDDEN",
+    3: "STV_PROTECTED",
+}
+SHN_SPECIAL = {0: "SHN_UNDEF", 0xFFF1: "SHN_ABS", 0xFFF2: "SHN_COMMON"}
+SHN_XINDEX = 0xFFFF
+
+# .note.gnu.build-id 的注释类型
+NT_GNU_BUILD_ID = 3
+
+D_TAG = {
+    0: "DT_NULL",
+    1: "DT_NEEDED",
+    2: "DT_PLTRELSZ",
+    3: "DT_PLTGOT",
+    4: "DT_HASH",
+    5: "DT_STRTAB",
+    6: "DT_SYMTAB",
+    7: "DT_RELA",
+    8: "DT_RELASZ",
+    9: "DT_RELAENT",
+    10: "DT_STRSZ",
+    11: "DT_SYMENT",
+    12: "DT_INIT",
+    13: "DT_FINI",
+    14: "DT_SONAME",
+    15: "DT_RPATH",
+    16: "DT_SYMBOLIC",
+    17: "DT_REL",
+    18: "DT_RELSZ",
+    19: "DT_RELENT",
+    20: "DT_PLTREL",
+    21: "DT_DEBUG",
+    22: "DT_TEXTREL",
+    23: "DT_JMPREL",
+    24: "DT_BIND_NOW",
+    25: "DT_INIT_ARRAY",
+    26: "DT_FINI_ARRAY",
+    27: "DT_INIT_ARRAYSZ",
+    28: "DT_FINI_ARRAYSZ",
+    29: "DT_RUNPATH",
+    30: "DT_FLAGS",
+    32: "DT_PREINIT_ARRAY",
+    33: "DT_PREINIT_ARRAYSZ",
+    35: "DT_RELRSZ",
+    36: "DT_RELR",
+    37: "DT_RELRENT",
+    0x6FFFFEF5: "DT_GNU_HASH",
+    0x6FFFFFF0: "DT_VERSYM",
+    0x6FFFFFF9: "DT_RELACOUNT",
+    0x6FFFFFFA: "DT_RELCOUNT",
+    0x6FFFFFFB: "DT_FLAGS_1",
+    0x6FFFFFFC: "DT_VERDEF",
+    0x6FFFFFFD: "DT_VERDEFNUM",
+    0x6FFFFFFE: "DT_VERNEED",
+    0x6FFFFFFF: "DT_VERNEEDNUM",
+}
+
+# 重定位类型名：动态链接器处理的类型，以及目标文件里常见的静态类型
+RELOC_TYPE = {
+    62: {
+        0: "R_X86_64_NONE",
+        1: "R_X86_64_64",
+        2: "R_X86_64_PC32",
+        3: "R_X86_64_GOT32",
+        4: "R_X86_64_PLT32",
+        5: "R_X86_64_COPY",
+        6: "R_X86_64_GLOB_DAT",
+        7: "R_X86_64_JUMP_SLOT",
+        8: "R_X86_64_RELATIVE",
+        9: "R_X86_64_GOTPCREL",
+        10: "R_X86_64_32",
+        11: "R_X86_64_32S",
+        12: "R_X86_64_16",
+        13: "R_X86_64_PC16",
+        14: "R_X86_64_8",
+        15: "R_X86_64_PC8",
+        16: "R_X86_64_DTPMOD64",
+        17: "R_X86_64_DTPOFF64",
+        18: "R_X86_64_TPOFF64",
+        19: "R_X86_64_TLSGD",
+        20: "R_X86_64_TLSLD",
+        21: "R_X86_64_DTPOFF32",
+        22: "R_X86_64_GOTTPOFF",
+        23: "R_X86_64_TPOFF32",
+        24: "R_X86_64_PC64",
+        25: "R_X86_64_GOTOFF64",
+        26: "R_X86_64_GOTPC32",
+        32: "R_X86_64_SIZE32",
+        33: "R_X86_64_SIZE64",
+        34: "R_X86_64_GOTPC32_TLSDESC",
+        35: "R_X86_64_TLSDESC_CALL",
+        36: "R_X86_64_TLSDESC",
+        37: "R_X86_64_IRELATIVE",
+        38: "R_X86_64_RELATIVE64",
+        41: "R_X86_64_GOTPCRELX",
+        42: "R_X86_64_REX_GOTPCRELX",
+    },
+    3: {
+        0: "R_386_NONE",
+        1: "R_386_32",
+        2: "R_386_PC32",
+        3: "R_386_GOT32",
+        4: "R_386_PLT32",
+        5: "R_386_COPY",
+        6: "R_386_GLOB_DAT",
+        7: "R_386_JMP_SLOT",
+        8: "R_386_RELATIVE",
+        9: "R_386_GOTOFF",
+        10: "R_386_GOTPC",
+        14: "R_386_TLS_TPOFF",
+        15: "R_386_TLS_IE",
+        16: "R_386_TLS_GOTIE",
+        17: "R_386_TLS_LE",
+        18: "R_386_TLS_GD",
+        19: "R_386_TLS_LDM",
+        35: "R_386_TLS_DTPMOD32",
+        36: "R_386_TLS_DTPOFF32",
+        37: "R_386_TLS_TPOFF32",
+        41: "R_386_TLS_DESC",
+        42: "R_386_IRELATIVE",
+        43: "R_386_GOT32X",
+    },
+    183: {
+        0: "R_AARCH64_NONE",
+        257: "R_AARCH64_ABS64",
+        258: "R_AARCH64_ABS32",
+        260: "R_AARCH64_PREL64",
+        261: "R_AARCH64_PREL32",
+        275: "R_AARCH64_ADR_PREL_PG_HI21",
+        277: "R_AARCH64_ADD_ABS_LO12_NC",
+        282: "R_AARCH64_JUMP26",
+        283: "R_AARCH64_CALL26",
+        286: "R_AARCH64_LDST64_ABS_LO12_NC",
+        311: "R_AARCH64_ADR_GOT_PAGE",
+        312: "R_AARCH64_LD64_GOT_LO12_NC",
+        1024: "R_AARCH64_COPY",
+        1025: "R_AARCH64_GLOB_DAT",
+        1026: "R_AARCH64_JUMP_SLOT",
+        1027: "R_AARCH64_RELATIVE",
+        1028: "R_AARCH64_TLS_DTPMOD",
+        1029: "R_AARCH64_TLS_DTPREL",
+        1030: "R_AARCH64_TLS_TPREL",
+        1031: "R_AARCH64_TLSDESC",
+        1032: "R_AARCH64_IRELATIVE",
+    },
+}
+
+# 按名字后缀归类：relative 不需要符号查找，其余带符号的都要查找
+_RELOC_KIND_SUFFIX = (
+    ("IRELATIVE", "irelative"),
+    ("RELATIVE", "relative"),
+    ("RELATIVE64", "relative"),
+    ("JUMP_SLOT", "jump_slot"),
+    ("JMP_SLOT", "jump_slot"),
+    ("GLOB_DAT", "glob_dat"),
+    ("COPY", "copy"),
+    ("NONE", "none"),
+)
+
+
+def reloc_type_name(e_machine, r_type):
+    """返回重定位类型名，未知类型返回 'R_<数值>'"""
+    return RELOC_TYPE.get(e_machine, {}).get(r_type, f"R_{r_type}")
+
+
+def reloc_kind(type_name):
+    """
+    把重定位类型归为 relative / irelative / jump_slot / glob_dat / copy / tls /
+    none / symbolic（其它需要符号值的类型）
+    """
+    for suffix, kind in _RELOC_KIND_SUFFIX:
+        if type_name.endswith(suffix):
+            return kind
+    if "TLS" in type_name or "TPOFF" in type_name or "DTP" in type_name:
+        return "tls"
+    return "symbolic"
+
+
+# 各种结构在 32/64 位下的布局（不含字节序前缀）
+_LAYOUT = {
+    32: {
+        "ehdr": "HHIIIIIHHHHHH",
+        "shdr": "IIIIIIIIII",
+        "phdr": "IIIIIIII",
+        "sym": "IIIBBH",
+        "dyn": "iI",
+        "rel": "II",
+        "rela": "IIi",
+    },
+    64: {
+        "ehdr": "HHIQQQIHHHHHH",
+        "shdr": "IIQQQQIIQQ",
+        "phdr": "IIQQQQQQ",
+        "sym": "IBBHQQ",
+        "dyn": "qQ",
+        "rel": "QQ",
+        "rela": "QQq",
+    },
+}
+
+
+def _name(table, value):
+    return table.get(value, value)
+
+
+def gnu_hash(name):
+    """.gnu.hash 使用的 DJB 哈希，name 为 bytes"""
+    h = 5381
+    for c in name:
+        h = (h * 33 + c) & 0xFFFFFFFF
+    return h
+
+
+def sysv_hash(name):
+    """.hash（System V ABI）使用的 ELF 哈希，name 为 bytes"""
+    h = 0
+    for c in name:
+        h = ((h << 4) + c) & 0xFFFFFFFF
+        g = h & 0xF0000000
+        if g:
+            h ^= g >> 24
+        h &= ~g
+    return h
+
+
+def is_elf_file(path):
+    """只读取 4 字节魔数判断是否为 ELF 文件"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(4) == b"\x7fELF"
+    except OSError:
+        return False
+
+
+class ELFReader:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")  # noqa: SIM115  由 close() 关闭
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # 空文件无法映射
+            self._file.close()
+            raise ELFError(f"{path}: empty file")
+        self.data = memoryview(self._mm)
+
+        if len(self._mm) < 16 or self._mm[:4] != b"\x7fELF":
+            self.close()
+            raise ELFError(f"{path}: not an ELF file")
+
+        ei_class = self._mm[4]
+        ei_data = self._mm[5]
+        if ei_class not in (1, 2) or ei_data not in (1, 2):
+            self.close()
+            raise ELFError(f"{path}: unsupported ELF class/data encoding")
+
+        self.elfclass = 32 if ei_class == 1 else 64
+        self.little_endian = ei_data == 1
+        self.ei_data = "ELFDATA2LSB" if self.little_endian else "ELFDATA2MSB"
+        self._layout = layout = {}
+        prefix = "<" if self.little_endian else ">"
+        for key, fmt in _LAYOUT[self.elfclass].items():
+            layout[key] = struct.Struct(prefix + fmt)
+        if len(self._mm) < 16 + layout["ehdr"].size:
+            self.close()
+            raise ELFError(f"{path}: truncated ELF header")
+
+        (
+            e_type,
+            e_machine,
+            e_version,
+            e_entry,
+            e_phoff,
+            e_shoff,
+            e_flags,
+            e_ehsize,
+            e_phentsize,
+            e_phnum,
+            e_shentsize,
+            e_shnum,
+            e_shstrndx,
+        ) = layout["ehdr"].unpack_from(self._mm, 16)
+        self.e_machine_value = e_machine
+        self.header = {
+            "e_type": _name(E_TYPE, e_type),
+            "e_machine": E_MACHINE.get(e_machine, (e_machine,))[0],
+            "e_version": e_version,
+            "e_entry": e_entry,
+            "e_phoff": e_phoff,
+            "e_shoff": e_shoff,
+            "e_flags": e_flags,
+            "e_ehsize": e_ehsize,
+            "e_phentsize": e_phentsize,
+            "e_phnum": e_phnum,
+            "e_shentsize": e_shentsize,
+            "e_shnum": e_shnum,
+            "e_shstrndx": e_shstrndx,
+        }
+
+        try:
+            self.sections = self._parse_sections()
+            self.segments = self._parse_segments()
+        except ELFError:
+            self.close()
+            raise
+        self._section_by_name = None
+        self._hash_table = None
+
+    # ---- 生命周期 ----
+
+    def close(self):
+        if self.data is not None:
+            self.data.release()
+            self.data = None
+        try:
+            self._mm.close()
+        except BufferError:
+            # 调用方还持有切片视图，交给垃圾回收关闭
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- 头部信息 ----
+
+    def _view(self, offset, size, what):
+        """文件中 [offset, offset + size) 的视图，越界时抛出 ELFError"""
+        if offset < 0 or size < 0 or offset + size > len(self._mm):
+            raise ELFError(f"{self.path}: {what} out of bounds")
+        return self.data[offset : offset + size]
+
+    def _unpack(self, layout, offset, what):
+        self._view(offset, layout.size, what)
+        return layout.unpack_from(self._mm, offset)
+
+    def get_machine_arch(self):
+        machine = E_MACHINE.get(self.e_machine_value)
+        return machine[1] if machine else "<unknown>"
+
+    # ---- 节表 / 段表 ----
+
+    def _parse_sections(self):
+        hdr = self.header
+        shoff = hdr["e_shoff"]
+        if shoff == 0 or hdr["e_shentsize"] == 0:
+            return []
+
+        shdr = self._layout["shdr"]
+        # 扩展编号：节数或节名表下标放在第 0 个节头里
+        first = self._unpack(shdr, shoff, "section header table")
+        shnum = hdr["e_shnum"] or first[5]
+        shstrndx = hdr["e_shstrndx"]
+        if shstrndx == SHN_XINDEX:
+            shstrndx = first[6]
+        if hdr["e_phnum"] == 0xFFFF:
+            hdr["e_phnum"] = first[7]
+
+        view = self._view(shoff, shnum * shdr.size, "section header table")
+        raw = list(shdr.iter_unpack(view))
+        names_offset = raw[shstrndx][4] if shstrndx < len(raw) else None
+
+        sections = []
+        for index, fields in enumerate(raw):
+            name = ""
+            if names_offset is not None:
+                name = self._cstring(names_offset + fields[0])
+            sections.append(
+                ELFSection(
+                    index,
+                    name,
+                    fields[0],
+                    _name(SH_TYPE, fields[1]),
+                    *fields[2:],
+                )
+            )
+        return sections
+
+    def _parse_segments(self):
+        hdr = self.header
+        phoff = hdr["e_phoff"]
+        phnum = hdr["e_phnum"]
+        if phoff == 0 or phnum == 0:
+            return []
+
+        phdr = self._layout["phdr"]
+        view = self._view(phoff, phnum * phdr.size, "program header table")
+        segments = []
+        for index, fields in enumerate(phdr.iter_unpack(view)):
+            if self.elfclass == 64:
+                (
+                    p_type,
+                    p_flags,
+                    p_offset,
+                    p_vaddr,
+                    p_paddr,
+                    p_filesz,
+                    p_memsz,
+                    p_align,
+                ) = fields
+            else:
+                (
+                    p_type,
+                    p_offset,
+                    p_vaddr,
+                    p_paddr,
+                    p_filesz,
+                    p_memsz,
+                    p_flags,
+                    p_align,
+                ) = fields
+            segments.append(
+                ELFSegment(
+                    index,
+                    _name(P_TYPE, p_type),
+                    p_flags,
+                    p_offset,
+                    p_vaddr,
+                    p_paddr,
+                    p_filesz,
+                    p_memsz,
+                    p_align,
+                )
+            )
+        return segments
+
+    def get_section(self, index):
+        if 0 <= index < len(self.sections):
+            return self.sections[index]
+        return None
+
+    def get_section_by_name(self, name):
+        if self._section_by_name is None:
+            self._section_by_name = {}
+            for sec in self.sections:
+                self._section_by_name.setdefault(sec.name, sec)
+        return self._section_by_name.get(name)
+
+    def iter_sections(self, sh_type=None):
+        for sec in self.sections:
+            if sh_type is None or sec.sh_type == sh_type:
+                yield sec
+
+    def iter_segments(self, p_type=None):
+        for seg in self.segments:
+            if p_type is None or seg.p_type == p_type:
+                yield seg
+
+    def section_data(self, section):
+        """返回节内容的 memoryview（零拷贝），SHT_NOBITS 返回空视图"""
+        if section.sh_type == "SHT_NOBITS":
+            return self.data[0:0]
+        return self.data[section.sh_offset : section.sh_offset + section.sh_size]
+
+    def vaddr_to_offset(self, vaddr):
+        """把虚拟地址换算成文件偏移，不在任何 PT_LOAD 的文件部分内返回 None"""
+        for seg in self.segments:
+            if seg.p_type != "PT_LOAD":
+                continue
+            if seg.p_vaddr <= vaddr < seg.p_vaddr + seg.p_filesz:
+                return seg.p_offset + (vaddr - seg.p_vaddr)
+        return None
+
+    # ---- 字符串表 ----
+
+    def _cstring(self, offset):
+        end = self._mm.find(b"\0", offset)
+        if end < 0:
+            end = len(self._mm)
+        return self._mm[offset:end].decode("utf-8", errors="replace")
+
+    def get_string(self, strtab, offset):
+        """从字符串表节中取出 offset 处的字符串"""
+        return self._cstring(strtab.sh_offset + offset)
+
+    # ---- 符号表 ----
+
+    def iter_symbols(self, section):
+        """逐条产出符号（ELFSymbol），名字通过 sh_link 指向的字符串表解析"""
+        if section.sh_type == "SHT_NOBITS":
+            return  # 分离出的调试文件中 .dynsym 等只剩节头
+        sym = self._layout["sym"]
+        strtab = self.get_section(section.sh_link)
+        str_base = strtab.sh_offset if strtab is not None else None
+        cstring = self._cstring
+        count = section.sh_size // sym.size
+        view = self._view(section.sh_offset, count * sym.size, section.name)
+        is64 = self.elfclass == 64
+
+        for index, fields in enumerate(sym.iter_unpack(view)):
+            if is64:
+                st_name, st_info, st_other, st_shndx, st_value, st_size = fields
+            else:
+                st_name, st_value, st_size, st_info, st_other, st_shndx = fields
+            yield ELFSymbol(
+                index,
+                cstring(str_base + st_name) if str_base is not None else "",
+                st_value,
+                st_size,
+                _name(ST_BIND, st_info >> 4),
+                _name(ST_TYPE, st_info & 0xF),
+                _name(ST_VISIBILITY, st_other & 0x3),
+                _name(SHN_SPECIAL, st_shndx),
+            )
+
+    def num_symbols(self, section):
+        return section.sh_size // self._layout["sym"].size
+
+    def get_symbol(self, section, index):
+        """按下标读取单个符号"""
+        sym = self._layout["sym"]
+        if index >= self.num_symbols(section):
+            return None
+        fields = self._unpack(sym, section.sh_offset + index * sym.size, section.name)
+        if self.elfclass == 64:
+            st_name, st_info, st_other, st_shndx, st_value, st_size = fields
+        else:
+            st_name, st_value, st_size, st_info, st_other, st_shndx = fields
+        strtab = self.get_section(section.sh_link)
+        return ELFSymbol(
+            index,
+            self.get_string(strtab, st_name) if strtab is not None else "",
+            st_value,
+            st_size,
+            _name(ST_BIND, st_info >> 4),
+            _name(ST_TYPE, st_info & 0xF),
+            _name(ST_VISIBILITY, st_other & 0x3),
+            _name(SHN_SPECIAL, st_shndx),
+        )
+
+    # ---- 动态段 ----
+
+    def _dynamic_location(self):
+        """返回 (文件偏移, 大小, 字符串表节)"""
+        for sec in self.sections:
+            if sec.sh_type == "SHT_DYNAMIC":
+                return sec.sh_offset, sec.sh_size, self.get_section(sec.sh_link)
+        for seg in self.segments:
+            if seg.p_type == "PT_DYNAMIC":
+                return seg.p_offset, seg.p_filesz, None
+        return None
+
+    def iter_dynamic(self):
+        """产出 (d_tag 名称, d_val)，遇到 DT_NULL 停止"""
+        location = self._dynamic_location()
+        if location is None:
+            return
+        offset, size, _ = location
+        dyn = self._layout["dyn"]
+        view = self._view(offset, size - size % dyn.size, "dynamic section")
+        for d_tag, d_val in dyn.iter_unpack(view):
+            if d_tag == 0:
+                break
+            yield _name(D_TAG, d_tag), d_val
+
+    def _dynamic_strtab_offset(self):
+        location = self._dynamic_location()
+        if location is None:
+            return None
+        if location[2] is not None:
+            return location[2].sh_offset
+        # 没有节头时用 DT_STRTAB 的地址换算
+        for tag, val in self.iter_dynamic():
+            if tag == "DT_STRTAB":
+                return self.vaddr_to_offset(val)
+        return None
+
+    def dynamic_strings(self, tag):
+        """返回某个字符串类动态标签（DT_NEEDED、DT_RPATH 等）的所有取值"""
+        entries = [val for d_tag, val in self.iter_dynamic() if d_tag == tag]
+        if not entries:
+            return []
+        base = self._dynamic_strtab_offset()
+        if base is None:
+            return []
+        return [self._cstring(base + val) for val in entries]
+
+    def needed(self):
+        return self.dynamic_strings("DT_NEEDED")
+
+    def soname(self):
+        values = self.dynamic_strings("DT_SONAME")
+        return values[0] if values else None
+
+    def rpath(self):
+        values = self.dynamic_strings("DT_RPATH")
+        return values[0] if values else None
+
+    def runpath(self):
+        values = self.dynamic_strings("DT_RUNPATH")
+        return values[0] if values else None
+
+    def interpreter(self):
+        for seg in self.segments:
+            if seg.p_type == "PT_INTERP":
+                return self._cstring(seg.p_offset)
+        return None
+
+    # ---- 注释节 ----
+
+    def iter_notes(self):
+        """产出所有 SHT_NOTE 节（没有节头时用 PT_NOTE 段）中的 (名字, 类型, 描述内容)"""
+        locations = [
+            (sec.sh_offset, sec.sh_size, sec.sh_addralign)
+            for sec in self.iter_sections("SHT_NOTE")
+        ]
+        if not locations:
+            locations = [
+                (seg.p_offset, seg.p_filesz, seg.p_align)
+                for seg in self.iter_segments("PT_NOTE")
+            ]
+        header = struct.Struct(("<" if self.little_endian else ">") + "III")
+        for offset, size, align in locations:
+            # 64 位的 .note.gnu.property 按 8 字节对齐，其他注释按 4 字节
+            align = 8 if align == 8 else 4
+            pos, end = offset, min(offset + size, len(self._mm))
+            while pos + header.size <= end:
+                namesz, descsz, n_type = header.unpack_from(self._mm, pos)
+                name_start = pos + header.size
+                desc_start = name_start + (namesz + align - 1) // align * align
+                desc_end = desc_start + descsz
+                if desc_end > end:
+                    break
+                name = self._mm[name_start : name_start + namesz].rstrip(b"\0")
+                yield (
+                    name.decode(errors="replace"),
+                    n_type,
+                    self._mm[desc_start:desc_end],
+                )
+                pos = desc_start + (descsz + align - 1) // align * align
+
+    def build_id(self):
+        """.note.gnu.build-id 中的构建 ID（十六进制字符串），没有时返回 None"""
+        for name, n_type, desc in self.iter_notes():
+            if name == "GNU" and n_type == NT_GNU_BUILD_ID:
+                return desc.hex()
+        return None
+
+    # ---- 符号版本 ----
+
+    def version_definitions(self):
+        """解析 .gnu.version_d，返回 {版本下标: (版本名, 是否为 VER_FLG_BASE)}"""
+        section = next(self.iter_sections("SHT_GNU_verdef"), None)
+        if section is None:
+            return {}
+        strtab = self.get_section(section.sh_link)
+        order = "<" if self.little_endian else ">"
+        verdef = struct.Struct(order + "HHHHIII")
+        verdaux = struct.Struct(order + "II")
+
+        result = {}
+        offset = section.sh_offset
+        end = section.sh_offset + section.sh_size
+        while offset < end:
+            _, vd_flags, vd_ndx, vd_cnt, _, vd_aux, vd_next = self._unpack(
+                verdef, offset, section.name
+            )
+            if vd_cnt:
+                vda_name, _ = self._unpack(verdaux, offset + vd_aux, section.name)
+                result[vd_ndx] = (self.get_string(strtab, vda_name), bool(vd_flags & 1))
+            if vd_next == 0:
+                break
+            offset += vd_next
+        return result
+
+    def version_requirements(self):
+        """解析 .gnu.version_r，返回 {版本下标: (版本名, 提供该版本的文件名)}"""
+        section = next(self.iter_sections("SHT_GNU_verneed"), None)
+        if section is None:
+            return {}
+        strtab = self.get_section(section.sh_link)
+        order = "<" if self.little_endian else ">"
+        verneed = struct.Struct(order + "HHIII")
+        vernaux = struct.Struct(order + "IHHII")
+
+        result = {}
+        offset = section.sh_offset
+        end = section.sh_offset + section.sh_size
+        while offset < end:
+            _, vn_cnt, vn_file, vn_aux, vn_next = self._unpack(
+                verneed, offset, section.name
+            )
+            filename = self.get_string(strtab, vn_file)
+            aux = offset + vn_aux
+            for _ in range(vn_cnt):
+                _, _, vna_other, vna_name, vna_next = self._unpack(
+                    vernaux, aux, section.name
+                )
+                result[vna_other] = (self.get_string(strtab, vna_name), filename)
+                if vna_next == 0:
+                    break
+                aux += vna_next
+            if vn_next == 0:
+                break
+            offset += vn_next
+        return result
+
+    def symbol_versions(self, section):
+        """
+        返回 .gnu.version 中与符号表一一对应的原始 versym 值列表，
+        没有版本信息时返回 None。低 15 位是版本下标，最高位表示隐藏版本
+        """
+        versym = next(self.iter_sections("SHT_GNU_versym"), None)
+        if versym is None or versym.sh_link != section.index:
+            return None
+        count = min(versym.sh_size // 2, self.num_symbols(section))
+        fmt = struct.Struct(("<" if self.little_endian else ">") + f"{count}H")
+        return list(self._unpack(fmt, versym.sh_offset, versym.name))
+
+    # ---- 符号哈希表 ----
+
+    def _symbol_hash_table(self):
+        """
+        找到 .dynsym 对应的 .gnu.hash（优先）或 .hash，解析表头并缓存
+        返回描述表位置的字典，没有哈希表时返回 {}
+        """
+        if self._hash_table is not None:
+            return self._hash_table
+        self._hash_table = {}
+        dynsym = next(self.iter_sections("SHT_DYNSYM"), None)
+        if dynsym is None:
+            return self._hash_table
+        order = "<" if self.little_endian else ">"
+
+        for sec in self.iter_sections("SHT_GNU_HASH"):
+            if sec.sh_link != dynsym.index:
+                continue
+            nbuckets, symoffset, bloom_size, bloom_shift = self._unpack(
+                struct.Struct(order + "4I"), sec.sh_offset, sec.name
+            )
+            if nbuckets == 0 or bloom_size == 0:
+                # 查找时要对这两个数取模；不缓存，每次查找都报同样的错误
+                self._hash_table = None
+                raise ELFError(
+                    f"{self.path}: {sec.name} has {nbuckets} buckets and "
+                    f"{bloom_size} bloom words"
+                )
+            word = 8 if self.elfclass == 64 else 4
+            bloom = sec.sh_offset + 16
+            buckets = bloom + bloom_size * word
+            self._hash_table = {
+                "kind": "gnu",
+                "dynsym": dynsym,
+                "nbuckets": nbuckets,
+                "symoffset": symoffset,
+                "bloom_size": bloom_size,
+                "bloom_shift": bloom_shift,
+                "bloom": bloom,
+                "bloom_word": struct.Struct(order + ("Q" if word == 8 else "I")),
+                "buckets": buckets,
+                "chain": buckets + 4 * nbuckets,
+                "u32": struct.Struct(order + "I"),
+            }
+            return self._hash_table
+
+        for sec in self.iter_sections("SHT_HASH"):
+            if sec.sh_link != dynsym.index:
+                continue
+            nbucket, _ = self._unpack(
+                struct.Struct(order + "2I"), sec.sh_offset, sec.name
+            )
+            self._hash_table = {
+                "kind": "sysv",
+                "dynsym": dynsym,
+                "nbucket": nbucket,
+                "buckets": sec.sh_offset + 8,
+                "chain": sec.sh_offset + 8 + 4 * nbucket,
+                "u32": struct.Struct(order + "I"),
+            }
+            return self._hash_table
+        return self._hash_table
+
+    def symbol_hash_kind(self):
+        """返回 "gnu"、"sysv"，没有可用的哈希表时返回 None"""
+        return self._symbol_hash_table().get("kind")
+
+    def _lookup_gnu(self, table, name, key):
+        h = gnu_hash(key)
+        bits = table["bloom_word"].size * 8
+        word = table["bloom_word"].unpack_from(
+            self._mm,
+            table["bloom"]
+            + ((h // bits) % table["bloom_size"]) * table["bloom_word"].size,
+        )[0]
+        mask = (1 << (h % bits)) | (1 << ((h >> table["bloom_shift"]) % bits))
+        if word & mask != mask:
+            return None  # 布隆过滤器判定不存在
+
+        u32 = table["u32"]
+        index = u32.unpack_from(
+            self._mm, table["buckets"] + 4 * (h % table["nbuckets"])
+        )[0]
+        symoffset = table["symoffset"]
+        if index < symoffset:
+            return None
+        dynsym = table["dynsym"]
+        count = self.num_symbols(dynsym)
+        while index < count:
+            chain_hash = u32.unpack_from(
+                self._mm, table["chain"] + 4 * (index - symoffset)
+            )[0]
+            if (chain_hash | 1) == (h | 1):
+                sym = self.get_symbol(dynsym, index)
+                if sym.name == name and sym.st_shndx != "SHN_UNDEF":
+                    return sym
+            if chain_hash & 1:  # 链的最后一项
+                break
+            index += 1
+        return None
+
+    def _lookup_sysv(self, table, name, key):
+        if table["nbucket"] == 0:
+            return None
+        u32 = table["u32"]
+        dynsym = table["dynsym"]
+        count = self.num_symbols(dynsym)
+        index = u32.unpack_from(
+            self._mm, table["buckets"] + 4 * (sysv_hash(key) % table["nbucket"])
+        )[0]
+        seen = 0
+        while index != 0 and index < count and seen < count:
+            sym = self.get_symbol(dynsym, index)
+            if sym.name == name and sym.st_shndx != "SHN_UNDEF":
+                return sym
+            index = u32.unpack_from(self._mm, table["chain"] + 4 * index)[0]
+            seen += 1
+        return None
+
+    def lookup_symbol(self, name):
+        """
+        按名字在 .dynsym 中查找已定义的符号，返回 ELFSymbol 或 None
+        与动态链接器一样使用 .gnu.hash 的布隆过滤器和哈希桶（或 .hash），
+        只比较同一个桶里的少数符号；没有哈希表时退化为线性扫描
+        """
+        table = self._symbol_hash_table()
+        key = name.encode()
+        try:
+            if table.get("kind") == "gnu":
+                return self._lookup_gnu(table, name, key)
+            if table.get("kind") == "sysv":
+                return self._lookup_sysv(table, name, key)
+        except struct.error:
+            # 桶或链的下标指到了文件之外
+            raise ELFError(f"{self.path}: corrupt symbol hash table") from None
+
+        dynsym = next(self.iter_sections("SHT_DYNSYM"), None)
+        if dynsym is None:
+            return None
+        for sym in self.iter_symbols(dynsym):
+            if sym.name == name and sym.st_shndx != "SHN_UNDEF":
+                return sym
+        return None
+
+    # ---- 重定位 ----
+
+    def iter_relocations(self, section):
+        """逐条产出 SHT_REL / SHT_RELA 节中的重定位（ELFRelocation）"""
+        is_rela = section.sh_type == "SHT_RELA"
+        rel = self._layout["rela" if is_rela else "rel"]
+        count = section.sh_size // rel.size
+        view = self._view(section.sh_offset, count * rel.size, section.name)
+        if self.elfclass == 64:
+            sym_shift, type_mask = 32, 0xFFFFFFFF
+        else:
+            sym_shift, type_mask = 8, 0xFF
+
+        for fields in rel.iter_unpack(view):
+            r_offset, r_info = fields[0], fields[1]
+            yield ELFRelocation(
+                r_offset,
+                r_info,
+                r_info >> sym_shift,
+                r_info & type_mask,
+                fields[2] if is_rela else None,
+            )
+
+    def relocation_fields(self, section):
+        """
+        返回 (r_offset 序列, r_info 序列)。文件字节序与本机相同时是 mmap 上
+        memoryview.cast 加步长切片得到的视图，不逐条解包；否则为列表。
+        SHT_RELR 节没有 r_info，第二项为 None
+        """
+        if section.sh_type == "SHT_RELR":
+            return list(self.iter_relr(section)), None
+        rel = self._layout["rela" if section.sh_type == "SHT_RELA" else "rel"]
+        count = section.sh_size // rel.size
+        view = self._view(section.sh_offset, count * rel.size, section.name)
+        word = self.elfclass // 8
+        if self.little_endian == (sys.byteorder == "little"):
+            words = view.cast("Q" if word == 8 else "I")
+            step = rel.size // word
+            return words[::step], words[1::step]
+        records = list(rel.iter_unpack(view))
+        return [r[0] for r in records], [r[1] for r in records]
+
+    def iter_relr(self, section):
+        """
+        逐个产出 SHT_RELR 节表示的重定位偏移
+        偶数项是地址，奇数项是位图：第 i 位表示 基址 + (i - 1) * 字长 需要重定位
+        """
+        word = self.elfclass // 8
+        bits = word * 8 - 1
+        fmt = ("<" if self.little_endian else ">") + ("Q" if word == 8 else "I")
+        count = section.sh_size // word
+        view = self._view(section.sh_offset, count * word, section.name)
+        where = 0
+        for (entry,) in struct.iter_unpack(fmt, view):
+            if entry & 1 == 0:
+                yield entry
+                where = entry + word
+                continue
+            bitmap = entry >> 1
+            offset = where
+            while bitmap:
+                if bitmap & 1:
+                    yield offset
+                bitmap >>= 1
+                offset += word
+            where += bits * word
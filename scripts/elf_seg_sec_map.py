@@ -1,98 +1,205 @@
 import argparse
+import bisect
+import json
+import os
+import sys
+import warnings
 
-import matplotlib.pyplot as plt
-from elftools.elf.elffile import ELFFile
+from elf_cache import DEFAULT_CACHE_DIR, ELFCache, open_elf
 
+# 只有画图用到 matplotlib 和 numpy（matplotlib 本身也依赖 numpy），
+# --no-plot 模式下两者都不需要
+try:
+    import matplotlib
+    import numpy as np
+except ImportError:
+    matplotlib = None
 
-def print_segment_section_mapping(filename, show_orphans=True):
-    with open(filename, "rb") as f:
-        elf = ELFFile(f)
+# pyplot 在真正画图时才导入：导入本身要近一秒，而且输出到文件时要先选定 Agg 后端
+plt = None
 
+# 相距不超过这么多字节的区域画在同一个子图里，更远的用断轴隔开
+DEFAULT_GAP = 1000
+
+
+def _load_pyplot(headless):
+    global plt
+    if plt is None:
+        if headless:
+            matplotlib.use("Agg")
+        from matplotlib import pyplot
+
+        plt = pyplot
+    return plt
+
+
+def map_sections_to_segments(seg_ranges, sections):
+    """
+    计算每个段包含哪些节，以及哪些节不属于任何段
+    seg_ranges: [(start, end), ...]，段在文件中的偏移范围
+    返回：(每个段包含的节下标列表, 被包含的节下标集合)
+
+    把非空节按起始偏移排序一次，每个段用二分查找定位起始偏移落在
+    [start, end] 内的那一段连续区间，再按结束偏移过滤，
+    整体复杂度 O((n+m) log n)，代替原来的 段数 × 节数 双重循环
+    """
+    order = sorted(
+        (j for j, sec in enumerate(sections) if sec["size"] > 0),
+        key=lambda j: sections[j]["offset"],
+    )
+    starts = [sections[j]["offset"] for j in order]
+
+    contained = []
+    sections_in_segments = set()
+    for seg_start, seg_end in seg_ranges:
+        lo = bisect.bisect_left(starts, seg_start)
+        hi = bisect.bisect_right(starts, seg_end)
+        indices = []
+        for k in range(lo, hi):
+            j = order[k]
+            if starts[k] + sections[j]["size"] <= seg_end:
+                indices.append(j)
+        # 保持原来按节下标输出的顺序
+        indices.sort()
+        contained.append(indices)
+        sections_in_segments.update(indices)
+
+    return contained, sections_in_segments
+
+
+def _format_section(sec):
+    sec_start = sec["offset"]
+    sec_end = sec_start + sec["size"]
+    return f"{sec['name']}\t 0x{sec_start:x} - 0x{sec_end:x} 0x{sec['size']:x} ({sec['size']})"
+
+
+def print_segment_section_mapping(
+    filename, show_orphans=True, verbose=True, cache=None
+):
+    # 只用到节表和段表，缓存命中时不需要打开原文件
+    with open_elf(filename, cache) as elf:
         # 读取所有节的信息
         sections = []
-        for sec in elf.iter_sections():
+        for sec in elf.sections:
             sections.append(
                 {
                     "name": sec.name,
-                    "addr": sec["sh_addr"],
-                    "offset": sec["sh_offset"],
-                    "size": sec["sh_size"],
+                    "addr": sec.sh_addr,
+                    "offset": sec.sh_offset,
+                    "size": sec.sh_size,
                 }
             )
 
-        print(f"File: {filename}\n")
+        raw_segments = []
+        for segment in elf.segments:
+            raw_segments.append(
+                (
+                    segment.p_type,
+                    segment.p_offset,
+                    segment.p_vaddr,
+                    segment.p_filesz,
+                    segment.p_memsz,
+                )
+            )
 
-        segments = []
-        sections_in_segments = set()  # 跟踪哪些节已经被包含在段中
+    seg_ranges = [(offset, offset + filesz) for _, offset, _, filesz, _ in raw_segments]
+    contained, sections_in_segments = map_sections_to_segments(seg_ranges, sections)
 
-        for i, segment in enumerate(elf.iter_segments()):
-            seg_type = segment["p_type"]
-            seg_offset = segment["p_offset"]
-            seg_vaddr = segment["p_vaddr"]
-            seg_filesz = segment["p_filesz"]
-            seg_memsz = segment["p_memsz"]
+    if verbose:
+        print(f"File: {filename}\n")
+
+    segments = []
+    for i, (seg_type, seg_offset, seg_vaddr, seg_filesz, seg_memsz) in enumerate(
+        raw_segments
+    ):
+        # 找出落在该段范围内的节
+        contained_sections = [_format_section(sections[j]) for j in contained[i]]
 
+        if verbose:
             print(
                 f"Segment {i}: Type={seg_type}, Offset=0x{seg_offset:x}, VirtAddr=0x{seg_vaddr:x}, FileSize=0x{seg_filesz:x} ({seg_filesz}), MemSize=0x{seg_memsz:x} ({seg_memsz})"
             )
-
-            # 找出落在该段范围内的节
-            contained_sections = []
-            seg_start = seg_offset
-            seg_end = seg_offset + seg_filesz
-
-            for j, sec in enumerate(sections):
-                sec_start = sec["offset"]
-                sec_end = sec_start + sec["size"]
-                # 判断节是否在段范围内
-                if sec["size"] > 0 and sec_start >= seg_start and sec_end <= seg_end:
-                    contained_sections.append(
-                        f"{sec['name']}\t 0x{sec_start:x} - 0x{sec_end:x} 0x{sec['size']:x} ({sec['size']})"
-                    )
-                    sections_in_segments.add(j)  # 记录已包含的节
-
             if contained_sections:
                 print("  Contains sections:")
                 for name in contained_sections:
                     print(f"    {name}")
             else:
                 print("  Contains no sections.")
-
             print()
-            segments.append(
-                {
-                    "index": i,
-                    "type": seg_type,
-                    "start": seg_start,
-                    "end": seg_end,
-                    "memsz": seg_memsz,
-                    "sections": contained_sections,
-                }
-            )
 
-        # 显示不属于任何段的节
-        orphan_sections = []
-        for j, sec in enumerate(sections):
-            if j not in sections_in_segments and sec["size"] > 0:
-                orphan_sections.append(
-                    f"{sec['name']}\t 0x{sec['offset']:x} - 0x{sec['offset'] + sec['size']:x} 0x{sec['size']:x} ({sec['size']})"
-                )
+        segments.append(
+            {
+                "index": i,
+                "type": seg_type,
+                "start": seg_offset,
+                "end": seg_offset + seg_filesz,
+                "vaddr": seg_vaddr,
+                "memsz": seg_memsz,
+                "sections": contained_sections,
+                "section_indices": contained[i],
+            }
+        )
 
-        if orphan_sections and show_orphans:
-            print("Sections not contained in any segment:")
-            for section_info in orphan_sections:
-                print(f"  {section_info}")
-            print()
+    # 显示不属于任何段的节
+    orphan_sections = []
+    for j, sec in enumerate(sections):
+        if j not in sections_in_segments and sec["size"] > 0:
+            orphan_sections.append(_format_section(sec))
+
+    if verbose and orphan_sections and show_orphans:
+        print("Sections not contained in any segment:")
+        for section_info in orphan_sections:
+            print(f"  {section_info}")
+        print()
 
     return segments, sections, sections_in_segments
 
 
-def plot_segments_sections(segments, sections, sections_in_segments, show_orphans=True):
+def mapping_json(filename, segments, sections, sections_in_segments):
+    """段和节的映射关系，转成可以直接 json.dump 的字典，便于在 CI 中处理"""
+    return {
+        "file": filename,
+        "segments": [
+            {
+                "index": seg["index"],
+                "type": str(seg["type"]),
+                "offset": seg["start"],
+                "vaddr": seg["vaddr"],
+                "filesz": seg["end"] - seg["start"],
+                "memsz": seg["memsz"],
+                "sections": [sections[j]["name"] for j in seg["section_indices"]],
+            }
+            for seg in segments
+        ],
+        "sections": [
+            {
+                "index": j,
+                "name": sec["name"],
+                "addr": sec["addr"],
+                "offset": sec["offset"],
+                "size": sec["size"],
+                "orphan": sec["size"] > 0 and j not in sections_in_segments,
+            }
+            for j, sec in enumerate(sections)
+        ],
+    }
+
+
+def plot_segments_sections(
+    segments,
+    sections,
+    sections_in_segments,
+    show_orphans=True,
+    gap=DEFAULT_GAP,
+    output=None,
+):
     """
     用 matplotlib 画出 ELF 文件中段和节的文件内偏移范围
     横轴：文件偏移（bytes）
     纵轴：段或节编号（段用大号，节用小号，区分颜色）
-    使用断轴来压缩空白区域，并在下方显示详细表格
+    相距超过 gap 字节的区域之间使用断轴来压缩空白
+    output 不为空时用 Agg 后端直接写入文件（按扩展名决定 PNG/SVG/PDF），不需要显示器
+    没有可画的范围或缺少 matplotlib 时不画图，返回 False
     """
 
     # 找出所有有效的偏移范围
@@ -110,7 +217,16 @@ def plot_segments_sections(segments, sections, sections_in_segments, show_orphan
             all_ranges.append((sec["offset"], sec["offset"] + sec["size"]))
 
     if not all_ranges:
-        return
+        print("nothing to plot: no non-empty segments or sections", file=sys.stderr)
+        return False
+
+    if matplotlib is None:
+        print(
+            "matplotlib is not installed, skipping plot (use --no-plot)",
+            file=sys.stderr,
+        )
+        return False
+    _load_pyplot(headless=output is not None)
 
     # 按起始位置排序
     all_ranges.sort()
@@ -120,76 +236,28 @@ def plot_segments_sections(segments, sections, sections_in_segments, show_orphan
     current_start, current_end = all_ranges[0]
 
     for start, end in all_ranges[1:]:
-        if start <= current_end + 1000:  # 允许小间隙（1KB以内）
+        if start <= current_end + gap:  # 允许小间隙
             current_end = max(current_end, end)
         else:
             merged_ranges.append((current_start, current_end))
             current_start, current_end = start, end
     merged_ranges.append((current_start, current_end))
 
-    # 如果只有一个连续区域，不需要断轴
-    if len(merged_ranges) == 1:
-        # 原始绘图逻辑
-        _plot_single_axis_with_table(
-            segments, sections, sections_in_segments, show_orphans
-        )
-    else:
-        # 使用断轴绘图
-        _plot_broken_axis_with_table(
-            segments, sections, merged_ranges, sections_in_segments, show_orphans
-        )
-
-
-def _plot_single_axis_with_table(
-    segments, sections, sections_in_segments, show_orphans=True
-):
-    """原始的单轴绘图"""
+    bars = _layout_bars(segments, sections, sections_in_segments, show_orphans)
     fig = plt.figure(figsize=(16, 8))
 
-    # 创建单个图表
-    ax_plot = fig.add_subplot(1, 1, 1)
-    _plot_chart_only(ax_plot, segments, sections, sections_in_segments, show_orphans)
-
-    plt.suptitle("ELF File Segment and Section Layout", fontsize=14)
-    try:
-        plt.tight_layout()
-    except:
-        pass  # 忽略tight_layout可能产生的警告
-    plt.show()
-
-
-def _plot_broken_axis_with_table(
-    segments, sections, merged_ranges, sections_in_segments, show_orphans=True
-):
-    """断轴绘图"""
-    fig = plt.figure(figsize=(16, 8))
-
-    # 计算断轴子图
+    # 每个连续区域一个子图，宽度按区域大小分配；只有一个区域时就是普通单轴
     n_subplots = len(merged_ranges)
-    range_sizes = [end - start for start, end in merged_ranges]
+    range_sizes = [max(end - start, 1) for start, end in merged_ranges]
     total_size = sum(range_sizes)
     width_ratios = [size / total_size for size in range_sizes]
-
-    # 创建断轴子图
     gs = fig.add_gridspec(1, n_subplots, width_ratios=width_ratios, wspace=0.05)
 
     axes = []
     for i, (start_range, end_range) in enumerate(merged_ranges):
         ax = fig.add_subplot(gs[0, i])
         axes.append(ax)
-
-        _plot_range(
-            ax,
-            segments,
-            sections,
-            start_range,
-            end_range,
-            i == 0,
-            i == n_subplots - 1,
-            sections_in_segments,
-            show_orphans,
-        )
-        ax.set_xlim(start_range, end_range)
+        _plot_range(ax, bars, start_range, end_range)
 
         if i == 0:
             ax.set_ylabel("Segments/Sections")
@@ -206,211 +274,198 @@ def _plot_broken_axis_with_table(
     for i in range(n_subplots - 1):
         _add_break_marks(axes[i], axes[i + 1])
 
-    if axes:
-        axes[0].legend(loc="upper left")
+    # 图例放在整张图上：第一个子图可能很窄，各个子图里出现的类别也不同
+    legend = {}
+    for ax in axes:
+        for handle, name in zip(*ax.get_legend_handles_labels()):
+            legend.setdefault(name, handle)
+    fig.legend(legend.values(), legend.keys(), loc="upper right")
 
     plt.suptitle("ELF File Segment and Section Layout", fontsize=14)
-    try:
+    with warnings.catch_warnings():
+        # 断轴子图与 tight_layout 不完全兼容，忽略它给出的 UserWarning
+        warnings.simplefilter("ignore", UserWarning)
         plt.tight_layout()
-    except:
-        pass  # 忽略tight_layout可能产生的警告
-    plt.show()
+
+    # 布局确定之后再放标签，按实际像素位置剔除互相重叠的
+    for ax, (start_range, end_range) in zip(axes, merged_ranges):
+        _label_range(ax, bars, start_range, end_range)
+
+    if output is None:
+        plt.show()
+    else:
+        fig.savefig(output, bbox_inches="tight")
+        plt.close(fig)
+    return True
 
 
-def _plot_chart_only(ax, segments, sections, sections_in_segments, show_orphans=True):
-    """只绘制图表部分，不包含表格"""
-    y_seg_base = 10
-    y_sec_base = 0
+# 条形的三种类别：(填充色, 边框色, 图例, 标签字号)
+_BAR_STYLES = (
+    ("skyblue", "blue", "Segment", 8),
+    ("orange", "darkred", "Section (in segment)", 6),
+    ("lightcoral", "red", "Section (orphan)", 6),
+)
+
+
+def _layout_bars(segments, sections, sections_in_segments, show_orphans):
+    """
+    把段和节整理成按类别分组的数组，每个子图只做切片和裁剪
+    返回 dict：kind/start/end/y/height 为 numpy 数组，label 为标签列表
+    """
     height_seg = 3
     height_sec = 1
+    # 节按下标占一行，段画在所有节的上方
+    y_seg_base = max(10, len(sections) + 1)
 
-    # 画段（Segments）
+    kind, start, end, y, height, label = [], [], [], [], [], []
     for seg in segments:
-        ax.barh(
-            y=seg["index"] * height_seg + y_seg_base,
-            width=seg["end"] - seg["start"],
-            left=seg["start"],
-            height=height_seg * 0.8,
-            color="skyblue",
-            edgecolor="blue",
-            label="Segment" if seg["index"] == 0 else None,
-        )
-        ax.text(
-            seg["start"],
-            seg["index"] * height_seg + y_seg_base + height_seg * 0.4,
-            f"Seg {seg['index']} ({seg['type']})",
-            va="center",
-            ha="right",
-            fontsize=8,
-        )
-
-    # 画节（Sections）
-    legend_added_in = False
-    legend_added_out = False
+        kind.append(0)
+        start.append(seg["start"])
+        end.append(seg["end"])
+        y.append(seg["index"] * height_seg + y_seg_base)
+        height.append(height_seg * 0.8)
+        label.append(f"Seg {seg['index']} ({seg['type']})")
 
     for idx, sec in enumerate(sections):
         if sec["size"] == 0:
             continue
-
         # 区分在segment中和不在segment中的section
         if idx in sections_in_segments:
-            color = "orange"
-            edgecolor = "darkred"
-            label = "Section (in segment)" if not legend_added_in else None
-            legend_added_in = True
+            kind.append(1)
+        elif show_orphans:
+            kind.append(2)
         else:
-            # 如果不显示orphan sections，则跳过
-            if not show_orphans:
-                continue
-            color = "lightcoral"  # 稍微不同的颜色
-            edgecolor = "red"
-            label = "Section (orphan)" if not legend_added_out else None
-            legend_added_out = True
-
-        ax.barh(
-            y=idx * height_sec + y_sec_base,
-            width=sec["size"],
-            left=sec["offset"],
-            height=height_sec * 0.8,
-            color=color,
-            edgecolor=edgecolor,
-            label=label,
+            continue
+        start.append(sec["offset"])
+        end.append(sec["offset"] + sec["size"])
+        y.append(idx * height_sec)
+        height.append(height_sec * 0.8)
+        label.append(sec["name"])
+
+    return {
+        "kind": np.array(kind, dtype=np.int8),
+        "start": np.array(start, dtype=np.float64),
+        "end": np.array(end, dtype=np.float64),
+        "y": np.array(y, dtype=np.float64),
+        "height": np.array(height, dtype=np.float64),
+        "label": label,
+        "top": y_seg_base + len(segments) * height_seg,
+    }
+
+
+def _plot_range(ax, bars, start_range, end_range):
+    """
+    在指定范围内绘制段和节：每个类别一个 PolyCollection，
+    代替每个条形一次 barh，几千个节也只有三次绘制调用
+    """
+    from matplotlib.collections import PolyCollection
+
+    start, end = bars["start"], bars["end"]
+    visible = (end > start_range) & (start < end_range) & (end > start)
+    left = np.maximum(start, start_range)
+    right = np.minimum(end, end_range)
+    bottom = bars["y"] - bars["height"] / 2
+    top = bars["y"] + bars["height"] / 2
+
+    for kind, (color, edgecolor, name, _) in enumerate(_BAR_STYLES):
+        mask = visible & (bars["kind"] == kind)
+        if not mask.any():
+            continue
+        l, r, b, t = left[mask], right[mask], bottom[mask], top[mask]
+        verts = np.stack(
+            [np.column_stack(corner) for corner in ((l, b), (l, t), (r, t), (r, b))],
+            axis=1,
         )
-        ax.text(
-            sec["offset"],
-            idx * height_sec + y_sec_base + height_sec * 0.4,
-            sec["name"],
-            va="center",
-            ha="right",
-            fontsize=6,
+        ax.add_collection(
+            PolyCollection(
+                verts,
+                facecolors=color,
+                edgecolors=edgecolor,
+                linewidths=0.5,
+                label=name,
+            )
         )
 
-    ax.set_xlabel("File Offset (bytes)")
+    ax.set_xlim(start_range, end_range)
+    ax.set_ylim(-1, bars["top"])
     ax.set_yticks([])
-    ax.legend(loc="upper right")
 
 
-def _plot_range(
-    ax,
-    segments,
-    sections,
-    start_range,
-    end_range,
-    show_legend,
-    is_last,
-    sections_in_segments,
-    show_orphans=True,
-):
-    """在指定范围内绘制段和节"""
-    y_seg_base = 10
-    y_sec_base = 0
-    height_seg = 3
-    height_sec = 1
+def _label_range(ax, bars, start_range, end_range):
+    """
+    在条形起点左侧放标签（只放起点落在本范围内的），按像素估算文字框，
+    与已放置的标签重叠就跳过；段优先，节按大小从大到小
+    """
+    start, end = bars["start"], bars["end"]
+    candidates = np.flatnonzero(
+        (start >= start_range) & (start < end_range) & (end > start)
+    )
+    if len(candidates) == 0:
+        return
+    order = np.lexsort((-(end - start)[candidates], bars["kind"][candidates]))
+    candidates = candidates[order]
 
-    legend_added_seg = False
-    legend_added_sec_in = False
-    legend_added_sec_out = False
+    fontsizes = np.array([style[3] for style in _BAR_STYLES])[bars["kind"][candidates]]
+    points = ax.transData.transform(
+        np.column_stack((start[candidates], bars["y"][candidates]))
+    )
+    scale = ax.figure.dpi / 72
+    heights = fontsizes * scale * 1.2
+    # 文字宽度按平均字宽 0.6 em 估算
+    widths = (
+        np.array([len(bars["label"][i]) for i in candidates]) * fontsizes * scale * 0.6
+    )
 
-    # 画段（Segments）
-    for seg in segments:
-        # 检查段是否与当前范围有重叠
-        if seg["end"] > start_range and seg["start"] < end_range:
-            # 计算在当前范围内的部分
-            plot_start = max(seg["start"], start_range)
-            plot_end = min(seg["end"], end_range)
-
-            ax.barh(
-                y=seg["index"] * height_seg + y_seg_base,
-                width=plot_end - plot_start,
-                left=plot_start,
-                height=height_seg * 0.8,
-                color="skyblue",
-                edgecolor="blue",
-                label="Segment" if show_legend and not legend_added_seg else None,
-            )
+    placed = _cull_overlapping(points, widths, heights)
+    for k in placed:
+        i = candidates[k]
+        ax.text(
+            start[i],
+            bars["y"][i],
+            bars["label"][i],
+            va="center",
+            ha="right",
+            fontsize=fontsizes[k],
+        )
 
-            if show_legend and not legend_added_seg:
-                legend_added_seg = True
-
-            # 只在段的起始位置显示标签
-            if seg["start"] >= start_range:
-                ax.text(
-                    seg["start"],
-                    seg["index"] * height_seg + y_seg_base + height_seg * 0.4,
-                    f"Seg {seg['index']} ({seg['type']})",
-                    va="center",
-                    ha="right",
-                    fontsize=8,
-                )
 
-    # 画节（Sections）
-    for idx, sec in enumerate(sections):
-        if sec["size"] == 0:
+def _cull_overlapping(points, widths, heights):
+    """
+    按顺序贪心放置文字框（右端对齐在 points 上，垂直居中），返回不重叠的下标
+    用网格哈希只和附近格子里的框比较
+    """
+    cell = max(float(heights.max()), 1.0)
+    grid = {}
+    placed = []
+    for k, ((x, y), w, h) in enumerate(zip(points.tolist(), widths, heights)):
+        box = (x - w, y - h / 2, x, y + h / 2)
+        cells = [
+            (cx, cy)
+            for cx in range(int(box[0] // cell), int(box[2] // cell) + 1)
+            for cy in range(int(box[1] // cell), int(box[3] // cell) + 1)
+        ]
+        if any(
+            box[0] < o[2] and o[0] < box[2] and box[1] < o[3] and o[1] < box[3]
+            for c in cells
+            for o in grid.get(c, ())
+        ):
             continue
-
-        sec_start = sec["offset"]
-        sec_end = sec_start + sec["size"]
-
-        # 检查节是否与当前范围有重叠
-        if sec_end > start_range and sec_start < end_range:
-            # 计算在当前范围内的部分
-            plot_start = max(sec_start, start_range)
-            plot_end = min(sec_end, end_range)
-
-            # 区分在segment中和不在segment中的section
-            if idx in sections_in_segments:
-                color = "orange"
-                edgecolor = "darkred"
-                label = (
-                    "Section (in segment)"
-                    if show_legend and not legend_added_sec_in
-                    else None
-                )
-                if show_legend and not legend_added_sec_in:
-                    legend_added_sec_in = True
-            else:
-                # 如果不显示orphan sections，则跳过
-                if not show_orphans:
-                    continue
-                color = "lightcoral"  # 稍微不同的颜色
-                edgecolor = "red"
-                label = (
-                    "Section (orphan)"
-                    if show_legend and not legend_added_sec_out
-                    else None
-                )
-                if show_legend and not legend_added_sec_out:
-                    legend_added_sec_out = True
-
-            ax.barh(
-                y=idx * height_sec + y_sec_base,
-                width=plot_end - plot_start,
-                left=plot_start,
-                height=height_sec * 0.8,
-                color=color,
-                edgecolor=edgecolor,
-                label=label,
-            )
-
-            # 只在节的起始位置显示标签
-            if sec_start >= start_range:
-                ax.text(
-                    sec_start,
-                    idx * height_sec + y_sec_base + height_sec * 0.4,
-                    sec["name"],
-                    va="center",
-                    ha="right",
-                    fontsize=6,
-                )
-
-    ax.set_yticks([])
+        for c in cells:
+            grid.setdefault(c, []).append(box)
+        placed.append(k)
+    return placed
 
 
 def _add_break_marks(ax1, ax2):
     """在两个相邻的子图之间添加断轴标记"""
     # 在右侧边缘添加断轴标记
     d = 0.015  # 断轴标记的大小
-    kwargs = dict(transform=ax1.transAxes, color="k", clip_on=False, linewidth=1)
+    kwargs = {
+        "transform": ax1.transAxes,
+        "color": "k",
+        "clip_on": False,
+        "linewidth": 1,
+    }
     ax1.plot((1 - d, 1 + d), (-d, +d), **kwargs)
     ax1.plot((1 - d, 1 + d), (1 - d, 1 + d), **kwargs)
 
@@ -420,24 +475,106 @@ def _add_break_marks(ax1, ax2):
     ax2.plot((-d, +d), (1 - d, 1 + d), **kwargs)
 
 
+def output_paths(pattern, elf_files):
+    """
+    把 pattern 中的 {name} 换成各个 ELF 文件名，返回 {文件: 输出路径}
+    文件名重复时（如不同目录下的 libc.so.6）改用整个路径，"/" 换成 "_"
+    """
+    names = [os.path.basename(f) for f in elf_files]
+    outputs = {}
+    for elf_file, name in zip(elf_files, names):
+        if names.count(name) > 1:
+            name = os.path.normpath(elf_file).strip(os.sep).replace(os.sep, "_")
+        outputs[elf_file] = pattern.replace("{name}", name)
+    return outputs
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Visualize ELF file segments and sections"
     )
-    parser.add_argument("elf_file", help="ELF file to analyze")
+    parser.add_argument("elf_files", nargs="+", help="ELF files to analyze")
     parser.add_argument(
         "--show-orphans",
         action="store_true",
         help="Show sections not contained in any segment",
     )
 
+    parser.add_argument(
+        "--no-plot",
+        action="store_true",
+        help="Do not plot; print the mapping as JSON (no matplotlib needed), "
+        "an array of objects for several files",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Render headless to this file instead of showing a window; "
+        "format follows the extension (.png, .svg, .pdf). "
+        "'{name}' is replaced by the ELF file name (the whole path when two "
+        "inputs share a name), required for several files",
+    )
+    parser.add_argument(
+        "--gap",
+        type=int,
+        default=DEFAULT_GAP,
+        help="Break the axis between regions more than this many bytes apart "
+        f"(default: {DEFAULT_GAP})",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help=f"Shared cache of parsed ELF metadata (default: {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Do not read or write the cache"
+    )
+    parser.add_argument(
+        "--write-cache",
+        action="store_true",
+        help="Also store newly parsed files in the cache (default: only read it)",
+    )
+
     args = parser.parse_args()
+    if args.output and len(args.elf_files) > 1 and "{name}" not in args.output:
+        parser.error("--output needs a '{name}' placeholder for several ELF files")
+    outputs = {}
+    if args.output:
+        outputs = output_paths(args.output, args.elf_files)
+        if len(set(outputs.values())) < len(outputs):
+            parser.error("several ELF files map to the same --output file")
 
     show_orphans = args.show_orphans
-    segments, sections, sections_in_segments = print_segment_section_mapping(
-        args.elf_file, show_orphans
-    )
-    plot_segments_sections(segments, sections, sections_in_segments, show_orphans)
+    cache = None if args.no_cache else ELFCache(args.cache_dir, write=args.write_cache)
+    results = []
+    failed = False
+    for elf_file in args.elf_files:
+        segments, sections, sections_in_segments = print_segment_section_mapping(
+            elf_file,
+            show_orphans,
+            verbose=not args.no_plot and not args.output,
+            cache=cache,
+        )
+        if args.no_plot:
+            results.append(
+                mapping_json(elf_file, segments, sections, sections_in_segments)
+            )
+            continue
+        output = outputs.get(elf_file)
+        written = plot_segments_sections(
+            segments, sections, sections_in_segments, show_orphans, args.gap, output
+        )
+        if output and written:
+            print(f"{elf_file}: layout chart saved to {output}")
+        elif output:
+            failed = True
+
+    if args.no_plot:
+        # 一个文件输出一个对象，多个文件输出一个数组，保证始终是一个 JSON 文档
+        json.dump(results[0] if len(results) == 1 else results, sys.stdout, indent=2)
+        print()
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
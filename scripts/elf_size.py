@@ -0,0 +1,685 @@
+"""
+ELF 文件大小归因（类似 bloaty）：文件大小和虚拟内存大小都花在了哪里
+
+elf_seg_sec_map.py 只说明哪些节落在哪些段里，这里进一步把字节数
+分摊到段、节、符号或编译单元上：
+
+  - segments     每个 PT_LOAD 段的文件大小和内存大小，段外的文件内容记为 [Unmapped]
+  - sections     每个节；ELF 头部记为 [ELF Headers]，段内不属于任何节的部分
+                 记为 [LOAD #n [RX]]，其余文件内容记为 [Unmapped]
+  - symbols      在 sections 的基础上把节细分到 .symtab（没有时用 .dynsym）中的符号，
+                 大小取 st_size，符号之间不超过 --max-gap 的空隙（对齐填充）
+                 记在前一个符号上，其余记为 [section .xxx]
+  - compileunits 按 DWARF 编译单元（.debug_aranges 或 CU 的地址范围）细分，需要 pyelftools
+
+符号表直接用 numpy 结构化 dtype 映射在 mmap 上，按 (节, 地址) 排序一次，
+去重、截断、空隙填充和按名字汇总都是数组运算，没有逐符号的 Python 循环，
+1GB 以上、数百万符号的文件也能在几秒内完成。
+
+用法：
+    python elf_size.py ./app
+    python elf_size.py -d symbols -n 30 ./app
+    python elf_size.py -d compileunits --debug-file ./app.debug ./app
+    python elf_size.py -d symbols ./app --base ./app.old     # 对比两个版本
+    python elf_size.py --json -d sections ./app
+"""
+
+import argparse
+import json
+import sys
+
+import numpy as np
+from elf_reader import ELFError, ELFReader
+from rich import box
+from rich.console import Console
+from rich.markup import escape
+from rich.table import Table
+from textfmt import demangle, human_size
+
+console = Console()
+
+SOURCES = ("segments", "sections", "symbols", "compileunits")
+
+SHF_ALLOC = 0x2
+SHF_TLS = 0x400
+
+# 参与归因的符号类型：NOTYPE、OBJECT、FUNC、GNU_IFUNC
+# （SECTION、FILE、COMMON 不占自己的空间，TLS 符号的值是 TLS 块内偏移）
+SYMBOL_TYPES = (0, 1, 2, 10)
+# 0 < st_shndx < SHN_LORESERVE 才是普通节下标
+SHN_LORESERVE = 0xFF00
+
+
+def _symbol_dtype(elf):
+    """与文件字节序一致的 ElfN_Sym 结构化 dtype"""
+    order = "<" if elf.little_endian else ">"
+    if elf.elfclass == 64:
+        fields = [
+            ("st_name", "u4"),
+            ("st_info", "u1"),
+            ("st_other", "u1"),
+            ("st_shndx", "u2"),
+            ("st_value", "u8"),
+            ("st_size", "u8"),
+        ]
+    else:
+        fields = [
+            ("st_name", "u4"),
+            ("st_value", "u4"),
+            ("st_size", "u4"),
+            ("st_info", "u1"),
+            ("st_other", "u1"),
+            ("st_shndx", "u2"),
+        ]
+    return np.dtype([(name, order + code) for name, code in fields])
+
+
+def _load_flags(p_flags):
+    return "".join(c for bit, c in ((4, "R"), (2, "W"), (1, "X")) if p_flags & bit)
+
+
+def _loads(elf):
+    """[(标签, 段)]，标签按 PT_LOAD 出现顺序编号，如 LOAD #1 [RX]"""
+    loads = [seg for seg in elf.segments if seg.p_type == "PT_LOAD"]
+    return [
+        (f"LOAD #{i} [{_load_flags(seg.p_flags)}]", seg) for i, seg in enumerate(loads)
+    ]
+
+
+def _occupies_vm(sec):
+    # .tbss 只是每个线程 TLS 块的模板大小，不占映像中的地址空间
+    if not sec.sh_flags & SHF_ALLOC:
+        return False
+    return not (sec.sh_flags & SHF_TLS and sec.sh_type == "SHT_NOBITS")
+
+
+def _overlay(bases, details):
+    """
+    把 details 区间叠加在 bases 区间上，都是 [(start, end, key)]
+    details 按起始位置依次认领，和前面已认领部分重叠的字节不重复计算；
+    返回 (每个 detail key 的字节数, 每个 base key 中未被 details 覆盖的字节数,
+    所有区间并集的总长度)
+    """
+    claimed = {}
+    pieces = []
+    cursor = 0
+    for start, end, key in sorted(details, key=lambda d: d[0]):
+        start = max(start, cursor)
+        if end > start:
+            pieces.append((start, end))
+            claimed[key] = claimed.get(key, 0) + end - start
+            cursor = end
+        else:
+            claimed.setdefault(key, 0)
+
+    leftover = {}
+    for start, end, key in bases:
+        covered = sum(max(0, min(end, e) - max(start, s)) for s, e in pieces)
+        leftover[key] = leftover.get(key, 0) + max(0, end - start - covered)
+
+    union = 0
+    cursor = 0
+    for start, end in sorted(pieces + [(s, e) for s, e, _ in bases]):
+        start = max(start, cursor)
+        if end > start:
+            union += end - start
+            cursor = end
+    return claimed, leftover, union
+
+
+class SizeProfile:
+    """标签 -> [VM 字节数, 文件字节数]，保持第一次出现的顺序"""
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = source
+        self.rows = {}
+
+    def add(self, label, vm, file):
+        if vm or file:
+            row = self.rows.setdefault(label, [0, 0])
+            row[0] += int(vm)
+            row[1] += int(file)
+
+    def total(self):
+        return [
+            sum(r[0] for r in self.rows.values()),
+            sum(r[1] for r in self.rows.values()),
+        ]
+
+
+def segment_profile(elf, file_size):
+    profile = SizeProfile(elf.path, "segments")
+    bases = []
+    for label, seg in _loads(elf):
+        bases.append((seg.p_offset, seg.p_offset + seg.p_filesz, label))
+        profile.add(label, seg.p_memsz, 0)
+    _, leftover, union = _overlay(bases, [])
+    for label, nbytes in leftover.items():
+        profile.add(label, 0, nbytes)
+    profile.add("[Unmapped]", 0, file_size - union)
+    return profile
+
+
+def section_layout(elf, file_size):
+    """
+    节级别的归因，是 sections / symbols / compileunits 的共同基础
+    返回 ({节下标: (VM 字节数, 文件字节数)}, [(其他标签, VM, 文件)])
+    """
+    hdr = elf.header
+    file_details = [
+        (0, hdr["e_ehsize"], "[ELF Headers]"),
+        (
+            hdr["e_phoff"],
+            hdr["e_phoff"] + hdr["e_phnum"] * hdr["e_phentsize"],
+            "[ELF Headers]",
+        ),
+        (
+            hdr["e_shoff"],
+            hdr["e_shoff"] + len(elf.sections) * hdr["e_shentsize"],
+            "[ELF Headers]",
+        ),
+    ]
+    vm_details = []
+    for sec in elf.sections:
+        if sec.sh_size == 0 or sec.sh_type == "SHT_NULL":
+            continue
+        if sec.sh_type != "SHT_NOBITS":
+            file_details.append((sec.sh_offset, sec.sh_offset + sec.sh_size, sec.index))
+        if _occupies_vm(sec):
+            vm_details.append((sec.sh_addr, sec.sh_addr + sec.sh_size, sec.index))
+
+    loads = _loads(elf)
+    file_claimed, file_left, file_union = _overlay(
+        [(s.p_offset, s.p_offset + s.p_filesz, label) for label, s in loads],
+        file_details,
+    )
+    if loads:
+        vm_claimed, vm_left, _ = _overlay(
+            [(s.p_vaddr, s.p_vaddr + s.p_memsz, label) for label, s in loads],
+            vm_details,
+        )
+    else:
+        # 可重定位文件没有段，节的大小就是它装载后占用的大小
+        vm_claimed = {index: end - start for start, end, index in vm_details}
+        vm_left = {}
+
+    sections = {}
+    for index in set(file_claimed) | set(vm_claimed):
+        if isinstance(index, int):
+            sections[index] = (vm_claimed.get(index, 0), file_claimed.get(index, 0))
+    other = [("[ELF Headers]", 0, file_claimed.get("[ELF Headers]", 0))]
+    for label, _ in loads:
+        other.append(
+            ("[" + label + "]", vm_left.get(label, 0), file_left.get(label, 0))
+        )
+    other.append(("[Unmapped]", 0, max(0, file_size - file_union)))
+    return sections, other
+
+
+def _section_label(elf, index):
+    return elf.sections[index].name or f"[section #{index}]"
+
+
+def section_profile(elf, file_size):
+    profile = SizeProfile(elf.path, "sections")
+    sections, other = section_layout(elf, file_size)
+    for index in sorted(sections):
+        profile.add(_section_label(elf, index), *sections[index])
+    for row in other:
+        profile.add(*row)
+    return profile
+
+
+def _symbol_table(elf):
+    for name in ("SHT_SYMTAB", "SHT_DYNSYM"):
+        for sec in elf.iter_sections(name):
+            if sec.sh_size:
+                return sec
+    return None
+
+
+def _cstrings(blob, offsets):
+    """取出 blob 中从各个 offset 开始、以 NUL 结尾的字符串"""
+    raw = np.frombuffer(blob, dtype=np.uint8)
+    zeros = np.flatnonzero(raw == 0)
+    index = np.searchsorted(zeros, offsets)
+    ends = np.append(zeros, len(blob))[index]
+    return [
+        blob[start:end].decode("utf-8", errors="replace")
+        for start, end in zip(offsets.tolist(), ends.tolist())
+    ]
+
+
+def attribute_spans(section, pos, size, limit, max_gap):
+    """
+    把符号（或地址范围）换算成它占用的字节数，全部是数组运算
+    section/pos/size: 所在节下标、节内偏移、大小；limit: 每个节的大小（按节下标索引）
+    同一位置的多个符号（别名）只保留最大的一个；符号在下一个符号开始处截断；
+    与下一个符号之间不超过 max_gap 的空隙记在这个符号上（max_gap < 0 时不填充）
+    返回 (保留的元素下标, 每个保留元素的字节数)
+    """
+    order = np.lexsort((-size, pos, section))
+    sec = section[order]
+    start = pos[order]
+    keep = np.ones(len(order), dtype=bool)
+    keep[1:] = (sec[1:] != sec[:-1]) | (start[1:] != start[:-1])
+    order, sec, start = order[keep], sec[keep], start[keep]
+
+    end_of_section = limit[sec]
+    nxt = end_of_section.copy()
+    same = sec[1:] == sec[:-1]
+    nxt[:-1][same] = start[1:][same]
+
+    end = np.minimum(start + size[order], nxt)
+    gap = nxt - end
+    nbytes = end - start + np.where(gap <= max_gap, gap, 0)
+    return order, nbytes
+
+
+def _refine(profile, elf, file_size, section_ids, keys, labels, nbytes):
+    """
+    把节级别的大小细分到 labels 上：section_ids/keys/nbytes 是每一段占用的
+    节下标、标签下标和字节数，节中剩下的部分记为 [section .xxx]
+    """
+    sections, other = section_layout(elf, file_size)
+    nsec = len(elf.sections)
+    has_vm = np.zeros(nsec, dtype=bool)
+    has_file = np.zeros(nsec, dtype=bool)
+    for index, (vm, file) in sections.items():
+        has_vm[index] = vm > 0
+        has_file[index] = file > 0
+
+    weights = nbytes.astype(np.float64)
+    vm = np.bincount(keys, weights * has_vm[section_ids], minlength=len(labels))
+    file = np.bincount(keys, weights * has_file[section_ids], minlength=len(labels))
+    for label, v, f in zip(labels, vm.tolist(), file.tolist()):
+        profile.add(label, v, f)
+
+    used = np.bincount(section_ids, weights, minlength=nsec).astype(np.int64)
+    for index in sorted(sections):
+        sec_vm, sec_file = sections[index]
+        label = f"[section {_section_label(elf, index)}]"
+        rest = int(used[index])
+        profile.add(
+            label,
+            max(0, sec_vm - rest) if sec_vm else 0,
+            max(0, sec_file - rest) if sec_file else 0,
+        )
+    for row in other:
+        profile.add(*row)
+    return profile
+
+
+def _section_arrays(elf):
+    """每个节的大小和起始地址（按节下标索引）"""
+    limit = np.array([sec.sh_size for sec in elf.sections], dtype=np.int64)
+    addr = np.array([sec.sh_addr for sec in elf.sections], dtype=np.int64)
+    return limit, addr
+
+
+def symbol_profile(elf, file_size, max_gap):
+    profile = SizeProfile(elf.path, "symbols")
+    symtab = _symbol_table(elf)
+    if symtab is None:
+        return _refine(profile, elf, file_size, *_empty_refinement())
+
+    dtype = _symbol_dtype(elf)
+    count = symtab.sh_size // dtype.itemsize
+    syms = np.frombuffer(elf.data, dtype=dtype, count=count, offset=symtab.sh_offset)
+    shndx = syms["st_shndx"].astype(np.int64)
+    stype = syms["st_info"] & 0xF
+    mask = (shndx > 0) & (shndx < min(SHN_LORESERVE, len(elf.sections)))
+    mask &= np.isin(stype, SYMBOL_TYPES)
+
+    strtab = elf.get_section(symtab.sh_link)
+    blob = bytes(elf.section_data(strtab)) if strtab is not None else b"\0"
+    names = syms["st_name"].astype(np.int64)
+    mask &= names < len(blob)
+    # ARM/AArch64 的映射符号（$x、$d、$t）只标记代码和数据的边界
+    mask &= np.frombuffer(blob, dtype=np.uint8)[np.where(mask, names, 0)] != ord("$")
+
+    limit, addr = _section_arrays(elf)
+    shndx = shndx[mask]
+    pos = syms["st_value"][mask].astype(np.int64) - addr[shndx]
+    size = syms["st_size"][mask].astype(np.int64)
+    names = names[mask]
+    del syms
+
+    inside = (pos >= 0) & (pos < limit[shndx])
+    shndx, pos, size, names = shndx[inside], pos[inside], size[inside], names[inside]
+
+    order, nbytes = attribute_spans(shndx, pos, size, limit, max_gap)
+    offsets, keys = np.unique(names[order], return_inverse=True)
+    labels = _cstrings(blob, offsets)
+    return _refine(profile, elf, file_size, shndx[order], keys, labels, nbytes)
+
+
+def _empty_refinement():
+    empty = np.zeros(0, dtype=np.int64)
+    return empty, empty, [], empty
+
+
+# ---- DWARF 编译单元 ----
+
+
+def _high_pc(attr, low):
+    # DWARF 4 起 DW_AT_high_pc 可以是相对 low_pc 的长度（常量类）
+    if attr.form == "DW_FORM_addr" or attr.form.startswith("DW_FORM_addrx"):
+        return attr.value
+    return low + attr.value
+
+
+def _cu_ranges(dwarf, cu, die):
+    """编译单元顶层 DIE 描述的地址范围 [(start, end)]"""
+    attrs = die.attributes
+    low = attrs["DW_AT_low_pc"].value if "DW_AT_low_pc" in attrs else 0
+    if "DW_AT_ranges" in attrs:
+        range_lists = dwarf.range_lists()
+        if range_lists is None:
+            return []
+        result = []
+        base = low
+        for entry in range_lists.get_range_list_at_offset(
+            attrs["DW_AT_ranges"].value, cu=cu
+        ):
+            if hasattr(entry, "base_address"):
+                base = entry.base_address
+            elif entry.is_absolute:
+                result.append((entry.begin_offset, entry.end_offset))
+            else:
+                result.append((base + entry.begin_offset, base + entry.end_offset))
+        return result
+    if "DW_AT_low_pc" in attrs and "DW_AT_high_pc" in attrs:
+        return [(low, _high_pc(attrs["DW_AT_high_pc"], low))]
+    return []
+
+
+def load_compile_units(path):
+    """
+    读取 DWARF 中每个编译单元覆盖的地址范围
+    返回 (名字列表, starts, ends, 名字下标)，没有调试信息时返回 None
+    优先用 .debug_aranges，其中没有的编译单元再看顶层 DIE 的 low_pc/high_pc/ranges
+    """
+    from elftools.elf.elffile import ELFFile
+
+    with open(path, "rb") as f:
+        elffile = ELFFile(f)
+        if not elffile.has_dwarf_info():
+            return None
+        dwarf = elffile.get_dwarf_info()
+
+        by_offset = {}
+        aranges = dwarf.get_aranges()
+        if aranges is not None:
+            for entry in aranges.entries:
+                if entry.length:
+                    by_offset.setdefault(entry.info_offset, []).append(
+                        (entry.begin_addr, entry.begin_addr + entry.length)
+                    )
+
+        names = []
+        starts, ends, keys = [], [], []
+        for cu in dwarf.iter_CUs():
+            die = cu.get_top_DIE()
+            name = die.attributes.get("DW_AT_name")
+            names.append(
+                name.value.decode(errors="replace")
+                if name
+                else f"[CU 0x{cu.cu_offset:x}]"
+            )
+            ranges = by_offset.get(cu.cu_offset)
+            if ranges is None:
+                ranges = _cu_ranges(dwarf, cu, die)
+            for start, end in ranges:
+                if end > start:
+                    starts.append(start)
+                    ends.append(end)
+                    keys.append(len(names) - 1)
+
+    return (
+        names,
+        np.array(starts, dtype=np.int64),
+        np.array(ends, dtype=np.int64),
+        np.array(keys, dtype=np.int64),
+    )
+
+
+def compile_unit_profile(elf, file_size, debug_path=None):
+    profile = SizeProfile(elf.path, "compileunits")
+    units = load_compile_units(debug_path or elf.path)
+    if units is None:
+        raise ELFError(f"{debug_path or elf.path}: no DWARF debug info")
+    labels, starts, ends, keys = units
+
+    # 地址范围只落在占用地址空间的节里；按节地址二分找到范围覆盖的第一个和
+    # 最后一个节，跨越多个节的范围（如 .init 到 .text）按节边界拆开
+    alloc = [sec for sec in elf.sections if sec.sh_size and _occupies_vm(sec)]
+    alloc.sort(key=lambda sec: sec.sh_addr)
+    sec_start = np.array([sec.sh_addr for sec in alloc], dtype=np.int64)
+    sec_end = sec_start + np.array([sec.sh_size for sec in alloc], dtype=np.int64)
+    sec_index = np.array([sec.index for sec in alloc], dtype=np.int64)
+
+    first = np.searchsorted(sec_end, starts, side="right")
+    last = np.searchsorted(sec_start, ends, side="left") - 1
+    count = np.maximum(last - first + 1, 0)
+    piece = np.repeat(np.arange(len(starts)), count)
+    where = np.arange(len(piece)) - np.repeat(np.cumsum(count) - count, count)
+    where += first[piece]
+    starts = np.maximum(starts[piece], sec_start[where])
+    ends = np.minimum(ends[piece], sec_end[where])
+    keys = keys[piece]
+
+    limit, addr = _section_arrays(elf)
+    section = sec_index[where]
+    pos = starts - addr[section]
+    size = ends - starts
+    # 编译单元之间的空隙是链接器的对齐填充以外的内容，不做填充
+    order, nbytes = attribute_spans(section, pos, size, limit, -1)
+    return _refine(profile, elf, file_size, section[order], keys[order], labels, nbytes)
+
+
+def profile_file(path, source, max_gap=16, debug_path=None):
+    with ELFReader(path) as elf:
+        file_size = len(elf.data)
+        if source == "segments":
+            return segment_profile(elf, file_size)
+        if source == "sections":
+            return section_profile(elf, file_size)
+        if source == "symbols":
+            return symbol_profile(elf, file_size, max_gap)
+        return compile_unit_profile(elf, file_size, debug_path)
+
+
+# ---- 输出 ----
+
+
+def _percent(part, whole):
+    return f"{part * 100 / whole:.1f}%" if whole else "-"
+
+
+def top_rows(rows, limit, key):
+    """按 key 排序取前 limit 行，其余合并为 [N Others]"""
+    rows = sorted(rows, key=key, reverse=True)
+    if limit <= 0 or len(rows) <= limit:
+        return rows
+    rest = rows[limit:]
+    merged = [f"[{len(rest)} Others]"] + [
+        sum(r[i] for r in rest) for i in range(1, len(rest[0]))
+    ]
+    return rows[:limit] + [tuple(merged)]
+
+
+def size_rows(profile, limit, sort):
+    col = 1 if sort == "vm" else 2
+    rows = [(label, vm, file) for label, (vm, file) in profile.rows.items()]
+    return top_rows(rows, limit, key=lambda r: (r[col], r[3 - col]))
+
+
+def diff_rows(profile, base, limit, sort):
+    """[(标签, VM 变化, 文件变化, 新 VM, 新文件)]，去掉没有变化的行"""
+    rows = []
+    for label in list(profile.rows) + [k for k in base.rows if k not in profile.rows]:
+        vm, file = profile.rows.get(label, (0, 0))
+        old_vm, old_file = base.rows.get(label, (0, 0))
+        if vm != old_vm or file != old_file:
+            rows.append((label, vm - old_vm, file - old_file, vm, file))
+    col = 1 if sort == "vm" else 2
+    return top_rows(rows, limit, key=lambda r: (abs(r[col]), abs(r[3 - col])))
+
+
+def print_profile(profile, rows):
+    total_vm, total_file = profile.total()
+    table = Table(
+        title=f"{profile.path} by {profile.source}",
+        box=box.ROUNDED,
+        header_style="bold magenta",
+    )
+    table.add_column("File Size", justify="right", style="yellow")
+    table.add_column("%", justify="right")
+    table.add_column("VM Size", justify="right", style="cyan")
+    table.add_column("%", justify="right")
+    table.add_column(profile.source.capitalize(), style="green", overflow="fold")
+    for label, vm, file in rows:
+        table.add_row(
+            human_size(file),
+            _percent(file, total_file),
+            human_size(vm),
+            _percent(vm, total_vm),
+            escape(label),
+        )
+    table.add_section()
+    table.add_row(
+        human_size(total_file), "100.0%", human_size(total_vm), "100.0%", "TOTAL"
+    )
+    console.print(table)
+
+
+def print_diff(profile, base, rows):
+    new_vm, new_file = profile.total()
+    old_vm, old_file = base.total()
+    table = Table(
+        title=f"{base.path} -> {profile.path} by {profile.source}",
+        box=box.ROUNDED,
+        header_style="bold magenta",
+    )
+    table.add_column("File Δ", justify="right")
+    table.add_column("%", justify="right")
+    table.add_column("VM Δ", justify="right")
+    table.add_column("%", justify="right")
+    table.add_column(profile.source.capitalize(), style="green", overflow="fold")
+
+    def delta(d, now):
+        style = "red" if d > 0 else "green" if d < 0 else "dim"
+        before = now - d
+        pct = f"{d * 100 / before:+.1f}%" if before else ("[NEW]" if d else "")
+        if now == 0 and d:
+            pct = "[DEL]"
+        return f"[{style}]{human_size(d, signed=True)}[/{style}]", pct
+
+    for label, dvm, dfile, vm, file in rows:
+        table.add_row(*delta(dfile, file), *delta(dvm, vm), escape(label))
+    table.add_section()
+    table.add_row(
+        *delta(new_file - old_file, new_file), *delta(new_vm - old_vm, new_vm), "TOTAL"
+    )
+    console.print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Attribute ELF file and VM size to segments, sections, "
+        "symbols or compile units"
+    )
+    parser.add_argument("elf_file", help="ELF file to analyze")
+    parser.add_argument(
+        "-d",
+        "--source",
+        choices=SOURCES,
+        default="sections",
+        help="What to attribute size to (default: sections)",
+    )
+    parser.add_argument(
+        "--base", metavar="ELF", help="Older build to diff against: show what grew"
+    )
+    parser.add_argument(
+        "-n", "--limit", type=int, default=20, help="Rows to show, 0 for all"
+    )
+    parser.add_argument(
+        "-s", "--sort", choices=("file", "vm"), default="file", help="Sort by"
+    )
+    parser.add_argument(
+        "--max-gap",
+        type=int,
+        default=16,
+        help="Give padding up to this many bytes after a symbol to that symbol "
+        "(default: 16, -1 to disable)",
+    )
+    parser.add_argument(
+        "--debug-file",
+        help="Separate debug info file for compileunits (e.g. from objcopy --only-keep-debug)",
+    )
+    parser.add_argument(
+        "--base-debug-file",
+        help="Separate debug info file for the --base build",
+    )
+    parser.add_argument(
+        "-C", "--demangle", action="store_true", help="Demangle C++ symbol names"
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    try:
+        profile = profile_file(
+            args.elf_file, args.source, args.max_gap, args.debug_file
+        )
+        base = None
+        if args.base:
+            base = profile_file(
+                args.base, args.source, args.max_gap, args.base_debug_file
+            )
+    except ImportError:
+        print("Error: pyelftools is required for -d compileunits", file=sys.stderr)
+        sys.exit(1)
+    except (OSError, ELFError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if base is None:
+        rows = size_rows(profile, args.limit, args.sort)
+    else:
+        rows = diff_rows(profile, base, args.limit, args.sort)
+    if args.demangle:
+        names = demangle([r[0] for r in rows])
+        rows = [(name, *r[1:]) for name, r in zip(names, rows)]
+
+    if args.json:
+        if base is None:
+            result = {
+                "file": profile.path,
+                "source": profile.source,
+                "rows": [{"name": n, "vm": vm, "file": f} for n, vm, f in rows],
+                "total": dict(zip(("vm", "file"), profile.total())),
+            }
+        else:
+            result = {
+                "file": profile.path,
+                "base": base.path,
+                "source": profile.source,
+                "rows": [
+                    {"name": n, "vm_delta": dvm, "file_delta": df, "vm": vm, "file": f}
+                    for n, dvm, df, vm, f in rows
+                ],
+                "total": dict(zip(("vm", "file"), profile.total())),
+                "base_total": dict(zip(("vm", "file"), base.total())),
+            }
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    elif base is None:
+        print_profile(profile, rows)
+    else:
+        print_diff(profile, base, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+估算一个可执行文件从 exec 到 main 的动态链接开销
+
+把几部分信息合在一起：
+  - 依赖闭包和加载顺序（elf_symbind / ldso_resolver，与 ld.so 的广度优先顺序一致）
+  - 每个对象的动态重定位，按类别计数（RELATIVE、GLOB_DAT、JUMP_SLOT、COPY、TLS ...），
+    包括 .relr.dyn 中打包的 RELATIVE
+  - 非 RELATIVE 重定位需要的符号查找，以及每次查找在全局作用域里探测了多少个对象
+  - 重定位写入的 PT_LOAD 页（写时复制，每页一次缺页和一次 4K 拷贝）
+  - GOT/PLT 的大小
+
+再用一个粗略的线性模型（COST_NS）折算成时间，并按开销给库排序，
+用来判断该在哪里做 prelink 类的优化，或者权衡 -z now / 延迟绑定。
+
+用法：
+    python elf_startup_cost.py /usr/bin/python3
+    python elf_startup_cost.py --bind-now ./app
+    python elf_startup_cost.py --json ./app
+"""
+
+import argparse
+import json
+import sys
+from collections import Counter
+
+from elf_reader import ELFError, ELFReader, reloc_kind, reloc_type_name
+from elf_symbind import BindingSimulator
+from ldso_resolver import LibraryResolver
+from rich import box
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+
+console = Console()
+
+PAGE_SIZE = 4096
+
+DF_BIND_NOW = 0x8
+DF_1_NOW = 0x1
+
+# 每项操作的大致开销（纳秒），只用于排序和量级估计，不是精确测量
+COST_NS = {
+    "object": 25000,  # open + 读头部 + 多次 mmap/mprotect + 初始化
+    "relative": 2,  # 一次加法和写入
+    "lookup": 80,  # 一次符号查找的固定部分（哈希、版本比较）
+    "probe": 15,  # 查找时每探测一个对象（布隆过滤器）
+    "dirty_page": 1500,  # 写时复制缺页：缺页处理 + 4K 拷贝
+}
+
+GOT_PLT_SECTIONS = (".got", ".got.plt", ".plt", ".plt.got", ".plt.sec")
+
+
+def _pages(offsets):
+    return {offset // PAGE_SIZE for offset in offsets}
+
+
+def analyze_object(path):
+    """读取一个对象的重定位类别计数、被写入的页、GOT/PLT 大小和绑定方式"""
+    with ELFReader(path) as elf:
+        machine = elf.e_machine_value
+        kinds = {}
+        dirty = set()
+        table_bytes = 0
+        packed = 0
+        type_mask = 0xFFFFFFFF if elf.elfclass == 64 else 0xFF
+
+        for section in elf.sections:
+            if section.sh_type not in ("SHT_REL", "SHT_RELA", "SHT_RELR"):
+                continue
+            # 只统计动态重定位（SHF_ALLOC），忽略 .o 中的静态重定位
+            if not section.sh_flags & 0x2:
+                continue
+            table_bytes += section.sh_size
+            offsets, infos = elf.relocation_fields(section)
+            dirty |= _pages(offsets)
+            if infos is None:
+                kinds["relative"] = kinds.get("relative", 0) + len(offsets)
+                packed += len(offsets)
+            else:
+                # 先用 Counter 按 r_info 计数（C 实现），再归并到类别
+                for info, count in Counter(infos).items():
+                    kind = reloc_kind(reloc_type_name(machine, info & type_mask))
+                    kinds[kind] = kinds.get(kind, 0) + count
+            del offsets, infos
+
+        writable_pages = 0
+        mapped_pages = 0
+        loads = 0
+        for seg in elf.iter_segments("PT_LOAD"):
+            loads += 1
+            first = seg.p_vaddr // PAGE_SIZE
+            last = (seg.p_vaddr + seg.p_memsz + PAGE_SIZE - 1) // PAGE_SIZE
+            mapped_pages += last - first
+            if seg.p_flags & 0x2:
+                writable_pages += last - first
+
+        bind_now = any(
+            tag == "DT_BIND_NOW"
+            or (tag == "DT_FLAGS" and val & DF_BIND_NOW)
+            or (tag == "DT_FLAGS_1" and val & DF_1_NOW)
+            for tag, val in elf.iter_dynamic()
+        )
+
+        got_plt = {}
+        for name in GOT_PLT_SECTIONS:
+            section = elf.get_section_by_name(name)
+            if section is not None:
+                got_plt[name] = section.sh_size
+
+        return {
+            "kinds": kinds,
+            "relocations": sum(kinds.values()),
+            "table_bytes": table_bytes,
+            "relr_packed": packed,
+            "dirty_pages": len(dirty),
+            "writable_pages": writable_pages,
+            "mapped_pages": mapped_pages,
+            "loads": loads,
+            "bind_now": bind_now,
+            "got_plt": got_plt,
+        }
+
+
+def count_lookups(scope, pos, bind_now):
+    """
+    统计对象 pos 的符号查找，返回 (启动时查找数, 延迟到首次调用的查找数,
+    启动时探测的对象数, 最终绑定到自身的查找数)
+    JUMP_SLOT 在延迟绑定时不在启动阶段查找
+    """
+    obj = scope.objects[pos]
+    eager = lazy = probes = self_bound = 0
+    for _, _, kind, name, version, local in obj.relocations:
+        if local or kind in ("relative", "irelative", "none"):
+            continue
+        if kind == "jump_slot" and not bind_now:
+            lazy += 1
+            continue
+        eager += 1
+        winner, probed = scope.lookup(name, version, pos, skip_self=kind == "copy")
+        probes += probed
+        if winner == pos:
+            self_bound += 1
+    return eager, lazy, probes, self_bound
+
+
+def estimate(exe_path, preloads=(), force_bind_now=False, simulator=None):
+    """返回整个进程以及每个对象的启动开销估计"""
+    simulator = simulator or BindingSimulator(LibraryResolver())
+    scope = simulator.build_scope(exe_path, preloads)
+
+    objects = []
+    for pos, obj in enumerate(scope.objects):
+        info = analyze_object(obj.path)
+        bind_now = force_bind_now or info["bind_now"]
+        eager, lazy, probes, self_bound = count_lookups(scope, pos, bind_now)
+        kinds = info["kinds"]
+        relative = kinds.get("relative", 0) + kinds.get("irelative", 0)
+        cost_ns = (
+            COST_NS["object"]
+            + relative * COST_NS["relative"]
+            + eager * COST_NS["lookup"]
+            + probes * COST_NS["probe"]
+            + info["dirty_pages"] * COST_NS["dirty_page"]
+        )
+        objects.append(
+            {
+                "name": obj.name,
+                "path": obj.path,
+                "source": scope.sources[pos],
+                "bind_now": bind_now,
+                "eager_lookups": eager,
+                "lazy_lookups": lazy,
+                "probes": probes,
+                "self_bound": self_bound,
+                "cost_us": cost_ns / 1000,
+                **info,
+            }
+        )
+
+    totals = {
+        "objects": len(objects),
+        "loads": sum(o["loads"] for o in objects),
+        "mapped_pages": sum(o["mapped_pages"] for o in objects),
+        "relocations": sum(o["relocations"] for o in objects),
+        "eager_lookups": sum(o["eager_lookups"] for o in objects),
+        "lazy_lookups": sum(o["lazy_lookups"] for o in objects),
+        "probes": sum(o["probes"] for o in objects),
+        "dirty_pages": sum(o["dirty_pages"] for o in objects),
+        "got_plt_bytes": sum(sum(o["got_plt"].values()) for o in objects),
+        "cost_us": sum(o["cost_us"] for o in objects),
+    }
+    kinds = {}
+    for o in objects:
+        for kind, count in o["kinds"].items():
+            kinds[kind] = kinds.get(kind, 0) + count
+    totals["kinds"] = kinds
+
+    return {
+        "binary": exe_path,
+        "missing": [
+            {"requester": requester, "name": name} for requester, name in scope.missing
+        ],
+        "totals": totals,
+        "objects": objects,
+    }
+
+
+def hints(obj):
+    """针对单个对象给出可能的优化方向"""
+    result = []
+    unpacked = obj["kinds"].get("relative", 0) - obj["relr_packed"]
+    if unpacked > 1000:
+        result.append(
+            f"{unpacked} RELATIVE in RELA: link with -z pack-relative-relocs (DT_RELR)"
+        )
+    if obj["lazy_lookups"] > 100:
+        result.append(f"-z now would add {obj['lazy_lookups']} lookups at startup")
+    if obj["self_bound"] > 20:
+        result.append(
+            f"{obj['self_bound']} lookups bind to itself: "
+            "-Bsymbolic or hidden visibility would skip them"
+        )
+    if obj["dirty_pages"] > 16:
+        result.append(f"{obj['dirty_pages']} COW pages: group relocated data (RELRO)")
+    return result
+
+
+def print_report(report, limit=20):
+    totals = report["totals"]
+    kinds = ", ".join(
+        f"{kind}={count}"
+        for kind, count in sorted(totals["kinds"].items(), key=lambda kv: -kv[1])
+    )
+    console.print(
+        Panel(
+            f"[bold white]Startup cost: [green]{report['binary']}[/green][/bold white]\n"
+            f"Objects mapped: [bold]{totals['objects']}[/bold] "
+            f"({totals['loads']} PT_LOAD, {totals['mapped_pages']} pages)\n"
+            f"Relocations: [bold]{totals['relocations']}[/bold] ({kinds})\n"
+            f"Symbol lookups at startup: [bold]{totals['eager_lookups']}[/bold] "
+            f"({totals['probes']} objects probed), "
+            f"deferred by lazy binding: {totals['lazy_lookups']}\n"
+            f"Pages dirtied by relocations: [bold]{totals['dirty_pages']}[/bold] "
+            f"({totals['dirty_pages'] * PAGE_SIZE // 1024} KiB copy-on-write)\n"
+            f"GOT/PLT: [bold]{totals['got_plt_bytes']}[/bold] bytes\n"
+            f"Estimated dynamic linking cost: [bold yellow]"
+            f"{totals['cost_us'] / 1000:.2f} ms[/bold yellow]",
+            title="[bold blue]Summary[/bold blue]",
+            box=box.DOUBLE,
+        )
+    )
+    for item in report["missing"]:
+        console.print(f"[red][Warning] {item['requester']}: {item['name']} not found")
+
+    table = Table(
+        title="Objects ranked by estimated cost",
+        box=box.ROUNDED,
+        header_style="bold magenta",
+    )
+    table.add_column("Object", style="green", no_wrap=True)
+    table.add_column("Bind", style="dim")
+    table.add_column("Relocs", justify="right")
+    table.add_column("Relative", justify="right")
+    table.add_column("Lookups", justify="right")
+    table.add_column("Lazy", justify="right")
+    table.add_column("Probes", justify="right")
+    table.add_column("COW pages", justify="right")
+    table.add_column("GOT/PLT", justify="right")
+    table.add_column("µs", justify="right", style="yellow")
+    table.add_column("%", justify="right")
+
+    total_cost = totals["cost_us"] or 1
+    ranked = sorted(report["objects"], key=lambda o: -o["cost_us"])
+    for obj in ranked[:limit]:
+        table.add_row(
+            obj["name"],
+            "now" if obj["bind_now"] else "lazy",
+            str(obj["relocations"]),
+            str(obj["kinds"].get("relative", 0)),
+            str(obj["eager_lookups"]),
+            str(obj["lazy_lookups"]),
+            str(obj["probes"]),
+            str(obj["dirty_pages"]),
+            str(sum(obj["got_plt"].values())),
+            f"{obj['cost_us']:.1f}",
+            f"{obj['cost_us'] * 100 / total_cost:.1f}",
+        )
+    console.print(table)
+
+    for obj in ranked[:3]:
+        for hint in hints(obj):
+            console.print(f"  [cyan]{obj['name']}[/cyan]: {hint}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Estimate dynamic linking startup cost of an ELF executable"
+    )
+    parser.add_argument("binaries", nargs="+", help="Executables to analyze")
+    parser.add_argument(
+        "--preload",
+        action="append",
+        default=[],
+        help="Library to preload, like LD_PRELOAD (can be repeated)",
+    )
+    parser.add_argument(
+        "--bind-now",
+        action="store_true",
+        help="Assume LD_BIND_NOW=1: resolve JUMP_SLOT relocations at startup",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print results as JSON Lines"
+    )
+    parser.add_argument(
+        "--limit", type=int, default=20, help="Number of objects in the ranking"
+    )
+    args = parser.parse_args()
+
+    simulator = BindingSimulator(LibraryResolver())
+    failed = 0
+    for exe_path in args.binaries:
+        try:
+            report = estimate(exe_path, args.preload, args.bind_now, simulator)
+        except (OSError, ELFError) as e:
+            print(f"Error: {exe_path}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        if args.json:
+            print(json.dumps(report))
+        else:
+            print_report(report, args.limit)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
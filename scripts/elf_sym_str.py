@@ -1,8 +1,9 @@
 import argparse
+import json
 import sys
 
-from elftools.elf.elffile import ELFFile
-from elftools.elf.sections import StringTableSection, SymbolTableSection
+from elf_cache import ELFCache, open_elf
+from elf_reader import ELFError, ELFReader
 from rich import box
 from rich.console import Console
 from rich.panel import Panel
@@ -12,12 +13,9 @@ from rich.text import Text
 console = Console()
 
 
-def print_symbols(elffile, section):
-    section_name = section.name
-
-    # 创建符号表
+def _new_symbol_table(title):
     table = Table(
-        title=f"[bold cyan]Symbols in {section_name}[/bold cyan]",
+        title=title,
         box=box.ROUNDED,
         show_header=True,
         header_style="bold magenta",
@@ -29,15 +27,29 @@ def print_symbols(elffile, section):
     table.add_column("Bind", style="red")
     table.add_column("Type", style="purple")
     table.add_column("Section", style="cyan", justify="right")
+    return table
+
+
+def print_symbols(elffile, section, page_size=0):
+    """
+    用 rich 表格显示符号表
+    page_size > 0 时每 page_size 行输出一张表，rich 只需测量当前页，
+    内存占用与符号总数无关
+    """
+    section_name = section.name
+    title = f"[bold cyan]Symbols in {section_name}[/bold cyan]"
+
+    # 创建符号表
+    table = _new_symbol_table(title)
 
     symbol_count = 0
-    for symbol in section.iter_symbols():
+    for symbol in elffile.iter_symbols(section):
         name = symbol.name if symbol.name else "[no name]"
-        addr = f"0x{symbol['st_value']:x}"
-        size = str(symbol["st_size"])
-        bind = symbol["st_info"].bind
-        typ = symbol["st_info"].type
-        shndx = str(symbol["st_shndx"])
+        addr = f"0x{symbol.st_value:x}"
+        size = str(symbol.st_size)
+        bind = symbol.bind
+        typ = symbol.type
+        shndx = str(symbol.st_shndx)
 
         # 为特殊符号添加样式
         name_style = (
@@ -45,25 +57,123 @@ def print_symbols(elffile, section):
             if symbol.name and not symbol.name.startswith(".")
             else "dim green"
         )
-        if symbol["st_value"] == 0 and symbol["st_size"] == 0:
+        if symbol.st_value == 0 and symbol.st_size == 0:
             name_style = "dim"
 
         table.add_row(Text(name, style=name_style), addr, size, bind, typ, shndx)
         symbol_count += 1
 
+        if page_size and symbol_count % page_size == 0:
+            table.title = f"{title} [dim](rows {symbol_count - page_size}-{symbol_count - 1})[/dim]"
+            console.print(table)
+            table = _new_symbol_table(title)
+
     # 添加统计信息
     stats_text = f"Total symbols: [bold]{symbol_count}[/bold]"
 
-    console.print(Panel(table, subtitle=stats_text))
+    if page_size:
+        if table.row_count:
+            first = symbol_count - table.row_count
+            table.title = f"{title} [dim](rows {first}-{symbol_count - 1})[/dim]"
+            console.print(table)
+        console.print(stats_text)
+    else:
+        console.print(Panel(table, subtitle=stats_text))
 
 
-def print_strings(elffile, section):
+def _tsv_escape(value):
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+SYMBOL_TSV_HEADER = "file\tsection\tindex\tname\tvalue\tsize\tbind\ttype\tshndx\n"
+STRING_TSV_HEADER = "file\tsection\toffset\tlength\tstring\n"
+
+
+def stream_symbols(elffile, section, fmt, out=sys.stdout, filename=""):
+    """按 TSV 或 JSON Lines 逐条输出符号，边读边写，不缓存整张表"""
+    write = out.write
     section_name = section.name
+    prefix = f"{_tsv_escape(filename)}\t{section_name}"
+    count = 0
+    for symbol in elffile.iter_symbols(section):
+        if fmt == "jsonl":
+            record = {
+                "kind": "symbol",
+                "file": filename,
+                "section": section_name,
+                "index": symbol.index,
+                "name": symbol.name,
+                "value": symbol.st_value,
+                "size": symbol.st_size,
+                "bind": symbol.bind,
+                "type": symbol.type,
+                "shndx": symbol.st_shndx,
+            }
+            write(json.dumps(record) + "\n")
+        else:
+            write(
+                f"{prefix}\t{symbol.index}\t{_tsv_escape(symbol.name)}\t"
+                f"0x{symbol.st_value:x}\t{symbol.st_size}\t{symbol.bind}\t"
+                f"{symbol.type}\t{symbol.st_shndx}\n"
+            )
+        count += 1
+    return count
 
-    # 获取字符串表的原始数据
-    data = section.data()
 
-    # 解析字符串表中的所有字符串
+def stream_strings(elffile, section, fmt, out=sys.stdout, filename=""):
+    """按 TSV 或 JSON Lines 逐条输出字符串表内容"""
+    write = out.write
+    section_name = section.name
+    prefix = f"{_tsv_escape(filename)}\t{section_name}"
+    count = 0
+    for offset, string, is_binary in iter_string_table(elffile.section_data(section)):
+        if fmt == "jsonl":
+            record = {
+                "kind": "string",
+                "file": filename,
+                "section": section_name,
+                "offset": offset,
+                "length": len(string),
+                "string": string,
+                "binary": is_binary,
+            }
+            write(json.dumps(record) + "\n")
+        else:
+            write(f"{prefix}\t{offset}\t{len(string)}\t{_tsv_escape(string)}\n")
+        count += 1
+    return count
+
+
+def iter_string_table(data):
+    """
+    把字符串表按 NUL 切分，逐个产出 (起始偏移, 字符串, 是否二进制)
+    用 bytes.split 一次切出所有字符串，偏移由各段长度累加得到
+    """
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+
+    pieces = data.split(b"\0")
+    # 最后一段后面没有结束符（或为空），与逐字节解析保持一致不计入
+    pieces.pop()
+
+    offset = 0
+    for piece in pieces:
+        if piece:
+            try:
+                yield offset, piece.decode("utf-8"), False
+            except UnicodeDecodeError:
+                # 如果无法解码为UTF-8，使用latin-1作为回退
+                yield offset, piece.decode("latin-1"), True
+        offset += len(piece) + 1
+
+
+def split_string_table(data):
+    """返回 [(起始偏移, 字符串, 是否二进制)]"""
+    return list(iter_string_table(data))
+
+
+def split_string_table_bytewise(data):
+    """逐字节解析字符串表（原始实现，保留用于对照和基准测试）"""
     strings = []
     current_string = b""
     offset = 0
@@ -84,6 +194,17 @@ def print_strings(elffile, section):
         else:
             current_string += bytes([byte])
         offset += 1
+    return strings
+
+
+def print_strings(elffile, section):
+    section_name = section.name
+
+    # 获取字符串表的原始数据
+    data = elffile.section_data(section)
+
+    # 解析字符串表中的所有字符串
+    strings = split_string_table(data)
 
     # 创建字符串表
     table = Table(
@@ -127,6 +248,111 @@ def print_strings(elffile, section):
     console.print(Panel(table, subtitle=stats_text))
 
 
+def stream_file(elffile, fmt, show_symbols, show_strings, out=sys.stdout, filename=""):
+    """
+    以流式格式输出整个文件的符号表和/或字符串表，每行带上文件名
+    TSV 表头由调用方在所有文件之前写一次
+    """
+    if show_symbols:
+        for section in elffile.sections:
+            if section.sh_type in ("SHT_SYMTAB", "SHT_DYNSYM"):
+                stream_symbols(elffile, section, fmt, out, filename)
+
+    if show_strings:
+        for section in elffile.iter_sections("SHT_STRTAB"):
+            stream_strings(elffile, section, fmt, out, filename)
+
+
+LOOKUP_TSV_HEADER = "file\tname\tfound\tvalue\tsize\tbind\ttype\tshndx\tmethod\n"
+
+
+def lookup_symbols(filenames, names, fmt, out=sys.stdout):
+    """
+    在每个文件的 .dynsym 中按名字查找符号，通过 .gnu.hash / .hash 定位，
+    每次查询只比较一个哈希桶里的符号。返回找到的符号个数
+    """
+    table = None
+    if fmt == "table":
+        table = Table(
+            title="[bold cyan]Symbol lookup[/bold cyan]",
+            box=box.ROUNDED,
+            show_header=True,
+            header_style="bold magenta",
+        )
+        table.add_column("File", style="cyan")
+        table.add_column("Name", style="green")
+        table.add_column("Address", style="blue", justify="right")
+        table.add_column("Size", style="yellow", justify="right")
+        table.add_column("Bind", style="red")
+        table.add_column("Type", style="purple")
+        table.add_column("Method", style="dim")
+    elif fmt == "tsv":
+        out.write(LOOKUP_TSV_HEADER)
+
+    found = 0
+    for filename in filenames:
+        try:
+            elffile = ELFReader(filename)
+        except (OSError, ELFError) as e:
+            print(f"[Warning] Skipping {filename}: {e}", file=sys.stderr)
+            continue
+        with elffile:
+            try:
+                method = elffile.symbol_hash_kind() or "scan"
+                results = [(name, elffile.lookup_symbol(name)) for name in names]
+            except ELFError as e:
+                # 哈希表损坏
+                print(f"[Warning] Skipping {filename}: {e}", file=sys.stderr)
+                continue
+            for name, symbol in results:
+                if symbol is not None:
+                    found += 1
+                if fmt == "jsonl":
+                    record = {"kind": "lookup", "file": filename, "name": name}
+                    record["found"] = symbol is not None
+                    if symbol is not None:
+                        record.update(
+                            index=symbol.index,
+                            value=symbol.st_value,
+                            size=symbol.st_size,
+                            bind=symbol.bind,
+                            type=symbol.type,
+                            shndx=symbol.st_shndx,
+                        )
+                    record["method"] = method
+                    out.write(json.dumps(record) + "\n")
+                elif fmt == "tsv":
+                    if symbol is None:
+                        out.write(
+                            f"{filename}\t{_tsv_escape(name)}\t0\t\t\t\t\t\t{method}\n"
+                        )
+                    else:
+                        out.write(
+                            f"{filename}\t{_tsv_escape(name)}\t1\t0x{symbol.st_value:x}\t"
+                            f"{symbol.st_size}\t{symbol.bind}\t{symbol.type}\t"
+                            f"{symbol.st_shndx}\t{method}\n"
+                        )
+                elif symbol is None:
+                    table.add_row(
+                        filename, Text(name, style="dim"), "-", "-", "-", "-", method
+                    )
+                else:
+                    table.add_row(
+                        filename,
+                        name,
+                        f"0x{symbol.st_value:x}",
+                        str(symbol.st_size),
+                        symbol.bind.replace("STB_", ""),
+                        symbol.type.replace("STT_", ""),
+                        method,
+                    )
+
+    if table is not None:
+        console.print(table)
+        console.print(f"Found [bold]{found}[/bold] of {len(filenames) * len(names)}")
+    return found
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Analyze ELF file symbols and string tables",
@@ -135,10 +361,16 @@ def main():
   python elf_sym_str.py program          # Show symbols only (default)
   python elf_sym_str.py program -s       # Show string tables only
   python elf_sym_str.py program -s -y    # Show both symbols and strings
+  python elf_sym_str.py program -f tsv   # Stream symbols as TSV
+  python elf_sym_str.py program -p 1000  # Rich tables of 1000 rows each
+  python elf_sym_str.py /usr/lib/*.so* --lookup malloc -f tsv
+                                         # Hash-table lookup across many files
         """,
     )
 
-    parser.add_argument("filename", help="ELF file to analyze")
+    parser.add_argument(
+        "filenames", nargs="+", metavar="filename", help="ELF file(s) to analyze"
+    )
     parser.add_argument(
         "-s",
         "--strings",
@@ -152,6 +384,39 @@ def main():
         help="Show symbols (use with -s to show both)",
     )
 
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=["table", "tsv", "jsonl"],
+        default="table",
+        help="Output format; tsv and jsonl stream rows as they are read",
+    )
+    parser.add_argument(
+        "-p",
+        "--page-size",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Print symbol tables in pages of N rows (table format only)",
+    )
+    parser.add_argument(
+        "-l",
+        "--lookup",
+        nargs="+",
+        metavar="NAME",
+        help="Look up dynamic symbols by name via .gnu.hash/.hash",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Parse files directly instead of using the shared ELF cache",
+    )
+    parser.add_argument(
+        "--write-cache",
+        action="store_true",
+        help="Also store newly parsed files in the cache (default: only read it)",
+    )
+
     args = parser.parse_args()
 
     # 确定要显示的内容
@@ -163,66 +428,90 @@ def main():
         if not args.symbols:
             show_symbols = False  # 如果只指定了 -s，就只显示字符串表
 
-    try:
-        with open(args.filename, "rb") as f:
-            elffile = ELFFile(f)
-
-            # 显示文件信息
-            console.print(
-                Panel(
-                    f"[bold white]ELF File Analysis: [green]{args.filename}[/green][/bold white]\n"
-                    f"[dim]Architecture: {elffile.get_machine_arch()}[/dim]\n"
-                    f"[dim]Class: {elffile.elfclass}[/dim]\n"
-                    f"[dim]Data: {elffile['e_ident']['EI_DATA']}[/dim]",
-                    title="[bold blue]File Information[/bold blue]",
-                    box=box.DOUBLE,
-                )
-            )
-
-            # 遍历所有节，找到所有符号表和字符串表
-            symbol_tables = []
-            string_tables = []
-
-            for section in elffile.iter_sections():
-                if isinstance(section, SymbolTableSection):
-                    symbol_tables.append(section)
-                elif isinstance(section, StringTableSection):
-                    string_tables.append(section)
-
-            # 根据参数决定显示内容
-            if show_symbols:
-                if symbol_tables:
-                    console.print(
-                        f"\n[bold blue]Found {len(symbol_tables)} Symbol Table(s)[/bold blue]"
+    if args.lookup:
+        lookup_symbols(args.filenames, args.lookup, args.format)
+        return
+
+    if args.format == "tsv":
+        # 符号和字符串的列不同，一个 TSV 流里只能有一种表头；jsonl 用 kind 区分
+        if show_symbols and show_strings:
+            parser.error("-s -y cannot be combined with -f tsv; use -f jsonl")
+        sys.stdout.write(SYMBOL_TSV_HEADER if show_symbols else STRING_TSV_HEADER)
+
+    # 表格模式的节表、符号表从共享缓存读取，同一文件再次运行时不必重新解析；
+    # tsv/jsonl 只顺序读一遍，直接用 ELFReader 逐条解码，内存与符号数无关
+    cache = None
+    if not args.no_cache and args.format == "table":
+        cache = ELFCache(write=args.write_cache)
+    for filename in args.filenames:
+        try:
+            with open_elf(filename, cache) as elffile:
+                if args.format != "table":
+                    stream_file(
+                        elffile,
+                        args.format,
+                        show_symbols,
+                        show_strings,
+                        filename=filename,
                     )
-                    for i, symtab in enumerate(symbol_tables):
-                        if i > 0:
-                            console.print()
-                        print_symbols(elffile, symtab)
-                else:
-                    console.print("\n[yellow]No symbol tables found[/yellow]")
-
-            if show_strings:
-                if show_symbols and symbol_tables:
-                    console.print()  # 在符号表和字符串表之间添加空行
-
-                if string_tables:
-                    console.print(
-                        f"\n[bold blue]Found {len(string_tables)} String Table(s)[/bold blue]"
+                    continue
+
+                # 显示文件信息
+                console.print(
+                    Panel(
+                        f"[bold white]ELF File Analysis: [green]{filename}[/green][/bold white]\n"
+                        f"[dim]Architecture: {elffile.get_machine_arch()}[/dim]\n"
+                        f"[dim]Class: {elffile.elfclass}[/dim]\n"
+                        f"[dim]Data: {elffile.ei_data}[/dim]",
+                        title="[bold blue]File Information[/bold blue]",
+                        box=box.DOUBLE,
                     )
-                    for i, strtab in enumerate(string_tables):
-                        if i > 0:
-                            console.print()
-                        print_strings(elffile, strtab)
-                else:
-                    console.print("\n[yellow]No string tables found[/yellow]")
-
-    except FileNotFoundError:
-        console.print(f"[bold red]Error: File '{args.filename}' not found[/bold red]")
-        sys.exit(1)
-    except Exception as e:
-        console.print(f"[bold red]Error analyzing file: {e}[/bold red]")
-        sys.exit(1)
+                )
+
+                # 遍历所有节，找到所有符号表和字符串表
+                symbol_tables = []
+                string_tables = []
+
+                for section in elffile.sections:
+                    if section.sh_type in ("SHT_SYMTAB", "SHT_DYNSYM"):
+                        symbol_tables.append(section)
+                    elif section.sh_type == "SHT_STRTAB":
+                        string_tables.append(section)
+
+                # 根据参数决定显示内容
+                if show_symbols:
+                    if symbol_tables:
+                        console.print(
+                            f"\n[bold blue]Found {len(symbol_tables)} Symbol Table(s)[/bold blue]"
+                        )
+                        for i, symtab in enumerate(symbol_tables):
+                            if i > 0:
+                                console.print()
+                            print_symbols(elffile, symtab, args.page_size)
+                    else:
+                        console.print("\n[yellow]No symbol tables found[/yellow]")
+
+                if show_strings:
+                    if show_symbols and symbol_tables:
+                        console.print()  # 在符号表和字符串表之间添加空行
+
+                    if string_tables:
+                        console.print(
+                            f"\n[bold blue]Found {len(string_tables)} String Table(s)[/bold blue]"
+                        )
+                        for i, strtab in enumerate(string_tables):
+                            if i > 0:
+                                console.print()
+                            print_strings(elffile, strtab)
+                    else:
+                        console.print("\n[yellow]No string tables found[/yellow]")
+
+        except FileNotFoundError:
+            console.print(f"[bold red]Error: File '{filename}' not found[/bold red]")
+            sys.exit(1)
+        except Exception as e:
+            console.print(f"[bold red]Error analyzing file: {e}[/bold red]")
+            sys.exit(1)
 
 
 if __name__ == "__main__":
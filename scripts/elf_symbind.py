@@ -0,0 +1,541 @@
+"""
+符号绑定模拟器：按 ld.so 的规则把每个未定义符号和动态重定位绑定到提供它的库
+
+1. 按加载顺序得到全局查找作用域：主程序、LD_PRELOAD 的库、然后按广度优先加载的
+   DT_NEEDED 依赖（库的查找使用 ldso_resolver）
+2. 为作用域中所有对象的导出符号（.dynsym，带 .gnu.version/.gnu.version_d 版本信息）
+   建立 名字 -> [(作用域位置, 版本, ...)] 的哈希索引
+3. 对每个对象的未定义符号和带符号的动态重定位，在索引中按作用域顺序找第一个
+   满足版本要求的定义
+
+同一次运行内，每个文件只解析一次（按真实路径缓存），分析多个可执行文件时
+公共的库（libc 等）不会重复解析。
+
+用法：
+    python elf_symbind.py /bin/ls
+    python elf_symbind.py --preload ./libpreload.so ./test_program
+    python elf_symbind.py /usr/bin/* --json > bindings.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from elf_reader import ELFError, ELFReader, reloc_kind, reloc_type_name
+from ldso_resolver import LibraryResolver, LoadedObject
+from rich import box
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+DF_SYMBOLIC = 0x2
+
+# versym 的最高位表示隐藏版本（symbol@VER 而不是 symbol@@VER）
+VERSYM_HIDDEN = 0x8000
+
+# 不参与全局查找的符号类型
+_SKIP_TYPES = ("STT_SECTION", "STT_FILE")
+
+
+class DynamicObject:
+    """一个 ELF 文件的动态符号信息：导出表、导入表和带符号的动态重定位"""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        # 名字 -> [(版本名或 None, 是否隐藏, 版本下标, 是否 protected)]
+        self.exports = {}
+        # [(名字, 版本名或 None, 是否弱引用)]
+        self.imports = []
+        # [(重定位节名, 类型名, 类别, 符号名, 版本名或 None, 是否在本对象内绑定)]
+        self.relocations = []
+        # 与 relocations 一一对应的 r_offset（被写入的虚拟地址，未加装载偏移）
+        self.relocation_offsets = []
+
+        with ELFReader(path) as elf:
+            self.soname = elf.soname()
+            self.needed = elf.needed()
+            self.rpath = elf.rpath()
+            self.runpath = elf.runpath()
+            self.elfclass = elf.elfclass
+            self.machine = elf.e_machine_value
+
+            self.flags_1 = 0
+            self.symbolic = False
+            for tag, val in elf.iter_dynamic():
+                if tag == "DT_FLAGS_1":
+                    self.flags_1 = val
+                elif tag == "DT_SYMBOLIC" or (tag == "DT_FLAGS" and val & DF_SYMBOLIC):
+                    self.symbolic = True
+
+            dynsym = next(elf.iter_sections("SHT_DYNSYM"), None)
+            if dynsym is None:
+                self.versioned = False
+                return
+            versyms = elf.symbol_versions(dynsym)
+            self.versioned = versyms is not None
+            definitions = elf.version_definitions()
+            requirements = elf.version_requirements()
+
+            # 每个符号的 (名字, 版本, 是否在本对象内解析)，供重定位使用
+            symbols = []
+            for sym in elf.iter_symbols(dynsym):
+                versym = (
+                    versyms[sym.index] if versyms and sym.index < len(versyms) else 1
+                )
+                ndx = versym & 0x7FFF
+                hidden = bool(versym & VERSYM_HIDDEN)
+                undefined = sym.st_shndx == "SHN_UNDEF"
+                if undefined:
+                    version = requirements.get(ndx, (None, None))[0]
+                else:
+                    version, is_base = definitions.get(ndx, (None, False))
+                    if is_base:
+                        version = None
+
+                local = (
+                    sym.bind == "STB_LOCAL"
+                    or sym.type in _SKIP_TYPES
+                    or (not undefined and sym.visibility != "STV_DEFAULT")
+                )
+                symbols.append((sym.name, version, local))
+
+                if not sym.name or sym.index == 0 or sym.bind == "STB_LOCAL":
+                    continue
+                if undefined:
+                    self.imports.append((sym.name, version, sym.bind == "STB_WEAK"))
+                elif sym.type not in _SKIP_TYPES and sym.visibility in (
+                    "STV_DEFAULT",
+                    "STV_PROTECTED",
+                ):
+                    self.exports.setdefault(sym.name, []).append(
+                        (version, hidden, ndx, sym.visibility == "STV_PROTECTED")
+                    )
+
+            for section in elf.sections:
+                if section.sh_type not in ("SHT_REL", "SHT_RELA"):
+                    continue
+                if section.sh_link != dynsym.index:
+                    continue
+                for rel in elf.iter_relocations(section):
+                    if rel.r_info_sym == 0 or rel.r_info_sym >= len(symbols):
+                        continue
+                    type_name = reloc_type_name(self.machine, rel.r_info_type)
+                    name, version, local = symbols[rel.r_info_sym]
+                    self.relocations.append(
+                        (
+                            section.name,
+                            type_name,
+                            reloc_kind(type_name),
+                            name,
+                            version,
+                            local,
+                        )
+                    )
+                    self.relocation_offsets.append(rel.r_offset)
+
+    def context(self, loader=None):
+        """转换成 ldso_resolver 查找库时使用的上下文"""
+        return LoadedObject(
+            self.path,
+            loader,
+            self.rpath,
+            self.runpath,
+            self.flags_1,
+            self.elfclass,
+            self.machine,
+        )
+
+
+def _definition_matches(definitions, version, versioned):
+    """
+    判断一个对象里名为 name 的定义能否满足带 version 要求的引用，
+    规则与 glibc do_lookup_x 中的 check_match 一致
+    """
+    if not versioned:
+        # 对象没有版本信息时任何引用都接受
+        return True
+    if version is None:
+        # 无版本引用：接受下标 0/1/2 的定义；否则只有唯一的非隐藏版本时才接受
+        candidates = 0
+        for _, hidden, ndx, _ in definitions:
+            if ndx < 3:
+                return True
+            if not hidden:
+                candidates += 1
+        return candidates == 1
+    for def_version, hidden, ndx, _ in definitions:
+        if def_version == version:
+            return True
+        if ndx < 2 and not hidden:
+            # 定义本身不带版本（VER_NDX_GLOBAL）
+            return True
+    return False
+
+
+class SymbolScope:
+    """一个可执行文件的全局查找作用域以及导出符号的哈希索引"""
+
+    def __init__(self, objects, sources, missing):
+        self.objects = objects  # 按查找顺序排列的 DynamicObject
+        self.sources = sources  # 与 objects 对应的加载来源（exe / preload / RPATH ...）
+        self.missing = missing  # [(请求者, 找不到的库名)]
+
+        # 名字 -> [(作用域位置, 该对象中此名字的所有定义)]
+        self.index = {}
+        for pos, obj in enumerate(objects):
+            for name, definitions in obj.exports.items():
+                self.index.setdefault(name, []).append((pos, definitions))
+
+    def lookup(self, name, version=None, requester=None, skip_self=False):
+        """
+        返回 (赢得查找的作用域位置, ld.so 查过哈希表的对象数)，找不到时位置为 None
+        DT_SYMBOLIC 的对象先查自身一次；skip_self 时跳过的自身不算
+        """
+        requester_obj = self.objects[requester] if requester is not None else None
+        skipped = 1 if skip_self and requester is not None else 0
+        probes = 0
+        entries = self.index.get(name, ())
+        if requester_obj is not None and requester_obj.symbolic and not skip_self:
+            # DT_SYMBOLIC：先在自身查找
+            probes = 1
+            for pos, definitions in entries:
+                if pos == requester and _definition_matches(
+                    definitions, version, requester_obj.versioned
+                ):
+                    return pos, probes
+        for pos, definitions in entries:
+            if skip_self and pos == requester:
+                continue
+            if _definition_matches(definitions, version, self.objects[pos].versioned):
+                before = skipped if requester is not None and requester < pos else 0
+                return pos, probes + pos + 1 - before
+        return None, probes + len(self.objects) - skipped
+
+    def definers(self, name):
+        """所有导出 name 的作用域位置，按查找顺序"""
+        return [pos for pos, _ in self.index.get(name, ())]
+
+
+class BindingSimulator:
+    """解析结果按真实路径缓存，分析多个可执行文件时复用"""
+
+    def __init__(self, resolver=None):
+        self.resolver = resolver or LibraryResolver()
+        self._objects = {}
+        self.parsed = 0
+        self.reused = 0
+
+    def load(self, path):
+        realpath = os.path.realpath(path)
+        obj = self._objects.get(realpath)
+        if obj is None:
+            obj = DynamicObject(path)
+            self._objects[realpath] = obj
+            self.parsed += 1
+        else:
+            self.reused += 1
+        return obj
+
+    def build_scope(self, exe_path, preloads=()):
+        """按 ld.so 的顺序加载主程序、LD_PRELOAD 和广度优先的依赖闭包"""
+        root = self.load(exe_path)
+        root_ctx = root.context()
+        objects, sources, missing = [root], ["exe"], []
+        known = {os.path.realpath(exe_path): 0}
+        names = {}  # 已加载对象的 DT_NEEDED 名字 / soname -> 作用域位置
+
+        def add(path, source, name, loader_ctx):
+            realpath = os.path.realpath(path)
+            if realpath in known:
+                names[name] = known[realpath]
+                return None
+            obj = self.load(path)
+            known[realpath] = len(objects)
+            names[name] = len(objects)
+            if obj.soname:
+                names.setdefault(obj.soname, len(objects))
+            objects.append(obj)
+            sources.append(source)
+            return obj, obj.context(loader_ctx)
+
+        queue = [(root, root_ctx)]
+        for item in preloads:
+            path, _ = self.resolver.resolve(item, root_ctx)
+            if path is None:
+                missing.append(("LD_PRELOAD", item))
+                continue
+            added = add(path, "preload", item, root_ctx)
+            if added:
+                queue.append(added)
+
+        head = 0
+        while head < len(queue):
+            obj, ctx = queue[head]
+            head += 1
+            for dep in obj.needed:
+                if dep in names:
+                    continue
+                path, how = self.resolver.resolve(dep, ctx)
+                if path is None:
+                    missing.append((obj.name, dep))
+                    names[dep] = None
+                    continue
+                try:
+                    added = add(path, how, dep, ctx)
+                except (OSError, ELFError) as e:
+                    console.print(f"[yellow][Warning] Failed to parse {path}: {e}")
+                    names[dep] = None
+                    continue
+                if added:
+                    queue.append(added)
+        return SymbolScope(objects, sources, missing)
+
+
+def resolve_bindings(scope):
+    """
+    解析作用域中所有对象的导入符号和动态重定位，返回报告用的字典：
+    imports: 对象 -> {提供者: 数量}，unresolved: [(对象, 符号, 版本, 是否弱引用)]，
+    relocations: 对象 -> {(类别, 提供者): 数量}
+    """
+    objects = scope.objects
+    imports = {}
+    unresolved = []
+    relocations = {}
+    referenced = set()
+
+    for pos, obj in enumerate(objects):
+        counts = imports.setdefault(obj.name, {})
+        for name, version, weak in obj.imports:
+            winner, _ = scope.lookup(name, version, pos)
+            if winner is None:
+                unresolved.append((obj.name, name, version, weak))
+                provider = "<unresolved>"
+            else:
+                provider = objects[winner].name
+                referenced.add(name)
+            counts[provider] = counts.get(provider, 0) + 1
+
+        reloc_counts = relocations.setdefault(obj.name, {})
+        for _, _, kind, name, version, local in obj.relocations:
+            if local:
+                provider = obj.name
+            else:
+                # COPY 重定位要找的是“别处”的定义，跳过主程序自身
+                winner, _ = scope.lookup(name, version, pos, skip_self=kind == "copy")
+                provider = (
+                    objects[winner].name if winner is not None else "<unresolved>"
+                )
+                if winner is not None:
+                    referenced.add(name)
+            key = (kind, provider)
+            reloc_counts[key] = reloc_counts.get(key, 0) + 1
+
+    return {
+        "imports": imports,
+        "unresolved": unresolved,
+        "relocations": relocations,
+        "referenced": referenced,
+    }
+
+
+def find_interpositions(scope, referenced):
+    """
+    找出被多个作用域对象导出、且确实被引用的符号：
+    赢家排在某个库前面即为符号介入（如 LD_PRELOAD 的 malloc 遮蔽 libc）
+    """
+    result = []
+    for name in sorted(referenced):
+        definers = scope.definers(name)
+        if len(definers) < 2:
+            continue
+        winner, _ = scope.lookup(name)
+        if winner is None:
+            winner = definers[0]
+        shadowed = [pos for pos in definers if pos != winner]
+        kind = (
+            "interposed" if scope.sources[winner] in ("exe", "preload") else "duplicate"
+        )
+        result.append(
+            (
+                name,
+                kind,
+                scope.objects[winner].name,
+                [scope.objects[pos].name for pos in shadowed],
+            )
+        )
+    return result
+
+
+def analyze(simulator, exe_path, preloads=()):
+    scope = simulator.build_scope(exe_path, preloads)
+    bindings = resolve_bindings(scope)
+    interpositions = find_interpositions(scope, bindings["referenced"])
+    return scope, bindings, interpositions
+
+
+def to_json(exe_path, scope, bindings, interpositions):
+    return {
+        "binary": exe_path,
+        "load_order": [
+            {
+                "name": obj.name,
+                "path": obj.path,
+                "source": source,
+                "exports": len(obj.exports),
+                "imports": len(obj.imports),
+            }
+            for obj, source in zip(scope.objects, scope.sources)
+        ],
+        "missing_libraries": [
+            {"requester": requester, "name": name} for requester, name in scope.missing
+        ],
+        "imports": bindings["imports"],
+        "relocations": {
+            obj: [
+                {"kind": kind, "provider": provider, "count": count}
+                for (kind, provider), count in sorted(counts.items())
+            ]
+            for obj, counts in bindings["relocations"].items()
+        },
+        "unresolved": [
+            {"object": obj, "symbol": name, "version": version, "weak": weak}
+            for obj, name, version, weak in bindings["unresolved"]
+        ],
+        "interpositions": [
+            {"symbol": name, "kind": kind, "winner": winner, "shadowed": shadowed}
+            for name, kind, winner, shadowed in interpositions
+        ],
+    }
+
+
+def print_report(exe_path, scope, bindings, interpositions, limit=50, verbose=False):
+    console.print(f"\n[bold blue]Symbol bindings for {exe_path}[/bold blue]")
+
+    table = Table(title="Load order (global scope)", box=box.ROUNDED)
+    table.add_column("#", justify="right", style="cyan")
+    table.add_column("Object", style="green")
+    table.add_column("Source", style="magenta")
+    table.add_column("Exports", justify="right")
+    table.add_column("Imports", justify="right")
+    table.add_column("Path", style="dim")
+    for pos, (obj, source) in enumerate(zip(scope.objects, scope.sources)):
+        table.add_row(
+            str(pos),
+            obj.name,
+            source,
+            str(len(obj.exports)),
+            str(len(obj.imports)),
+            obj.path,
+        )
+    console.print(table)
+
+    for requester, name in scope.missing:
+        console.print(f"[red][Warning] {requester}: library {name} not found")
+
+    table = Table(title="Undefined symbols bound per provider", box=box.ROUNDED)
+    table.add_column("Object", style="green")
+    table.add_column("Provider", style="yellow")
+    table.add_column("Symbols", justify="right")
+    for obj, counts in bindings["imports"].items():
+        for provider, count in sorted(counts.items(), key=lambda kv: -kv[1]):
+            table.add_row(obj, provider, str(count))
+    console.print(table)
+
+    if verbose:
+        table = Table(title="Dynamic relocations by kind and provider", box=box.ROUNDED)
+        table.add_column("Object", style="green")
+        table.add_column("Kind", style="cyan")
+        table.add_column("Provider", style="yellow")
+        table.add_column("Count", justify="right")
+        for obj, counts in bindings["relocations"].items():
+            for (kind, provider), count in sorted(counts.items()):
+                table.add_row(obj, kind, provider, str(count))
+        console.print(table)
+
+    unresolved = bindings["unresolved"]
+    strong = [u for u in unresolved if not u[3]]
+    console.print(
+        f"\nUnresolved: {len(strong)} strong, {len(unresolved) - len(strong)} weak"
+    )
+    for obj, name, version, weak in strong[:limit]:
+        suffix = f"@{version}" if version else ""
+        console.print(f"  [red]{obj}: {name}{suffix}")
+
+    if interpositions:
+        table = Table(
+            title=f"Interposed / duplicate definitions ({len(interpositions)})",
+            box=box.ROUNDED,
+        )
+        table.add_column("Symbol", style="cyan")
+        table.add_column("Kind", style="magenta")
+        table.add_column("Winner", style="green")
+        table.add_column("Shadowed", style="dim")
+        # 先列出真正的介入（主程序或预加载库遮蔽了库中的定义）
+        ordered = sorted(interpositions, key=lambda item: item[1] != "interposed")
+        for name, kind, winner, shadowed in ordered[:limit]:
+            table.add_row(name, kind, winner, ", ".join(shadowed))
+        console.print(table)
+        if len(interpositions) > limit:
+            console.print(f"  ... {len(interpositions) - limit} more (use --limit)")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Simulate ld.so symbol binding for ELF executables"
+    )
+    parser.add_argument("binaries", nargs="+", help="Executables to analyze")
+    parser.add_argument(
+        "--preload",
+        action="append",
+        default=[],
+        help="Library to preload, like LD_PRELOAD (can be repeated)",
+    )
+    parser.add_argument(
+        "--ld-library-path",
+        default=None,
+        help="LD_LIBRARY_PATH to use (default: from the environment)",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print results as JSON Lines"
+    )
+    parser.add_argument(
+        "--limit", type=int, default=50, help="Maximum rows in symbol lists"
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="Also show relocation bindings"
+    )
+    args = parser.parse_args()
+
+    simulator = BindingSimulator(LibraryResolver(args.ld_library_path))
+    start = time.perf_counter()
+    failed = 0
+    for exe_path in args.binaries:
+        try:
+            scope, bindings, interpositions = analyze(simulator, exe_path, args.preload)
+        except (OSError, ELFError) as e:
+            print(f"Error: {exe_path}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        if args.json:
+            print(json.dumps(to_json(exe_path, scope, bindings, interpositions)))
+        else:
+            print_report(
+                exe_path, scope, bindings, interpositions, args.limit, args.verbose
+            )
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Analyzed {len(args.binaries) - failed} binaries in {elapsed:.2f}s: "
+        f"{simulator.parsed} objects parsed, {simulator.reused} reused from cache",
+        file=sys.stderr,
+    )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
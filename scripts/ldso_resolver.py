@@ -0,0 +1,302 @@
+"""
+按照 glibc ld.so 的规则查找共享库
+
+对一个不含 '/' 的 DT_NEEDED 名字，查找顺序为：
+  1. 请求者没有 DT_RUNPATH 时，依次搜索请求者及其加载链上各对象的 DT_RPATH
+  2. LD_LIBRARY_PATH
+  3. 请求者自己的 DT_RUNPATH
+  4. /etc/ld.so.cache（请求者带 DF_1_NODEFLIB 时跳过 4 和 5）
+  5. 默认目录
+路径中的 $ORIGIN / $LIB / $PLATFORM 会被展开。
+
+每个搜索目录只用 os.scandir 扫描一次建立 名字 -> 路径 的索引，
+之后的查找都是字典命中，不再对每个候选路径做 stat。
+"""
+
+import os
+import platform
+import re
+import struct
+
+from elf_reader import ELFReader
+
+LD_SO_CACHE = "/etc/ld.so.cache"
+
+_CACHE_MAGIC_NEW = b"glibc-ld.so.cache1.1"
+_CACHE_MAGIC_OLD = b"ld.so-1.7.0"
+_CACHE_HEADER_NEW = struct.Struct("<20sII4xI12x")
+_CACHE_ENTRY_NEW = struct.Struct("<iIIIQ")
+_CACHE_ENTRY_OLD = struct.Struct("<iII")
+
+# ld.so.cache 条目的 flags：低 8 位为 FLAG_ELF_LIBC6，高 8 位为架构
+_CACHE_FLAGS = {
+    (64, 62): 0x0303,  # x86-64
+    (32, 3): 0x0003,  # i386
+    (64, 183): 0x0A03,  # AArch64
+    (64, 22): 0x0403,  # s390x
+    (64, 21): 0x0503,  # ppc64
+}
+
+DF_1_NODEFLIB = 0x800
+
+_DST_RE = re.compile(r"\$(\{(ORIGIN|LIB|PLATFORM)\}|(ORIGIN|LIB|PLATFORM))")
+
+
+def _multiarch_triplet():
+    machine = platform.machine()
+    return {
+        "x86_64": "x86_64-linux-gnu",
+        "aarch64": "aarch64-linux-gnu",
+        "i686": "i386-linux-gnu",
+        "i386": "i386-linux-gnu",
+        "ppc64le": "powerpc64le-linux-gnu",
+        "s390x": "s390x-linux-gnu",
+        "riscv64": "riscv64-linux-gnu",
+    }.get(machine)
+
+
+def default_library_dirs(elfclass=64):
+    """系统默认目录：多架构目录（如果存在）、lib64 变体、lib"""
+    dirs = []
+    triplet = _multiarch_triplet()
+    if triplet:
+        dirs += [f"/lib/{triplet}", f"/usr/lib/{triplet}"]
+    if elfclass == 64:
+        dirs += ["/lib64", "/usr/lib64"]
+    dirs += ["/lib", "/usr/lib"]
+    return [d for d in dirs if os.path.isdir(d)]
+
+
+def parse_ld_so_cache(filename=LD_SO_CACHE):
+    """
+    解析 ld.so.cache，返回 [(soname, flags, path)]，保持文件中的顺序
+    支持新格式以及“旧格式 + 新格式”的组合文件
+    """
+    try:
+        with open(filename, "rb") as f:
+            data = f.read()
+    except OSError:
+        return []
+
+    base = 0
+    if data.startswith(_CACHE_MAGIC_OLD):
+        (nlibs,) = struct.unpack_from("<I", data, 12)
+        old_end = 16 + nlibs * _CACHE_ENTRY_OLD.size
+        new_base = (old_end + 7) & ~7
+        if data[new_base : new_base + 20] != _CACHE_MAGIC_NEW:
+            # 只有旧格式：字符串偏移相对于条目表末尾
+            entries = []
+            for flags, key, value in _CACHE_ENTRY_OLD.iter_unpack(data[16:old_end]):
+                entries.append(
+                    (
+                        _cache_string(data, old_end + key),
+                        flags,
+                        _cache_string(data, old_end + value),
+                    )
+                )
+            return entries
+        base = new_base
+    elif not data.startswith(_CACHE_MAGIC_NEW):
+        return []
+
+    _, nlibs, _, _ = _CACHE_HEADER_NEW.unpack_from(data, base)
+    start = base + _CACHE_HEADER_NEW.size
+    end = start + nlibs * _CACHE_ENTRY_NEW.size
+    entries = []
+    for flags, key, value, _, _ in _CACHE_ENTRY_NEW.iter_unpack(data[start:end]):
+        # 新格式的字符串偏移相对于新格式头部
+        entries.append(
+            (_cache_string(data, base + key), flags, _cache_string(data, base + value))
+        )
+    return entries
+
+
+def _cache_string(data, offset):
+    end = data.find(b"\0", offset)
+    return data[offset:end].decode("utf-8", errors="replace")
+
+
+class LoadedObject:
+    """参与查找的一个已加载对象：路径、RPATH/RUNPATH 以及加载它的对象"""
+
+    def __init__(
+        self,
+        path,
+        loader=None,
+        rpath=None,
+        runpath=None,
+        flags_1=0,
+        elfclass=64,
+        machine=62,
+    ):
+        self.path = path
+        self.loader = loader
+        self.rpath = rpath
+        self.runpath = runpath
+        self.flags_1 = flags_1
+        self.elfclass = elfclass
+        self.machine = machine
+
+    @classmethod
+    def from_file(cls, path, loader=None):
+        with ELFReader(path) as elf:
+            flags_1 = 0
+            for tag, val in elf.iter_dynamic():
+                if tag == "DT_FLAGS_1":
+                    flags_1 = val
+            return cls(
+                path,
+                loader,
+                elf.rpath(),
+                elf.runpath(),
+                flags_1,
+                elf.elfclass,
+                elf.e_machine_value,
+            )
+
+    @property
+    def origin(self):
+        # 主程序的 $ORIGIN 来自 /proc/self/exe，即真实路径；库取加载时所用路径的目录
+        path = os.path.realpath(self.path) if self.loader is None else self.path
+        return os.path.dirname(os.path.abspath(path))
+
+
+class LibraryResolver:
+    def __init__(
+        self,
+        ld_library_path=None,
+        cache_file=LD_SO_CACHE,
+        default_dirs=None,
+        platform_name=None,
+    ):
+        if ld_library_path is None:
+            ld_library_path = os.environ.get("LD_LIBRARY_PATH", "")
+        self.ld_library_path = ld_library_path
+        self.cache_file = cache_file
+        self._default_dirs = default_dirs
+        self.platform_name = platform_name or platform.machine()
+
+        self._dir_index = {}  # 目录 -> {文件名: 路径}
+        self._ld_cache = None  # soname -> [(flags, path)]
+        self._compat = {}  # 路径 -> (elfclass, machine) 或 None
+
+    # ---- 目录索引 ----
+
+    def _index(self, directory):
+        index = self._dir_index.get(directory)
+        if index is None:
+            index = {}
+            try:
+                with os.scandir(directory or ".") as it:
+                    for entry in it:
+                        index[entry.name] = entry.path
+            except OSError:
+                pass
+            self._dir_index[directory] = index
+        return index
+
+    def _ld_so_cache(self):
+        if self._ld_cache is None:
+            self._ld_cache = {}
+            if self.cache_file:
+                for soname, flags, path in parse_ld_so_cache(self.cache_file):
+                    self._ld_cache.setdefault(soname, []).append((flags, path))
+        return self._ld_cache
+
+    def _header(self, path):
+        """读取 ELF 类别和机器类型，非 ELF 或无法打开时返回 None"""
+        if path not in self._compat:
+            try:
+                with open(path, "rb") as f:
+                    ident = f.read(20)
+            except OSError:
+                ident = b""
+            if len(ident) == 20 and ident[:4] == b"\x7fELF" and ident[4] in (1, 2):
+                order = "<" if ident[5] == 1 else ">"
+                (machine,) = struct.unpack_from(order + "H", ident, 18)
+                self._compat[path] = (32 if ident[4] == 1 else 64, machine)
+            else:
+                self._compat[path] = None
+        return self._compat[path]
+
+    def _compatible(self, path, loader):
+        header = self._header(path)
+        return header is not None and header == (loader.elfclass, loader.machine)
+
+    # ---- 路径展开 ----
+
+    def expand_path_list(self, value, obj):
+        """把 RPATH/RUNPATH/LD_LIBRARY_PATH 字符串拆成目录列表并展开动态字符串"""
+        if value is None:
+            return []
+        lib = "lib64" if obj is None or obj.elfclass == 64 else "lib"
+        origin = obj.origin if obj is not None else os.getcwd()
+        replacements = {"ORIGIN": origin, "LIB": lib, "PLATFORM": self.platform_name}
+
+        dirs = []
+        for item in re.split("[:;]", value):
+            item = _DST_RE.sub(lambda m: replacements[m.group(2) or m.group(3)], item)
+            dirs.append(item.rstrip("/") or ("/" if item else ""))
+        return dirs
+
+    def default_dirs(self, loader):
+        if self._default_dirs is None:
+            self._default_dirs = default_library_dirs(loader.elfclass)
+        return self._default_dirs
+
+    # ---- 查找 ----
+
+    def _search_dirs(self, name, dirs, loader):
+        for directory in dirs:
+            path = self._index(directory).get(name)
+            if path is not None and self._compatible(path, loader):
+                return path
+        return None
+
+    def resolve(self, name, loader):
+        """返回 (路径, 来源)，找不到时返回 (None, None)"""
+        if "/" in name:
+            # 含 '/' 的名字按路径直接打开，不做任何搜索
+            return (name, "path") if os.path.isfile(name) else (None, None)
+
+        # 1. DT_RPATH：仅当请求者没有 DT_RUNPATH 时生效，沿加载链向上
+        if loader.runpath is None:
+            obj = loader
+            while obj is not None:
+                if obj.rpath:
+                    dirs = self.expand_path_list(obj.rpath, obj)
+                    path = self._search_dirs(name, dirs, loader)
+                    if path:
+                        return path, "RPATH"
+                obj = obj.loader
+
+        # 2. LD_LIBRARY_PATH
+        if self.ld_library_path:
+            dirs = self.expand_path_list(self.ld_library_path, None)
+            path = self._search_dirs(name, dirs, loader)
+            if path:
+                return path, "LD_LIBRARY_PATH"
+
+        # 3. DT_RUNPATH：只使用请求者自己的
+        if loader.runpath:
+            dirs = self.expand_path_list(loader.runpath, loader)
+            path = self._search_dirs(name, dirs, loader)
+            if path:
+                return path, "RUNPATH"
+
+        if loader.flags_1 & DF_1_NODEFLIB:
+            return None, None
+
+        # 4. ld.so.cache
+        expected = _CACHE_FLAGS.get((loader.elfclass, loader.machine))
+        for flags, path in self._ld_so_cache().get(name, ()):
+            if expected is not None and flags & 0xFFFF != expected:
+                continue
+            if self._compatible(path, loader):
+                return path, "ld.so.cache"
+
+        # 5. 默认目录
+        path = self._search_dirs(name, self.default_dirs(loader), loader)
+        if path:
+            return path, "default"
+        return None, None
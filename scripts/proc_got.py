@@ -0,0 +1,485 @@
+"""
+查看运行中进程的 GOT/PLT 绑定状态
+
+对 /proc/pid/maps 中的每个 ELF 对象：
+  1. 用 PT_LOAD 和映射的文件偏移算出装载偏移（proc_maps.load_bias）
+  2. 取出 JUMP_SLOT 重定位（elf_symbind.DynamicObject，含符号名和版本）
+  3. 所有对象的 GOT 区间合并成一次 RemoteMemory.read_many 读取
+  4. 逐个槽位判断：
+       lazy   - 仍是文件中的初值加装载偏移（指回本对象的 PLT），还没有调用过
+       bound  - 已指向某个映射，给出目标库和符号
+       unresolved - 值为 0：弱引用的未定义符号（__gmon_start__ 等），不会被调用
+       invalid - 指向未映射的地址
+  5. 用与 ld.so 相同顺序的作用域（主程序、LD_PRELOAD、依赖闭包，再加上
+     dlopen 的对象）判断介入：目标在 LD_PRELOAD 库中且遮蔽了其他库的同名定义，
+     或者目标与查找规则给出的提供者不一致（GOT 被改写）。dlopen 的对象有各自的
+     局部作用域，顺序无法从 maps 推出，只做 LD_PRELOAD 的判断
+
+读取目标进程需要 ptrace 权限（同一用户且 ptrace_scope 允许，或 root）。
+
+用法：
+    python proc_got.py <pid>
+    python proc_got.py <pid> --lib libc.so.6 -v
+    python proc_got.py <pid> --json
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+from collections import Counter
+
+from elf_reader import ELFError, ELFReader, is_elf_file
+from elf_symbind import BindingSimulator, SymbolScope
+from ldso_resolver import LibraryResolver
+from proc_maps import ProcMaps, load_bias
+from proc_mem import RemoteMemory
+from rich import box
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+
+console = Console()
+
+PLT_SECTIONS = (".plt", ".plt.sec", ".iplt")
+
+
+def read_environ(pid):
+    """读取目标进程的环境变量，读不到时返回空字典"""
+    try:
+        with open(f"/proc/{pid}/environ", "rb") as f:
+            data = f.read()
+    except OSError:
+        return {}
+    env = {}
+    for item in data.split(b"\0"):
+        key, sep, value = item.partition(b"=")
+        if sep:
+            env[key.decode(errors="replace")] = value.decode(errors="replace")
+    return env
+
+
+def preload_list(env):
+    """LD_PRELOAD（空格或冒号分隔）加上 /etc/ld.so.preload，与 ld.so 的顺序一致"""
+    items = env.get("LD_PRELOAD", "").replace(":", " ").split()
+    try:
+        with open("/etc/ld.so.preload") as f:
+            items += f.read().split()
+    except OSError:
+        pass
+    return items
+
+
+def mapped_file(pid, path, mappings):
+    """
+    读取映射文件用的路径。文件已被删除时（升级后仍在运行的旧版本库，
+    maps 中的路径以 " (deleted)" 结尾）用 /proc/pid/map_files 打开映射的那一份，
+    这需要 CAP_SYS_ADMIN（或 CAP_CHECKPOINT_RESTORE）
+    """
+    if not path.endswith(" (deleted)"):
+        return path
+    m = mappings[0]
+    return f"/proc/{pid}/map_files/{m.start:x}-{m.end:x}"
+
+
+class GotObject:
+    """
+    进程中的一个 ELF 对象：装载偏移、PLT 范围和 JUMP_SLOT 槽位
+    path 是 maps 中的路径，source 是实际读取的文件（见 mapped_file）
+    """
+
+    def __init__(self, path, mappings, dynobj, source=None):
+        self.path = path
+        self.source = source or path
+        self.name = os.path.basename(path)
+        self.dynobj = dynobj
+        self.word = dynobj.elfclass // 8
+        # [(r_offset, 符号名, 版本, 文件中的初值)]
+        self.slots = []
+        self.plt_ranges = []
+
+        with ELFReader(self.source) as elf:
+            self.bias = load_bias(elf.segments, mappings)
+            for name in PLT_SECTIONS:
+                section = elf.get_section_by_name(name)
+                if section is not None and section.sh_addr:
+                    self.plt_ranges.append(
+                        (section.sh_addr, section.sh_addr + section.sh_size)
+                    )
+            self.fmt = fmt = ("<" if elf.little_endian else ">") + (
+                "Q" if self.word == 8 else "I"
+            )
+            relocations = zip(dynobj.relocation_offsets, dynobj.relocations)
+            for r_offset, (_, _, kind, name, version, _) in relocations:
+                if kind != "jump_slot":
+                    continue
+                offset = elf.vaddr_to_offset(r_offset)
+                initial = (
+                    struct.unpack_from(fmt, elf.data, offset)[0]
+                    if offset is not None
+                    else None
+                )
+                self.slots.append((r_offset, name, version, initial))
+
+    def region(self):
+        """覆盖所有槽位的 (实际地址, 大小)，没有槽位时返回 None"""
+        if not self.slots or self.bias is None:
+            return None
+        low = min(slot[0] for slot in self.slots)
+        high = max(slot[0] for slot in self.slots) + self.word
+        return self.bias + low, high - low
+
+    def in_plt(self, addr):
+        rel = addr - self.bias
+        return any(start <= rel < end for start, end in self.plt_ranges)
+
+
+def build_scope(pid, objects, env, simulator):
+    """
+    按 ld.so 的顺序给进程中的对象排出全局作用域：从 /proc/pid/exe 出发的
+    广度优先闭包（包括 LD_PRELOAD），闭包之外的对象（dlopen）按地址顺序追加。
+    objects 已经通过同一个 simulator 解析，这里不会重复解析
+    """
+    preloads = preload_list(env)
+    try:
+        scope = simulator.build_scope(os.readlink(f"/proc/{pid}/exe"), preloads)
+        members, sources, missing = (
+            list(scope.objects),
+            list(scope.sources),
+            scope.missing,
+        )
+    except (OSError, ELFError):
+        members, sources, missing = [], [], []
+    known = {os.path.realpath(dynobj.path) for dynobj in members}
+    for obj in objects.values():
+        if os.path.realpath(obj.source) not in known:
+            members.append(obj.dynobj)
+            sources.append("dlopen")
+    return SymbolScope(members, sources, missing)
+
+
+class TargetSymbols:
+    """按需打开目标对象，用 .gnu.hash 查找符号的实际地址和类型，结果缓存"""
+
+    def __init__(self):
+        self._readers = {}
+        self._cache = {}
+
+    def lookup(self, obj, name):
+        key = (obj.path, name)
+        if key not in self._cache:
+            elf = self._readers.get(obj.path)
+            if elf is None:
+                elf = self._readers[obj.path] = ELFReader(obj.source)
+            sym = elf.lookup_symbol(name)
+            self._cache[key] = (
+                (obj.bias + sym.st_value, sym.type) if sym is not None else None
+            )
+        return self._cache[key]
+
+    def close(self):
+        for elf in self._readers.values():
+            elf.close()
+        self._readers = {}
+
+
+def classify(objects, scope, maps, views, symbols):
+    """
+    把读到的 GOT 内容和重定位对照，返回每个槽位的记录
+    views 是 [(GotObject, 读取的起始地址, 读到的内容)]
+    """
+    by_path = {os.path.realpath(obj.path): obj for obj in objects.values()}
+    positions = {
+        os.path.realpath(dynobj.path): pos for pos, dynobj in enumerate(scope.objects)
+    }
+    records = []
+    for obj, addr, data in views:
+        requester = positions.get(os.path.realpath(obj.source))
+        for r_offset, name, version, initial in obj.slots:
+            start = r_offset - (addr - obj.bias)
+            record = {
+                "object": obj.name,
+                "path": obj.path,
+                "got": obj.bias + r_offset,
+                "symbol": name,
+                "version": version,
+                "value": None,
+                "state": "unreadable",
+                "target": None,
+                "target_symbol": None,
+                "expected": None,
+                "interposed": None,
+                "shadowed": [],
+            }
+            records.append(record)
+
+            expected, _ = scope.lookup(name, version, requester)
+            if expected is not None:
+                record["expected"] = scope.objects[expected].name
+
+            if start + obj.word > len(data):
+                continue
+            value = struct.unpack_from(obj.fmt, data, start)[0]
+            record["value"] = value
+            if value == 0:
+                record["state"] = "unresolved"
+                continue
+            if (initial is not None and value == obj.bias + initial) or obj.in_plt(
+                value
+            ):
+                record["state"] = "lazy"
+                if expected is not None and scope.sources[expected] == "preload":
+                    record["interposed"] = "preload (pending)"
+                continue
+
+            mapping = maps.find(value)
+            target = by_path.get(os.path.realpath(mapping.path)) if mapping else None
+            if target is None:
+                record["state"] = "bound" if mapping else "invalid"
+                record["target"] = mapping.path if mapping else None
+                continue
+
+            record["state"] = "bound"
+            record["target"] = target.name
+            found = symbols.lookup(target, name)
+            if found is not None and found[0] == value:
+                record["target_symbol"] = name
+            elif found is not None and found[1] == "STT_GNU_IFUNC":
+                record["target_symbol"] = f"{name} (ifunc)"
+            else:
+                record["target_symbol"] = f"{target.name}+0x{value - target.bias:x}"
+
+            pos = positions.get(os.path.realpath(target.source))
+            if pos is not None and scope.sources[pos] == "preload":
+                shadowed = [p for p in scope.definers(name) if p != pos]
+                if shadowed:
+                    record["interposed"] = "preload"
+                    record["shadowed"] = [scope.objects[p].name for p in shadowed]
+            elif (
+                expected is not None
+                and pos != expected
+                and pos is not None
+                and "dlopen" not in (scope.sources[pos], scope.sources[requester])
+            ):
+                record["interposed"] = "unexpected target"
+    return records
+
+
+def inspect(pid, resolver=None):
+    """读取进程 pid 所有对象的 JUMP_SLOT 槽位，返回报告字典"""
+    maps = ProcMaps(pid)
+    env = read_environ(pid)
+    resolver = resolver or LibraryResolver(env.get("LD_LIBRARY_PATH", ""))
+    simulator = BindingSimulator(resolver)
+
+    objects = {}
+    errors = []
+    for path, mappings in maps.file_mappings().items():
+        source = mapped_file(pid, path, mappings)
+        try:
+            if source == path:
+                if not is_elf_file(path):
+                    continue
+            else:
+                # 已删除的文件打不开时要报告出来，不能当作非 ELF 悄悄跳过
+                with open(source, "rb") as f:
+                    if f.read(4) != b"\x7fELF":
+                        continue
+            dynobj = simulator.load(source)
+            if source != path:
+                # 显示 maps 中的名字而不是 map_files 的地址区间；已删除的对象不在
+                # 按磁盘上的文件推出的依赖闭包里，作用域中按 dlopen 的对象处理
+                dynobj.name = os.path.basename(path)
+            obj = GotObject(path, mappings, dynobj, source)
+        except (OSError, ELFError) as e:
+            errors.append({"path": path, "error": str(e)})
+            continue
+        objects[path] = obj
+    # 没有 JUMP_SLOT 的对象也参与作用域和目标查找，只是不需要读取
+    regions = {}
+    for path, obj in objects.items():
+        region = obj.region()
+        if region is not None:
+            regions[path] = region
+
+    # 所有 GOT 一次读完，目标进程内存只被访问一次
+    start = time.perf_counter()
+    with RemoteMemory(pid) as mem:
+        views = mem.read_many(list(regions.values()))
+        method, syscalls = mem.method, mem.syscalls
+    read_ms = (time.perf_counter() - start) * 1000
+
+    scope = build_scope(pid, objects, env, simulator)
+    views = [
+        (objects[path], region[0], view)
+        for (path, region), view in zip(regions.items(), views)
+    ]
+    symbols = TargetSymbols()
+    try:
+        records = classify(objects, scope, maps, views, symbols)
+    finally:
+        symbols.close()
+
+    # 按路径汇总：不同目录下的同名库（比如容器里的两份 libc）分开统计
+    summary = {}
+    for path in regions:
+        obj = objects[path]
+        summary[obj.path] = {
+            "name": obj.name,
+            "bias": obj.bias,
+            "slots": 0,
+            "bound": 0,
+            "lazy": 0,
+            "unresolved": 0,
+            "invalid": 0,
+            "unreadable": 0,
+            "interposed": 0,
+        }
+    for record in records:
+        item = summary[record["path"]]
+        item["slots"] += 1
+        item[record["state"]] += 1
+        if record["interposed"]:
+            item["interposed"] += 1
+
+    return {
+        "pid": int(pid),
+        "preload": preload_list(env),
+        "objects": summary,
+        "slots": records,
+        "errors": errors,
+        "read": {"method": method, "syscalls": syscalls, "ms": read_ms},
+    }
+
+
+def print_report(report, lib=None, verbose=False, limit=50):
+    objects = report["objects"]
+    records = report["slots"]
+    states = {}
+    for record in records:
+        states[record["state"]] = states.get(record["state"], 0) + 1
+    interposed = [r for r in records if r["interposed"]]
+    read = report["read"]
+    console.print(
+        Panel(
+            f"[bold white]GOT/PLT of process [green]{report['pid']}[/green][/bold white]\n"
+            f"Objects with JUMP_SLOT relocations: [bold]{len(objects)}[/bold]\n"
+            f"Slots: [bold]{len(records)}[/bold] "
+            + ", ".join(f"{state}={count}" for state, count in sorted(states.items()))
+            + "\n"
+            f"Interposed: [bold]{len(interposed)}[/bold]\n"
+            f"LD_PRELOAD: {' '.join(report['preload']) or '-'}\n"
+            f"GOT read with {read['method']}: {read['syscalls']} syscall(s), "
+            f"[bold yellow]{read['ms']:.2f} ms[/bold yellow]",
+            title="[bold blue]Summary[/bold blue]",
+            box=box.DOUBLE,
+        )
+    )
+    for item in report["errors"]:
+        console.print(f"[yellow][Warning] {item['path']}: {item['error']}")
+
+    # 同名的对象显示完整路径
+    names = Counter(item["name"] for item in objects.values())
+    table = Table(title="Objects", box=box.ROUNDED, header_style="bold magenta")
+    table.add_column("Object", style="green", no_wrap=True)
+    table.add_column("Load bias", style="cyan")
+    table.add_column("Slots", justify="right")
+    table.add_column("Bound", justify="right")
+    table.add_column("Lazy", justify="right")
+    table.add_column("Unresolved", justify="right")
+    table.add_column("Invalid", justify="right")
+    table.add_column("Interposed", justify="right", style="red")
+    for path, item in objects.items():
+        if lib and lib not in (item["name"], path):
+            continue
+        table.add_row(
+            item["name"] if names[item["name"]] == 1 else path,
+            f"0x{item['bias']:x}",
+            str(item["slots"]),
+            str(item["bound"]),
+            str(item["lazy"]),
+            str(item["unresolved"]),
+            str(item["invalid"] + item["unreadable"]),
+            str(item["interposed"]),
+        )
+    console.print(table)
+
+    if interposed:
+        table = Table(
+            title="Interposed functions", box=box.ROUNDED, header_style="bold magenta"
+        )
+        table.add_column("Object", style="green")
+        table.add_column("Symbol", style="yellow")
+        table.add_column("Bound to", style="red")
+        table.add_column("Instead of", style="cyan")
+        table.add_column("Kind")
+        for record in interposed[:limit]:
+            table.add_row(
+                record["object"],
+                record["symbol"],
+                record["target"] or "-",
+                ", ".join(record["shadowed"]) or record["expected"] or "-",
+                record["interposed"],
+            )
+        console.print(table)
+        if len(interposed) > limit:
+            console.print(f"[dim]... and {len(interposed) - limit} more")
+
+    if verbose or lib:
+        selected = [r for r in records if not lib or lib in (r["object"], r["path"])]
+        table = Table(title="Slots", box=box.SIMPLE, header_style="bold magenta")
+        table.add_column("Object", style="green")
+        table.add_column("GOT", style="cyan")
+        table.add_column("Symbol", style="yellow")
+        table.add_column("State")
+        table.add_column("Value", style="dim")
+        table.add_column("Target")
+        for record in selected[: limit if not verbose else None]:
+            symbol = record["symbol"]
+            if record["version"]:
+                symbol += f"@{record['version']}"
+            value = record["value"]
+            target = record["target_symbol"] or record["target"] or "-"
+            if record["target"] and record["target_symbol"]:
+                target = f"{record['target']}: {record['target_symbol']}"
+            table.add_row(
+                record["object"],
+                f"0x{record['got']:x}",
+                symbol,
+                record["state"],
+                f"0x{value:x}" if value is not None else "-",
+                target,
+            )
+        console.print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Inspect GOT/PLT bindings of a running process"
+    )
+    parser.add_argument("pid", type=int, help="Process ID")
+    parser.add_argument(
+        "--lib", help="Only show slots of this object (basename or path)"
+    )
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument(
+        "--limit", type=int, default=50, help="Maximum rows in symbol lists"
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show every slot")
+    args = parser.parse_args()
+
+    try:
+        report = inspect(args.pid)
+    except OSError as e:
+        print(f"Error: process {args.pid}: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(report))
+    else:
+        print_report(report, args.lib, args.verbose, args.limit)
+
+
+if __name__ == "__main__":
+    main()
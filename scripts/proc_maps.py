@@ -0,0 +1,140 @@
+"""
+/proc/<pid>/maps 的解析和地址区间索引
+
+一次读入整个 maps 文件，解析成按起始地址排序的映射列表，
+“某个地址落在哪个映射里”用 bisect 回答，不再每次重新扫描文件。
+对长时间运行、映射不断变化的进程，可以调用 refresh() 重新取快照。
+
+用法：
+    maps = ProcMaps(pid)
+    m = maps.find(0x7F12_3456_7000)
+    if m:
+        print(m.path, hex(m.start), m.perms)
+"""
+
+import bisect
+import os
+from collections import namedtuple
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+Mapping = namedtuple("Mapping", "start end perms offset dev inode path")
+
+
+def parse_maps(data):
+    """把 maps 文件内容（bytes）解析成 Mapping 列表，保持文件中的顺序"""
+    mappings = []
+    for line in data.splitlines():
+        fields = line.split(None, 5)
+        if len(fields) < 5:
+            continue
+        start, _, end = fields[0].partition(b"-")
+        path = fields[5].decode(errors="replace") if len(fields) > 5 else ""
+        mappings.append(
+            Mapping(
+                int(start, 16),
+                int(end, 16),
+                fields[1].decode(),
+                int(fields[2], 16),
+                fields[3].decode(),
+                int(fields[4]),
+                path,
+            )
+        )
+    return mappings
+
+
+def format_mapping(mapping):
+    """按 maps 文件的格式输出一行"""
+    return (
+        f"{mapping.start:x}-{mapping.end:x} {mapping.perms} {mapping.offset:08x} "
+        f"{mapping.dev} {mapping.inode} {mapping.path}"
+    ).rstrip()
+
+
+def load_bias(segments, mappings):
+    """
+    由 PT_LOAD 段和同一文件的映射计算装载偏移（实际地址 - p_vaddr）
+    用映射的文件偏移找到对应的段，而不是假设第一个映射就是基址：
+    映射起点 start 对应文件偏移 offset，该偏移在段内的虚拟地址是
+    p_vaddr + (offset - p_offset)。找不到对应关系时返回 None
+    """
+    loads = [seg for seg in segments if seg.p_type == "PT_LOAD"]
+    for m in mappings:
+        for seg in loads:
+            align = seg.p_offset % PAGE_SIZE
+            if seg.p_offset - align <= m.offset < seg.p_offset + max(seg.p_filesz, 1):
+                return m.start - (seg.p_vaddr + m.offset - seg.p_offset)
+    return None
+
+
+class ProcMaps:
+    """一个进程地址空间的快照，按地址排序，支持二分查找"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self._raw = None
+        self.mappings = []
+        self.starts = []
+        self.ends = []
+        self.refresh()
+
+    def refresh(self):
+        """重新读取 maps；内容没有变化时不重新解析。返回快照是否更新"""
+        with open(f"/proc/{self.pid}/maps", "rb") as f:
+            data = f.read()
+        if data == self._raw:
+            return False
+        self._raw = data
+        self.mappings = parse_maps(data)
+        # 内核按地址顺序输出，这里仍然排序一次以保证 bisect 的前提成立
+        self.mappings.sort(key=lambda m: m.start)
+        self.starts = [m.start for m in self.mappings]
+        self.ends = [m.end for m in self.mappings]
+        return True
+
+    def __len__(self):
+        return len(self.mappings)
+
+    def __iter__(self):
+        return iter(self.mappings)
+
+    def find(self, addr):
+        """返回包含 addr 的映射，没有时返回 None"""
+        i = bisect.bisect_right(self.starts, addr) - 1
+        if i >= 0 and addr < self.ends[i]:
+            return self.mappings[i]
+        return None
+
+    def find_range(self, start, end):
+        """返回与 [start, end) 有交集的所有映射"""
+        i = max(bisect.bisect_right(self.starts, start) - 1, 0)
+        result = []
+        while i < len(self.mappings) and self.starts[i] < end:
+            if self.ends[i] > start:
+                result.append(self.mappings[i])
+            i += 1
+        return result
+
+    def for_path(self, path):
+        """返回映射了 path（按真实路径比较）的所有映射，按地址排序"""
+        real = os.path.realpath(path)
+        return [m for m in self.mappings if m.path in (path, real)]
+
+    def for_file(self, path):
+        """
+        映射了 path 这个文件的所有映射，按设备号和 inode 比较，
+        不会把同名的其他文件当成它；overlayfs 等设备号对不上时退回按真实路径比较
+        """
+        st = os.stat(path)
+        dev = f"{os.major(st.st_dev):02x}:{os.minor(st.st_dev):02x}"
+        result = [m for m in self.mappings if m.inode == st.st_ino and m.dev == dev]
+        return result or self.for_path(path)
+
+    def file_mappings(self):
+        """按路径分组的文件映射：{路径: [Mapping, ...]}，匿名和伪文件（[heap] 等）除外"""
+        groups = {}
+        for m in self.mappings:
+            if m.inode and m.path.startswith("/"):
+                groups.setdefault(m.path, []).append(m)
+        return groups
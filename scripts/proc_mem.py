@@ -0,0 +1,178 @@
+"""
+批量读取另一个进程的内存
+
+优先使用 process_vm_readv（通过 ctypes 调用）：一次系统调用把多个远端区域
+直接读进本地预先分配好的缓冲区，不经过 /proc/pid/mem 的 seek + read，
+也没有中间拷贝。内核不支持或没有权限时，退化为在保持打开的
+/proc/pid/mem 上逐个区域 os.preadv。
+
+用法：
+    with RemoteMemory(pid) as mem:
+        views = mem.read_many([(addr1, size1), (addr2, size2)])
+        data = mem.read(addr, size)
+"""
+
+import ctypes
+import errno
+import os
+
+# 每次 process_vm_readv 最多传入的 iovec 数（Linux 的 IOV_MAX）
+IOV_MAX = 1024
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+def _load_process_vm_readv():
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        func = libc.process_vm_readv
+    except (OSError, AttributeError):
+        return None
+    func.argtypes = [
+        ctypes.c_int,
+        ctypes.POINTER(_IOVec),
+        ctypes.c_ulong,
+        ctypes.POINTER(_IOVec),
+        ctypes.c_ulong,
+        ctypes.c_ulong,
+    ]
+    func.restype = ctypes.c_ssize_t
+    return func
+
+
+_process_vm_readv = _load_process_vm_readv()
+
+
+class RemoteMemory:
+    """读取进程 pid 的内存，/proc/pid/mem 只打开一次并在整个生命周期内复用"""
+
+    def __init__(self, pid, use_vm_readv=True):
+        self.pid = int(pid)
+        self._vm_readv = _process_vm_readv if use_vm_readv else None
+        self._fd = None
+        self.syscalls = 0
+
+    @property
+    def method(self):
+        return "process_vm_readv" if self._vm_readv else "preadv"
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _mem_fd(self):
+        if self._fd is None:
+            self._fd = os.open(f"/proc/{self.pid}/mem", os.O_RDONLY)
+        return self._fd
+
+    # ---- process_vm_readv ----
+
+    def _vm_read_batch(self, base, regions, local_offsets):
+        """
+        用一次 process_vm_readv 读取一批区域，返回前若干个区域实际读到的字节数
+        内核在第一个不可读的远端区域处停止，返回列表的最后一项就是该区域
+        （读到的部分或 0），之后的区域由调用者在下一批重新读取
+        """
+        count = len(regions)
+        local = (_IOVec * count)()
+        remote = (_IOVec * count)()
+        for i, ((addr, size), offset) in enumerate(zip(regions, local_offsets)):
+            local[i].iov_base = base + offset
+            local[i].iov_len = size
+            remote[i].iov_base = addr
+            remote[i].iov_len = size
+
+        self.syscalls += 1
+        n = self._vm_readv(self.pid, local, count, remote, count, 0)
+        if n < 0:
+            err = ctypes.get_errno()
+            if err == errno.EFAULT:
+                return [0]
+            raise OSError(err, os.strerror(err))
+
+        result = []
+        for _, size in regions:
+            if n < size:
+                result.append(n)
+                break
+            result.append(size)
+            n -= size
+        return result
+
+    def _read_vm(self, buffer, regions, offsets):
+        base = ctypes.addressof((ctypes.c_char * len(buffer)).from_buffer(buffer))
+        lengths = []
+        while len(lengths) < len(regions):
+            i = len(lengths)
+            lengths += self._vm_read_batch(
+                base, regions[i : i + IOV_MAX], offsets[i : i + IOV_MAX]
+            )
+        return lengths
+
+    # ---- /proc/pid/mem 回退 ----
+
+    def _read_preadv(self, view, regions, offsets):
+        fd = self._mem_fd()
+        lengths = []
+        for (addr, size), offset in zip(regions, offsets):
+            self.syscalls += 1
+            try:
+                lengths.append(os.preadv(fd, [view[offset : offset + size]], addr))
+            except OSError:
+                lengths.append(0)
+        return lengths
+
+    # ---- 对外接口 ----
+
+    def read_many(self, regions, buffer=None):
+        """
+        读取多个 (地址, 大小) 区域，返回与 regions 对应的 memoryview 列表，
+        每个视图都指向同一块预分配缓冲区，长度为实际读到的字节数（不可读时为 0）
+        """
+        offsets = []
+        total = 0
+        for _, size in regions:
+            offsets.append(total)
+            total += size
+        if buffer is None:
+            buffer = bytearray(total)
+        elif len(buffer) < total:
+            raise ValueError(f"buffer too small: {len(buffer)} < {total}")
+        view = memoryview(buffer)
+
+        if not regions:
+            return []
+
+        lengths = None
+        if self._vm_readv is not None:
+            try:
+                lengths = self._read_vm(buffer, regions, offsets)
+            except OSError as e:
+                if e.errno not in (errno.ENOSYS, errno.EPERM, errno.EACCES):
+                    raise
+                # 内核不支持或 ptrace 权限不允许，改用 /proc/pid/mem
+                self._vm_readv = None
+        if lengths is None:
+            lengths = self._read_preadv(view, regions, offsets)
+
+        return [
+            view[offset : offset + length] for offset, length in zip(offsets, lengths)
+        ]
+
+    def read(self, addr, size):
+        """读取单个区域，返回 bytes；读不到完整区域时抛出 OSError"""
+        (data,) = self.read_many([(addr, size)])
+        if len(data) != size:
+            raise OSError(
+                errno.EIO, f"short read at 0x{addr:x}: {len(data)} of {size} bytes"
+            )
+        return data.tobytes()
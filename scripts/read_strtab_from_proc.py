@@ -1,94 +1,93 @@
+import argparse
 import os
+import re
 import sys
+import time
+from collections import namedtuple
 
-from elftools.elf.elffile import ELFFile
-from elftools.elf.sections import StringTableSection
+from elf_reader import ELFError, ELFReader
+from proc_maps import ProcMaps, format_mapping, load_bias
+from proc_mem import RemoteMemory
 from rich import print as rprint
 from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
 
+SHF_ALLOC = 0x2
+
 
 def find_all_strtab_sections(elffile):
     """找到所有的字符串表节"""
     strtabs = []
-    for section in elffile.iter_sections():
-        if isinstance(section, StringTableSection):
+    for section in elffile.sections:
+        if section.sh_type == "SHT_STRTAB":
             strtabs.append(section)
     return strtabs
 
 
 def find_segment_containing_offset(elffile, offset):
-    for segment in elffile.iter_segments():
-        if segment["p_type"] == "PT_LOAD":
-            start = segment["p_offset"]
-            end = start + segment["p_filesz"]
+    for segment in elffile.segments:
+        if segment.p_type == "PT_LOAD":
+            start = segment.p_offset
+            end = start + segment.p_filesz
             if start <= offset < end:
                 return segment
     return None
 
 
-def find_load_base_address(pid, binary_path):
-    """从 /proc/pid/maps 中找到二进制文件的实际加载基地址"""
+def find_load_bias(maps, binary_path, elffile):
+    """
+    从 maps 中找到二进制文件的映射（按设备号和 inode 匹配，不按文件名），
+    并用 PT_LOAD 和映射的文件偏移算出装载偏移。返回 (装载偏移, 映射列表)
+    """
     try:
-        # 获取提供路径的真实路径（解析符号链接）
-        try:
-            real_binary_path = os.path.realpath(binary_path)
-        except:
-            real_binary_path = binary_path
-
-        with open(f"/proc/{pid}/maps") as mapsf:
-            for line in mapsf:
-                fields = line.strip().split()
-                if len(fields) >= 6:
-                    maps_path = fields[5]
-                    # 检查直接匹配或者真实路径匹配
-                    if (
-                        maps_path == binary_path
-                        or maps_path == real_binary_path
-                        or os.path.basename(maps_path) == os.path.basename(binary_path)
-                    ):
-                        # 找到第一个映射，这通常是可执行段的基地址
-                        addr_range = fields[0]
-                        start_s, _ = addr_range.split("-")
-                        rprint(f"[green]Found binary in maps:[/green] {maps_path}")
-                        return int(start_s, 16)
-    except Exception as e:
-        rprint(f"[red]Error reading maps:[/red] {e}")
-    return None
+        mappings = maps.for_file(binary_path)
+    except OSError as e:
+        rprint(f"[red]Cannot stat {binary_path}:[/red] {e}")
+        return None, []
+    if not mappings:
+        return None, []
+    rprint(f"[green]Found binary in maps:[/green] {mappings[0].path}")
+    return load_bias(elffile.segments, mappings), mappings
+
+
+def strtab_address(elffile, strtab, load_bias):
+    """返回 (所在段, 相对虚拟地址, 实际虚拟地址)，不在任何 PT_LOAD 中时返回 None"""
+    segment = find_segment_containing_offset(elffile, strtab.sh_offset)
+    if not segment:
+        return None
+    # 计算字符串表的相对虚拟地址（相对于段基地址）
+    relative_vaddr = segment.p_vaddr + (strtab.sh_offset - segment.p_offset)
+    # 计算实际的虚拟地址（加上进程的实际加载基地址）
+    return segment, relative_vaddr, load_bias + relative_vaddr
 
 
-def read_mem(pid, addr, size):
-    with open(f"/proc/{pid}/mem", "rb") as memf:
-        memf.seek(addr)
-        return memf.read(size)
+def parse_cstrings(data):
+    """按 NUL 切分，最后一段没有结束符时不计入"""
+    pieces = bytes(data).split(b"\0")
+    pieces.pop()
+    return [piece.decode(errors="replace") for piece in pieces if piece]
 
 
-def parse_cstrings(data):
-    strings = []
-    current = []
-    for b in data:
-        if b == 0:
-            if current:
-                strings.append(bytes(current).decode(errors="replace"))
-                current = []
-        else:
-            current.append(b)
-    return strings
-
-
-def create_string_table_info(strtab, segment, load_base, relative_vaddr, actual_vaddr):
+def count_cstrings(data):
+    """与 parse_cstrings 的计数一致，但不解码"""
+    pieces = bytes(data).split(b"\0")
+    pieces.pop()
+    return len(pieces) - pieces.count(b"")
+
+
+def create_string_table_info(strtab, segment, load_bias, relative_vaddr, actual_vaddr):
     """创建字符串表信息表格"""
     table = Table(title=f"String Table: {strtab.name}")
     table.add_column("Property", style="cyan")
     table.add_column("Value", style="magenta")
 
     table.add_row("Section Name", strtab.name)
-    table.add_row("File Offset", f"0x{strtab['sh_offset']:x}")
-    table.add_row("Size", f"{strtab['sh_size']} bytes")
-    table.add_row("Segment p_vaddr", f"0x{segment['p_vaddr']:x}")
-    table.add_row("Segment p_offset", f"0x{segment['p_offset']:x}")
-    table.add_row("Load Base Address", f"0x{load_base:x}")
+    table.add_row("File Offset", f"0x{strtab.sh_offset:x}")
+    table.add_row("Size", f"{strtab.sh_size} bytes")
+    table.add_row("Segment p_vaddr", f"0x{segment.p_vaddr:x}")
+    table.add_row("Segment p_offset", f"0x{segment.p_offset:x}")
+    table.add_row("Load Bias", f"0x{load_bias:x}")
     table.add_row("Relative Virtual Address", f"0x{relative_vaddr:x}")
     table.add_row("Actual Virtual Address", f"0x{actual_vaddr:x}")
 
@@ -106,7 +105,7 @@ def create_strings_display(strings, section_name):
     display_strings = strings[:50] if len(strings) > 50 else strings
 
     string_text = "\n".join(
-        [f"[green]{i:3d}:[/green] {repr(s)}" for i, s in enumerate(display_strings)]
+        [f"[green]{i:3d}:[/green] {s!r}" for i, s in enumerate(display_strings)]
     )
     if len(strings) > 50:
         string_text += f"\n[yellow]... and {len(strings) - 50} more strings[/yellow]"
@@ -114,102 +113,324 @@ def create_strings_display(strings, section_name):
     return Panel(string_text, title=f"{section_name} - Strings ({len(strings)} total)")
 
 
-def main():
-    console = Console()
-
-    if len(sys.argv) != 3:
-        console.print(f"[red]Usage:[/red] {sys.argv[0]} <pid> <path_to_binary>")
-        sys.exit(1)
-
-    pid = sys.argv[1]
-    binary_path = sys.argv[2]
-
+def dump_binary(console, pid, maps, binary_path, section=None):
+    """单个二进制文件：逐个字符串表显示地址信息和内容；section 只看这个节"""
     console.print(
         Panel.fit(
             f"[bold]Reading String Tables from Process {pid}[/bold]\n[dim]Binary: {binary_path}[/dim]"
         )
     )
 
-    # 找到进程中二进制文件的实际加载基地址
-    load_base = find_load_base_address(pid, binary_path)
-    if load_base is None:
-        console.print(
-            f"[red]Could not find load base address for {binary_path} in process {pid}[/red]"
-        )
-        sys.exit(1)
+    with ELFReader(binary_path) as elffile:
+        # 找到进程中二进制文件的装载偏移
+        load_bias, _ = find_load_bias(maps, binary_path, elffile)
+        if load_bias is None:
+            console.print(
+                f"[red]Could not find load bias for {binary_path} in process {pid}[/red]"
+            )
+            sys.exit(1)
 
-    console.print(f"[green]Found load base address:[/green] 0x{load_base:x}")
+        console.print(f"[green]Found load bias:[/green] 0x{load_bias:x}")
 
-    with open(binary_path, "rb") as f:
-        elffile = ELFFile(f)
         strtabs = find_all_strtab_sections(elffile)
+        if section is not None:
+            strtabs = [strtab for strtab in strtabs if strtab.name == section]
         if not strtabs:
-            console.print("[red]No String Table sections found[/red]")
+            if section is None:
+                console.print("[red]No String Table sections found[/red]")
+            else:
+                console.print(f"[red]No String Table section named {section}[/red]")
             sys.exit(1)
 
         console.print(f"[green]Found {len(strtabs)} String Table section(s)[/green]")
 
-        for i, strtab in enumerate(strtabs):
+        # 先算出所有字符串表的地址，一次批量读取，目标进程只需被读一次
+        addresses = [strtab_address(elffile, strtab, load_bias) for strtab in strtabs]
+        regions = [
+            (address[2], strtab.sh_size)
+            for strtab, address in zip(strtabs, addresses)
+            if address is not None
+        ]
+        try:
+            with RemoteMemory(pid) as mem:
+                views = iter(mem.read_many(regions))
+        except OSError as e:
+            console.print(f"[red]Failed to read process memory: {e}[/red]")
+            sys.exit(1)
+
+        for i, (strtab, address) in enumerate(zip(strtabs, addresses)):
             console.print(
                 f"\n[bold blue]Processing String Table {i + 1}/{len(strtabs)}: {strtab.name}[/bold blue]"
             )
 
-            strtab_offset = strtab["sh_offset"]
-            strtab_size = strtab["sh_size"]
-
-            segment = find_segment_containing_offset(elffile, strtab_offset)
-            if not segment:
+            if address is None:
                 console.print(
                     f"[yellow]Warning: No PT_LOAD segment contains {strtab.name}[/yellow]"
                 )
                 continue
-
-            # 计算字符串表的相对虚拟地址（相对于段基地址）
-            relative_vaddr = segment["p_vaddr"] + (strtab_offset - segment["p_offset"])
-
-            # 计算实际的虚拟地址（加上进程的实际加载基地址）
-            actual_vaddr = load_base + relative_vaddr
+            segment, relative_vaddr, actual_vaddr = address
+            data = next(views)
 
             # 显示信息表格
             info_table = create_string_table_info(
-                strtab, segment, load_base, relative_vaddr, actual_vaddr
+                strtab, segment, load_bias, relative_vaddr, actual_vaddr
             )
             console.print(info_table)
 
             # 验证地址范围
-            with open(f"/proc/{pid}/maps") as mapsf:
-                found = False
-                for line in mapsf:
-                    fields = line.strip().split()
-                    addr_range = fields[0]
-                    start_s, end_s = addr_range.split("-")
-                    start = int(start_s, 16)
-                    end = int(end_s, 16)
-                    if start <= actual_vaddr < end:
-                        console.print(
-                            f"[green]✓ Address found in process memory map:[/green] {line.strip()}"
-                        )
-                        found = True
-                        break
-                if not found:
-                    console.print(
-                        f"[yellow]⚠ Warning: {strtab.name} virtual address not found in process memory maps.[/yellow]"
-                    )
-
-            # 读取进程内存中的字符串表数据
-            try:
-                data = read_mem(pid, actual_vaddr, strtab_size)
-                strings = parse_cstrings(data)
-
-                # 显示字符串
-                strings_panel = create_strings_display(strings, strtab.name)
-                console.print(strings_panel)
+            mapping = maps.find(actual_vaddr)
+            if mapping is not None:
+                console.print(
+                    f"[green]✓ Address found in process memory map:[/green] {format_mapping(mapping)}"
+                )
+            else:
+                console.print(
+                    f"[yellow]⚠ Warning: {strtab.name} virtual address not found in process memory maps.[/yellow]"
+                )
 
-            except Exception as e:
+            # 进程内存中的字符串表数据（上面已批量读出）
+            if len(data) != strtab.sh_size:
                 console.print(
-                    f"[red]Failed to read process memory for {strtab.name}: {e}[/red]"
+                    f"[red]Failed to read process memory for {strtab.name}: "
+                    f"read {len(data)} of {strtab.sh_size} bytes[/red]"
                 )
                 continue
+            strings = parse_cstrings(data)
+
+            # 显示字符串
+            strings_panel = create_strings_display(strings, strtab.name)
+            console.print(strings_panel)
+
+
+# ---- 整个进程：所有映射的 ELF 对象 ----
+
+MappedObject = namedtuple("MappedObject", "path name key bias strtabs")
+
+# 一批读取的字节数上限，缓冲区在批之间复用
+BATCH_BYTES = 16 << 20
+
+
+def _open_mapped_elf(pid, path, mappings):
+    """按路径打开映射的文件；文件已被删除或替换时通过 map_files 打开映射的那一份"""
+    m = mappings[0]
+    candidates = [path, f"/proc/{pid}/map_files/{m.start:x}-{m.end:x}"]
+    if path.endswith(" (deleted)"):
+        candidates.pop(0)
+    error = None
+    for candidate in candidates:
+        try:
+            return ELFReader(candidate)
+        except OSError as e:
+            error = e
+    raise error
+
+
+def loaded_strtabs(elffile):
+    """被 PT_LOAD 装入内存的字符串表：[(节名, sh_addr, 大小)]"""
+    result = []
+    for strtab in find_all_strtab_sections(elffile):
+        if not strtab.sh_flags & SHF_ALLOC or not strtab.sh_size:
+            continue
+        if find_segment_containing_offset(elffile, strtab.sh_offset) is None:
+            continue
+        result.append((strtab.name, strtab.sh_addr, strtab.sh_size))
+    return result
+
+
+def mapped_objects(pid, maps, cache=None):
+    """
+    /proc/pid/maps 中所有文件映射的 ELF 对象及其装载偏移
+    每个文件（设备号, inode）只解析一次，cache 可以在多次扫描之间复用；
+    返回 (对象列表, [(路径, 错误)])
+    """
+    if cache is None:
+        cache = {}
+    objects = []
+    errors = []
+    for path, mappings in maps.file_mappings().items():
+        key = (mappings[0].dev, mappings[0].inode)
+        info = cache.get(key)
+        if info is None:
+            try:
+                elffile = _open_mapped_elf(pid, path, mappings)
+            except ELFError:
+                info = cache[key] = False  # 不是 ELF（locale-archive 等）
+            except OSError as e:
+                errors.append((path, e))
+                continue
+            else:
+                with elffile:
+                    info = cache[key] = (elffile.segments, loaded_strtabs(elffile))
+        if not info:
+            continue
+        segments, strtabs = info
+        bias = load_bias(segments, mappings)
+        if bias is None:
+            errors.append((path, "no PT_LOAD matches the mappings"))
+            continue
+        objects.append(MappedObject(path, os.path.basename(path), key, bias, strtabs))
+    return objects, errors
+
+
+def iter_strtab_data(mem, objects, section=None, batch_bytes=BATCH_BYTES):
+    """
+    分批读取所有对象的字符串表，逐个产出 (对象, 节名, 实际地址, 内容视图)
+    每批合成一次 read_many，缓冲区复用；视图只在下一批读取之前有效
+    """
+    items = []
+    for obj in objects:
+        for name, addr, size in obj.strtabs:
+            if section is None or name == section:
+                items.append((obj, name, obj.bias + addr, size))
+
+    buffer = bytearray(min(batch_bytes, sum(item[3] for item in items)))
+    i = 0
+    while i < len(items):
+        batch = [items[i]]
+        total = items[i][3]
+        i += 1
+        while i < len(items) and total + items[i][3] <= batch_bytes:
+            total += items[i][3]
+            batch.append(items[i])
+            i += 1
+        if total > len(buffer):
+            buffer = bytearray(total)  # 单个字符串表超过批大小
+        views = mem.read_many([(addr, size) for _, _, addr, size in batch], buffer)
+        for (obj, name, addr, _), view in zip(batch, views):
+            yield obj, name, addr, view
+
+
+def search_strings(mem, objects, pattern, section=None):
+    """
+    在远端内存的字符串表中搜索正则表达式，逐个产出
+    (对象, 节名, 字符串地址, 字符串)。NUL 换成换行后用 MULTILINE 整块匹配：
+    ^ 和 $ 对应每个字符串的首尾，匹配不会跨越字符串
+    """
+    table = bytes.maketrans(b"\0", b"\n")
+    for obj, name, addr, view in iter_strtab_data(mem, objects, section):
+        text = bytes(view).translate(table)
+        last = -1
+        for m in pattern.finditer(text):
+            start = text.rfind(b"\n", 0, m.start()) + 1
+            if start == last:
+                continue  # 同一个字符串里的多处匹配只报告一次
+            last = start
+            end = text.find(b"\n", m.end())
+            if end < 0:
+                end = len(text)
+            yield obj, name, addr + start, text[start:end].decode(errors="replace")
+
+
+def dump_process(console, pid, mem, objects, section=None, verbose=False):
+    """所有对象的字符串表概览，verbose 时显示每个表的字符串"""
+    table = Table(title=f"String tables in process {pid}")
+    table.add_column("Object", style="green", no_wrap=True)
+    table.add_column("Load Bias", style="cyan")
+    table.add_column("Section", style="magenta")
+    table.add_column("Address", style="cyan")
+    table.add_column("Size", justify="right")
+    table.add_column("Strings", justify="right")
+    panels = []
+    total_bytes = total_strings = 0
+    for obj, name, addr, view in iter_strtab_data(mem, objects, section):
+        strings = parse_cstrings(view) if verbose else None
+        count = len(strings) if verbose else count_cstrings(view)
+        total_bytes += len(view)
+        total_strings += count
+        table.add_row(
+            obj.name, f"0x{obj.bias:x}", name, f"0x{addr:x}", str(len(view)), str(count)
+        )
+        if verbose:
+            panels.append(create_strings_display(strings, f"{obj.name} {name}"))
+    console.print(table)
+    for panel in panels:
+        console.print(panel)
+    console.print(
+        f"[green]{len(objects)} objects, {total_strings} strings, "
+        f"{total_bytes} bytes read[/green]"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Read string tables from the memory of a running process",
+        epilog="Without a binary, all ELF objects mapped in the process are scanned.",
+    )
+    parser.add_argument("pid", type=int, help="Process ID")
+    parser.add_argument(
+        "binary", nargs="?", help="Only this binary (default: all mapped objects)"
+    )
+    parser.add_argument(
+        "-e",
+        "--search",
+        metavar="REGEX",
+        help="Print strings matching REGEX as TSV (object, section, address, string)",
+    )
+    parser.add_argument(
+        "-i", "--ignore-case", action="store_true", help="Case-insensitive search"
+    )
+    parser.add_argument(
+        "--section", help="Only this string table section, e.g. .dynstr"
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="Show strings of every table"
+    )
+    args = parser.parse_args()
+    console = Console()
+    pid = args.pid
+
+    # maps 只读取一次，之后的地址查询都在这份快照上二分查找
+    try:
+        maps = ProcMaps(pid)
+    except OSError as e:
+        console.print(f"[red]Cannot read memory maps of process {pid}: {e}[/red]")
+        sys.exit(1)
+
+    if args.binary and not args.search:
+        dump_binary(console, pid, maps, args.binary, args.section)
+        return
+
+    start = time.perf_counter()
+    objects, errors = mapped_objects(pid, maps)
+    if args.binary:
+        try:
+            wanted = {(m.dev, m.inode) for m in maps.for_file(args.binary)}
+        except OSError as e:
+            console.print(f"[red]Cannot stat {args.binary}: {e}[/red]")
+            sys.exit(1)
+        objects = [obj for obj in objects if obj.key in wanted]
+    err = Console(stderr=True)
+    for path, error in errors:
+        err.print(f"[yellow]Warning: {path}: {error}[/yellow]")
+
+    try:
+        with RemoteMemory(pid) as mem:
+            if args.search:
+                flags = re.MULTILINE | (re.IGNORECASE if args.ignore_case else 0)
+                pattern = re.compile(args.search.encode(), flags)
+                hits = 0
+                for obj, name, addr, string in search_strings(
+                    mem, objects, pattern, args.section
+                ):
+                    print(f"{obj.name}\t{name}\t0x{addr:x}\t{string}", flush=True)
+                    hits += 1
+                summary = f"{hits} matches"
+            else:
+                dump_process(console, pid, mem, objects, args.section, args.verbose)
+                summary = "done"
+            syscalls, method = mem.syscalls, mem.method
+    except OSError as e:
+        console.print(f"[red]Failed to read process memory: {e}[/red]")
+        sys.exit(1)
+    except re.error as e:
+        console.print(f"[red]Invalid regular expression: {e}[/red]")
+        sys.exit(1)
+
+    elapsed = time.perf_counter() - start
+    err.print(
+        f"[dim]{summary} in {len(objects)} objects, {elapsed:.2f}s, "
+        f"{syscalls} {method} call(s)[/dim]"
+    )
 
 
 if __name__ == "__main__":
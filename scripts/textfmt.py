@@ -0,0 +1,30 @@
+"""
+命令行输出用的小工具：C++ 符号名还原和字节数格式化
+
+不依赖 numpy，符号化、统计之类的脚本都可以直接导入
+"""
+
+import shutil
+import subprocess
+
+
+def demangle(names):
+    """用 c++filt 一次性还原 C++ 符号名，没有 c++filt 时原样返回"""
+    tool = shutil.which("c++filt")
+    if tool is None or not names:
+        return names
+    result = subprocess.run(
+        [tool], input="\n".join(names), capture_output=True, text=True, check=False
+    )
+    out = result.stdout.splitlines()
+    return out if len(out) == len(names) else names
+
+
+def human_size(n, signed=False):
+    sign = "+" if signed and n > 0 else "-" if n < 0 else ""
+    n = abs(n)
+    for unit in ("", "Ki", "Mi", "Gi"):
+        if n < 1024 or unit == "Gi":
+            return f"{sign}{n}" if not unit else f"{sign}{n:.1f}{unit}"
+        n /= 1024
+    return f"{sign}{n}"
@@ -0,0 +1,463 @@
+#define _GNU_SOURCE
+#include <pthread.h>
+#include <sched.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/resource.h>
+#include <time.h>
+#include <unistd.h>
+
+// 分配器微基准：一个进程跑一个负载，结果以一行 JSON 打印到 stdout
+//
+// 用法：malloc_bench <负载> [-t 线程数] [-n 每线程操作数] [-s 种子] [-l 延迟采样位数]
+//
+// 负载：
+//   size_churn         每个线程持有 1024 个块，随机替换，大小在 16B~64KB 间按对数均匀分布
+//   producer_consumer  线程两两成对，一个分配、经无锁队列交给另一个释放（跨线程 free）
+//   fragmentation      交替分配小块和大块，释放全部小块后再分配放不进空洞的中等块，
+//                      每轮保留一部分长期存活的块钉住页面
+//   realloc_growth     每个线程 64 个缓冲区轮流 realloc 增长 1.5 倍，到 256KB 后释放重来
+//
+// 操作数指分配器调用次数（malloc/free/realloc 各算一次）。每 2^l 次调用计一次时
+// （默认 l=4），延迟包含一次 clock_gettime 的开销，结果中的 timer_overhead_ns 是它的估计。
+// 负载结束时各线程的块仍然存活，主线程先读 RSS 再统一释放，rss_kb 和 live_bytes
+// 是同一时刻的值，二者之比反映碎片。rss_kb/hwm_kb 是相对开始前（线程已创建、
+// 在起跑屏障前等待时）的增量，base_rss_kb 是这个基线，不让进程固定的几 MB
+// 淹没只有几十 KB 活跃数据的负载。
+
+#define SLOTS 1024
+#define QUEUE_SIZE 1024
+#define GROWTH_BUFFERS 64
+#define GROWTH_LIMIT (1 << 18)
+#define FRAG_BLOCKS 2048
+
+// 延迟直方图：0~63ns 每纳秒一格，之后每个 2 的幂区间分 16 格
+#define HIST_LINEAR 64
+#define HIST_SUB_BITS 4
+#define HIST_BUCKETS (HIST_LINEAR + (64 - 6) * (1 << HIST_SUB_BITS))
+
+typedef struct {
+  uint64_t counts[HIST_BUCKETS];
+  uint64_t samples;
+  uint64_t max;
+} latency_hist_t;
+
+// 生产者和消费者之间的单生产者单消费者队列
+typedef struct {
+  void *items[QUEUE_SIZE];
+  char pad1[64];
+  uint64_t head;  // 消费者读取的位置
+  char pad2[64];
+  uint64_t tail;  // 生产者写入的位置
+} spsc_queue_t;
+
+typedef struct {
+  int id;
+  uint64_t ops;  // 本线程要做的操作数
+  uint64_t rng;
+  uint64_t calls;
+  uint64_t sample_mask;
+  spsc_queue_t *queue;
+  void **blocks;  // 结束时仍存活的块，由主线程释放
+  size_t nblocks;
+  size_t live_bytes;
+  latency_hist_t hist;
+} thread_ctx_t;
+
+typedef void (*workload_fn)(thread_ctx_t *ctx);
+
+static pthread_barrier_t start_barrier;
+
+static inline uint64_t now_ns(void) {
+  struct timespec ts;
+  clock_gettime(CLOCK_MONOTONIC, &ts);
+  return (uint64_t)ts.tv_sec * 1000000000ull + (uint64_t)ts.tv_nsec;
+}
+
+// xorshift64*：可复现、足够快，不会成为被测对象
+static inline uint64_t next_random(thread_ctx_t *ctx) {
+  uint64_t x = ctx->rng;
+  x ^= x >> 12;
+  x ^= x << 25;
+  x ^= x >> 27;
+  ctx->rng = x;
+  return x * 0x2545F4914F6CDD1Dull;
+}
+
+// [2^lo, 2^hi) 之间按对数均匀分布的大小
+static inline size_t random_size(thread_ctx_t *ctx, int lo, int hi) {
+  uint64_t r = next_random(ctx);
+  int e = lo + (int)(r % (uint64_t)(hi - lo));
+  return ((size_t)1 << e) + ((r >> 32) & (((size_t)1 << e) - 1));
+}
+
+static inline int hist_bucket(uint64_t v) {
+  if (v < HIST_LINEAR) return (int)v;
+  int e = 63 - __builtin_clzll(v);
+  int sub = (int)(v >> (e - HIST_SUB_BITS)) & ((1 << HIST_SUB_BITS) - 1);
+  return HIST_LINEAR + (e - 6) * (1 << HIST_SUB_BITS) + sub;
+}
+
+static inline uint64_t bucket_floor(int b) {
+  if (b < HIST_LINEAR) return (uint64_t)b;
+  int e = (b - HIST_LINEAR) / (1 << HIST_SUB_BITS) + 6;
+  int sub = (b - HIST_LINEAR) % (1 << HIST_SUB_BITS);
+  return ((uint64_t)1 << e) + ((uint64_t)sub << (e - HIST_SUB_BITS));
+}
+
+static inline void hist_record(latency_hist_t *h, uint64_t ns) {
+  h->counts[hist_bucket(ns)]++;
+  h->samples++;
+  if (ns > h->max) h->max = ns;
+}
+
+// 执行一次分配器调用；每 2^l 次计一次时
+#define TIMED(ctx, stmt)                          \
+  do {                                            \
+    if ((++(ctx)->calls & (ctx)->sample_mask)) {  \
+      stmt;                                       \
+    } else {                                      \
+      uint64_t t0_ = now_ns();                    \
+      stmt;                                       \
+      hist_record(&(ctx)->hist, now_ns() - t0_);  \
+    }                                             \
+  } while (0)
+
+static size_t page_size;
+
+// 块的每一页写一个字节，让分配器拿到的页真正被使用（与 replay_oplog -T 2 相同）
+static inline void touch(void *p, size_t size) {
+  if (!p || !size) return;
+  for (size_t off = 0; off < size; off += page_size) ((volatile char *)p)[off] = 1;
+  ((volatile char *)p)[size - 1] = 1;
+}
+
+static void keep_blocks(thread_ctx_t *ctx, void **blocks, size_t n,
+                        size_t live_bytes) {
+  ctx->blocks = blocks;
+  ctx->nblocks = n;
+  ctx->live_bytes = live_bytes;
+}
+
+// ---- 负载 ----
+
+static void size_churn(thread_ctx_t *ctx) {
+  void **slots = calloc(SLOTS, sizeof(void *));
+  size_t *sizes = calloc(SLOTS, sizeof(size_t));
+  size_t live = 0;
+  while (ctx->calls < ctx->ops) {
+    size_t k = next_random(ctx) % SLOTS;
+    if (slots[k]) {
+      TIMED(ctx, free(slots[k]));
+      live -= sizes[k];
+    }
+    size_t size = random_size(ctx, 4, 16);
+    TIMED(ctx, slots[k] = malloc(size));
+    touch(slots[k], size);
+    sizes[k] = size;
+    live += size;
+  }
+  free(sizes);
+  keep_blocks(ctx, slots, SLOTS, live);
+}
+
+static void producer(thread_ctx_t *ctx) {
+  spsc_queue_t *q = ctx->queue;
+  for (uint64_t i = 0; i < ctx->ops; i++) {
+    size_t size = random_size(ctx, 4, 10);
+    void *p;
+    TIMED(ctx, p = malloc(size));
+    touch(p, size);
+    uint64_t tail = q->tail;
+    while (tail - __atomic_load_n(&q->head, __ATOMIC_ACQUIRE) == QUEUE_SIZE) {
+      sched_yield();
+    }
+    q->items[tail % QUEUE_SIZE] = p;
+    __atomic_store_n(&q->tail, tail + 1, __ATOMIC_RELEASE);
+  }
+}
+
+static void consumer(thread_ctx_t *ctx) {
+  spsc_queue_t *q = ctx->queue;
+  for (uint64_t i = 0; i < ctx->ops; i++) {
+    uint64_t head = q->head;
+    while (__atomic_load_n(&q->tail, __ATOMIC_ACQUIRE) == head) {
+      sched_yield();
+    }
+    void *p = q->items[head % QUEUE_SIZE];
+    __atomic_store_n(&q->head, head + 1, __ATOMIC_RELEASE);
+    TIMED(ctx, free(p));
+  }
+}
+
+// 偶数号线程生产、奇数号线程消费，共用同一个队列
+static void producer_consumer(thread_ctx_t *ctx) {
+  if (ctx->id % 2 == 0) {
+    producer(ctx);
+  } else {
+    consumer(ctx);
+  }
+}
+
+static void fragmentation(thread_ctx_t *ctx) {
+  size_t cap = FRAG_BLOCKS;
+  size_t kept = 0;
+  size_t kept_bytes = 0;
+  void **keep = malloc(cap * sizeof(void *));
+  void *small[FRAG_BLOCKS], *large[FRAG_BLOCKS];
+  size_t small_size[FRAG_BLOCKS], large_size[FRAG_BLOCKS];
+
+  while (ctx->calls < ctx->ops) {
+    // 小块和大块交替分配，在堆里交错排列
+    for (int i = 0; i < FRAG_BLOCKS; i++) {
+      small_size[i] = random_size(ctx, 5, 8);
+      TIMED(ctx, small[i] = malloc(small_size[i]));
+      touch(small[i], small_size[i]);
+      large_size[i] = random_size(ctx, 10, 14);
+      TIMED(ctx, large[i] = malloc(large_size[i]));
+      touch(large[i], large_size[i]);
+    }
+    // 释放全部小块，留下一堆放不下中等块的空洞；每 16 个小块留一个长期存活
+    for (int i = 0; i < FRAG_BLOCKS; i++) {
+      if (i % 16 == 0) {
+        if (kept == cap) {
+          cap *= 2;
+          keep = realloc(keep, cap * sizeof(void *));
+        }
+        keep[kept++] = small[i];
+        kept_bytes += small_size[i];
+      } else {
+        TIMED(ctx, free(small[i]));
+      }
+    }
+    // 中等块比小块的空洞大，只能从新的内存分配
+    for (int i = 0; i < FRAG_BLOCKS; i++) {
+      size_t size = random_size(ctx, 8, 10);
+      TIMED(ctx, small[i] = malloc(size));
+      touch(small[i], size);
+      small_size[i] = size;
+    }
+    // 释放大块和中等块，只剩长期存活的块
+    for (int i = 0; i < FRAG_BLOCKS; i++) {
+      TIMED(ctx, free(large[i]));
+      TIMED(ctx, free(small[i]));
+    }
+  }
+  keep_blocks(ctx, keep, kept, kept_bytes);
+}
+
+static void realloc_growth(thread_ctx_t *ctx) {
+  void **buffers = calloc(GROWTH_BUFFERS, sizeof(void *));
+  size_t sizes[GROWTH_BUFFERS];
+  size_t live = 0;
+  for (int i = 0; i < GROWTH_BUFFERS; i++) sizes[i] = 0;
+
+  while (ctx->calls < ctx->ops) {
+    for (int i = 0; i < GROWTH_BUFFERS && ctx->calls < ctx->ops; i++) {
+      if (sizes[i] >= GROWTH_LIMIT) {
+        TIMED(ctx, free(buffers[i]));
+        live -= sizes[i];
+        buffers[i] = NULL;
+        sizes[i] = 0;
+      }
+      // 从 16 字节起每次增长约 1.5 倍，加一点随机量避免总是同一组大小
+      size_t size = sizes[i] ? sizes[i] + sizes[i] / 2 + next_random(ctx) % 64
+                             : 16;
+      void *p;
+      TIMED(ctx, p = realloc(buffers[i], size));
+      if (!p) continue;
+      touch(p, size);
+      live += size - sizes[i];
+      buffers[i] = p;
+      sizes[i] = size;
+    }
+  }
+  keep_blocks(ctx, buffers, GROWTH_BUFFERS, live);
+}
+
+static const struct {
+  const char *name;
+  workload_fn fn;
+  int paired;  // 线程数必须是偶数
+} workloads[] = {
+    {"size_churn", size_churn, 0},
+    {"producer_consumer", producer_consumer, 1},
+    {"fragmentation", fragmentation, 0},
+    {"realloc_growth", realloc_growth, 0},
+};
+
+// ---- 运行和报告 ----
+
+static workload_fn current_workload;
+
+static void *thread_main(void *arg) {
+  thread_ctx_t *ctx = arg;
+  pthread_barrier_wait(&start_barrier);
+  current_workload(ctx);
+  return NULL;
+}
+
+// 从 /proc/self/status 读取一个 kB 为单位的字段
+static long status_kb(const char *field) {
+  FILE *f = fopen("/proc/self/status", "r");
+  if (!f) return -1;
+  char line[256];
+  long value = -1;
+  size_t len = strlen(field);
+  while (fgets(line, sizeof(line), f)) {
+    if (strncmp(line, field, len) == 0 && line[len] == ':') {
+      value = strtol(line + len + 1, NULL, 10);
+      break;
+    }
+  }
+  fclose(f);
+  return value;
+}
+
+// 两次 clock_gettime 之间的最小间隔，作为计时本身的开销
+static uint64_t timer_overhead(void) {
+  uint64_t best = UINT64_MAX;
+  for (int i = 0; i < 1000; i++) {
+    uint64_t t0 = now_ns();
+    uint64_t t1 = now_ns();
+    if (t1 - t0 < best) best = t1 - t0;
+  }
+  return best;
+}
+
+// 在所在的桶内按排名线性插值；只取桶下界会让 p50/p99 系统性偏低（最多差一个桶宽）
+static uint64_t percentile(const latency_hist_t *h, double q) {
+  if (!h->samples) return 0;
+  uint64_t rank = (uint64_t)(q * (double)(h->samples - 1));
+  uint64_t seen = 0;
+  for (int b = 0; b < HIST_BUCKETS; b++) {
+    if (seen + h->counts[b] > rank) {
+      uint64_t low = bucket_floor(b);
+      uint64_t high = b + 1 < HIST_BUCKETS ? bucket_floor(b + 1) : h->max + 1;
+      double within = ((double)(rank - seen) + 0.5) / (double)h->counts[b];
+      uint64_t value = low + (uint64_t)((double)(high - low) * within);
+      return value < h->max ? value : h->max;
+    }
+    seen += h->counts[b];
+  }
+  return h->max;
+}
+
+static double timeval_s(struct timeval tv) {
+  return (double)tv.tv_sec + (double)tv.tv_usec / 1e6;
+}
+
+static void usage(const char *prog) {
+  fprintf(stderr, "Usage: %s <workload> [-t threads] [-n ops] [-s seed] [-l shift]\n",
+          prog);
+  fprintf(stderr, "Workloads:");
+  for (size_t i = 0; i < sizeof(workloads) / sizeof(workloads[0]); i++) {
+    fprintf(stderr, " %s", workloads[i].name);
+  }
+  fprintf(stderr, "\n");
+  exit(2);
+}
+
+int main(int argc, char **argv) {
+  if (argc < 2) usage(argv[0]);
+  int w = -1;
+  for (size_t i = 0; i < sizeof(workloads) / sizeof(workloads[0]); i++) {
+    if (strcmp(argv[1], workloads[i].name) == 0) w = (int)i;
+  }
+  if (w < 0) usage(argv[0]);
+
+  int threads = 1;
+  uint64_t ops = 1000000;
+  uint64_t seed = 1;
+  int shift = 4;
+  int opt;
+  optind = 2;
+  while ((opt = getopt(argc, argv, "t:n:s:l:")) != -1) {
+    switch (opt) {
+      case 't':
+        threads = atoi(optarg);
+        break;
+      case 'n':
+        ops = strtoull(optarg, NULL, 0);
+        break;
+      case 's':
+        seed = strtoull(optarg, NULL, 0);
+        break;
+      case 'l':
+        shift = atoi(optarg);
+        break;
+      default:
+        usage(argv[0]);
+    }
+  }
+  if (threads < 1) threads = 1;
+  if (workloads[w].paired && threads % 2) threads++;
+  if (shift < 0 || shift > 30) shift = 4;
+
+  page_size = (size_t)sysconf(_SC_PAGESIZE);
+  uint64_t overhead = timer_overhead();
+  thread_ctx_t *ctxs = calloc(threads, sizeof(thread_ctx_t));
+  spsc_queue_t *queues = calloc((threads + 1) / 2, sizeof(spsc_queue_t));
+  pthread_t *tids = calloc(threads, sizeof(pthread_t));
+  for (int i = 0; i < threads; i++) {
+    ctxs[i].id = i;
+    ctxs[i].ops = ops;
+    ctxs[i].rng = (seed * 0x9E3779B97F4A7C15ull) ^ ((uint64_t)(i + 1) << 32) ^ 1;
+    ctxs[i].sample_mask = ((uint64_t)1 << shift) - 1;
+    ctxs[i].queue = &queues[i / 2];
+  }
+
+  current_workload = workloads[w].fn;
+  pthread_barrier_init(&start_barrier, NULL, threads + 1);
+  for (int i = 0; i < threads; i++) {
+    pthread_create(&tids[i], NULL, thread_main, &ctxs[i]);
+  }
+  struct rusage before, after;
+  long base_rss_kb = status_kb("VmRSS");
+  getrusage(RUSAGE_SELF, &before);
+  pthread_barrier_wait(&start_barrier);
+  uint64_t start = now_ns();
+  for (int i = 0; i < threads; i++) pthread_join(tids[i], NULL);
+  uint64_t elapsed = now_ns() - start;
+  getrusage(RUSAGE_SELF, &after);
+  long rss_kb = status_kb("VmRSS") - base_rss_kb;
+  long hwm_kb = status_kb("VmHWM") - base_rss_kb;
+
+  latency_hist_t *total = calloc(1, sizeof(latency_hist_t));
+  uint64_t calls = 0;
+  size_t live_bytes = 0;
+  for (int i = 0; i < threads; i++) {
+    latency_hist_t *h = &ctxs[i].hist;
+    for (int b = 0; b < HIST_BUCKETS; b++) total->counts[b] += h->counts[b];
+    total->samples += h->samples;
+    if (h->max > total->max) total->max = h->max;
+    calls += ctxs[i].calls;
+    live_bytes += ctxs[i].live_bytes;
+    for (size_t k = 0; k < ctxs[i].nblocks; k++) free(ctxs[i].blocks[k]);
+    free(ctxs[i].blocks);
+  }
+
+  double seconds = (double)elapsed / 1e9;
+  printf(
+      "{\"workload\": \"%s\", \"threads\": %d, \"ops\": %lu, \"seconds\": %.6f, "
+      "\"ops_per_sec\": %.1f, \"latency_ns\": {\"samples\": %lu, \"p50\": %lu, "
+      "\"p90\": %lu, \"p99\": %lu, \"p999\": %lu, \"max\": %lu}, "
+      "\"timer_overhead_ns\": %lu, \"live_bytes\": %zu, \"rss_kb\": %ld, "
+      "\"hwm_kb\": %ld, \"base_rss_kb\": %ld, \"minor_faults\": %ld, "
+      "\"major_faults\": %ld, "
+      "\"user_s\": %.6f, \"sys_s\": %.6f, \"voluntary_ctxsw\": %ld, "
+      "\"involuntary_ctxsw\": %ld}\n",
+      workloads[w].name, threads, (unsigned long)calls, seconds,
+      seconds > 0 ? (double)calls / seconds : 0.0,
+      (unsigned long)total->samples, (unsigned long)percentile(total, 0.5),
+      (unsigned long)percentile(total, 0.9), (unsigned long)percentile(total, 0.99),
+      (unsigned long)percentile(total, 0.999), (unsigned long)total->max,
+      (unsigned long)overhead, live_bytes, rss_kb, hwm_kb, base_rss_kb,
+      after.ru_minflt - before.ru_minflt, after.ru_majflt - before.ru_majflt,
+      timeval_s(after.ru_utime) - timeval_s(before.ru_utime),
+      timeval_s(after.ru_stime) - timeval_s(before.ru_stime),
+      after.ru_nvcsw - before.ru_nvcsw, after.ru_nivcsw - before.ru_nivcsw);
+  return 0;
+}
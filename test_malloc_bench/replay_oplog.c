@@ -0,0 +1,386 @@
+#define _GNU_SOURCE
+#include <fcntl.h>
+#include <pthread.h>
+#include <sched.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/mman.h>
+#include <sys/resource.h>
+#include <sys/stat.h>
+#include <time.h>
+#include <unistd.h>
+
+// 重放 replay_trace.py convert 生成的操作日志，结果以一行 JSON 打印到 stdout
+//
+// 用法：replay_oplog <操作日志> [-p 节奏倍数] [-i 采样间隔毫秒] [-T 0|1|2]
+//
+// 日志中的指针已经换成了槽位号，每个原始线程的操作连续存放。重放时每个原始线程
+// 对应一个线程，按原来的顺序调用 malloc/calloc/realloc/free。
+// 槽位会被不同线程先后重用，每条记录带着它在槽位上的轮次（放入、取走各算一轮），
+// 操作要等槽位轮到自己：释放等分配它的线程放入，分配等上一个占用者被释放。
+// 轮次按转换时的时间顺序编号，等待的总是时间上更早的操作，不会死锁。
+//
+// -p 0（默认）尽快重放；-p 1 按记录下来的间隔重放，-p 0.5 以两倍速重放。
+// -T 控制新分配内存的写入：0 不写，1 只写首字节，2（默认）每页写一个字节，
+// 和真实程序一样让 RSS 随使用增长。
+// 采样线程每隔 -i 毫秒（默认 10）读取 RssAnon（不含映射进来的操作日志本身）和
+// 各线程当前存活的字节数，报告 RSS 峰值、峰值时的存活字节数和平均的
+// RSS/存活字节比（碎片）。RSS 都减去了开始前（线程已创建）的 RssAnon，
+// 即 base_rss_kb，只算重放带来的增长；hwm_kb 是进程的 VmHWM 原值。
+
+#define OPLOG_MAGIC "OPLOG\0\0\0"
+#define OPLOG_VERSION 1
+#define NO_SLOT 0xFFFFFFFFu
+
+enum { OP_MALLOC = 0, OP_CALLOC = 1, OP_REALLOC = 2, OP_FREE = 3 };
+
+typedef struct {
+  char magic[8];
+  uint32_t version;
+  uint32_t record_size;
+  uint32_t threads;
+  uint32_t flags;
+  uint64_t slots;
+  uint64_t records;
+  uint64_t duration_ns;
+  uint64_t peak_live_bytes;
+  uint64_t end_live_bytes;
+} oplog_header_t;
+
+typedef struct {
+  uint32_t tid;
+  uint32_t reserved;
+  uint64_t first;
+  uint64_t count;
+} oplog_thread_t;
+
+typedef struct {
+  uint64_t size;
+  uint32_t slot;
+  uint32_t old_slot;
+  uint32_t turn;      // 本操作在 slot 上的轮次
+  uint32_t old_turn;  // realloc 取走 old_slot 的轮次
+  uint32_t gap_ns;    // 与同一线程上一个操作的间隔
+  uint16_t op;
+  uint16_t flags;
+} oplog_record_t;
+
+_Static_assert(sizeof(oplog_header_t) == 64, "header layout");
+_Static_assert(sizeof(oplog_thread_t) == 24, "thread layout");
+_Static_assert(sizeof(oplog_record_t) == 32, "record layout");
+
+typedef struct {
+  const oplog_thread_t *info;
+  const oplog_record_t *records;
+  uint64_t elapsed_ns;
+  uint64_t waits;  // 等待其他线程的次数
+  // 当前存活字节数，由采样线程读取；独占缓存行，避免线程间互相干扰
+  __attribute__((aligned(64))) int64_t live_bytes;
+} replay_thread_t;
+
+typedef struct {
+  void *ptr;
+  size_t size;
+  uint32_t turn;  // 已经完成的操作数
+} slot_t;
+
+static slot_t *slots;
+static double pace = 0;
+static int touch_mode = 2;
+static long page_size;
+static pthread_barrier_t start_barrier;
+static int replay_done;
+
+static inline uint64_t now_ns(void) {
+  struct timespec ts;
+  clock_gettime(CLOCK_MONOTONIC, &ts);
+  return (uint64_t)ts.tv_sec * 1000000000ull + (uint64_t)ts.tv_nsec;
+}
+
+static void touch(char *p, size_t from, size_t to) {
+  if (!p || to <= from || touch_mode == 0) return;
+  if (touch_mode == 1) {
+    p[from] = 1;
+    return;
+  }
+  for (size_t off = from; off < to; off += page_size) p[off] = 1;
+  p[to - 1] = 1;
+}
+
+// 等到槽位轮到 turn；单核上别的线程要靠让出 CPU 才能推进
+static slot_t *wait_turn(replay_thread_t *t, uint32_t slot, uint32_t turn) {
+  slot_t *s = &slots[slot];
+  int spins = 0;
+  while (__atomic_load_n(&s->turn, __ATOMIC_ACQUIRE) != turn) {
+    if (spins++ == 0) t->waits++;
+    if (spins > 64) sched_yield();
+  }
+  return s;
+}
+
+static void *take_slot(replay_thread_t *t, uint32_t slot, uint32_t turn,
+                       size_t *size) {
+  slot_t *s = wait_turn(t, slot, turn);
+  void *p = s->ptr;
+  *size = s->size;
+  __atomic_store_n(&s->turn, turn + 1, __ATOMIC_RELEASE);
+  return p;
+}
+
+static void put_slot(replay_thread_t *t, uint32_t slot, uint32_t turn, void *p,
+                     size_t size) {
+  slot_t *s = wait_turn(t, slot, turn);
+  s->ptr = p;
+  s->size = size;
+  __atomic_store_n(&s->turn, turn + 1, __ATOMIC_RELEASE);
+}
+
+static void wait_gap(uint64_t deadline) {
+  uint64_t now = now_ns();
+  if (deadline > now + 100000) {
+    struct timespec ts = {0, (long)(deadline - now - 50000)};
+    nanosleep(&ts, NULL);
+  }
+  while (now_ns() < deadline) {
+  }
+}
+
+static void *replay_thread(void *arg) {
+  replay_thread_t *t = arg;
+  pthread_barrier_wait(&start_barrier);
+  uint64_t start = now_ns();
+  uint64_t deadline = start;
+
+  for (uint64_t i = 0; i < t->info->count; i++) {
+    const oplog_record_t *r = &t->records[i];
+    if (pace > 0) {
+      deadline += (uint64_t)(r->gap_ns * pace);
+      wait_gap(deadline);
+    }
+    void *p;
+    size_t old_size;
+    switch (r->op) {
+      case OP_MALLOC:
+        p = malloc(r->size);
+        touch(p, 0, r->size);
+        put_slot(t, r->slot, r->turn, p, r->size);
+        __atomic_store_n(&t->live_bytes, t->live_bytes + (int64_t)r->size,
+                         __ATOMIC_RELAXED);
+        break;
+      case OP_CALLOC:
+        p = calloc(1, r->size);
+        touch(p, 0, r->size);
+        put_slot(t, r->slot, r->turn, p, r->size);
+        __atomic_store_n(&t->live_bytes, t->live_bytes + (int64_t)r->size,
+                         __ATOMIC_RELAXED);
+        break;
+      case OP_REALLOC:
+        p = take_slot(t, r->old_slot, r->old_turn, &old_size);
+        p = realloc(p, r->size);
+        if (!p) {
+          fprintf(stderr, "realloc(%lu) failed\n", (unsigned long)r->size);
+          exit(1);
+        }
+        touch(p, old_size < r->size ? old_size : r->size, r->size);
+        put_slot(t, r->slot, r->turn, p, r->size);
+        __atomic_store_n(&t->live_bytes,
+                         t->live_bytes + (int64_t)r->size - (int64_t)old_size,
+                         __ATOMIC_RELAXED);
+        break;
+      case OP_FREE:
+        p = take_slot(t, r->slot, r->turn, &old_size);
+        free(p);
+        __atomic_store_n(&t->live_bytes, t->live_bytes - (int64_t)old_size,
+                         __ATOMIC_RELAXED);
+        break;
+    }
+  }
+  t->elapsed_ns = now_ns() - start;
+  return NULL;
+}
+
+// ---- RSS 采样 ----
+
+typedef struct {
+  replay_thread_t *threads;
+  uint32_t nthreads;
+  long interval_ms;
+  long base_rss_kb;  // 开始前的 RssAnon
+  long peak_rss_kb;
+  int64_t live_at_peak;
+  double ratio_sum;  // Σ RSS/存活字节
+  uint64_t ratio_samples;
+  uint64_t samples;
+} sampler_t;
+
+// 从 /proc/self/status 读取一个 kB 为单位的字段；用 read 而不是 stdio，
+// 采样线程不经过被测分配器
+static long status_kb(const char *field) {
+  char buf[4096];
+  int fd = open("/proc/self/status", O_RDONLY | O_CLOEXEC);
+  if (fd < 0) return -1;
+  ssize_t n = read(fd, buf, sizeof(buf) - 1);
+  close(fd);
+  if (n <= 0) return -1;
+  buf[n] = 0;
+  size_t len = strlen(field);
+  for (char *line = buf; line && *line; line = strchr(line, '\n')) {
+    if (*line == '\n') line++;
+    if (strncmp(line, field, len) == 0 && line[len] == ':') {
+      return strtol(line + len + 1, NULL, 10);
+    }
+  }
+  return -1;
+}
+
+static int64_t total_live(const sampler_t *s) {
+  int64_t live = 0;
+  for (uint32_t i = 0; i < s->nthreads; i++) {
+    live += __atomic_load_n(&s->threads[i].live_bytes, __ATOMIC_RELAXED);
+  }
+  return live;
+}
+
+static void sample(sampler_t *s) {
+  long rss = status_kb("RssAnon") - s->base_rss_kb;
+  int64_t live = total_live(s);
+  s->samples++;
+  if (rss > s->peak_rss_kb) {
+    s->peak_rss_kb = rss;
+    s->live_at_peak = live;
+  }
+  // 存活字节很少时比值没有意义（主要是程序本身的 RSS）
+  if (live > 1 << 20) {
+    s->ratio_sum += (double)rss * 1024 / (double)live;
+    s->ratio_samples++;
+  }
+}
+
+static void *sampler_thread(void *arg) {
+  sampler_t *s = arg;
+  struct timespec ts = {s->interval_ms / 1000, (s->interval_ms % 1000) * 1000000};
+  while (!__atomic_load_n(&replay_done, __ATOMIC_ACQUIRE)) {
+    sample(s);
+    nanosleep(&ts, NULL);
+  }
+  return NULL;
+}
+
+static void usage(const char *prog) {
+  fprintf(stderr, "Usage: %s <oplog> [-p pace] [-i interval_ms] [-T 0|1|2]\n", prog);
+  exit(2);
+}
+
+int main(int argc, char **argv) {
+  long interval_ms = 10;
+  int opt;
+  while ((opt = getopt(argc, argv, "p:i:T:")) != -1) {
+    switch (opt) {
+      case 'p':
+        pace = atof(optarg);
+        break;
+      case 'i':
+        interval_ms = atol(optarg);
+        break;
+      case 'T':
+        touch_mode = atoi(optarg);
+        break;
+      default:
+        usage(argv[0]);
+    }
+  }
+  if (optind >= argc) usage(argv[0]);
+  if (interval_ms < 1) interval_ms = 1;
+  page_size = sysconf(_SC_PAGESIZE);
+
+  int fd = open(argv[optind], O_RDONLY | O_CLOEXEC);
+  struct stat st;
+  if (fd < 0 || fstat(fd, &st) != 0 || (size_t)st.st_size < sizeof(oplog_header_t)) {
+    fprintf(stderr, "cannot read %s\n", argv[optind]);
+    return 1;
+  }
+  const char *data = mmap(NULL, st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+  if (data == MAP_FAILED) {
+    fprintf(stderr, "cannot map %s\n", argv[optind]);
+    return 1;
+  }
+  const oplog_header_t *h = (const oplog_header_t *)data;
+  size_t threads_end = sizeof(*h) + (size_t)h->threads * sizeof(oplog_thread_t);
+  if (memcmp(h->magic, OPLOG_MAGIC, 8) != 0 || h->version != OPLOG_VERSION ||
+      h->record_size != sizeof(oplog_record_t) ||
+      threads_end + h->records * sizeof(oplog_record_t) > (size_t)st.st_size) {
+    fprintf(stderr, "%s: not a version %d op log\n", argv[optind], OPLOG_VERSION);
+    return 1;
+  }
+  const oplog_thread_t *infos = (const oplog_thread_t *)(data + sizeof(*h));
+  const oplog_record_t *records = (const oplog_record_t *)(data + threads_end);
+
+  // 槽位表也经由被测分配器分配，和真实程序中的指针数组一样
+  slots = calloc(h->slots ? h->slots : 1, sizeof(slot_t));
+  replay_thread_t *threads = aligned_alloc(64, sizeof(replay_thread_t) * (h->threads + 1));
+  memset(threads, 0, sizeof(replay_thread_t) * (h->threads + 1));
+  pthread_t *tids = calloc(h->threads + 1, sizeof(pthread_t));
+  for (uint32_t i = 0; i < h->threads; i++) {
+    if (infos[i].first + infos[i].count > h->records) {
+      fprintf(stderr, "%s: corrupt thread table\n", argv[optind]);
+      return 1;
+    }
+    threads[i].info = &infos[i];
+    threads[i].records = records + infos[i].first;
+  }
+
+  sampler_t sampler = {threads, h->threads, interval_ms, 0, 0, 0, 0, 0, 0};
+  pthread_t sampler_tid;
+  pthread_barrier_init(&start_barrier, NULL, h->threads + 1);
+  for (uint32_t i = 0; i < h->threads; i++) {
+    if (pthread_create(&tids[i], NULL, replay_thread, &threads[i]) != 0) {
+      fprintf(stderr, "cannot create thread %u\n", i);
+      return 1;
+    }
+  }
+  sampler.base_rss_kb = status_kb("RssAnon");
+  pthread_create(&sampler_tid, NULL, sampler_thread, &sampler);
+  struct rusage before, after;
+  getrusage(RUSAGE_SELF, &before);
+  pthread_barrier_wait(&start_barrier);
+  uint64_t start = now_ns();
+  for (uint32_t i = 0; i < h->threads; i++) pthread_join(tids[i], NULL);
+  uint64_t elapsed = now_ns() - start;
+  __atomic_store_n(&replay_done, 1, __ATOMIC_RELEASE);
+  pthread_join(sampler_tid, NULL);
+  sample(&sampler);  // 结束时存活的块都还在
+  getrusage(RUSAGE_SELF, &after);
+
+  double seconds = (double)elapsed / 1e9;
+  long rss_kb = status_kb("RssAnon") - sampler.base_rss_kb;
+  int64_t live = total_live(&sampler);
+  printf("{\"records\": %lu, \"threads\": %u, \"seconds\": %.6f, \"ops_per_sec\": %.1f, "
+         "\"pace\": %g, \"trace_seconds\": %.6f, \"base_rss_kb\": %ld, \"rss_kb\": %ld, "
+         "\"hwm_kb\": %ld, \"peak_rss_kb\": %ld, \"live_bytes\": %ld, "
+         "\"live_at_peak_rss\": %ld, \"trace_peak_live_bytes\": %lu, "
+         "\"mean_rss_over_live\": %.3f, "
+         "\"rss_samples\": %lu, \"minor_faults\": %ld, \"major_faults\": %ld, "
+         "\"user_s\": %.6f, \"sys_s\": %.6f, \"per_thread\": [",
+         (unsigned long)h->records, h->threads, seconds,
+         seconds > 0 ? (double)h->records / seconds : 0.0, pace,
+         (double)h->duration_ns / 1e9, sampler.base_rss_kb, rss_kb, status_kb("VmHWM"),
+         sampler.peak_rss_kb,
+         (long)live, (long)sampler.live_at_peak, (unsigned long)h->peak_live_bytes,
+         sampler.ratio_samples ? sampler.ratio_sum / sampler.ratio_samples : 0.0,
+         (unsigned long)sampler.samples, after.ru_minflt - before.ru_minflt,
+         after.ru_majflt - before.ru_majflt,
+         (after.ru_utime.tv_sec - before.ru_utime.tv_sec) +
+             (after.ru_utime.tv_usec - before.ru_utime.tv_usec) / 1e6,
+         (after.ru_stime.tv_sec - before.ru_stime.tv_sec) +
+             (after.ru_stime.tv_usec - before.ru_stime.tv_usec) / 1e6);
+  for (uint32_t i = 0; i < h->threads; i++) {
+    const replay_thread_t *t = &threads[i];
+    printf("%s{\"tid\": %u, \"ops\": %lu, \"seconds\": %.6f, \"waits\": %lu}",
+           i ? ", " : "", t->info->tid, (unsigned long)t->info->count,
+           t->elapsed_ns / 1e9, (unsigned long)t->waits);
+  }
+  printf("]}\n");
+  return 0;
+}
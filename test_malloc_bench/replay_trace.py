@@ -0,0 +1,535 @@
+"""
+用真实程序的分配序列比较分配器：录制 -> 转换 -> 重放
+
+1. 录制：用 advanced_preload 的二进制跟踪模式运行服务，记录每次
+   malloc/calloc/realloc/free 的线程号、时间戳、指针和大小
+       PRELOAD_TRACE=/tmp/svc.trace LD_PRELOAD=libadvanced_preload.so ./service
+2. 转换：把跟踪文件转成紧凑的操作日志
+       python replay_trace.py convert /tmp/svc.trace -o /tmp/svc.oplog
+   指针换成槽位号（释放的槽位重用，槽位数等于同时存活的块数的峰值），
+   操作按原始线程分组连续存放，每条 32 字节，记录与同一线程上一个操作的时间间隔。
+   跟踪开始前分配的块的释放被丢掉，对它们的 realloc 当作 malloc。
+3. 重放：用 replay_oplog 在各个分配器下（与 run_bench.py 相同的分配器列表）重放
+       python replay_trace.py run /tmp/svc.oplog -a glibc jemalloc -o replay.json
+   报告吞吐、RSS 峰值和碎片（RSS 与存活字节之比）。
+
+操作日志格式（小端）：
+    头部    magic "OPLOG\\0\\0\\0" | 版本 u32 | 记录大小 u32 | 线程数 u32 | 标志 u32 |
+            槽位数 u64 | 记录数 u64 | 跟踪时长 ns u64 | 存活字节峰值 u64 | 结束时存活字节 u64
+    线程表  每个线程 (tid u32, 保留 u32, 第一条记录 u64, 记录数 u64)
+    记录    (大小 u64, 槽位 u32, 原槽位 u32, 轮次 u32, 原槽位轮次 u32, 间隔 ns u32,
+             操作 u16, 标志 u16)
+槽位会被不同线程重用，轮次是操作在槽位上的序号（放入、取走各算一次），
+replay_oplog 让每个操作等到槽位轮到自己，跨线程的释放和重用因此按原来的顺序发生。
+
+用法：
+    python replay_trace.py convert TRACE -o OPLOG
+    python replay_trace.py info OPLOG
+    python replay_trace.py run OPLOG [-a 分配器 ...] [-r 次数] [--pace 1] [-o results.json]
+"""
+
+import argparse
+import json
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+from rich import box
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test_preload")
+)
+from preload_trace import open_trace
+from run_bench import (
+    DEFAULT_BUILD_DIR,
+    ROOT,
+    _compile,
+    _median_of,
+    allocator_list,
+    host_info,
+)
+
+console = Console()
+
+OPLOG_MAGIC = b"OPLOG\0\0\0"
+OPLOG_VERSION = 1
+HEADER = struct.Struct("<8sIIIIQQQQQ")
+THREAD = struct.Struct("<IIQQ")
+NO_SLOT = 0xFFFFFFFF
+GAP_MAX = 0xFFFFFFFF  # 约 4.3 秒，更长的间隔截断
+
+MALLOC, CALLOC, REALLOC, FREE = range(4)
+
+RECORD_DTYPE = np.dtype(
+    [
+        ("size", "<u8"),
+        ("slot", "<u4"),
+        ("old_slot", "<u4"),
+        ("turn", "<u4"),
+        ("old_turn", "<u4"),
+        ("gap_ns", "<u4"),
+        ("op", "<u2"),
+        ("flags", "<u2"),
+    ]
+)
+
+RESULTS_FORMAT = "malloc-replay-results"
+RESULTS_VERSION = 1
+REPLAY_SOURCE = os.path.join(ROOT, "test_malloc_bench", "replay_oplog.c")
+
+
+# ---- 转换 ----
+
+
+class SlotAllocator:
+    """指针 -> 槽位号；释放的槽位后进先出地重用，让槽位表保持紧凑。
+    assign/release 返回 (槽位, 轮次)"""
+
+    def __init__(self):
+        self.of = {}
+        self.free = []
+        self.turns = []
+
+    @property
+    def count(self):
+        return len(self.turns)
+
+    def _step(self, slot):
+        turn = self.turns[slot]
+        self.turns[slot] = turn + 1
+        return slot, turn
+
+    def assign(self, ptr):
+        if self.free:
+            slot = self.free.pop()
+        else:
+            slot = len(self.turns)
+            self.turns.append(0)
+        self.of[ptr] = slot
+        return self._step(slot)
+
+    def release(self, ptr):
+        slot = self.of.pop(ptr, None)
+        if slot is None:
+            return None
+        self.free.append(slot)
+        return self._step(slot)
+
+
+def convert(trace_path, output):
+    """
+    把跟踪文件转成操作日志，返回统计信息
+    跟踪按时间顺序分块读入，每块转换出的操作按线程排好写进临时文件，
+    最后按线程把各块的片段依次拷进输出；内存只和块大小、同时存活的块数有关
+    """
+    slots = SlotAllocator()
+    sizes = {}  # 存活的指针 -> 大小
+    thread_index = {}
+    last_ts = []
+    fields = ("thread", "size", "slot", "turn", "old_slot", "old_turn", "gap", "op")
+    out = {name: [] for name in fields}
+    pieces = []  # 每块一项：{线程: (在临时文件中的第一条记录, 记录数)}
+    live = peak = 0
+    dropped = written = 0
+    first_ts = end_ts = None
+
+    def emit(t, ts, op, slot, size=0, old=(NO_SLOT, 0)):
+        out["thread"].append(t)
+        out["size"].append(size)
+        out["slot"].append(slot[0])
+        out["turn"].append(slot[1])
+        out["old_slot"].append(old[0])
+        out["old_turn"].append(old[1])
+        out["gap"].append(min(max(ts - last_ts[t], 0), GAP_MAX))
+        out["op"].append(op)
+        last_ts[t] = ts
+
+    def spill_chunk(spill):
+        """把这一块的操作按线程分组（组内保持时间顺序）追加到临时文件"""
+        nonlocal written
+        thread = np.array(out["thread"], dtype=np.uint32)
+        order = np.argsort(thread, kind="stable")
+        ops = np.zeros(len(thread), dtype=RECORD_DTYPE)
+        for name in fields[1:]:
+            field = "gap_ns" if name == "gap" else name
+            ops[field] = np.array(out[name], dtype=RECORD_DTYPE[field])[order]
+        spill.write(ops.tobytes())
+        counts = np.bincount(thread, minlength=len(last_ts))
+        firsts = written + np.concatenate(([0], np.cumsum(counts)[:-1]))
+        pieces.append(
+            {
+                t: (first, count)
+                for t, (first, count) in enumerate(
+                    zip(firsts.tolist(), counts.tolist())
+                )
+                if count
+            }
+        )
+        written += len(ops)
+        for column in out.values():
+            column.clear()
+
+    directory = os.path.dirname(os.path.abspath(output))
+    with (
+        open_trace(trace_path) as trace,
+        tempfile.TemporaryFile(dir=directory) as spill,
+    ):
+        start_ns = trace.start_ns
+        for chunk in trace.iter_chunks():
+            columns = [
+                chunk[name].tolist()
+                for name in ("ts_ns", "ptr", "old_ptr", "size", "tid", "op")
+            ]
+            if first_ts is None:
+                first_ts = columns[0][0]
+            end_ts = columns[0][-1]
+
+            for ts, ptr, old, size, tid, op in zip(*columns):
+                t = thread_index.get(tid)
+                if t is None:
+                    t = thread_index[tid] = len(last_ts)
+                    last_ts.append(start_ns or ts)
+
+                if op == FREE:
+                    if ptr not in sizes:
+                        dropped += 1  # 跟踪开始前分配的，或者重复释放
+                        continue
+                    live -= sizes.pop(ptr)
+                    emit(t, ts, FREE, slots.release(ptr))
+                    continue
+
+                old_slot = None
+                if op == REALLOC and old in sizes:
+                    if not ptr:
+                        # realloc(p, 0) 释放了原来的块；size > 0 时是失败，原块仍然有效
+                        if size == 0:
+                            live -= sizes.pop(old)
+                            emit(t, ts, FREE, slots.release(old))
+                        else:
+                            dropped += 1
+                        continue
+                    live -= sizes.pop(old)
+                    old_slot = slots.release(old)
+                if not ptr:
+                    dropped += 1  # 分配失败
+                    continue
+                if ptr in sizes:
+                    # 同一地址没有对应的 free 就再次分配：中间的释放没有经过 shim
+                    live -= sizes.pop(ptr)
+                    emit(t, ts, FREE, slots.release(ptr))
+
+                slot = slots.assign(ptr)
+                sizes[ptr] = size
+                live += size
+                peak = max(peak, live)
+                if old_slot is not None:
+                    emit(t, ts, REALLOC, slot, size, old_slot)
+                else:
+                    # 原块不在跟踪范围内的 realloc 当作 malloc
+                    emit(t, ts, CALLOC if op == CALLOC else MALLOC, slot, size)
+            spill_chunk(spill)
+
+        tids = sorted(thread_index, key=thread_index.get)
+        counts = [sum(p.get(t, (0, 0))[1] for p in pieces) for t in range(len(tids))]
+        duration = int(end_ts - first_ts) if first_ts is not None else 0
+        with open(output, "wb") as f:
+            f.write(
+                HEADER.pack(
+                    OPLOG_MAGIC,
+                    OPLOG_VERSION,
+                    RECORD_DTYPE.itemsize,
+                    len(tids),
+                    0,
+                    slots.count,
+                    written,
+                    duration,
+                    peak,
+                    live,
+                )
+            )
+            first = 0
+            for tid, count in zip(tids, counts):
+                f.write(THREAD.pack(tid, 0, first, count))
+                first += count
+            for t in range(len(tids)):
+                for piece in pieces:
+                    if t in piece:
+                        start, count = piece[t]
+                        spill.seek(start * RECORD_DTYPE.itemsize)
+                        f.write(spill.read(count * RECORD_DTYPE.itemsize))
+    return {
+        "records": written,
+        "dropped": dropped,
+        "threads": len(tids),
+        "slots": slots.count,
+        "peak_live_bytes": peak,
+        "end_live_bytes": live,
+        "duration_ns": duration,
+    }
+
+
+def read_oplog(path):
+    """返回 (头部 dict, [(tid, 第一条, 条数)], 记录数组)；记录数组直接映射在文件上"""
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path}: too short for an op log")
+    fields = HEADER.unpack_from(data)
+    if fields[0] != OPLOG_MAGIC or fields[1] != OPLOG_VERSION:
+        raise ValueError(f"{path}: not a version {OPLOG_VERSION} op log")
+    header = dict(
+        zip(
+            (
+                "threads",
+                "flags",
+                "slots",
+                "records",
+                "duration_ns",
+                "peak_live_bytes",
+                "end_live_bytes",
+            ),
+            fields[3:],
+        )
+    )
+    threads = [
+        THREAD.unpack_from(data, HEADER.size + i * THREAD.size)
+        for i in range(header["threads"])
+    ]
+    offset = HEADER.size + header["threads"] * THREAD.size
+    records = np.frombuffer(
+        data, dtype=RECORD_DTYPE, count=header["records"], offset=offset
+    )
+    return header, [(tid, first, count) for tid, _, first, count in threads], records
+
+
+def print_info(path):
+    header, threads, records = read_oplog(path)
+    console.print(f"[bold]Op log:[/bold] {path}")
+    console.print(
+        f"{header['records']:,} ops in {header['threads']} threads over "
+        f"{header['duration_ns'] / 1e9:.3f} s, {header['slots']:,} slots, "
+        f"peak live {header['peak_live_bytes']:,} bytes, "
+        f"{header['end_live_bytes']:,} bytes live at the end"
+    )
+    ops = np.bincount(records["op"], minlength=4)
+    console.print(
+        "  ".join(
+            f"{name}: {int(n):,}"
+            for name, n in zip(("malloc", "calloc", "realloc", "free"), ops)
+        )
+    )
+    table = Table(title="Threads", box=box.SIMPLE)
+    table.add_column("TID", justify="right")
+    table.add_column("Ops", justify="right")
+    table.add_column("Span", justify="right")
+    for tid, first, count in sorted(threads, key=lambda t: -t[2])[:20]:
+        gaps = records["gap_ns"][first : first + count]
+        table.add_row(
+            str(tid), f"{count:,}", f"{gaps.sum(dtype=np.uint64) / 1e9:.3f} s"
+        )
+    console.print(table)
+
+
+# ---- 重放 ----
+
+
+def find_replay(path, build_dir):
+    if path:
+        return path
+    built = os.path.join(ROOT, "bazel-bin", "test_malloc_bench", "replay_oplog")
+    if os.path.exists(built):
+        return built
+    return _compile(
+        REPLAY_SOURCE, os.path.join(build_dir, "replay_oplog"), [], ["-lpthread"]
+    )
+
+
+def replay_once(driver, oplog, lib, env, args):
+    with tempfile.TemporaryDirectory(prefix="replay_oplog-") as tmp:
+        run_env = dict(os.environ)
+        run_env.pop("LD_PRELOAD", None)
+        run_env.update({k: v.format(tmp=tmp) for k, v in env.items()})
+        if lib:
+            run_env["LD_PRELOAD"] = lib
+        cmd = [driver, oplog, "-p", str(args.pace), "-T", str(args.touch)]
+        try:
+            result = subprocess.run(
+                cmd,
+                env=run_env,
+                capture_output=True,
+                timeout=args.timeout,
+                check=False,
+            )
+        except subprocess.TimeoutExpired:
+            return {"error": f"timed out after {args.timeout}s"}
+    lines = result.stdout.decode(errors="replace").strip().splitlines()
+    if result.returncode != 0 or not lines:
+        message = result.stderr.decode(errors="replace").strip().splitlines()
+        return {"error": message[-1] if message else f"exit {result.returncode}"}
+    try:
+        return json.loads(lines[-1])
+    except json.JSONDecodeError:
+        return {"error": "unparsable output"}
+
+
+def run_replays(args):
+    header, _, _ = read_oplog(args.oplog)
+    driver = find_replay(args.driver, args.build_dir)
+    results = []
+    with console.status("") as status:
+        for name, lib, env in allocator_list(args, args.build_dir):
+            status.update(f"Replaying under {name}")
+            runs = [
+                replay_once(driver, args.oplog, lib, env, args)
+                for _ in range(args.repeat)
+            ]
+            ok = [r for r in runs if "error" not in r]
+            entry = {"allocator": name, "library": lib, "runs": runs}
+            if ok:
+                # 每线程明细只保留第一次运行的
+                median = _median_of(
+                    [{k: v for k, v in r.items() if k != "per_thread"} for r in ok]
+                )
+                median["per_thread"] = ok[0]["per_thread"]
+                entry["median"] = median
+            else:
+                entry["error"] = runs[0]["error"]
+            results.append(entry)
+    return {
+        "format": RESULTS_FORMAT,
+        "version": RESULTS_VERSION,
+        "host": host_info(),
+        "oplog": {"path": args.oplog, **header},
+        "config": {
+            "driver": driver,
+            "repeat": args.repeat,
+            "pace": args.pace,
+            "touch": args.touch,
+        },
+        "results": results,
+    }
+
+
+def print_replays(doc):
+    oplog = doc["oplog"]
+    console.print(
+        f"[bold]Replay of[/bold] {oplog['path']}: {oplog['records']:,} ops, "
+        f"{oplog['threads']} threads, peak live {oplog['peak_live_bytes'] / 2**20:.1f} MiB"
+    )
+    baseline = next(
+        (e for e in doc["results"] if e["allocator"] == "glibc" and "median" in e), None
+    )
+    table = Table(box=box.ROUNDED, header_style="bold magenta")
+    table.add_column("Allocator", style="green")
+    table.add_column("ops/s", justify="right")
+    table.add_column("Time s", justify="right")
+    table.add_column("vs glibc", justify="right")
+    table.add_column("Peak MiB", justify="right")
+    table.add_column("Peak/live", justify="right")
+    table.add_column("RSS/live", justify="right")
+    for entry in doc["results"]:
+        m = entry.get("median")
+        if m is None:
+            table.add_row(entry["allocator"], f"[red]{entry['error']}[/red]", *[""] * 5)
+            continue
+        base_ops = baseline["median"]["ops_per_sec"] if baseline else None
+        peak_live = oplog["peak_live_bytes"]
+        table.add_row(
+            entry["allocator"],
+            f"{m['ops_per_sec']:,.0f}",
+            f"{m['seconds']:.3f}",
+            f"{m['ops_per_sec'] / base_ops:.2f}x" if base_ops else "-",
+            f"{m['peak_rss_kb'] / 1024:.1f}",
+            f"{m['peak_rss_kb'] * 1024 / peak_live:.2f}" if peak_live else "-",
+            f"{m['mean_rss_over_live']:.2f}" if m["mean_rss_over_live"] else "-",
+        )
+    console.print(table)
+    console.print(
+        "RSS is anonymous memory above the baseline before replay starts; "
+        "Peak/live: peak RSS over the trace's peak live bytes; "
+        "RSS/live: mean over samples with more than 1 MiB live"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert advanced_preload traces to op logs and replay them "
+        "against candidate allocators"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_convert = sub.add_parser("convert", help="Convert a PRELOAD_TRACE file")
+    p_convert.add_argument("trace", help="Binary trace from libadvanced_preload.so")
+    p_convert.add_argument("-o", "--output", required=True, help="Op log to write")
+
+    p_info = sub.add_parser("info", help="Describe an op log")
+    p_info.add_argument("oplog", help="Op log")
+
+    p_run = sub.add_parser("run", help="Replay an op log under each allocator")
+    p_run.add_argument("oplog", help="Op log")
+    p_run.add_argument(
+        "-a", "--allocators", nargs="+", help="Only run these allocators (by name)"
+    )
+    p_run.add_argument(
+        "--allocator",
+        action="append",
+        default=[],
+        metavar="NAME=PATH",
+        help="Add an LD_PRELOAD-able allocator library",
+    )
+    p_run.add_argument(
+        "-r", "--repeat", type=int, default=3, help="Replays per allocator"
+    )
+    p_run.add_argument(
+        "--pace",
+        type=float,
+        default=0,
+        help="Reproduce recorded gaps scaled by this factor (default 0: as fast "
+        "as possible)",
+    )
+    p_run.add_argument(
+        "--touch",
+        type=int,
+        choices=(0, 1, 2),
+        default=2,
+        help="Write new memory: 0 never, 1 first byte, 2 every page (default)",
+    )
+    p_run.add_argument("--driver", help="Path to the replay_oplog binary")
+    p_run.add_argument(
+        "--build-dir",
+        default=DEFAULT_BUILD_DIR,
+        help=f"Where to compile missing binaries (default: {DEFAULT_BUILD_DIR})",
+    )
+    p_run.add_argument(
+        "--timeout", type=int, default=1800, help="Seconds allowed per replay"
+    )
+    p_run.add_argument("-o", "--output", help="Write the JSON results here")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "convert":
+            stats = convert(args.trace, args.output)
+            console.print(
+                f"Wrote {stats['records']:,} ops from {stats['threads']} threads "
+                f"({stats['slots']:,} slots, {stats['dropped']:,} events dropped) "
+                f"to {args.output}"
+            )
+        elif args.command == "info":
+            print_info(args.oplog)
+        else:
+            doc = run_replays(args)
+            if args.output:
+                with open(args.output, "w") as f:
+                    json.dump(doc, f, indent=2)
+            print_replays(doc)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
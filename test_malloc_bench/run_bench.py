@@ -0,0 +1,498 @@
+"""
+分配器微基准的驱动：在不同分配器下运行 malloc_bench 的各个负载，汇总成可比较的 JSON
+
+分配器：
+  - glibc                  不设置 LD_PRELOAD
+  - test_preload 中的 shim  preload、advanced_preload（文本日志和 PRELOAD_TRACE 二进制跟踪）、
+                           sampling_preload；shim 的 stderr 输出丢弃
+  - 本机找到的分配器       jemalloc、tcmalloc、mimalloc、tbbmalloc、hoard、snmalloc，
+                           在 ldconfig 缓存和常见库目录中查找；也可以用 --allocator 名字=路径 指定
+
+每个（分配器, 负载, 线程数）运行 --repeat 次，每次是一个新进程，取各指标的中位数。
+malloc_bench 用固定的种子生成操作序列，同样的参数在各个分配器下执行完全相同的调用。
+
+bazel-bin 中没有 malloc_bench 或 shim 时，用 cc 从源码编译到 --build-dir。
+
+用法：
+    python run_bench.py
+    python run_bench.py -w size_churn fragmentation -t 1 8 -n 500000 -o results.json
+    python run_bench.py -a glibc jemalloc --allocator mine=/opt/lib/libmymalloc.so
+    python run_bench.py -o new.json --compare results.json
+"""
+
+import argparse
+import fnmatch
+import glob
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from rich import box
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_SOURCE = os.path.join(ROOT, "test_malloc_bench", "malloc_bench.c")
+DEFAULT_BUILD_DIR = os.path.join(tempfile.gettempdir(), "malloc_bench-build")
+
+WORKLOADS = ("size_churn", "producer_consumer", "fragmentation", "realloc_growth")
+
+RESULTS_FORMAT = "malloc-bench-results"
+RESULTS_VERSION = 1
+
+# test_preload 中的 shim：名字 -> (源文件, 库名, 额外环境变量)；
+# 环境变量中的 {tmp} 替换为本次运行的临时目录
+SHIMS = {
+    "preload": ("preload.c", "libpreload.so", {}),
+    "advanced_preload": ("advanced_preload.c", "libadvanced_preload.so", {}),
+    "advanced_preload/trace": (
+        "advanced_preload.c",
+        "libadvanced_preload.so",
+        {"PRELOAD_TRACE": "{tmp}/trace.bin"},
+    ),
+    "sampling_preload": (
+        "sampling_preload.c",
+        "libsampling_preload.so",
+        {"PRELOAD_PROFILE": "{tmp}/heap"},
+    ),
+}
+
+# 可以 LD_PRELOAD 的分配器：名字 -> 库文件名模式
+KNOWN_ALLOCATORS = {
+    "jemalloc": "libjemalloc.so*",
+    "tcmalloc": "libtcmalloc.so*",
+    "tcmalloc_minimal": "libtcmalloc_minimal.so*",
+    "mimalloc": "libmimalloc.so*",
+    "tbbmalloc": "libtbbmalloc_proxy.so*",
+    "hoard": "libhoard.so*",
+    "snmalloc": "libsnmallocshim.so*",
+}
+LIBRARY_DIRS = (
+    "/usr/local/lib",
+    "/usr/local/lib64",
+    "/usr/lib",
+    "/usr/lib64",
+    "/usr/lib/x86_64-linux-gnu",
+    "/usr/lib/aarch64-linux-gnu",
+)
+
+# 表格中展示的指标：(JSON 路径, 列名, 越大越好)
+# rss_kb/hwm_kb 是负载开始后相对基线的增长，RSS/live 因此只反映负载本身的碎片
+COLUMNS = (
+    (("ops_per_sec",), "ops/s", True),
+    (("latency_ns", "p50"), "p50 ns", False),
+    (("latency_ns", "p99"), "p99 ns", False),
+    (("rss_kb",), "RSS KiB", False),
+    (("hwm_kb",), "HWM KiB", False),
+    (("minor_faults",), "Faults", False),
+)
+
+
+# ---- 构建和查找 ----
+
+
+def _compile(source, output, flags, libs):
+    cc = os.environ.get("CC") or shutil.which("cc") or shutil.which("gcc")
+    if cc is None:
+        raise RuntimeError(f"no C compiler to build {os.path.basename(output)}")
+    if os.path.exists(output) and os.path.getmtime(output) >= os.path.getmtime(source):
+        return output
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    cmd = [cc, "-O2", *flags, "-o", output, source, *libs]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=False)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd)} failed:\n{result.stderr}")
+    return output
+
+
+def find_bench(path, build_dir):
+    """malloc_bench 的路径：指定的、bazel-bin 中的，或者现场编译"""
+    if path:
+        return path
+    built = os.path.join(ROOT, "bazel-bin", "test_malloc_bench", "malloc_bench")
+    if os.path.exists(built):
+        return built
+    return _compile(
+        BENCH_SOURCE, os.path.join(build_dir, "malloc_bench"), [], ["-lpthread"]
+    )
+
+
+def find_shim(source, library, build_dir):
+    built = os.path.join(ROOT, "bazel-bin", "test_preload", library)
+    if os.path.exists(built):
+        return built
+    return _compile(
+        os.path.join(ROOT, "test_preload", source),
+        os.path.join(build_dir, library),
+        ["-fPIC", "-shared"],
+        ["-ldl", "-lpthread", "-lm"],
+    )
+
+
+def _library_candidates():
+    """ldconfig 缓存中的库路径，加上常见库目录里的文件"""
+    paths = []
+    try:
+        out = subprocess.run(
+            ["ldconfig", "-p"], capture_output=True, text=True, check=False
+        ).stdout
+        paths += [line.rpartition(" => ")[2] for line in out.splitlines()[1:]]
+    except OSError:
+        pass
+    for directory in LIBRARY_DIRS:
+        paths += glob.glob(os.path.join(directory, "*.so*"))
+    return paths
+
+
+def discover_allocators():
+    """本机能找到的分配器：{名字: 库路径}，同一个库的多个链接只取一个"""
+    candidates = _library_candidates()
+    found = {}
+    for name, pattern in KNOWN_ALLOCATORS.items():
+        regex = re.compile(fnmatch.translate(pattern))
+        matches = sorted(
+            {
+                os.path.realpath(p)
+                for p in candidates
+                if regex.match(os.path.basename(p)) and os.path.exists(p)
+            }
+        )
+        if matches:
+            found[name] = matches[0]
+    return found
+
+
+def allocator_list(args, build_dir):
+    """[(名字, 库路径或 None, 额外环境变量)]，按 --allocators 过滤"""
+    allocators = [("glibc", None, {})]
+    for name, (source, library, env) in SHIMS.items():
+        allocators.append((name, (source, library), env))
+    for name, path in discover_allocators().items():
+        allocators.append((name, path, {}))
+    for spec in args.allocator:
+        name, sep, path = spec.partition("=")
+        if not sep or not os.path.exists(path):
+            raise RuntimeError(f"--allocator expects NAME=PATH to a library: {spec}")
+        allocators.append((name, os.path.abspath(path), {}))
+
+    if args.allocators:
+        allocators = [a for a in allocators if a[0] in args.allocators]
+        missing = set(args.allocators) - {a[0] for a in allocators}
+        if missing:
+            console.print(
+                f"[yellow]Not available: {', '.join(sorted(missing))}[/yellow]"
+            )
+
+    result = []
+    for name, lib, env in allocators:
+        if isinstance(lib, tuple):
+            try:
+                lib = find_shim(*lib, build_dir)
+            except RuntimeError as e:
+                console.print(f"[yellow]Skipping {name}: {e}[/yellow]")
+                continue
+        result.append((name, lib, env))
+    return result
+
+
+# ---- 运行 ----
+
+
+def run_once(bench, workload, threads, ops, seed, lib, env, timeout):
+    """运行一次 malloc_bench，返回它打印的 JSON；失败时返回 {"error": ...}"""
+    with tempfile.TemporaryDirectory(prefix="malloc_bench-") as tmp:
+        run_env = dict(os.environ)
+        run_env.pop("LD_PRELOAD", None)
+        run_env.update({k: v.format(tmp=tmp) for k, v in env.items()})
+        if lib:
+            run_env["LD_PRELOAD"] = lib
+        cmd = [bench, workload, "-t", str(threads), "-n", str(ops), "-s", str(seed)]
+        try:
+            result = subprocess.run(
+                cmd,
+                env=run_env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                timeout=timeout,
+                check=False,
+            )
+        except subprocess.TimeoutExpired:
+            return {"error": f"timed out after {timeout}s"}
+    lines = result.stdout.decode(errors="replace").strip().splitlines()
+    if result.returncode != 0 or not lines:
+        return {"error": f"exit status {result.returncode}"}
+    try:
+        return json.loads(lines[-1])
+    except json.JSONDecodeError:
+        return {"error": "unparsable output"}
+
+
+def _median_of(runs):
+    """各次运行逐字段取中位数，嵌套的 dict 递归处理"""
+    merged = {}
+    for key, value in runs[0].items():
+        if isinstance(value, dict):
+            merged[key] = _median_of([r[key] for r in runs])
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            merged[key] = statistics.median(r[key] for r in runs)
+        else:
+            merged[key] = value
+    return merged
+
+
+def host_info():
+    model = ""
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    model = line.partition(":")[2].strip()
+                    break
+    except OSError:
+        pass
+    try:
+        libc = os.confstr("CS_GNU_LIBC_VERSION")
+    except (ValueError, OSError):
+        libc = ""
+    return {
+        "hostname": platform.node(),
+        "cpu": model,
+        "cpus": os.cpu_count(),
+        "kernel": platform.release(),
+        "libc": libc,
+    }
+
+
+def run_suite(args):
+    build_dir = args.build_dir
+    bench = find_bench(args.bench, build_dir)
+    allocators = allocator_list(args, build_dir)
+    results = []
+    with console.status("") as status:
+        for workload in args.workloads:
+            for threads in args.threads:
+                for name, lib, env in allocators:
+                    status.update(f"{workload} x{threads} under {name}")
+                    runs = [
+                        run_once(
+                            bench,
+                            workload,
+                            threads,
+                            args.ops,
+                            args.seed,
+                            lib,
+                            env,
+                            args.timeout,
+                        )
+                        for _ in range(args.repeat)
+                    ]
+                    ok = [r for r in runs if "error" not in r]
+                    entry = {
+                        "allocator": name,
+                        "library": lib,
+                        "workload": workload,
+                        "threads": threads,
+                        "runs": runs,
+                    }
+                    if ok:
+                        entry["median"] = _median_of(ok)
+                    else:
+                        entry["error"] = runs[0]["error"]
+                    results.append(entry)
+    return {
+        "format": RESULTS_FORMAT,
+        "version": RESULTS_VERSION,
+        "host": host_info(),
+        "config": {
+            "bench": bench,
+            "ops_per_thread": args.ops,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+# ---- 输出 ----
+
+
+def _metric(entry, path):
+    value = entry.get("median")
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _fmt(value):
+    if value is None:
+        return "-"
+    return f"{value:,.0f}"
+
+
+def _key(entry):
+    return entry["workload"], entry["threads"], entry["allocator"]
+
+
+def print_results(doc):
+    groups = {}
+    for entry in doc["results"]:
+        groups.setdefault((entry["workload"], entry["threads"]), []).append(entry)
+
+    for (workload, threads), entries in groups.items():
+        baseline = next(
+            (e for e in entries if e["allocator"] == "glibc" and "median" in e), None
+        )
+        table = Table(
+            title=f"{workload} ({threads} threads)",
+            box=box.ROUNDED,
+            header_style="bold magenta",
+        )
+        table.add_column("Allocator", style="green")
+        for _, label, _ in COLUMNS:
+            table.add_column(label, justify="right")
+        table.add_column("vs glibc", justify="right")
+        table.add_column("RSS/live", justify="right")
+        for entry in entries:
+            if "median" not in entry:
+                table.add_row(
+                    entry["allocator"], f"[red]{entry['error']}[/red]", *[""] * 7
+                )
+                continue
+            ops = _metric(entry, ("ops_per_sec",))
+            base_ops = _metric(baseline, ("ops_per_sec",)) if baseline else None
+            live = _metric(entry, ("live_bytes",))
+            rss = _metric(entry, ("rss_kb",))
+            table.add_row(
+                entry["allocator"],
+                *(_fmt(_metric(entry, path)) for path, _, _ in COLUMNS),
+                f"{ops / base_ops:.2f}x" if base_ops else "-",
+                f"{rss * 1024 / live:.2f}" if live and rss else "-",
+            )
+        console.print(table)
+
+
+def print_comparison(doc, base):
+    """和之前的结果逐项对比（按 负载、线程数、分配器 对齐）"""
+    old = {_key(e): e for e in base["results"] if "median" in e}
+    table = Table(
+        title="Change vs. baseline results",
+        box=box.ROUNDED,
+        header_style="bold magenta",
+    )
+    table.add_column("Workload", style="green")
+    table.add_column("Threads", justify="right")
+    table.add_column("Allocator")
+    for _, label, _ in COLUMNS:
+        table.add_column(f"Δ {label}", justify="right")
+    for entry in doc["results"]:
+        prev = old.get(_key(entry))
+        if prev is None or "median" not in entry:
+            continue
+        cells = []
+        for path, _, higher_is_better in COLUMNS:
+            new, was = _metric(entry, path), _metric(prev, path)
+            if not new or not was:
+                cells.append("-")
+                continue
+            change = (new - was) * 100 / was
+            better = change > 0 if higher_is_better else change < 0
+            style = "green" if better else "red" if change else "dim"
+            cells.append(f"[{style}]{change:+.1f}%[/{style}]")
+        table.add_row(
+            entry["workload"], str(entry["threads"]), entry["allocator"], *cells
+        )
+    console.print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the malloc_bench workloads under glibc, the test_preload "
+        "shims and locally installed allocators"
+    )
+    parser.add_argument(
+        "-w",
+        "--workloads",
+        nargs="+",
+        choices=WORKLOADS,
+        default=list(WORKLOADS),
+        help="Workloads to run (default: all)",
+    )
+    parser.add_argument(
+        "-t",
+        "--threads",
+        nargs="+",
+        type=int,
+        default=[1, 4],
+        help="Thread counts (default: 1 4)",
+    )
+    parser.add_argument(
+        "-n", "--ops", type=int, default=200000, help="Allocator calls per thread"
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=3, help="Runs per configuration"
+    )
+    parser.add_argument("-s", "--seed", type=int, default=1, help="Workload seed")
+    parser.add_argument(
+        "-a", "--allocators", nargs="+", help="Only run these allocators (by name)"
+    )
+    parser.add_argument(
+        "--allocator",
+        action="append",
+        default=[],
+        metavar="NAME=PATH",
+        help="Add an LD_PRELOAD-able allocator library",
+    )
+    parser.add_argument("--bench", help="Path to the malloc_bench binary")
+    parser.add_argument(
+        "--build-dir",
+        default=DEFAULT_BUILD_DIR,
+        help=f"Where to compile missing binaries (default: {DEFAULT_BUILD_DIR})",
+    )
+    parser.add_argument(
+        "--timeout", type=int, default=600, help="Seconds allowed per run"
+    )
+    parser.add_argument("-o", "--output", help="Write the JSON results here")
+    parser.add_argument(
+        "--compare", metavar="RESULTS", help="Compare against earlier JSON results"
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="List the available allocators and exit"
+    )
+    args = parser.parse_args()
+
+    try:
+        if args.list:
+            for name, lib, _ in allocator_list(args, args.build_dir):
+                console.print(f"{name:24} {lib or '(system malloc)'}")
+            return
+        base = None
+        if args.compare:
+            with open(args.compare) as f:
+                base = json.load(f)
+            if base.get("format") != RESULTS_FORMAT:
+                raise ValueError(f"{args.compare}: not a {RESULTS_FORMAT} file")
+        doc = run_suite(args)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(doc, f, indent=2)
+    print_results(doc)
+    if base is not None:
+        print_comparison(doc, base)
+
+
+if __name__ == "__main__":
+    main()
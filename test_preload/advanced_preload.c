@@ -1,27 +1,30 @@
 #define _GNU_SOURCE
 #include <dlfcn.h>
-#include <stdarg.h>
+#include <fcntl.h>
+#include <pthread.h>
+#include <sched.h>
+#include <stdint.h>
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
-#include <sys/time.h>
+#include <sys/file.h>
+#include <sys/mman.h>
+#include <sys/syscall.h>
 #include <time.h>
 #include <unistd.h>
 
-// 内存分配记录结构
-typedef struct alloc_record {
-  void *ptr;
-  size_t size;
-  struct timeval alloc_time;
-  const char *file;
-  int line;
-  struct alloc_record *next;
-} alloc_record_t;
-
-// 全局统计信息
-static alloc_record_t *alloc_list = NULL;
-static int total_allocations = 0;
-static int total_frees = 0;
+// 两种输出模式：
+//   默认：每次调用向 stderr 打印一行 [PRELOAD] 文本（analyze_preload_log.py 可分析）
+//   PRELOAD_TRACE=<文件>：二进制跟踪。每个线程把定长记录写进自己的缓冲区，
+//     不加锁；缓冲区满时一次性拷贝进 mmap 映射的跟踪文件（preload_trace.py 读取）。
+//     fork 出的子进程不再跟踪；exec 之后的子进程发现文件正被父进程写入时
+//     改写 <文件>.<pid>
+// 活跃块保存在分片的开放寻址哈希表中，查找和删除都是 O(1)。
+
+// ---- 统计信息（原子操作，不需要全局锁） ----
+
+static unsigned long total_allocations = 0;
+static unsigned long total_frees = 0;
 static size_t total_allocated = 0;
 static size_t current_allocated = 0;
 static size_t peak_allocated = 0;
@@ -32,70 +35,506 @@ static void *(*original_calloc)(size_t nmemb, size_t size) = NULL;
 static void *(*original_realloc)(void *ptr, size_t size) = NULL;
 static void (*original_free)(void *ptr) = NULL;
 
-// 互斥锁（简单的忙等待）
-static volatile int lock = 0;
+static uint64_t now_ns(clockid_t clock) {
+  struct timespec ts;
+  clock_gettime(clock, &ts);
+  return (uint64_t)ts.tv_sec * 1000000000ull + (uint64_t)ts.tv_nsec;
+}
 
-static void simple_lock() {
-  while (__sync_lock_test_and_set(&lock, 1)) {
-    usleep(1);
+// 自旋锁：竞争时让出 CPU，而不是 usleep 睡眠
+static void spin_lock(int *lock) {
+  while (__atomic_exchange_n(lock, 1, __ATOMIC_ACQUIRE)) {
+    while (__atomic_load_n(lock, __ATOMIC_RELAXED)) {
+      sched_yield();
+    }
   }
 }
 
-static void simple_unlock() { __sync_lock_release(&lock); }
+static void spin_unlock(int *lock) { __atomic_store_n(lock, 0, __ATOMIC_RELEASE); }
 
-// 初始化原始函数指针
-static void init_original_functions() {
-  if (!original_malloc) {
-    original_malloc = dlsym(RTLD_NEXT, "malloc");
-    original_calloc = dlsym(RTLD_NEXT, "calloc");
-    original_realloc = dlsym(RTLD_NEXT, "realloc");
-    original_free = dlsym(RTLD_NEXT, "free");
+// 直接向内核要内存，避免在 malloc 钩子里递归调用 malloc
+static void *map_pages(size_t size) {
+  void *p = mmap(NULL, size, PROT_READ | PROT_WRITE,
+                 MAP_PRIVATE | MAP_ANONYMOUS, -1, 0);
+  return p == MAP_FAILED ? NULL : p;
+}
+
+// ---- 活跃块哈希表 ----
+
+#define SHARD_BITS 6
+#define SHARD_COUNT (1 << SHARD_BITS)
+#define SHARD_MIN_SLOTS 1024
+#define SLOT_EMPTY 0
+#define SLOT_DELETED 1  // 删除标记，指针不可能是 1
+
+typedef struct {
+  uintptr_t ptr;
+  size_t size;
+  uint64_t alloc_ns;
+} live_entry_t;
+
+// 按指针哈希值的高位分片，每片有自己的锁和线性探测表
+typedef struct {
+  int lock;
+  size_t mask;
+  size_t used;  // 活跃 + 删除标记
+  size_t live;
+  live_entry_t *slots;
+} live_shard_t;
+
+static live_shard_t shards[SHARD_COUNT];
+
+static inline uint64_t hash_ptr(uintptr_t ptr) {
+  uint64_t h = ((uint64_t)ptr >> 4) * 0x9E3779B97F4A7C15ull;
+  return h ^ (h >> 29);
+}
+
+static inline live_shard_t *shard_for(uint64_t h) {
+  return &shards[h >> (64 - SHARD_BITS)];
+}
+
+// 调整容量并清掉删除标记；失败时保留原表
+static int shard_resize(live_shard_t *shard) {
+  size_t cap = SHARD_MIN_SLOTS;
+  while (cap < (shard->live + 1) * 2) cap *= 2;
+  live_entry_t *slots = map_pages(cap * sizeof(live_entry_t));
+  if (!slots) return -1;
+
+  for (size_t i = 0; shard->slots && i <= shard->mask; i++) {
+    live_entry_t *e = &shard->slots[i];
+    if (e->ptr <= SLOT_DELETED) continue;
+    size_t j = hash_ptr(e->ptr) & (cap - 1);
+    while (slots[j].ptr != SLOT_EMPTY) j = (j + 1) & (cap - 1);
+    slots[j] = *e;
+  }
+  if (shard->slots) munmap(shard->slots, (shard->mask + 1) * sizeof(live_entry_t));
+  shard->slots = slots;
+  shard->mask = cap - 1;
+  shard->used = shard->live;
+  return 0;
+}
+
+// 记录一个活跃块；同一指针已在表中（丢失了 free）时覆盖，返回旧块大小
+static size_t live_insert(uintptr_t ptr, size_t size, uint64_t ts) {
+  uint64_t h = hash_ptr(ptr);
+  live_shard_t *shard = shard_for(h);
+  size_t replaced = 0;
+
+  spin_lock(&shard->lock);
+  if (!shard->slots || (shard->used + 1) * 4 > (shard->mask + 1) * 3) {
+    if (shard_resize(shard) != 0) {
+      spin_unlock(&shard->lock);
+      return 0;
+    }
+  }
+  size_t i = h & shard->mask;
+  live_entry_t *tomb = NULL;
+  for (;; i = (i + 1) & shard->mask) {
+    live_entry_t *e = &shard->slots[i];
+    if (e->ptr == ptr) {
+      replaced = e->size;
+      e->size = size;
+      e->alloc_ns = ts;
+      break;
+    }
+    if (e->ptr == SLOT_DELETED && !tomb) tomb = e;
+    if (e->ptr == SLOT_EMPTY) {
+      if (tomb) {
+        e = tomb;
+      } else {
+        shard->used++;
+      }
+      e->ptr = ptr;
+      e->size = size;
+      e->alloc_ns = ts;
+      shard->live++;
+      break;
+    }
+  }
+  spin_unlock(&shard->lock);
+  return replaced;
+}
+
+// 删除活跃块，找到时返回 1 并写出它的大小
+static int live_remove(uintptr_t ptr, size_t *size) {
+  uint64_t h = hash_ptr(ptr);
+  live_shard_t *shard = shard_for(h);
+  int found = 0;
+
+  spin_lock(&shard->lock);
+  if (shard->slots) {
+    for (size_t i = h & shard->mask;; i = (i + 1) & shard->mask) {
+      live_entry_t *e = &shard->slots[i];
+      if (e->ptr == SLOT_EMPTY) break;
+      if (e->ptr == ptr) {
+        *size = e->size;
+        e->ptr = SLOT_DELETED;
+        shard->live--;
+        found = 1;
+        break;
+      }
+    }
+  }
+  spin_unlock(&shard->lock);
+  return found;
+}
+
+static void stats_add(size_t size) {
+  __atomic_fetch_add(&total_allocations, 1, __ATOMIC_RELAXED);
+  __atomic_fetch_add(&total_allocated, size, __ATOMIC_RELAXED);
+  size_t current =
+      __atomic_add_fetch(&current_allocated, size, __ATOMIC_RELAXED);
+  size_t peak = __atomic_load_n(&peak_allocated, __ATOMIC_RELAXED);
+  while (current > peak &&
+         !__atomic_compare_exchange_n(&peak_allocated, &peak, current, 1,
+                                      __ATOMIC_RELAXED, __ATOMIC_RELAXED)) {
   }
 }
 
 // 添加分配记录
 static void add_alloc_record(void *ptr, size_t size) {
   if (!ptr) return;
+  size_t replaced = live_insert((uintptr_t)ptr, size, now_ns(CLOCK_MONOTONIC));
+  if (replaced) {
+    __atomic_fetch_sub(&current_allocated, replaced, __ATOMIC_RELAXED);
+  }
+  stats_add(size);
+}
 
-  alloc_record_t *record = original_malloc(sizeof(alloc_record_t));
-  if (!record) return;
-
-  record->ptr = ptr;
-  record->size = size;
-  gettimeofday(&record->alloc_time, NULL);
-  record->file = "unknown";
-  record->line = 0;
-  record->next = alloc_list;
-  alloc_list = record;
+// 移除分配记录，返回 1 表示找到；size 写出块大小
+static int remove_alloc_record(void *ptr, size_t *size) {
+  if (!ptr) return 0;
+  if (!live_remove((uintptr_t)ptr, size)) return 0;
+  __atomic_fetch_sub(&current_allocated, *size, __ATOMIC_RELAXED);
+  __atomic_fetch_add(&total_frees, 1, __ATOMIC_RELAXED);
+  return 1;
+}
 
-  total_allocations++;
-  total_allocated += size;
-  current_allocated += size;
-  if (current_allocated > peak_allocated) {
-    peak_allocated = current_allocated;
+// ---- 二进制跟踪 ----
+
+enum { OP_MALLOC = 0, OP_CALLOC = 1, OP_REALLOC = 2, OP_FREE = 3 };
+#define RECORD_UNTRACKED 0x1  // 释放的指针不在活跃表中（重复释放等）
+
+// 定长 40 字节记录，preload_trace.py 中的 RECORD_DTYPE 与之对应
+typedef struct {
+  uint64_t ts_ns;    // CLOCK_MONOTONIC
+  uint64_t ptr;      // 返回的指针；free 时为被释放的指针
+  uint64_t old_ptr;  // realloc 的原指针
+  uint64_t size;     // 请求大小；free 时为块的大小（未知为 0）
+  uint32_t tid;
+  uint16_t op;
+  uint16_t flags;
+} trace_record_t;
+
+// 文件头 64 字节，记录紧随其后
+typedef struct {
+  char magic[8];  // "PLTRACE\0"
+  uint32_t version;
+  uint32_t record_size;
+  uint64_t record_count;  // 每次刷出后更新，进程崩溃时文件仍可读
+  uint64_t dropped;       // 文件写满后丢弃的记录数
+  uint64_t start_ns;      // 开始跟踪时的 CLOCK_MONOTONIC
+  uint64_t start_unix_ns;
+  uint32_t pid;
+  uint32_t flags;  // TRACE_COMPLETE：进程正常退出、所有记录都已写入
+  uint64_t reserved;
+} trace_header_t;
+
+_Static_assert(sizeof(trace_record_t) == 40, "record layout");
+_Static_assert(sizeof(trace_header_t) == 64, "header layout");
+
+#define TRACE_VERSION 1
+#define TRACE_COMPLETE 0x1
+// 跟踪文件按 64MB 的窗口映射，写到哪里才扩展文件、映射对应窗口，
+// 已映射的窗口在退出前不会移动，各线程可以并发拷贝
+#define TRACE_WINDOW_SHIFT 26
+#define TRACE_WINDOW_SIZE ((uint64_t)1 << TRACE_WINDOW_SHIFT)
+#define TRACE_MAX_WINDOWS 4096
+// 关闭时把已预留的长度设成这个值，之后的 trace_write 都按文件写满处理
+#define TRACE_SEALED ((uint64_t)TRACE_MAX_WINDOWS << TRACE_WINDOW_SHIFT)
+// 每个线程缓冲 4096 条记录（160KB）后一次性刷出
+#define TRACE_BUFFER_RECORDS 4096
+
+typedef struct thread_buffer {
+  struct thread_buffer *next_free;  // 空闲链表
+  uint32_t tid;
+  uint32_t count;
+  trace_record_t records[TRACE_BUFFER_RECORDS];
+} thread_buffer_t;
+
+enum { TRACE_OFF = 0, TRACE_STARTING = 1, TRACE_ON = 2, TRACE_CLOSED = 3 };
+static int trace_state = TRACE_OFF;
+static int trace_fd = -1;
+static trace_header_t *trace_header;
+static char *trace_windows[TRACE_MAX_WINDOWS];
+static int trace_window_lock;
+static uint64_t trace_reserved;  // 已分配出去的记录区字节数
+static uint64_t trace_file_size;
+static thread_buffer_t *free_buffers;  // 已退出线程留下的缓冲区，供新线程复用
+static int live_buffers;               // 仍被线程持有的缓冲区个数
+static int buffers_lock;
+static char trace_path[4096];
+static pthread_key_t buffer_key;
+
+static __thread thread_buffer_t *tls_buffer __attribute__((tls_model("initial-exec")));
+
+static char *trace_window(uint64_t index) {
+  char *window = __atomic_load_n(&trace_windows[index], __ATOMIC_ACQUIRE);
+  if (window) return window;
+
+  spin_lock(&trace_window_lock);
+  window = trace_windows[index];
+  if (!window) {
+    uint64_t end = (index + 1) << TRACE_WINDOW_SHIFT;
+    if (trace_fd >= 0 && end > trace_file_size &&
+        ftruncate(trace_fd, (off_t)end) == 0) {
+      trace_file_size = end;
+    }
+    if (trace_fd >= 0 && end <= trace_file_size) {
+      void *p = mmap(NULL, TRACE_WINDOW_SIZE, PROT_READ | PROT_WRITE,
+                     MAP_SHARED, trace_fd, (off_t)(index << TRACE_WINDOW_SHIFT));
+      if (p != MAP_FAILED) {
+        window = p;
+        __atomic_store_n(&trace_windows[index], window, __ATOMIC_RELEASE);
+      }
+    }
   }
+  spin_unlock(&trace_window_lock);
+  return window;
 }
 
-// 移除分配记录
-static void remove_alloc_record(void *ptr) {
-  if (!ptr) return;
+// 把一批记录写入文件：原子地预留一段位置，然后按窗口拷贝，不持有全局锁
+static void trace_write(const trace_record_t *records, uint32_t count) {
+  uint64_t len = (uint64_t)count * sizeof(trace_record_t);
+  uint64_t offset = sizeof(trace_header_t) +
+                    __atomic_fetch_add(&trace_reserved, len, __ATOMIC_RELAXED);
+  if ((offset + len) >> TRACE_WINDOW_SHIFT >= TRACE_MAX_WINDOWS) {
+    __atomic_fetch_add(&trace_header->dropped, count, __ATOMIC_RELAXED);
+    return;
+  }
 
-  alloc_record_t **current = &alloc_list;
-  while (*current) {
-    if ((*current)->ptr == ptr) {
-      alloc_record_t *to_free = *current;
-      current_allocated -= to_free->size;
-      *current = to_free->next;
-      original_free(to_free);
-      total_frees++;
+  const char *src = (const char *)records;
+  uint64_t left = len;
+  while (left) {
+    char *window = trace_window(offset >> TRACE_WINDOW_SHIFT);
+    uint64_t in = offset & (TRACE_WINDOW_SIZE - 1);
+    uint64_t n = TRACE_WINDOW_SIZE - in < left ? TRACE_WINDOW_SIZE - in : left;
+    if (!window) {
+      __atomic_fetch_add(&trace_header->dropped, count, __ATOMIC_RELAXED);
       return;
     }
-    current = &(*current)->next;
+    memcpy(window + in, src, n);
+    src += n;
+    offset += n;
+    left -= n;
+  }
+  __atomic_fetch_add(&trace_header->record_count, count, __ATOMIC_RELEASE);
+}
+
+static void flush_buffer(thread_buffer_t *buffer) {
+  if (buffer->count) {
+    trace_write(buffer->records, buffer->count);
+    buffer->count = 0;
+  }
+}
+
+// 线程退出时刷出它的缓冲区，并把缓冲区放回空闲链表
+static void release_buffer(void *arg) {
+  thread_buffer_t *buffer = arg;
+  if (buffer != tls_buffer) return;  // fork 之前的缓冲区，子进程里已经作废
+  flush_buffer(buffer);
+  tls_buffer = NULL;
+  spin_lock(&buffers_lock);
+  buffer->next_free = free_buffers;
+  free_buffers = buffer;
+  live_buffers--;
+  spin_unlock(&buffers_lock);
+}
+
+static thread_buffer_t *acquire_buffer(void) {
+  spin_lock(&buffers_lock);
+  thread_buffer_t *buffer = free_buffers;
+  if (buffer) free_buffers = buffer->next_free;
+  live_buffers++;
+  spin_unlock(&buffers_lock);
+
+  if (!buffer) buffer = map_pages(sizeof(thread_buffer_t));
+  if (!buffer) {
+    spin_lock(&buffers_lock);
+    live_buffers--;
+    spin_unlock(&buffers_lock);
+    return NULL;
+  }
+  buffer->tid = (uint32_t)syscall(SYS_gettid);
+  buffer->count = 0;
+  tls_buffer = buffer;
+  pthread_setspecific(buffer_key, buffer);
+  return buffer;
+}
+
+// 打开跟踪文件并加上 flock。文件正被另一个进程写入时（被跟踪的程序 exec
+// 出的子进程继承了 PRELOAD_TRACE），截断它会让那个进程写映射时收到 SIGBUS，
+// 这时改写 <文件>.<pid>
+static int trace_open_file(const char *path) {
+  snprintf(trace_path, sizeof(trace_path), "%s", path);
+  int fd = open(trace_path, O_RDWR | O_CREAT | O_CLOEXEC, 0644);
+  if (fd >= 0 && flock(fd, LOCK_EX | LOCK_NB) != 0) {
+    close(fd);
+    snprintf(trace_path, sizeof(trace_path), "%s.%d", path, (int)getpid());
+    fd = open(trace_path, O_RDWR | O_CREAT | O_CLOEXEC, 0644);
+    if (fd >= 0 && flock(fd, LOCK_EX | LOCK_NB) != 0) {
+      close(fd);
+      fd = -1;
+    }
+  }
+  if (fd >= 0 && ftruncate(fd, 0) != 0) {
+    close(fd);
+    fd = -1;
+  }
+  return fd;
+}
+
+static void trace_open(const char *path) {
+  trace_fd = trace_open_file(path);
+  if (trace_fd < 0) {
+    fprintf(stderr, "[PRELOAD] cannot open trace file %s\n", trace_path);
+    return;
   }
+  if (pthread_key_create(&buffer_key, release_buffer) != 0 || !trace_window(0)) {
+    close(trace_fd);
+    trace_fd = -1;
+    fprintf(stderr, "[PRELOAD] cannot map trace file %s\n", trace_path);
+    return;
+  }
+  trace_header = (trace_header_t *)trace_windows[0];
+  memcpy(trace_header->magic, "PLTRACE", 8);
+  trace_header->version = TRACE_VERSION;
+  trace_header->record_size = sizeof(trace_record_t);
+  trace_header->start_ns = now_ns(CLOCK_MONOTONIC);
+  trace_header->start_unix_ns = now_ns(CLOCK_REALTIME);
+  trace_header->pid = (uint32_t)getpid();
+  __atomic_store_n(&trace_state, TRACE_ON, __ATOMIC_RELEASE);
+}
+
+// 进程退出时刷出本线程的缓冲区，封住记录区，把文件截到已预留的长度。
+// 这时其他线程可能还在 trace_write/trace_event 中：映射保持不动，
+// 已预留位置的拷贝可以安全完成，封住之后的写入计入 dropped；
+// 仍在运行的线程缓冲区里的记录不刷出（它们可能正在追加），文件标为不完整
+static void trace_close(void) {
+  int expected = TRACE_ON;
+  if (!__atomic_compare_exchange_n(&trace_state, &expected, TRACE_CLOSED, 0,
+                                   __ATOMIC_ACQ_REL, __ATOMIC_ACQUIRE)) {
+    return;
+  }
+
+  thread_buffer_t *own = tls_buffer;
+  if (own) flush_buffer(own);
+  uint64_t used = __atomic_exchange_n(&trace_reserved, TRACE_SEALED, __ATOMIC_ACQ_REL);
+  if (used > TRACE_SEALED - sizeof(trace_header_t)) {
+    used = TRACE_SEALED - sizeof(trace_header_t);
+  }
+
+  spin_lock(&buffers_lock);
+  int others = live_buffers - (own != NULL);
+  spin_unlock(&buffers_lock);
+
+  uint64_t count = __atomic_load_n(&trace_header->record_count, __ATOMIC_ACQUIRE);
+  if (others == 0 && count * sizeof(trace_record_t) == used) {
+    trace_header->flags |= TRACE_COMPLETE;
+  }
+  fprintf(stderr, "[PRELOAD] Trace: %lu records, %lu dropped%s\n",
+          (unsigned long)count, (unsigned long)trace_header->dropped,
+          others ? ", threads still running" : "");
+
+  // 在窗口锁内截断并关闭，正在扩展窗口的线程会看到 trace_fd < 0 而放弃
+  spin_lock(&trace_window_lock);
+  uint64_t size = sizeof(trace_header_t) + used;
+  if (ftruncate(trace_fd, (off_t)size) == 0) {
+    trace_file_size = size;
+  } else {
+    fprintf(stderr, "[PRELOAD] cannot truncate trace file\n");
+  }
+  close(trace_fd);
+  trace_fd = -1;
+  spin_unlock(&trace_window_lock);
+}
+
+// ts 由调用方决定：分配取在原始函数返回之后，释放和 realloc 取在调用之前，
+// 这样一个块被释放后再被别的线程分配到，两条记录按时间排序仍然先后一致
+static void trace_event(int op, uint64_t ts, void *ptr, void *old_ptr,
+                        size_t size, int flags) {
+  thread_buffer_t *buffer = tls_buffer;
+  if (!buffer) {
+    buffer = acquire_buffer();
+    if (!buffer) return;
+  }
+  trace_record_t *r = &buffer->records[buffer->count];
+  r->ts_ns = ts;
+  r->ptr = (uintptr_t)ptr;
+  r->old_ptr = (uintptr_t)old_ptr;
+  r->size = size;
+  r->tid = buffer->tid;
+  r->op = (uint16_t)op;
+  r->flags = (uint16_t)flags;
+  if (++buffer->count == TRACE_BUFFER_RECORDS) flush_buffer(buffer);
+}
+
+static inline int tracing(void) {
+  return __atomic_load_n(&trace_state, __ATOMIC_ACQUIRE) == TRACE_ON;
+}
+
+// ---- fork ----
+
+// fork 前拿住所有锁，子进程里的哈希表和缓冲区链表不会停在修改到一半的状态，
+// 也不会继承一把别的线程持有、永远不会释放的锁
+static void atfork_prepare(void) {
+  for (int s = 0; s < SHARD_COUNT; s++) spin_lock(&shards[s].lock);
+  spin_lock(&buffers_lock);
+  spin_lock(&trace_window_lock);
+}
+
+static void atfork_parent(void) {
+  spin_unlock(&trace_window_lock);
+  spin_unlock(&buffers_lock);
+  for (int s = 0; s < SHARD_COUNT; s++) spin_unlock(&shards[s].lock);
+}
 
-  // 如果找不到记录，说明可能是double free或者free未分配的内存
-  fprintf(stderr,
-          "[PRELOAD] WARNING: Attempting to free untracked pointer: %p\n", ptr);
+// 子进程停止跟踪：它继承的记录区位置和父进程的重叠，析构时还会截断父进程的文件。
+// 只解除映射、关闭描述符；继承来的缓冲区里是父进程尚未刷出的记录，留给父进程
+static void atfork_child(void) {
+  atfork_parent();
+  if (__atomic_load_n(&trace_state, __ATOMIC_ACQUIRE) == TRACE_OFF) return;
+  __atomic_store_n(&trace_state, TRACE_CLOSED, __ATOMIC_RELEASE);
+  for (int i = 0; i < TRACE_MAX_WINDOWS; i++) {
+    if (trace_windows[i]) munmap(trace_windows[i], TRACE_WINDOW_SIZE);
+    trace_windows[i] = NULL;
+  }
+  trace_header = NULL;
+  if (trace_fd >= 0) close(trace_fd);
+  trace_fd = -1;
+  tls_buffer = NULL;
+  free_buffers = NULL;
+  live_buffers = 0;
+}
+
+// 初始化原始函数指针，第一次调用时根据环境变量决定是否进入二进制跟踪模式
+static void init_original_functions() {
+  if (!original_malloc) {
+    original_malloc = dlsym(RTLD_NEXT, "malloc");
+    original_calloc = dlsym(RTLD_NEXT, "calloc");
+    original_realloc = dlsym(RTLD_NEXT, "realloc");
+    original_free = dlsym(RTLD_NEXT, "free");
+  }
+  if (__atomic_load_n(&trace_state, __ATOMIC_ACQUIRE) == TRACE_OFF) {
+    int expected = TRACE_OFF;
+    const char *path = getenv("PRELOAD_TRACE");
+    if (path && *path &&
+        __atomic_compare_exchange_n(&trace_state, &expected, TRACE_STARTING, 0,
+                                    __ATOMIC_ACQ_REL, __ATOMIC_ACQUIRE)) {
+      trace_open(path);
+      if (trace_fd < 0) __atomic_store_n(&trace_state, TRACE_CLOSED, __ATOMIC_RELEASE);
+    }
+  }
 }
 
 // 拦截 malloc
@@ -103,13 +542,14 @@ void *malloc(size_t size) {
   init_original_functions();
 
   void *ptr = original_malloc(size);
-
-  simple_lock();
   add_alloc_record(ptr, size);
-  simple_unlock();
 
-  fprintf(stderr, "[PRELOAD] malloc(%zu) = %p [current: %zu bytes]\n", size,
-          ptr, current_allocated);
+  if (tracing()) {
+    trace_event(OP_MALLOC, now_ns(CLOCK_MONOTONIC), ptr, NULL, size, 0);
+  } else if (trace_state == TRACE_OFF) {
+    fprintf(stderr, "[PRELOAD] malloc(%zu) = %p [current: %zu bytes]\n", size,
+            ptr, current_allocated);
+  }
   return ptr;
 }
 
@@ -118,13 +558,14 @@ void *calloc(size_t nmemb, size_t size) {
   init_original_functions();
 
   void *ptr = original_calloc(nmemb, size);
-
-  simple_lock();
   add_alloc_record(ptr, nmemb * size);
-  simple_unlock();
 
-  fprintf(stderr, "[PRELOAD] calloc(%zu, %zu) = %p [current: %zu bytes]\n",
-          nmemb, size, ptr, current_allocated);
+  if (tracing()) {
+    trace_event(OP_CALLOC, now_ns(CLOCK_MONOTONIC), ptr, NULL, nmemb * size, 0);
+  } else if (trace_state == TRACE_OFF) {
+    fprintf(stderr, "[PRELOAD] calloc(%zu, %zu) = %p [current: %zu bytes]\n",
+            nmemb, size, ptr, current_allocated);
+  }
   return ptr;
 }
 
@@ -132,20 +573,25 @@ void *calloc(size_t nmemb, size_t size) {
 void *realloc(void *ptr, size_t size) {
   init_original_functions();
 
-  simple_lock();
-  if (ptr) {
-    remove_alloc_record(ptr);
+  size_t old_size = 0;
+  int found = remove_alloc_record(ptr, &old_size);
+  if (ptr && !found && trace_state == TRACE_OFF) {
+    fprintf(stderr,
+            "[PRELOAD] WARNING: Attempting to free untracked pointer: %p\n",
+            ptr);
   }
-  simple_unlock();
 
+  uint64_t ts = tracing() ? now_ns(CLOCK_MONOTONIC) : 0;
   void *new_ptr = original_realloc(ptr, size);
-
-  simple_lock();
   add_alloc_record(new_ptr, size);
-  simple_unlock();
 
-  fprintf(stderr, "[PRELOAD] realloc(%p, %zu) = %p [current: %zu bytes]\n", ptr,
-          size, new_ptr, current_allocated);
+  if (tracing()) {
+    trace_event(OP_REALLOC, ts, new_ptr, ptr, size,
+                ptr && !found ? RECORD_UNTRACKED : 0);
+  } else if (trace_state == TRACE_OFF) {
+    fprintf(stderr, "[PRELOAD] realloc(%p, %zu) = %p [current: %zu bytes]\n",
+            ptr, size, new_ptr, current_allocated);
+  }
   return new_ptr;
 }
 
@@ -154,25 +600,36 @@ void free(void *ptr) {
   init_original_functions();
 
   if (!ptr) {
-    fprintf(stderr, "[PRELOAD] free(NULL) - ignored\n");
+    if (trace_state == TRACE_OFF) {
+      fprintf(stderr, "[PRELOAD] free(NULL) - ignored\n");
+    }
     return;
   }
 
-  simple_lock();
-  remove_alloc_record(ptr);
-  simple_unlock();
-
-  fprintf(stderr, "[PRELOAD] free(%p) [current: %zu bytes]\n", ptr,
-          current_allocated);
+  size_t size = 0;
+  int found = remove_alloc_record(ptr, &size);
+  if (tracing()) {
+    trace_event(OP_FREE, now_ns(CLOCK_MONOTONIC), ptr, NULL, size,
+                found ? 0 : RECORD_UNTRACKED);
+  } else if (trace_state == TRACE_OFF) {
+    if (!found) {
+      // 如果找不到记录，说明可能是double free或者free未分配的内存
+      fprintf(stderr,
+              "[PRELOAD] WARNING: Attempting to free untracked pointer: %p\n",
+              ptr);
+    }
+    fprintf(stderr, "[PRELOAD] free(%p) [current: %zu bytes]\n", ptr,
+            current_allocated);
+  }
   original_free(ptr);
 }
 
 // 显示内存统计信息
 static void show_memory_stats() {
   fprintf(stderr, "\n[PRELOAD] === Memory Statistics ===\n");
-  fprintf(stderr, "[PRELOAD] Total allocations: %d\n", total_allocations);
-  fprintf(stderr, "[PRELOAD] Total frees: %d\n", total_frees);
-  fprintf(stderr, "[PRELOAD] Memory leaks: %d allocations\n",
+  fprintf(stderr, "[PRELOAD] Total allocations: %lu\n", total_allocations);
+  fprintf(stderr, "[PRELOAD] Total frees: %lu\n", total_frees);
+  fprintf(stderr, "[PRELOAD] Memory leaks: %lu allocations\n",
           total_allocations - total_frees);
   fprintf(stderr, "[PRELOAD] Total allocated: %zu bytes\n", total_allocated);
   fprintf(stderr, "[PRELOAD] Peak memory usage: %zu bytes\n", peak_allocated);
@@ -180,52 +637,58 @@ static void show_memory_stats() {
           current_allocated);
 }
 
-// 显示内存泄漏详情
-static void show_memory_leaks() {
-  if (!alloc_list) {
-    fprintf(stderr, "[PRELOAD] No memory leaks detected!\n");
-    return;
-  }
-
-  fprintf(stderr, "\n[PRELOAD] === Memory Leaks Detected ===\n");
-  alloc_record_t *current = alloc_list;
-  int leak_count = 0;
+// 显示内存泄漏详情；跟踪模式下只给总数，明细可以从跟踪文件中重建
+static void show_memory_leaks(int details) {
+  uint64_t now = now_ns(CLOCK_MONOTONIC);
+  size_t leak_count = 0;
   size_t leak_size = 0;
 
-  while (current) {
-    struct timeval now;
-    gettimeofday(&now, NULL);
-    double leak_age = (now.tv_sec - current->alloc_time.tv_sec) +
-                      (now.tv_usec - current->alloc_time.tv_usec) / 1000000.0;
-
-    fprintf(stderr, "[PRELOAD] LEAK: %p (%zu bytes, %.2f seconds old)\n",
-            current->ptr, current->size, leak_age);
-    leak_count++;
-    leak_size += current->size;
-    current = current->next;
+  for (int s = 0; s < SHARD_COUNT; s++) {
+    live_shard_t *shard = &shards[s];
+    spin_lock(&shard->lock);
+    for (size_t i = 0; shard->slots && i <= shard->mask; i++) {
+      live_entry_t *e = &shard->slots[i];
+      if (e->ptr <= SLOT_DELETED) continue;
+      if (details) {
+        if (leak_count == 0) {
+          fprintf(stderr, "\n[PRELOAD] === Memory Leaks Detected ===\n");
+        }
+        fprintf(stderr, "[PRELOAD] LEAK: %p (%zu bytes, %.2f seconds old)\n",
+                (void *)e->ptr, e->size, (now - e->alloc_ns) / 1e9);
+      }
+      leak_count++;
+      leak_size += e->size;
+    }
+    spin_unlock(&shard->lock);
   }
 
-  fprintf(stderr, "[PRELOAD] Total leaks: %d allocations, %zu bytes\n",
+  if (leak_count == 0) {
+    fprintf(stderr, "[PRELOAD] No memory leaks detected!\n");
+    return;
+  }
+  fprintf(stderr, "[PRELOAD] Total leaks: %zu allocations, %zu bytes\n",
           leak_count, leak_size);
 }
 
 // 构造函数
 __attribute__((constructor)) static void advanced_preload_init() {
+  init_original_functions();
+  pthread_atfork(atfork_prepare, atfork_parent, atfork_child);
   fprintf(stderr, "[PRELOAD] Advanced Memory Tracker loaded!\n");
-  fprintf(stderr,
-          "[PRELOAD] Tracking malloc, calloc, realloc, and free calls\n");
+  if (tracing()) {
+    fprintf(stderr, "[PRELOAD] Tracing to %s (binary)\n", trace_path);
+  } else {
+    fprintf(stderr,
+            "[PRELOAD] Tracking malloc, calloc, realloc, and free calls\n");
+  }
 }
 
 // 析构函数
 __attribute__((destructor)) static void advanced_preload_fini() {
+  // fork 出的子进程虽然不再跟踪，也不逐个打印从父进程继承来的活跃块
+  int traced = __atomic_load_n(&trace_state, __ATOMIC_ACQUIRE) != TRACE_OFF;
+  trace_close();
   fprintf(stderr, "\n[PRELOAD] Advanced Memory Tracker unloading!\n");
   show_memory_stats();
-  show_memory_leaks();
-
-  // 清理记录链表
-  while (alloc_list) {
-    alloc_record_t *next = alloc_list->next;
-    original_free(alloc_list);
-    alloc_list = next;
-  }
-}
\ No newline at end of file
+  show_memory_leaks(!traced);
+}
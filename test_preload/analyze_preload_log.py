@@ -0,0 +1,598 @@
+"""
+分析 advanced_preload 输出的 [PRELOAD] 日志
+
+libadvanced_preload.so 对每次 malloc/calloc/realloc/free 向 stderr 写一行，
+真实负载下日志可达几个 GB。这里用生成器流水线逐行处理：
+
+    read_lines -> parse_events -> HeapReplay.feed
+
+内存占用是常数（固定大小的直方图和时间线）加上一个 活跃指针 -> (大小, 序号) 的字典，
+从中重建：
+  - 活跃堆大小随时间的变化和峰值
+  - 按 2 的幂分组的大小直方图
+  - 分配的生命周期（日志里没有时间戳，“时间”是分配器调用的序号）
+  - 泄漏候选：结束时仍然活跃的块，按大小分组
+还可以导出紧凑的列式 JSON 摘要，用 --compare 和另一次运行对比。
+
+用法：
+    LD_PRELOAD=./libadvanced_preload.so ./app 2> preload.log
+    python analyze_preload_log.py preload.log
+    python analyze_preload_log.py preload.log.gz --summary run2.json --compare run1.json
+    ./app 2>&1 >/dev/null | python analyze_preload_log.py -
+
+PRELOAD_TRACE 写出的二进制跟踪文件也可以作为输入（需要 numpy，见 preload_trace.py），
+和同一次运行的 stderr 日志一起传入时，shim 的统计从日志中读取：
+    python analyze_preload_log.py trace.bin preload.log --check
+多线程的跟踪按时间戳重放，峰值和 shim 的计数器可能略有出入，--check 只把它当作近似值提示。
+"""
+
+import argparse
+import gzip
+import json
+import sys
+
+from rich import box
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+
+console = Console()
+
+PREFIX = b"[PRELOAD] "
+
+MALLOC, CALLOC, REALLOC, FREE = range(4)
+OP_NAMES = ("malloc", "calloc", "realloc", "free")
+
+# 直方图按 2 的幂分组：第 i 组是 [2^(i-1), 2^i)，第 0 组只有 0
+HIST_BUCKETS = 65
+# 时间线最多保留这么多个点，超过时相邻两点合并、分辨率减半
+TIMELINE_POINTS = 1024
+SPARK = "▁▂▃▄▅▆▇█"
+
+SUMMARY_FORMAT = "preload-heap-summary"
+SUMMARY_VERSION = 1
+
+
+# ---- 读取和解析 ----
+
+
+def read_lines(paths):
+    """依次产出各个文件中的行（bytes），.gz 自动解压，"-" 表示标准输入"""
+    for path in paths:
+        if path == "-":
+            yield from sys.stdin.buffer
+            continue
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as f:
+            yield from f
+
+
+def _ptr(token):
+    # glibc 的 %p 把空指针打印成 (nil)
+    return 0 if token == b"(nil)" else int(token, 16)
+
+
+def parse_events(lines, footer=None):
+    """
+    把日志行解析成 (操作, 指针, 大小, 原指针) 元组
+    只认 malloc/calloc/realloc/free 四种调用行；其他 [PRELOAD] 行里
+    “Total leaks” 这样的汇总写入 footer（dict），多线程交错导致的残行计入 footer["malformed"]
+    """
+    if footer is None:
+        footer = {}
+    footer.setdefault("malformed", 0)
+    prefix_len = len(PREFIX)
+    for line in lines:
+        if not line.startswith(PREFIX):
+            continue
+        body = line[prefix_len:]
+        try:
+            if body.startswith(b"malloc("):
+                size, _, rest = body[7:].partition(b") = ")
+                yield MALLOC, _ptr(rest.split(None, 1)[0]), int(size), 0
+            elif body.startswith(b"free("):
+                if body.startswith(b"free(NULL)"):
+                    continue
+                yield FREE, _ptr(body[5:].partition(b")")[0]), 0, 0
+            elif body.startswith(b"calloc("):
+                args, _, rest = body[7:].partition(b") = ")
+                nmemb, _, size = args.partition(b", ")
+                yield CALLOC, _ptr(rest.split(None, 1)[0]), int(nmemb) * int(size), 0
+            elif body.startswith(b"realloc("):
+                args, _, rest = body[8:].partition(b") = ")
+                old, _, size = args.partition(b", ")
+                yield REALLOC, _ptr(rest.split(None, 1)[0]), int(size), _ptr(old)
+            elif body.startswith(b"Total leaks: "):
+                count, _, rest = body[13:].partition(b" allocations, ")
+                footer["leaks"] = int(count)
+                footer["leak_bytes"] = int(rest.split(None, 1)[0])
+            elif body.startswith(b"Peak memory usage: "):
+                footer["peak_bytes"] = int(body[19:].split(None, 1)[0])
+        except (ValueError, IndexError):
+            footer["malformed"] += 1
+
+
+def read_events(paths, footer):
+    """依次产出各个输入中的事件：二进制跟踪文件直接解码，其余按文本日志解析"""
+    for path in paths:
+        if path != "-" and not path.endswith(".gz"):
+            from preload_trace import is_trace, open_trace
+
+            if is_trace(path):
+                with open_trace(path) as trace:
+                    threads = trace.thread_count()
+                    footer["trace_threads"] = max(
+                        footer.get("trace_threads", 0), threads
+                    )
+                    yield from trace.iter_events()
+                continue
+        yield from parse_events(read_lines([path]), footer)
+
+
+# ---- 重建堆状态 ----
+
+
+def _bucket_floor(i):
+    return 0 if i == 0 else 1 << (i - 1)
+
+
+class Timeline:
+    """
+    活跃字节数随事件序号的变化，固定点数：每个点记录一段序号内的最大值，
+    点数超过上限时相邻两点合并，每点覆盖的序号数翻倍
+    """
+
+    def __init__(self, points=TIMELINE_POINTS):
+        self.points = points
+        self.width = 1
+        self.maxima = []
+
+    def record(self, seq, live):
+        i = seq // self.width
+        if i >= self.points:
+            self._halve()
+            i = seq // self.width
+        if i < len(self.maxima):
+            self.maxima[i] = max(self.maxima[i], live)
+        else:
+            # 中间没有事件的点沿用前一个值
+            last = self.maxima[-1] if self.maxima else 0
+            self.maxima.extend([last] * (i - len(self.maxima)))
+            self.maxima.append(live)
+
+    def _halve(self):
+        m = self.maxima
+        self.maxima = [max(m[i : i + 2]) for i in range(0, len(m), 2)]
+        self.width *= 2
+
+    def columns(self):
+        return {
+            "seq": [i * self.width for i in range(len(self.maxima))],
+            "live_bytes": list(self.maxima),
+        }
+
+
+class HeapReplay:
+    """按顺序重放分配事件，维护活跃块和各项统计"""
+
+    def __init__(self, timeline_points=TIMELINE_POINTS):
+        self.live = {}  # 指针 -> (大小, 分配时的序号)
+        self.seq = 0
+        self.live_bytes = 0
+        self.peak_bytes = 0
+        self.peak_seq = 0
+        self.total_bytes = 0
+        self.calls = [0, 0, 0, 0]
+        self.failed = 0  # 返回 NULL 的分配
+        self.untracked_frees = 0  # 释放未记录的指针：重复释放或跟踪开始前分配的
+        self.size_allocs = [0] * HIST_BUCKETS
+        self.size_bytes = [0] * HIST_BUCKETS
+        self.lifetime_count = [0] * HIST_BUCKETS
+        self.lifetime_bytes = [0] * HIST_BUCKETS
+        self.timeline = Timeline(timeline_points)
+
+    def _retire(self, entry, seq):
+        """一个块在 seq 处被释放：记入生命周期直方图，返回它的大小"""
+        size, born = entry
+        b = (seq - born).bit_length()
+        self.lifetime_count[b] += 1
+        self.lifetime_bytes[b] += size
+        return size
+
+    def feed(self, events):
+        """
+        消费 parse_events 产出的事件，返回 self 便于链式调用
+        每行日志都要经过这里，分配、释放和时间线的更新都内联在循环里，
+        状态放在局部变量中，结束时写回
+        """
+        live = self.live
+        calls = self.calls
+        size_allocs, size_bytes = self.size_allocs, self.size_bytes
+        timeline = self.timeline
+        seq = self.seq
+        live_bytes = self.live_bytes
+        peak_bytes, peak_seq = self.peak_bytes, self.peak_seq
+        total_bytes = self.total_bytes
+        failed = self.failed
+        untracked = self.untracked_frees
+        # 时间线当前点的结束序号和其中的最大值，跨点时才写入 timeline
+        point_end = seq
+        point_max = 0
+
+        for op, ptr, size, old in events:
+            calls[op] += 1
+            if op == FREE:
+                release = ptr
+                ptr = 0
+            elif op == REALLOC:
+                # realloc 失败（返回 NULL 且 size > 0）时原来的块仍然有效
+                release = old if ptr or size == 0 else 0
+                if not ptr and size:
+                    failed += 1
+            else:
+                release = 0
+                if not ptr:
+                    failed += 1
+            if release:
+                entry = live.pop(release, None)
+                if entry is None:
+                    untracked += 1
+                else:
+                    live_bytes -= self._retire(entry, seq)
+
+            if ptr:
+                entry = live.get(ptr)
+                if entry is not None:
+                    # 同一地址没有对应的 free 就再次分配，说明中间的 free 行丢失了
+                    live_bytes -= self._retire(entry, seq)
+                live[ptr] = (size, seq)
+                live_bytes += size
+                total_bytes += size
+                b = size.bit_length()
+                size_allocs[b] += 1
+                size_bytes[b] += size
+                if live_bytes > peak_bytes:
+                    peak_bytes = live_bytes
+                    peak_seq = seq
+
+            if seq >= point_end:
+                timeline.record(seq, live_bytes)
+                point_end = (seq // timeline.width + 1) * timeline.width
+                point_max = live_bytes
+            elif live_bytes > point_max:
+                timeline.record(seq, live_bytes)
+                point_max = live_bytes
+            seq += 1
+
+        self.seq = seq
+        self.live_bytes = live_bytes
+        self.peak_bytes, self.peak_seq = peak_bytes, peak_seq
+        self.total_bytes = total_bytes
+        self.failed = failed
+        self.untracked_frees = untracked
+        return self
+
+    def leak_groups(self, limit=None):
+        """结束时仍活跃的块按大小分组：[(大小, 块数, 字节数, 最早分配序号)]，按字节数降序"""
+        groups = {}
+        for size, born in self.live.values():
+            g = groups.get(size)
+            if g is None:
+                groups[size] = [1, size, born]
+            else:
+                g[0] += 1
+                g[1] += size
+                g[2] = min(g[2], born)
+        rows = sorted(
+            ((size, n, nbytes, born) for size, (n, nbytes, born) in groups.items()),
+            key=lambda r: (-r[2], r[3]),
+        )
+        return rows[:limit] if limit else rows
+
+
+# ---- 列式摘要 ----
+
+
+def _histogram_columns(key, counts, nbytes, count_name):
+    used = [i for i in range(HIST_BUCKETS) if counts[i]]
+    return {
+        key: [_bucket_floor(i) for i in used],
+        count_name: [counts[i] for i in used],
+        "bytes": [nbytes[i] for i in used],
+    }
+
+
+def build_summary(replay, sources, footer, leak_limit=100):
+    """
+    紧凑的列式摘要：每张表是 {列名: [值, ...]}，便于比较和用 pandas/numpy 直接加载
+    """
+    leaks = replay.leak_groups(leak_limit)
+    return {
+        "format": SUMMARY_FORMAT,
+        "version": SUMMARY_VERSION,
+        "sources": list(sources),
+        # 多线程的二进制跟踪按各次调用的时间戳排序，和 shim 里计数器的更新顺序不完全一致
+        "trace_threads": footer.get("trace_threads", 0),
+        "totals": {
+            "events": replay.seq,
+            **{name: replay.calls[op] for op, name in enumerate(OP_NAMES)},
+            "failed": replay.failed,
+            "untracked_frees": replay.untracked_frees,
+            "allocated_bytes": replay.total_bytes,
+            "peak_bytes": replay.peak_bytes,
+            "peak_seq": replay.peak_seq,
+            "live_blocks": len(replay.live),
+            "live_bytes": replay.live_bytes,
+            "malformed_lines": footer.get("malformed", 0),
+        },
+        "shim_reported": {
+            k: footer[k] for k in ("leaks", "leak_bytes", "peak_bytes") if k in footer
+        },
+        "timeline": replay.timeline.columns(),
+        "size_classes": _histogram_columns(
+            "min_size", replay.size_allocs, replay.size_bytes, "allocs"
+        ),
+        "lifetimes": _histogram_columns(
+            "min_ops", replay.lifetime_count, replay.lifetime_bytes, "frees"
+        ),
+        "leaks": {
+            "size": [r[0] for r in leaks],
+            "blocks": [r[1] for r in leaks],
+            "bytes": [r[2] for r in leaks],
+            "first_seq": [r[3] for r in leaks],
+        },
+    }
+
+
+def check_against_shim(summary):
+    """
+    把重放结果和 shim 退出时自己打印的统计对比，返回 (不一致项, 说明)
+    多个线程的二进制跟踪按时间戳重放，几乎同时发生的分配和释放顺序可能与 shim 的
+    原子计数器不同，峰值只是近似值，不同时只作说明；结束时的泄漏数与顺序无关
+    """
+    totals = summary["totals"]
+    shim = summary["shim_reported"]
+    approximate_peak = summary.get("trace_threads", 0) > 1
+    mismatches = []
+    notes = []
+    if not shim:
+        mismatches.append("no shim statistics found in the log")
+    for key, ours in (
+        ("leaks", "live_blocks"),
+        ("leak_bytes", "live_bytes"),
+        ("peak_bytes", "peak_bytes"),
+    ):
+        if key not in shim or shim[key] == totals[ours]:
+            continue
+        message = f"shim {key}={shim[key]}, replay {ours}={totals[ours]}"
+        if key == "peak_bytes" and approximate_peak:
+            notes.append(
+                f"{message} (approximate: trace from "
+                f"{summary['trace_threads']} threads)"
+            )
+        else:
+            mismatches.append(message)
+    return mismatches, notes
+
+
+def load_summary(path):
+    with open(path) as f:
+        summary = json.load(f)
+    if summary.get("format") != SUMMARY_FORMAT:
+        raise ValueError(f"{path}: not a {SUMMARY_FORMAT} file")
+    return summary
+
+
+# ---- 输出 ----
+
+
+def sparkline(values, width=64):
+    """把时间线压缩到 width 个字符，每个字符取对应区间的最大值"""
+    if not values:
+        return ""
+    step = max(1, -(-len(values) // width))
+    maxima = [max(values[i : i + step]) for i in range(0, len(values), step)]
+    top = max(maxima) or 1
+    return "".join(
+        SPARK[min(len(SPARK) - 1, v * len(SPARK) // (top + 1))] for v in maxima
+    )
+
+
+def _histogram_table(title, columns, key, count_name, label):
+    table = Table(title=title, box=box.ROUNDED, header_style="bold magenta")
+    table.add_column(label, justify="right", style="green")
+    table.add_column(count_name.capitalize(), justify="right")
+    table.add_column("Bytes", justify="right")
+    table.add_column("", style="cyan")
+    counts = columns[count_name]
+    top = max(counts, default=0) or 1
+    for floor, count, nbytes in zip(columns[key], counts, columns["bytes"]):
+        upper = floor * 2 if floor else 1
+        table.add_row(
+            f"{floor}-{upper - 1}" if upper - 1 > floor else str(floor),
+            str(count),
+            str(nbytes),
+            "█" * max(1, count * 30 // top),
+        )
+    return table
+
+
+def print_report(summary, limit):
+    t = summary["totals"]
+    shim = summary["shim_reported"]
+    lines = [
+        (
+            f"Events: [bold]{t['events']}[/bold] "
+            f"(malloc {t['malloc']}, calloc {t['calloc']}, "
+            f"realloc {t['realloc']}, free {t['free']})"
+        ),
+        (
+            f"Allocated: [bold]{t['allocated_bytes']}[/bold] bytes, "
+            f"peak live: [bold yellow]{t['peak_bytes']}[/bold yellow] bytes "
+            f"at event {t['peak_seq']}"
+        ),
+        f"Live at exit: [bold]{t['live_blocks']}[/bold] blocks, {t['live_bytes']} bytes",
+    ]
+    if t["untracked_frees"] or t["failed"] or t["malformed_lines"]:
+        lines.append(
+            f"[red]Untracked frees: {t['untracked_frees']}, failed allocations: "
+            f"{t['failed']}, malformed lines: {t['malformed_lines']}[/red]"
+        )
+    if "leaks" in shim and shim["leaks"] != t["live_blocks"]:
+        lines.append(
+            f"[red]Shim reported {shim['leaks']} leaks, replay found "
+            f"{t['live_blocks']}[/red]"
+        )
+    lines.append(f"Live heap: {sparkline(summary['timeline']['live_bytes'])}")
+    console.print(
+        Panel(
+            "\n".join(lines),
+            title="[bold blue]Heap Summary[/bold blue]",
+            box=box.DOUBLE,
+        )
+    )
+
+    console.print(
+        _histogram_table(
+            "Allocation sizes", summary["size_classes"], "min_size", "allocs", "Size"
+        )
+    )
+    console.print(
+        _histogram_table(
+            "Lifetimes (allocator calls until free)",
+            summary["lifetimes"],
+            "min_ops",
+            "frees",
+            "Calls",
+        )
+    )
+
+    leaks = summary["leaks"]
+    if not leaks["size"]:
+        console.print("[green]No live allocations at exit")
+        return
+    table = Table(
+        title="Leak candidates (live at exit, grouped by size)",
+        box=box.ROUNDED,
+        header_style="bold magenta",
+    )
+    table.add_column("Size", justify="right", style="green")
+    table.add_column("Blocks", justify="right")
+    table.add_column("Bytes", justify="right", style="yellow")
+    table.add_column("First event", justify="right")
+    for row in list(zip(*leaks.values()))[:limit]:
+        table.add_row(*(str(v) for v in row))
+    console.print(table)
+
+
+def _delta(new, old):
+    d = new - old
+    if not d:
+        return "[dim]0[/dim]"
+    pct = f" ({d * 100 / old:+.1f}%)" if old else ""
+    style = "red" if d > 0 else "green"
+    return f"[{style}]{d:+d}{pct}[/{style}]"
+
+
+def print_comparison(summary, base):
+    table = Table(
+        title=f"{', '.join(base['sources'])} -> {', '.join(summary['sources'])}",
+        box=box.ROUNDED,
+        header_style="bold magenta",
+    )
+    table.add_column("Metric", style="green")
+    table.add_column("Base", justify="right")
+    table.add_column("Current", justify="right")
+    table.add_column("Δ", justify="right")
+    for key, value in summary["totals"].items():
+        old = base["totals"].get(key, 0)
+        if key == "peak_seq" or (not value and not old):
+            continue
+        table.add_row(key, str(old), str(value), _delta(value, old))
+    console.print(table)
+
+    table = Table(
+        title="Allocation sizes", box=box.ROUNDED, header_style="bold magenta"
+    )
+    table.add_column("Size", justify="right", style="green")
+    table.add_column("Allocs", justify="right")
+    table.add_column("Δ allocs", justify="right")
+    table.add_column("Bytes", justify="right")
+    table.add_column("Δ bytes", justify="right")
+    new = {
+        k: (a, b)
+        for k, a, b in zip(
+            *(summary["size_classes"][c] for c in ("min_size", "allocs", "bytes"))
+        )
+    }
+    old = {
+        k: (a, b)
+        for k, a, b in zip(
+            *(base["size_classes"][c] for c in ("min_size", "allocs", "bytes"))
+        )
+    }
+    for floor in sorted(set(new) | set(old)):
+        a, b = new.get(floor, (0, 0))
+        oa, ob = old.get(floor, (0, 0))
+        table.add_row(str(floor), str(a), _delta(a, oa), str(b), _delta(b, ob))
+    console.print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Analyze [PRELOAD] allocation logs from libadvanced_preload.so"
+    )
+    parser.add_argument(
+        "logs",
+        nargs="+",
+        help="Log files (.gz supported, '-' for stdin) or PRELOAD_TRACE binary traces",
+    )
+    parser.add_argument("--summary", help="Write the columnar JSON summary here")
+    parser.add_argument(
+        "--compare", metavar="SUMMARY", help="Compare against an earlier summary"
+    )
+    parser.add_argument(
+        "--limit", type=int, default=20, help="Number of leak candidates to show"
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print the summary as JSON instead"
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Exit with status 1 if the replay disagrees with the shim's own "
+        "leak and peak report",
+    )
+    args = parser.parse_args()
+
+    footer = {}
+    try:
+        base = load_summary(args.compare) if args.compare else None
+        replay = HeapReplay().feed(read_events(args.logs, footer))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    summary = build_summary(replay, args.logs, footer)
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, separators=(",", ":"))
+    if args.json:
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(summary, args.limit)
+        if base is not None:
+            print_comparison(summary, base)
+    if args.check:
+        mismatches, notes = check_against_shim(summary)
+        for message in notes:
+            print(f"Note: {message}", file=sys.stderr)
+        for message in mismatches:
+            print(f"Mismatch: {message}", file=sys.stderr)
+        if mismatches:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
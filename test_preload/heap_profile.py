@@ -0,0 +1,328 @@
+"""
+符号化 sampling_preload 写出的堆 profile，汇总成火焰图可用的折叠调用栈
+
+    PRELOAD_PROFILE=/tmp/app LD_PRELOAD=./libsampling_preload.so ./app
+    PRELOAD_PROFILE_SIGNAL=12 PRELOAD_PROFILE=/tmp/app LD_PRELOAD=... ./app &
+    kill -USR2 <pid>                        # 运行中再写一份 /tmp/app.<pid>.<序号>.heap
+
+profile 是 gperftools 的 heap_v2 格式：每个调用栈一行采样计数，后面附带写出时的
+/proc/self/maps。这里的处理：
+  - 换算：采样值按 pprof 的方法放大，一个平均大小为 s 的样本代表
+    1 / (1 - exp(-s / rate)) 次分配
+  - 符号化：按映射找到地址所在的文件，用 proc_maps.load_bias 算出装载偏移，
+    在 .symtab 和 .dynsym 的函数符号中二分查找（经由 elf_cache，可共享缓存）；
+    返回地址减 1 再查，落在调用指令上
+  - 输出：最热的分配点，或者 --folded 输出 “根;...;分配点 数值” 格式的折叠栈，
+    可以直接交给 flamegraph.pl / speedscope / inferno
+
+用法：
+    python heap_profile.py /tmp/app.1234.0003.heap
+    python heap_profile.py /tmp/app.1234.0003.heap -m alloc_space --folded > alloc.folded
+    python heap_profile.py /tmp/app.1234.0003.heap --base /tmp/app.1234.0001.heap   # 两次之间的增长
+    flamegraph.pl alloc.folded > alloc.svg
+"""
+
+import argparse
+import bisect
+import math
+import os
+import sys
+from collections import Counter
+
+from rich import box
+from rich.console import Console
+from rich.markup import escape
+from rich.table import Table
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+)
+from elf_cache import DEFAULT_CACHE_DIR, ELFCache, open_elf
+from elf_reader import ELFError
+from proc_maps import load_bias, parse_maps
+from textfmt import demangle, human_size
+
+console = Console()
+
+HEADER_PREFIX = b"heap profile:"
+MAPS_MARKER = b"MAPPED_LIBRARIES:"
+# 与 pprof 的 sample 类型同名；每行依次是 在用块数、在用字节、累计块数、累计字节
+METRICS = ("inuse_objects", "inuse_space", "alloc_objects", "alloc_space")
+FUNCTION_TYPES = ("STT_FUNC", "STT_GNU_IFUNC")
+
+
+class HeapProfile:
+    """一份堆 profile：rate、每个调用栈的四个采样值和写出时的映射"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            data = f.read()
+        head, _, maps = data.partition(MAPS_MARKER)
+        lines = head.splitlines()
+        if not lines or not lines[0].startswith(HEADER_PREFIX):
+            raise ValueError(f"{path}: not a heap profile")
+        kind = lines[0].rpartition(b"@")[2].strip()
+        if not kind.startswith(b"heap_v2/"):
+            raise ValueError(f"{path}: unsupported profile type {kind.decode()}")
+        self.rate = int(kind[8:])
+        self.mappings = parse_maps(maps)
+        # [(在用块数, 在用字节, 累计块数, 累计字节), (返回地址, ...)]
+        self.stacks = []
+        for line in lines[1:]:
+            counts, sep, frames = line.partition(b"@")
+            if not sep:
+                continue
+            fields = counts.replace(b"[", b" ").replace(b"]", b" ").replace(b":", b" ")
+            values = tuple(int(v) for v in fields.split())
+            if len(values) != 4:
+                raise ValueError(f"{path}: malformed stack line: {line.decode()}")
+            self.stacks.append((values, tuple(int(pc, 16) for pc in frames.split())))
+
+    def _scale(self, count, nbytes):
+        # 和 pprof 的 heap_v2 换算一致
+        if count == 0 or self.rate <= 1:
+            return count, nbytes
+        scale = 1 / (1 - math.exp(-(nbytes / count) / self.rate))
+        return count * scale, nbytes * scale
+
+    def estimates(self):
+        """产出 ({指标: 估计值}, 返回地址元组)"""
+        for (live_n, live_b, alloc_n, alloc_b), pcs in self.stacks:
+            live = self._scale(live_n, live_b)
+            alloc = self._scale(alloc_n, alloc_b)
+            yield dict(zip(METRICS, (*live, *alloc))), pcs
+
+
+class Symbolizer:
+    """把进程中的地址翻译成 “函数名” 或 “文件名+偏移”，每个文件的符号表只读一次"""
+
+    def __init__(self, mappings, cache=None):
+        self.cache = cache
+        self.mappings = sorted(mappings, key=lambda m: m.start)
+        self.starts = [m.start for m in self.mappings]
+        self._by_path = {}
+        for m in self.mappings:
+            if m.inode and m.path.startswith("/"):
+                self._by_path.setdefault(m.path, []).append(m)
+        self._objects = {}
+        self._frames = {}
+
+    def _load(self, path):
+        """返回 (装载偏移, 起始地址列表, 结束地址列表, 名字列表)，读不了时返回 None"""
+        try:
+            with open_elf(path, self.cache) as elf:
+                bias = load_bias(elf.segments, self._by_path[path])
+                if bias is None:
+                    return None
+                symbols = {}
+                for name in (".symtab", ".dynsym"):
+                    section = elf.get_section_by_name(name)
+                    if section is None:
+                        continue
+                    for sym in elf.iter_symbols(section):
+                        if (
+                            sym.type in FUNCTION_TYPES
+                            and sym.st_value
+                            and sym.st_shndx != "SHN_UNDEF"
+                        ):
+                            # .symtab 在前，同一地址优先用它的名字
+                            symbols.setdefault(sym.st_value, (sym.st_size, sym.name))
+        except (OSError, ELFError):
+            return None
+        starts = sorted(symbols)
+        ends = []
+        for i, addr in enumerate(starts):
+            size = symbols[addr][0]
+            # 大小为 0 的符号（手写汇编）延伸到下一个符号
+            if not size:
+                size = starts[i + 1] - addr if i + 1 < len(starts) else 1
+            ends.append(addr + size)
+        return bias, starts, ends, [symbols[a][1] for a in starts]
+
+    def frame(self, pc):
+        name = self._frames.get(pc)
+        if name is None:
+            name = self._frames[pc] = self._symbolize(pc)
+        return name
+
+    def _symbolize(self, pc):
+        i = bisect.bisect_right(self.starts, pc) - 1
+        if i < 0 or pc >= self.mappings[i].end:
+            return f"0x{pc:x}"
+        mapping = self.mappings[i]
+        if mapping.path not in self._by_path:
+            return f"[{mapping.path or 'anon'}] 0x{pc:x}"
+        if mapping.path not in self._objects:
+            self._objects[mapping.path] = self._load(mapping.path)
+        obj = self._objects[mapping.path]
+        base = os.path.basename(mapping.path)
+        if obj is None:
+            return f"{base}+0x{pc - mapping.start + mapping.offset:x}"
+
+        bias, starts, ends, names = obj
+        vaddr = pc - 1 - bias  # 返回地址的下一条指令可能已经属于别的函数
+        j = bisect.bisect_right(starts, vaddr) - 1
+        if j >= 0 and vaddr < ends[j]:
+            return names[j]
+        return f"{base}+0x{vaddr + 1:x}"
+
+
+def fold(profile, symbolizer, metric):
+    """按符号化后的调用栈汇总：{(根, ..., 分配点): 估计值}"""
+    folded = Counter()
+    for values, pcs in profile.estimates():
+        if values[metric]:
+            frames = tuple(symbolizer.frame(pc) for pc in reversed(pcs))
+            folded[frames] += values[metric]
+    return folded
+
+
+def subtract(folded, base):
+    """两份 profile 之差，只保留增长的调用栈"""
+    result = Counter()
+    for frames, value in folded.items():
+        delta = value - base.get(frames, 0)
+        if delta > 0:
+            result[frames] = delta
+    return result
+
+
+def demangle_frames(folded):
+    names = sorted({name for frames in folded for name in frames})
+    mapping = dict(zip(names, demangle(names)))
+    result = Counter()
+    for frames, value in folded.items():
+        result[tuple(mapping[name] for name in frames)] += value
+    return result
+
+
+def write_folded(folded, out):
+    for frames, value in sorted(folded.items(), key=lambda kv: -kv[1]):
+        n = round(value)
+        if n > 0:
+            # 折叠格式用 ";" 分隔帧，数值在最后一个空格之后，帧名里只需替换分号
+            names = (f.replace(";", ":") for f in frames)
+            out.write(f"{';'.join(names) or '[unknown]'} {n}\n")
+
+
+def _format(value, metric):
+    return human_size(round(value)) if metric.endswith("space") else f"{value:,.0f}"
+
+
+def print_top(profile, folded, metric, limit):
+    total = sum(folded.values())
+    console.print(
+        f"[bold]Heap profile:[/bold] {profile.path} "
+        f"(1 sample per {human_size(profile.rate)}B, {len(profile.stacks)} stacks)"
+    )
+    console.print(f"Total {metric}: {_format(total, metric)}")
+
+    leaf = Counter()
+    cumulative = Counter()
+    for frames, value in folded.items():
+        if frames:
+            leaf[frames[-1]] += value
+        for name in set(frames):
+            cumulative[name] += value
+
+    table = Table(title=f"Top allocation sites by {metric}", box=box.SIMPLE)
+    table.add_column("Flat", justify="right")
+    table.add_column("Flat%", justify="right")
+    table.add_column("Cum", justify="right")
+    table.add_column("Cum%", justify="right")
+    table.add_column("Function")
+    for name, value in leaf.most_common(limit):
+        table.add_row(
+            _format(value, metric),
+            f"{value * 100 / total:.1f}%" if total else "-",
+            _format(cumulative[name], metric),
+            f"{cumulative[name] * 100 / total:.1f}%" if total else "-",
+            escape(name),
+        )
+    console.print(table)
+
+    table = Table(title="Top callers (cumulative)", box=box.SIMPLE)
+    table.add_column("Cum", justify="right")
+    table.add_column("Cum%", justify="right")
+    table.add_column("Function")
+    for name, value in cumulative.most_common(limit):
+        table.add_row(
+            _format(value, metric),
+            f"{value * 100 / total:.1f}%" if total else "-",
+            escape(name),
+        )
+    console.print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Symbolize heap profiles from libsampling_preload.so and "
+        "fold them into flamegraph stacks"
+    )
+    parser.add_argument("profile", help="Heap profile (<prefix>.<pid>.<seq>.heap)")
+    parser.add_argument(
+        "--base", help="Subtract an earlier profile of the same process"
+    )
+    parser.add_argument(
+        "-m",
+        "--metric",
+        choices=METRICS,
+        default="inuse_space",
+        help="Value to report (default: inuse_space)",
+    )
+    parser.add_argument(
+        "--folded",
+        nargs="?",
+        const="-",
+        metavar="FILE",
+        help="Write folded stacks for flamegraph.pl (default: stdout)",
+    )
+    parser.add_argument(
+        "-n", "--limit", type=int, default=20, help="Number of functions to show"
+    )
+    parser.add_argument(
+        "-C", "--demangle", action="store_true", help="Demangle C++ symbol names"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help=f"Shared cache of parsed ELF metadata (default: {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Do not read or write the cache"
+    )
+    parser.add_argument(
+        "--write-cache",
+        action="store_true",
+        help="Also store newly parsed files in the cache (default: only read it)",
+    )
+    args = parser.parse_args()
+
+    cache = None if args.no_cache else ELFCache(args.cache_dir, write=args.write_cache)
+    try:
+        profile = HeapProfile(args.profile)
+        folded = fold(profile, Symbolizer(profile.mappings, cache), args.metric)
+        if args.base:
+            base = HeapProfile(args.base)
+            folded = subtract(
+                folded, fold(base, Symbolizer(base.mappings, cache), args.metric)
+            )
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.demangle:
+        folded = demangle_frames(folded)
+
+    if args.folded == "-":
+        write_folded(folded, sys.stdout)
+    elif args.folded:
+        with open(args.folded, "w") as f:
+            write_folded(folded, f)
+        console.print(f"Folded stacks written to {args.folded}")
+    else:
+        print_top(profile, folded, args.metric, args.limit)
+
+
+if __name__ == "__main__":
+    main()
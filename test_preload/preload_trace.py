@@ -0,0 +1,301 @@
+"""
+读取 advanced_preload 的二进制跟踪文件
+
+    PRELOAD_TRACE=trace.bin LD_PRELOAD=./libadvanced_preload.so ./app
+
+文件是 64 字节的头加上定长 40 字节的记录（布局见 advanced_preload.c 中的
+trace_header_t / trace_record_t）。这里把文件 mmap 进来，用 np.frombuffer
+直接把记录区当作结构化数组，不做拷贝，几 GB 的跟踪也能立即打开。
+
+每个线程先写自己的缓冲区，再整批刷进文件，所以文件中的记录只在单个线程内
+按时间有序；ordered() 按时间戳重排。分配记录的时间戳取在原始 malloc 返回之后，
+释放和 realloc 记录的时间戳取在原始函数调用之前，因此一个块被释放、再被别的线程
+分配到时，两条记录按时间排序后仍然先后一致。
+
+iter_chunks() 只对时间戳排序得到下标（每条记录 8 字节），记录按块从映射中取出，
+不像 ordered() 那样拷贝整个记录区。
+
+用法：
+    python preload_trace.py trace.bin
+    python preload_trace.py trace.bin --json
+    python analyze_preload_log.py trace.bin preload.log   # 重放堆状态，日志里有 shim 的统计
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+from rich import box
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+)
+from textfmt import human_size
+
+console = Console()
+
+MAGIC = b"PLTRACE\0"
+TRACE_VERSION = 1
+TRACE_COMPLETE = 0x1
+RECORD_UNTRACKED = 0x1
+
+# magic, version, record_size, record_count, dropped, start_ns, start_unix_ns, pid, flags
+HEADER = struct.Struct("<8sIIQQQQII8x")
+
+RECORD_DTYPE = np.dtype(
+    [
+        ("ts_ns", "<u8"),
+        ("ptr", "<u8"),
+        ("old_ptr", "<u8"),
+        ("size", "<u8"),
+        ("tid", "<u4"),
+        ("op", "<u2"),
+        ("flags", "<u2"),
+    ]
+)
+
+# 与 analyze_preload_log 中的操作编号一致
+OP_NAMES = ("malloc", "calloc", "realloc", "free")
+FREE = 3
+
+# iter_events 每次从数组转换这么多条记录为 Python 对象
+EVENT_CHUNK = 65536
+
+
+def is_trace(path):
+    """文件是否以跟踪文件的 magic 开头"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class TraceFile:
+    """一个映射到内存的跟踪文件，records 是指向文件内容的只读结构化数组"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < HEADER.size:
+            self._mm.close()
+            raise ValueError(f"{path}: too short for a trace header")
+
+        (
+            magic,
+            self.version,
+            record_size,
+            count,
+            self.dropped,
+            self.start_ns,
+            self.start_unix_ns,
+            self.pid,
+            self.flags,
+        ) = HEADER.unpack_from(self._mm)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path}: not a preload trace file")
+        if self.version != TRACE_VERSION or record_size != RECORD_DTYPE.itemsize:
+            self._mm.close()
+            raise ValueError(
+                f"{path}: unsupported trace version {self.version} "
+                f"(record size {record_size})"
+            )
+
+        available = (len(self._mm) - HEADER.size) // RECORD_DTYPE.itemsize
+        if self.complete:
+            count = min(count, available)
+        else:
+            # 进程没有正常退出或退出时还有线程在写：各线程预留的位置不按顺序写完，
+            # 记录可能在头里的计数之外，已预留但没写完的位置是全零
+            count = available
+        records = np.frombuffer(
+            self._mm, dtype=RECORD_DTYPE, count=count, offset=HEADER.size
+        )
+        if not self.complete:
+            records = records[records["ts_ns"] != 0]
+        self.records = records
+
+    @property
+    def complete(self):
+        return bool(self.flags & TRACE_COMPLETE)
+
+    def thread_count(self):
+        """写过记录的线程数"""
+        return len(np.unique(self.records["tid"]))
+
+    def ordered(self):
+        """按时间戳排序的记录（拷贝）"""
+        order = np.argsort(self.records["ts_ns"], kind="stable")
+        return self.records[order]
+
+    def iter_chunks(self, chunk_size=EVENT_CHUNK):
+        """按时间顺序分块产出记录（拷贝），拼起来和 ordered() 相同"""
+        # 空闲线程的缓冲区可能到退出时才刷出，早期的记录会出现在文件末尾，
+        # 所以没法只看附近的记录排序；排序只用时间戳，记录本身留在映射里
+        order = np.argsort(self.records["ts_ns"], kind="stable")
+        for start in range(0, len(order), chunk_size):
+            yield self.records[order[start : start + chunk_size]]
+
+    def iter_events(self):
+        """
+        按时间顺序产出 (操作, 指针, 大小, 原指针)，
+        和 analyze_preload_log.parse_events 的输出相同，可以直接交给 HeapReplay.feed
+        """
+        for chunk in self.iter_chunks():
+            size = chunk["size"].copy()
+            # 文本日志里 free 行没有大小，保持一致
+            size[chunk["op"] == FREE] = 0
+            yield from zip(
+                chunk["op"].tolist(),
+                chunk["ptr"].tolist(),
+                size.tolist(),
+                chunk["old_ptr"].tolist(),
+            )
+
+    def summary(self):
+        """按操作、线程和大小的统计，全部用向量运算完成"""
+        r = self.records
+        ops = np.bincount(r["op"], minlength=len(OP_NAMES))
+        allocs = r[r["op"] != FREE]
+        tids, tid_index = np.unique(r["tid"], return_inverse=True)
+        per_thread = np.bincount(tid_index, minlength=len(tids))
+        thread_bytes = np.bincount(
+            tid_index,
+            weights=np.where(r["op"] != FREE, r["size"], 0).astype(np.float64),
+            minlength=len(tids),
+        )
+        # frexp 的指数就是 bit_length：第 i 组是 [2^(i-1), 2^i)
+        buckets = np.frexp(allocs["size"].astype(np.float64))[1]
+        hist = np.bincount(buckets, minlength=1)
+        hist_bytes = np.bincount(
+            buckets, weights=allocs["size"].astype(np.float64), minlength=1
+        )
+        ts = r["ts_ns"]
+        duration = int(ts.max() - ts.min()) if len(r) else 0
+        used = np.nonzero(hist)[0]
+
+        return {
+            "path": self.path,
+            "pid": self.pid,
+            "complete": self.complete,
+            "records": len(r),
+            "dropped": self.dropped,
+            "start_unix_ns": self.start_unix_ns,
+            "duration_ns": duration,
+            "ops": {name: int(ops[i]) for i, name in enumerate(OP_NAMES)},
+            "untracked_frees": int(np.count_nonzero(r["flags"] & RECORD_UNTRACKED)),
+            "allocated_bytes": int(allocs["size"].sum(dtype=np.uint64)),
+            "threads": {
+                "tid": tids.tolist(),
+                "events": per_thread.tolist(),
+                "allocated_bytes": thread_bytes.astype(np.int64).tolist(),
+            },
+            "size_classes": {
+                "min_size": [0 if i == 0 else 1 << (int(i) - 1) for i in used],
+                "allocs": hist[used].tolist(),
+                "bytes": hist_bytes[used].astype(np.int64).tolist(),
+            },
+        }
+
+    def close(self):
+        self.records = None
+        try:
+            self._mm.close()
+        except BufferError:
+            # 调用方还持有记录的视图，映射留给垃圾回收
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_trace(path):
+    return TraceFile(path)
+
+
+def print_summary(s, limit):
+    seconds = s["duration_ns"] / 1e9
+    rate = s["records"] / seconds if seconds else 0
+    state = "complete" if s["complete"] else "[yellow]incomplete[/yellow]"
+    console.print(f"[bold]Trace:[/bold] {s['path']} (pid {s['pid']}, {state})")
+    console.print(
+        f"{s['records']:,} records over {seconds:.3f} s ({rate:,.0f}/s), "
+        f"{s['dropped']:,} dropped, {len(s['threads']['tid'])} threads, "
+        f"{human_size(s['allocated_bytes'])} allocated"
+    )
+
+    table = Table(title="Calls", box=box.SIMPLE)
+    table.add_column("Op")
+    table.add_column("Count", justify="right")
+    for name, count in s["ops"].items():
+        table.add_row(name, f"{count:,}")
+    table.add_row("untracked free", f"{s['untracked_frees']:,}")
+    console.print(table)
+
+    threads = s["threads"]
+    rows = sorted(
+        zip(threads["tid"], threads["events"], threads["allocated_bytes"]),
+        key=lambda row: row[1],
+        reverse=True,
+    )
+    table = Table(title="Threads", box=box.SIMPLE)
+    table.add_column("TID", justify="right")
+    table.add_column("Events", justify="right")
+    table.add_column("Allocated", justify="right")
+    for tid, events, nbytes in rows[:limit]:
+        table.add_row(str(tid), f"{events:,}", human_size(nbytes))
+    if len(rows) > limit:
+        table.add_row("...", f"{len(rows) - limit} more", "")
+    console.print(table)
+
+    sizes = s["size_classes"]
+    table = Table(title="Allocation sizes", box=box.SIMPLE)
+    table.add_column("Size >=", justify="right")
+    table.add_column("Allocs", justify="right")
+    table.add_column("Bytes", justify="right")
+    for low, count, nbytes in zip(sizes["min_size"], sizes["allocs"], sizes["bytes"]):
+        table.add_row(human_size(low), f"{count:,}", human_size(nbytes))
+    console.print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Summarize binary traces written by libadvanced_preload.so "
+        "(PRELOAD_TRACE=file)"
+    )
+    parser.add_argument("trace", help="Trace file")
+    parser.add_argument(
+        "--limit", type=int, default=20, help="Number of threads to show"
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print the summary as JSON instead"
+    )
+    args = parser.parse_args()
+
+    try:
+        with open_trace(args.trace) as trace:
+            summary = trace.summary()
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.json:
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+    else:
+        print_summary(summary, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,614 @@
+#define _GNU_SOURCE
+#include <dlfcn.h>
+#include <errno.h>
+#include <execinfo.h>
+#include <fcntl.h>
+#include <limits.h>
+#include <math.h>
+#include <pthread.h>
+#include <sched.h>
+#include <semaphore.h>
+#include <signal.h>
+#include <stdarg.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/mman.h>
+#include <time.h>
+#include <unistd.h>
+
+// 采样式堆分析（思路同 tcmalloc/jemalloc）：
+// 每个线程维护一个“距离下次采样还有多少字节”的计数器，间隔服从均值为
+// PRELOAD_SAMPLE_RATE 字节的指数分布（字节上的泊松过程），所以一个 s 字节的分配
+// 被采中的概率是 1 - exp(-s / rate)。只有采中的分配才调用 backtrace() 记录调用栈，
+// 未采中的 malloc 只多一次 TLS 减法，free 只多一次位图查询。
+//
+// 堆 profile 使用 gperftools 的 heap_v2 文本格式（pprof 可以直接读取）：
+//   heap profile: <在用块数>: <在用字节> [<累计块数>: <累计字节>] @ heap_v2/<rate>
+//   <在用块数>: <在用字节> [<累计块数>: <累计字节>] @ <返回地址> ...
+//   MAPPED_LIBRARIES:
+//   <当时的 /proc/self/maps>
+// 数值是未经放大的采样值，heap_profile.py 按 rate 换算成估计值并符号化。
+//
+// 环境变量：
+//   PRELOAD_SAMPLE_RATE      平均采样间隔（字节），默认 524288，0 表示关闭
+//   PRELOAD_PROFILE          输出文件前缀，默认 heap，文件名为 <前缀>.<pid>.<序号>.heap
+//   PRELOAD_PROFILE_INTERVAL 每隔多少秒写一次 profile，默认 0（不定期写）
+//   PRELOAD_PROFILE_SIGNAL   收到这个编号的信号时写一次 profile（如 12 即 SIGUSR2），
+//                            默认不安装信号处理函数
+// 和 gperftools 一样，定期或按信号写 profile 都要显式打开，否则不改动进程的信号处理，
+// 也不创建后台线程。进程退出时写最后一份（一次都没采到时不写，
+// 免得 exec 出的每个子进程都留下一个空文件）。
+
+#define DEFAULT_SAMPLE_RATE (512 * 1024)
+#define MAX_FRAMES 64
+
+// 原始函数指针
+static void *(*original_malloc)(size_t size) = NULL;
+static void *(*original_calloc)(size_t nmemb, size_t size) = NULL;
+static void *(*original_realloc)(void *ptr, size_t size) = NULL;
+static void (*original_free)(void *ptr) = NULL;
+
+static size_t sample_rate = DEFAULT_SAMPLE_RATE;
+static char profile_prefix[256] = "heap";
+static unsigned profile_interval = 0;
+static int profile_signal = 0;
+static void *self_base;  // 本库的装载基址，用来跳过调用栈中 shim 自己的帧
+
+// 每个线程的采样状态
+#define TLS __thread __attribute__((tls_model("initial-exec")))
+static TLS long bytes_until_sample;  // 初始为 0，第一次分配时初始化
+static TLS uint64_t rng_state;
+static TLS int in_hook;  // 采样过程中（backtrace 可能分配内存）和写 profile 的线程不再采样
+
+static void spin_lock(int *lock) {
+  while (__atomic_exchange_n(lock, 1, __ATOMIC_ACQUIRE)) {
+    while (__atomic_load_n(lock, __ATOMIC_RELAXED)) {
+      sched_yield();
+    }
+  }
+}
+
+static void spin_unlock(int *lock) { __atomic_store_n(lock, 0, __ATOMIC_RELEASE); }
+
+// 直接向内核要内存，避免在 malloc 钩子里递归调用 malloc
+static void *map_pages(size_t size) {
+  void *p = mmap(NULL, size, PROT_READ | PROT_WRITE,
+                 MAP_PRIVATE | MAP_ANONYMOUS, -1, 0);
+  return p == MAP_FAILED ? NULL : p;
+}
+
+static inline uint64_t hash_u64(uint64_t x) {
+  uint64_t h = x * 0x9E3779B97F4A7C15ull;
+  return h ^ (h >> 29);
+}
+
+// ---- 调用栈表 ----
+
+// 每个不同的调用栈一条记录，计数用原子操作，free 路径不需要加锁
+typedef struct stack_record {
+  uint64_t hash;
+  uint64_t alloc_count;
+  uint64_t alloc_bytes;
+  uint64_t live_count;
+  uint64_t live_bytes;
+  uint32_t depth;
+  void *pcs[];
+} stack_record_t;
+
+#define STACK_TABLE_SIZE (1 << 16)
+#define STACK_ARENA_CHUNK (1 << 20)
+
+static stack_record_t **stack_table;
+static unsigned stack_count;
+static int stack_lock;
+static char *arena_cur, *arena_end;
+static stack_record_t overflow_stack;  // 表满或内存不足时，样本记在这里（深度为 0）
+
+static void *arena_alloc(size_t size) {
+  size = (size + 15) & ~(size_t)15;
+  if (arena_cur + size > arena_end) {
+    char *chunk = map_pages(STACK_ARENA_CHUNK);
+    if (!chunk) return NULL;
+    arena_cur = chunk;
+    arena_end = chunk + STACK_ARENA_CHUNK;
+  }
+  void *p = arena_cur;
+  arena_cur += size;
+  return p;
+}
+
+static stack_record_t *intern_stack(void **pcs, int depth) {
+  uint64_t h = 0;
+  for (int i = 0; i < depth; i++) h = hash_u64(h ^ (uintptr_t)pcs[i]);
+
+  stack_record_t *found = &overflow_stack;
+  spin_lock(&stack_lock);
+  if (!stack_table) {
+    stack_table = map_pages(STACK_TABLE_SIZE * sizeof(stack_record_t *));
+  }
+  // 只填到四分之三，保证线性探测能停下
+  for (size_t i = h & (STACK_TABLE_SIZE - 1); stack_table;
+       i = (i + 1) & (STACK_TABLE_SIZE - 1)) {
+    stack_record_t *s = stack_table[i];
+    if (!s) {
+      if (stack_count >= STACK_TABLE_SIZE / 4 * 3) break;
+      s = arena_alloc(sizeof(stack_record_t) + depth * sizeof(void *));
+      if (!s) break;
+      s->hash = h;
+      s->depth = depth;
+      memcpy(s->pcs, pcs, depth * sizeof(void *));
+      // 先填好内容再发布，写 profile 的线程不加锁也能读
+      __atomic_store_n(&stack_table[i], s, __ATOMIC_RELEASE);
+      stack_count++;
+      found = s;
+      break;
+    }
+    if (s->hash == h && s->depth == (uint32_t)depth &&
+        memcmp(s->pcs, pcs, depth * sizeof(void *)) == 0) {
+      found = s;
+      break;
+    }
+  }
+  spin_unlock(&stack_lock);
+  return found;
+}
+
+// ---- 已采样的活跃块 ----
+
+#define SHARD_BITS 5
+#define SHARD_COUNT (1 << SHARD_BITS)
+#define SHARD_MIN_SLOTS 256
+#define SLOT_EMPTY 0
+#define SLOT_DELETED 1
+
+typedef struct {
+  uintptr_t ptr;
+  size_t size;
+  stack_record_t *stack;
+} sample_entry_t;
+
+typedef struct {
+  int lock;
+  size_t mask;
+  size_t used;
+  size_t live;
+  sample_entry_t *slots;
+} sample_shard_t;
+
+static sample_shard_t shards[SHARD_COUNT];
+
+// free 先查这张计数位图：按指针哈希计数已采样的活跃块，为 0 时肯定没被采样，
+// 绝大多数 free 到这里就结束，不碰哈希表也不加锁
+// 64KB，能留在 L2 缓存里；已采样的活跃块通常只有几千个，误判很少
+#define FILTER_BITS 16
+#define FILTER_STICKY 0xFF  // 计数饱和后不再减，只会多查几次哈希表
+static uint8_t *sample_filter;
+
+static inline uint64_t hash_ptr(uintptr_t ptr) { return hash_u64(ptr >> 4); }
+
+static inline uint8_t *filter_slot(uint64_t h) {
+  return &sample_filter[h & ((1u << FILTER_BITS) - 1)];
+}
+
+static int shard_resize(sample_shard_t *shard) {
+  size_t cap = SHARD_MIN_SLOTS;
+  while (cap < (shard->live + 1) * 2) cap *= 2;
+  sample_entry_t *slots = map_pages(cap * sizeof(sample_entry_t));
+  if (!slots) return -1;
+
+  for (size_t i = 0; shard->slots && i <= shard->mask; i++) {
+    sample_entry_t *e = &shard->slots[i];
+    if (e->ptr <= SLOT_DELETED) continue;
+    size_t j = hash_ptr(e->ptr) & (cap - 1);
+    while (slots[j].ptr != SLOT_EMPTY) j = (j + 1) & (cap - 1);
+    slots[j] = *e;
+  }
+  if (shard->slots) {
+    munmap(shard->slots, (shard->mask + 1) * sizeof(sample_entry_t));
+  }
+  shard->slots = slots;
+  shard->mask = cap - 1;
+  shard->used = shard->live;
+  return 0;
+}
+
+static void retire_sample(sample_entry_t *e) {
+  __atomic_fetch_sub(&e->stack->live_count, 1, __ATOMIC_RELAXED);
+  __atomic_fetch_sub(&e->stack->live_bytes, e->size, __ATOMIC_RELAXED);
+}
+
+static void insert_sample(uintptr_t ptr, size_t size, stack_record_t *stack) {
+  uint64_t h = hash_ptr(ptr);
+  sample_shard_t *shard = &shards[h >> (64 - SHARD_BITS)];
+
+  spin_lock(&shard->lock);
+  if (!shard->slots || (shard->used + 1) * 4 > (shard->mask + 1) * 3) {
+    if (shard_resize(shard) != 0) {
+      spin_unlock(&shard->lock);
+      return;
+    }
+  }
+  sample_entry_t *tomb = NULL;
+  for (size_t i = h & shard->mask;; i = (i + 1) & shard->mask) {
+    sample_entry_t *e = &shard->slots[i];
+    if (e->ptr == ptr) {
+      // 同一地址又被采中，说明之前的 free 没经过这里（例如来自 posix_memalign）
+      retire_sample(e);
+      e->size = size;
+      e->stack = stack;
+      break;
+    }
+    if (e->ptr == SLOT_DELETED && !tomb) tomb = e;
+    if (e->ptr == SLOT_EMPTY) {
+      if (tomb) {
+        e = tomb;
+      } else {
+        shard->used++;
+      }
+      *e = (sample_entry_t){ptr, size, stack};
+      shard->live++;
+      uint8_t *f = filter_slot(h);
+      if (*f != FILTER_STICKY) __atomic_fetch_add(f, 1, __ATOMIC_RELAXED);
+      break;
+    }
+  }
+  spin_unlock(&shard->lock);
+}
+
+static void remove_sample(uintptr_t ptr) {
+  if (!sample_filter) return;
+  uint64_t h = hash_ptr(ptr);
+  uint8_t *f = filter_slot(h);
+  if (!__atomic_load_n(f, __ATOMIC_RELAXED)) return;
+
+  sample_shard_t *shard = &shards[h >> (64 - SHARD_BITS)];
+  spin_lock(&shard->lock);
+  for (size_t i = h & shard->mask; shard->slots; i = (i + 1) & shard->mask) {
+    sample_entry_t *e = &shard->slots[i];
+    if (e->ptr == SLOT_EMPTY) break;
+    if (e->ptr == ptr) {
+      retire_sample(e);
+      e->ptr = SLOT_DELETED;
+      shard->live--;
+      if (*f != FILTER_STICKY) __atomic_fetch_sub(f, 1, __ATOMIC_RELAXED);
+      break;
+    }
+  }
+  spin_unlock(&shard->lock);
+}
+
+// ---- 采样 ----
+
+// xorshift64*，每个线程独立，不需要同步
+static uint64_t next_random(void) {
+  uint64_t x = rng_state;
+  x ^= x >> 12;
+  x ^= x << 25;
+  x ^= x >> 27;
+  rng_state = x;
+  return x * 0x2545F4914F6CDD1Dull;
+}
+
+// 下一次采样前还要分配的字节数：均值为 sample_rate 的指数分布
+static long next_sample_interval(void) {
+  double u = ((next_random() >> 11) + 1) * (1.0 / 9007199254740992.0);  // (0, 1]
+  double bytes = -log(u) * (double)sample_rate;
+  if (bytes < 1) return 1;
+  if (bytes > (double)(LONG_MAX / 2)) return LONG_MAX / 2;
+  return (long)bytes;
+}
+
+// 计数器耗尽时进入这里，返回是否采样这次分配
+static __attribute__((noinline)) int sample_slow(size_t size) {
+  if (in_hook) return 0;
+  if (sample_rate == 0) {
+    bytes_until_sample = LONG_MAX;
+    return 0;
+  }
+  if (!rng_state) {
+    // 线程第一次分配：初始化随机数和计数器，这一次不采样
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    rng_state = hash_u64((uintptr_t)&ts ^ (uint64_t)ts.tv_nsec) | 1;
+    bytes_until_sample = next_sample_interval();
+    if (bytes_until_sample > (long)size) {
+      bytes_until_sample -= size;
+      return 0;
+    }
+  }
+  // 指数分布无记忆，采样点之后的剩余部分不用结转，直接重新抽取
+  bytes_until_sample = next_sample_interval();
+  return 1;
+}
+
+static inline int should_sample(size_t size) {
+  if (__builtin_expect(bytes_until_sample > (long)size, 1)) {
+    bytes_until_sample -= size;
+    return 0;
+  }
+  return sample_slow(size);
+}
+
+static __attribute__((noinline)) void record_sample(void *ptr, size_t size) {
+  void *frames[MAX_FRAMES];
+  in_hook = 1;
+  int depth = backtrace(frames, MAX_FRAMES);
+  // 去掉 shim 自己的帧（record_sample、malloc 等）
+  int skip = 0;
+  Dl_info info;
+  while (skip < depth && dladdr(frames[skip], &info) &&
+         info.dli_fbase == self_base) {
+    skip++;
+  }
+  stack_record_t *stack = intern_stack(frames + skip, depth - skip);
+  __atomic_fetch_add(&stack->alloc_count, 1, __ATOMIC_RELAXED);
+  __atomic_fetch_add(&stack->alloc_bytes, size, __ATOMIC_RELAXED);
+  __atomic_fetch_add(&stack->live_count, 1, __ATOMIC_RELAXED);
+  __atomic_fetch_add(&stack->live_bytes, size, __ATOMIC_RELAXED);
+  insert_sample((uintptr_t)ptr, size, stack);
+  in_hook = 0;
+}
+
+// ---- 写 profile ----
+
+static int dump_lock;
+static unsigned dump_seq;
+
+typedef struct {
+  int fd;
+  size_t len;
+  char data[16384];
+} out_buffer_t;
+
+static void out_flush(out_buffer_t *out) {
+  size_t done = 0;
+  while (done < out->len) {
+    ssize_t n = write(out->fd, out->data + done, out->len - done);
+    if (n <= 0) break;
+    done += n;
+  }
+  out->len = 0;
+}
+
+// 只用 snprintf 和 write，写的过程中不分配内存
+static void out_printf(out_buffer_t *out, const char *fmt, ...)
+    __attribute__((format(printf, 2, 3)));
+static void out_printf(out_buffer_t *out, const char *fmt, ...) {
+  if (sizeof(out->data) - out->len < 1024) out_flush(out);
+  va_list ap;
+  va_start(ap, fmt);
+  int n = vsnprintf(out->data + out->len, sizeof(out->data) - out->len, fmt, ap);
+  va_end(ap);
+  if (n > 0) {
+    size_t room = sizeof(out->data) - out->len - 1;
+    out->len += (size_t)n < room ? (size_t)n : room;
+  }
+}
+
+static void write_stack(out_buffer_t *out, stack_record_t *s) {
+  uint64_t alloc_count = __atomic_load_n(&s->alloc_count, __ATOMIC_RELAXED);
+  if (!alloc_count) return;
+  out_printf(out, "%6lu: %8lu [%6lu: %8lu] @",
+             (unsigned long)__atomic_load_n(&s->live_count, __ATOMIC_RELAXED),
+             (unsigned long)__atomic_load_n(&s->live_bytes, __ATOMIC_RELAXED),
+             (unsigned long)alloc_count,
+             (unsigned long)__atomic_load_n(&s->alloc_bytes, __ATOMIC_RELAXED));
+  for (uint32_t i = 0; i < s->depth; i++) out_printf(out, " %p", s->pcs[i]);
+  out_printf(out, "\n");
+}
+
+static void write_profile(const char *reason) {
+  spin_lock(&dump_lock);
+  char path[512];
+  snprintf(path, sizeof(path), "%s.%d.%04u.heap", profile_prefix, getpid(),
+           dump_seq++);
+  static out_buffer_t out;
+  out.fd = open(path, O_WRONLY | O_CREAT | O_TRUNC | O_CLOEXEC, 0644);
+  if (out.fd < 0) {
+    spin_unlock(&dump_lock);
+    fprintf(stderr, "[PRELOAD] cannot write heap profile %s\n", path);
+    return;
+  }
+  out.len = 0;
+
+  // 先算总数写头部；表中记录只增不删，发布后内容不变，不需要持有 stack_lock
+  uint64_t totals[4] = {0, 0, 0, 0};
+  unsigned samples = 0;
+  for (size_t i = 0; stack_table && i < STACK_TABLE_SIZE; i++) {
+    stack_record_t *s = __atomic_load_n(&stack_table[i], __ATOMIC_ACQUIRE);
+    if (!s) continue;
+    totals[0] += __atomic_load_n(&s->live_count, __ATOMIC_RELAXED);
+    totals[1] += __atomic_load_n(&s->live_bytes, __ATOMIC_RELAXED);
+    totals[2] += __atomic_load_n(&s->alloc_count, __ATOMIC_RELAXED);
+    totals[3] += __atomic_load_n(&s->alloc_bytes, __ATOMIC_RELAXED);
+  }
+  samples = (unsigned)totals[2];
+  out_printf(&out, "heap profile: %6lu: %8lu [%6lu: %8lu] @ heap_v2/%zu\n",
+             (unsigned long)totals[0], (unsigned long)totals[1],
+             (unsigned long)totals[2], (unsigned long)totals[3], sample_rate);
+  for (size_t i = 0; stack_table && i < STACK_TABLE_SIZE; i++) {
+    stack_record_t *s = __atomic_load_n(&stack_table[i], __ATOMIC_ACQUIRE);
+    if (s) write_stack(&out, s);
+  }
+  write_stack(&out, &overflow_stack);
+
+  // 符号化需要当时的映射
+  out_printf(&out, "\nMAPPED_LIBRARIES:\n");
+  out_flush(&out);
+  int maps = open("/proc/self/maps", O_RDONLY | O_CLOEXEC);
+  if (maps >= 0) {
+    ssize_t n;
+    while ((n = read(maps, out.data, sizeof(out.data))) > 0) {
+      out.len = n;
+      out_flush(&out);
+    }
+    close(maps);
+  }
+  close(out.fd);
+  unsigned stacks = __atomic_load_n(&stack_count, __ATOMIC_RELAXED);
+  spin_unlock(&dump_lock);
+
+  fprintf(stderr, "[PRELOAD] Heap profile (%s): %s (%u stacks, %u samples)\n",
+          reason, path, stacks, samples);
+}
+
+// ---- 定期和按信号写 profile ----
+
+static sem_t dump_request;
+
+static void on_profile_signal(int sig) {
+  (void)sig;
+  sem_post(&dump_request);  // 异步信号安全
+}
+
+static void *dump_thread(void *arg) {
+  (void)arg;
+  in_hook = 1;  // 这个线程自己的分配不参与采样
+  for (;;) {
+    int rc;
+    if (profile_interval) {
+      struct timespec deadline;
+      clock_gettime(CLOCK_REALTIME, &deadline);
+      deadline.tv_sec += profile_interval;
+      while ((rc = sem_timedwait(&dump_request, &deadline)) != 0 &&
+             errno == EINTR) {
+      }
+    } else {
+      while ((rc = sem_wait(&dump_request)) != 0 && errno == EINTR) {
+      }
+    }
+    write_profile(rc == 0 ? "signal" : "interval");
+  }
+  return NULL;
+}
+
+// ---- fork ----
+
+// fork 前拿住所有锁（写 profile 的锁在最外层，它可能被持有一整次写入），
+// 子进程不会继承一把别的线程持有、永远不会释放的锁，表也不会停在修改到一半的状态
+static void atfork_prepare(void) {
+  spin_lock(&dump_lock);
+  spin_lock(&stack_lock);
+  for (int s = 0; s < SHARD_COUNT; s++) spin_lock(&shards[s].lock);
+}
+
+static void atfork_parent(void) {
+  for (int s = 0; s < SHARD_COUNT; s++) spin_unlock(&shards[s].lock);
+  spin_unlock(&stack_lock);
+  spin_unlock(&dump_lock);
+}
+
+// 子进程继承了父进程的样本（这些块在子进程里同样存活），但没有写 profile 的线程：
+// 清空信号量里没处理的请求，profile 序号从头开始（文件名里是子进程的 pid）。
+// 信号处理函数仍在，收到信号只是没有效果；退出时照常写最后一份。
+// 随机数重新播种，免得和父进程的这个线程采到同样的位置
+static void atfork_child(void) {
+  atfork_parent();
+  if (profile_interval || profile_signal > 0) sem_init(&dump_request, 0, 0);
+  dump_seq = 0;
+  rng_state = 0;
+  bytes_until_sample = 0;
+}
+
+// 初始化原始函数指针，并读取环境变量中的配置
+static void init_original_functions() {
+  if (original_malloc) return;
+  original_malloc = dlsym(RTLD_NEXT, "malloc");
+  original_calloc = dlsym(RTLD_NEXT, "calloc");
+  original_realloc = dlsym(RTLD_NEXT, "realloc");
+  original_free = dlsym(RTLD_NEXT, "free");
+
+  const char *value = getenv("PRELOAD_SAMPLE_RATE");
+  if (value && *value) sample_rate = strtoull(value, NULL, 0);
+  value = getenv("PRELOAD_PROFILE");
+  if (value && *value) snprintf(profile_prefix, sizeof(profile_prefix), "%s", value);
+  value = getenv("PRELOAD_PROFILE_INTERVAL");
+  if (value && *value) profile_interval = strtoul(value, NULL, 0);
+  value = getenv("PRELOAD_PROFILE_SIGNAL");
+  if (value) profile_signal = atoi(value);
+
+  Dl_info info;
+  if (dladdr((void *)init_original_functions, &info)) self_base = info.dli_fbase;
+  sample_filter = map_pages(1 << FILTER_BITS);
+  if (!sample_filter) sample_rate = 0;
+}
+
+// 拦截 malloc
+void *malloc(size_t size) {
+  init_original_functions();
+  void *ptr = original_malloc(size);
+  if (ptr && should_sample(size)) record_sample(ptr, size);
+  return ptr;
+}
+
+// 拦截 calloc
+void *calloc(size_t nmemb, size_t size) {
+  init_original_functions();
+  void *ptr = original_calloc(nmemb, size);
+  if (ptr && should_sample(nmemb * size)) record_sample(ptr, nmemb * size);
+  return ptr;
+}
+
+// 拦截 realloc：相当于释放原来的块、再分配一个新块
+void *realloc(void *ptr, size_t size) {
+  init_original_functions();
+  if (ptr) remove_sample((uintptr_t)ptr);
+  void *new_ptr = original_realloc(ptr, size);
+  if (new_ptr && should_sample(size)) record_sample(new_ptr, size);
+  return new_ptr;
+}
+
+// 拦截 free
+void free(void *ptr) {
+  init_original_functions();
+  if (ptr) remove_sample((uintptr_t)ptr);
+  original_free(ptr);
+}
+
+// 构造函数
+__attribute__((constructor)) static void sampling_preload_init() {
+  init_original_functions();
+  if (sample_rate == 0) {
+    fprintf(stderr, "[PRELOAD] Sampling heap profiler disabled\n");
+    return;
+  }
+  // 第一次调用 backtrace 会加载 libgcc_s，提前做掉，避免发生在采样路径上
+  void *frames[4];
+  in_hook = 1;
+  backtrace(frames, 4);
+  in_hook = 0;
+
+  fprintf(stderr,
+          "[PRELOAD] Sampling heap profiler loaded! (1 sample per %zu bytes)\n",
+          sample_rate);
+  pthread_atfork(atfork_prepare, atfork_parent, atfork_child);
+
+  if (profile_interval || profile_signal > 0) {
+    sem_init(&dump_request, 0, 0);
+    if (profile_signal > 0) {
+      struct sigaction sa;
+      memset(&sa, 0, sizeof(sa));
+      sa.sa_handler = on_profile_signal;
+      sa.sa_flags = SA_RESTART;
+      sigemptyset(&sa.sa_mask);
+      sigaction(profile_signal, &sa, NULL);
+    }
+    pthread_t thread;
+    if (pthread_create(&thread, NULL, dump_thread, NULL) == 0) {
+      pthread_detach(thread);
+    }
+  }
+}
+
+// 析构函数
+__attribute__((destructor)) static void sampling_preload_fini() {
+  if (sample_rate == 0) return;
+  if (__atomic_load_n(&stack_count, __ATOMIC_RELAXED) == 0 &&
+      __atomic_load_n(&overflow_stack.alloc_count, __ATOMIC_RELAXED) == 0) {
+    return;
+  }
+  in_hook = 1;
+  write_profile("exit");
+}
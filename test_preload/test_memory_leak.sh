@@ -53,6 +53,22 @@ else
     exit 1
 fi
 
+# 用分析脚本重放日志，核对泄漏和峰值与 shim 自己的统计一致
+ANALYZER="$SCRIPT_DIR/analyze_preload_log.py"
+if [[ ! -f "$ANALYZER" ]]; then
+    ANALYZER="$SCRIPT_DIR/test_preload/analyze_preload_log.py"
+fi
+if python3 -c "import rich" 2>/dev/null && [[ -f "$ANALYZER" ]]; then
+    if python3 "$ANALYZER" --check --summary /tmp/leak_summary.json /tmp/leak_output.txt; then
+        echo "✓ Log replay matches shim statistics"
+    else
+        echo "✗ Log replay disagrees with shim statistics"
+        exit 1
+    fi
+else
+    echo "- Skipping log replay (python3 with rich not available)"
+fi
+
 echo "Memory leak detection test passed!"
 
 # 清理临时文件
@@ -1,39 +1,351 @@
-from elftools.elf.elffile import ELFFile
-from elftools.elf.sections import Section
-from elftools.elf.enums import ENUM_RELOC_TYPE_x64, ENUM_RELOC_TYPE_i386
+import argparse
+import json
+import os
 import sys
+
+import numpy as np
+from rich import box
 from rich.console import Console
-from rich.table import Table
 from rich.panel import Panel
+from rich.table import Table
 from rich.text import Text
-from rich import box
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from elf_reader import RELOC_TYPE, ELFReader, reloc_kind, reloc_type_name
 
 console = Console()
 
-def get_relocation_type_name(reloc_type, machine):
-    """获取重定位类型的名称"""
-    try:
-        if machine == 'EM_X86_64':
-            return ENUM_RELOC_TYPE_x64.get(reloc_type, f'Unknown({reloc_type})')
-        elif machine == 'EM_386':
-            return ENUM_RELOC_TYPE_i386.get(reloc_type, f'Unknown({reloc_type})')
-        else:
-            return f'Type_{reloc_type}'
-    except:
-        return f'Type_{reloc_type}'
+# 读取重定位表时按页计算启动时要触及的内存
+PAGE_SIZE = 4096
 
 def is_relocation_section(section):
     """检查是否为重定位节"""
-    sh_type = section['sh_type']
-    return sh_type == 'SHT_REL' or sh_type == 'SHT_RELA'
+    sh_type = section.sh_type
+    return sh_type == 'SHT_REL' or sh_type == 'SHT_RELA' or sh_type == 'SHT_RELR'
+
+# 解码后的重定位记录，r_info 已拆分成符号下标和类型
+RELOCATION_DTYPE = np.dtype([
+    ('r_offset', 'u8'),
+    ('r_sym', 'u4'),
+    ('r_type', 'u4'),
+    ('r_addend', 'i8'),
+])
+
+def raw_relocation_dtype(elf, is_rela):
+    """与文件中 Elf_Rel / Elf_Rela 布局一致的结构化 dtype"""
+    order = '<' if elf.little_endian else '>'
+    word, sword = ('u8', 'i8') if elf.elfclass == 64 else ('u4', 'i4')
+    fields = [('r_offset', order + word), ('r_info', order + word)]
+    if is_rela:
+        fields.append(('r_addend', order + sword))
+    return np.dtype(fields)
+
+def relative_type(elf):
+    """本架构 R_*_RELATIVE 的类型值，SHT_RELR 里的条目都是这种重定位"""
+    for value, name in RELOC_TYPE.get(elf.e_machine_value, {}).items():
+        if reloc_kind(name) == 'relative':
+            return value
+    return 0
+
+def decode_relocations(elf, section):
+    """
+    把整个 REL/RELA/RELR 节一次性解码成 RELOCATION_DTYPE 数组
+    直接在 mmap 上 frombuffer，r_info 的拆分用向量运算完成
+    """
+    if section.sh_type == 'SHT_RELR':
+        offsets = np.fromiter(elf.iter_relr(section), dtype=np.uint64)
+        relocs = np.zeros(len(offsets), dtype=RELOCATION_DTYPE)
+        relocs['r_offset'] = offsets
+        relocs['r_type'] = relative_type(elf)
+        return relocs
+
+    is_rela = section.sh_type == 'SHT_RELA'
+    raw_dtype = raw_relocation_dtype(elf, is_rela)
+    count = section.sh_size // raw_dtype.itemsize
+    raw = np.frombuffer(elf.data, dtype=raw_dtype, count=count, offset=section.sh_offset)
+    if elf.elfclass == 64:
+        sym_shift, type_mask = 32, 0xFFFFFFFF
+    else:
+        sym_shift, type_mask = 8, 0xFF
+
+    relocs = np.empty(count, dtype=RELOCATION_DTYPE)
+    relocs['r_offset'] = raw['r_offset']
+    info = raw['r_info']
+    relocs['r_sym'] = info >> sym_shift
+    relocs['r_type'] = info & type_mask
+    relocs['r_addend'] = raw['r_addend'] if is_rela else 0
+    del raw, info  # 释放对 mmap 的引用，ELFReader 才能正常关闭
+    return relocs
+
+class SymbolNames:
+    """按下标缓存一个符号表里的符号名，每个符号只解析一次"""
+
+    def __init__(self, elf, symtab):
+        self.elf = elf
+        self.symtab = symtab
+        self.names = {0: 'None'}
+
+    def get(self, index):
+        name = self.names.get(index)
+        if name is None:
+            symbol = None
+            if self.symtab is not None:
+                symbol = self.elf.get_symbol(self.symtab, index)
+            name = symbol.name if symbol and symbol.name else f"Symbol_{index}"
+            self.names[index] = name
+        return name
+
+    def lookup(self, indices):
+        """把符号下标数组转换成名字列表，只对出现过的下标解析一次"""
+        unique, inverse = np.unique(indices, return_inverse=True)
+        names = [self.get(index) for index in unique.tolist()]
+        return [names[i] for i in inverse.tolist()]
+
+def type_names(types, e_machine):
+    """把类型数组转换成名字列表"""
+    unique, inverse = np.unique(types, return_inverse=True)
+    names = [reloc_type_name(e_machine, t) for t in unique.tolist()]
+    return [names[i] for i in inverse.tolist()]
+
+def iter_relocation_rows(elf, section, symbol_cache):
+    """产出 (r_offset, 类型名, 符号名, r_addend)，整节先批量解码"""
+    relocs = decode_relocations(elf, section)
+    names = symbol_cache.get(section.sh_link)
+    if names is None:
+        names = SymbolNames(elf, elf.get_section(section.sh_link) if section.sh_link else None)
+        symbol_cache[section.sh_link] = names
+    return zip(
+        relocs['r_offset'].tolist(),
+        type_names(relocs['r_type'], elf.e_machine_value),
+        names.lookup(relocs['r_sym']),
+        relocs['r_addend'].tolist(),
+    )
+
+def find_relocation_sections(elf):
+    return [section for section in elf.sections if is_relocation_section(section)]
+
+def stream_relocations(filename, out=sys.stdout):
+    """按 TSV 输出所有重定位，不经过 rich 表格，适合几百万条的大文件"""
+    with ELFReader(filename) as elf:
+        symbol_cache = {}
+        write = out.write
+        write("section\toffset\ttype\tsymbol\taddend\n")
+        for section in find_relocation_sections(elf):
+            is_rela = section.sh_type == 'SHT_RELA'
+            for offset, type_name, symbol_name, addend in iter_relocation_rows(
+                elf, section, symbol_cache
+            ):
+                write(
+                    f"{section.name}\t0x{offset:x}\t{type_name}\t{symbol_name}\t"
+                    f"{addend if is_rela else ''}\n"
+                )
+
+def relr_entry_count(offsets, word):
+    """
+    估算把这些 RELATIVE 重定位打包成 DT_RELR 需要多少个字，算法与 lld 相同：
+    一个地址项之后，用位图覆盖接下来 (位数 - 1) 个字，直到某个窗口里没有偏移为止
+    offsets 必须已按字长对齐并排序
+    """
+    bits = word * 8 - 1
+    offsets = offsets.tolist()
+    count = 0
+    i = 0
+    n = len(offsets)
+    while i < n:
+        count += 1
+        base = offsets[i] + word
+        i += 1
+        while i < n:
+            limit = base + bits * word
+            j = i
+            while j < n and offsets[j] < limit:
+                j += 1
+            if j == i:
+                break
+            count += 1
+            i = j
+            base = limit
+    return count
+
+def summarize_relocations(filename, top=20):
+    """
+    汇总一个文件的动态重定位：按类型、类别、节和符号计数，
+    并估算把 RELATIVE 重定位改用 DT_RELR 打包后文件和启动时读取的重定位表能小多少
+    """
+    with ELFReader(filename) as elf:
+        machine = elf.header['e_machine']
+        word = elf.elfclass // 8
+        rel_type = relative_type(elf)
+        symbol_cache = {}
+
+        type_counts = {}
+        sym_counts = {}
+        sections = []
+        relative_offsets = []
+        relative_entsize = 0
+        packed = 0
+        relr_bytes = 0
+        table_bytes = 0
+        total = 0
+        lookups = 0
+
+        for section in find_relocation_sections(elf):
+            # 只统计动态重定位（SHF_ALLOC），忽略 .o 中的静态重定位
+            if not section.sh_flags & 0x2:
+                continue
+            relocs = decode_relocations(elf, section)
+            total += len(relocs)
+            table_bytes += section.sh_size
+            kind = {'SHT_RELA': 'RELA', 'SHT_REL': 'REL', 'SHT_RELR': 'RELR'}[section.sh_type]
+            sections.append({
+                'name': section.name,
+                'format': kind,
+                'relocations': len(relocs),
+                'bytes': section.sh_size,
+            })
+
+            types, counts = np.unique(relocs['r_type'], return_counts=True)
+            for t, c in zip(types.tolist(), counts.tolist()):
+                type_counts[t] = type_counts.get(t, 0) + c
+
+            if kind == 'RELR':
+                packed += len(relocs)
+                relr_bytes += section.sh_size
+                continue
+
+            is_relative = relocs['r_type'] == rel_type
+            if is_relative.any():
+                relative_offsets.append(relocs['r_offset'][is_relative])
+                relative_entsize = section.sh_size // max(len(relocs), 1)
+
+            syms = relocs['r_sym'][relocs['r_sym'] != 0]
+            lookups += len(syms)
+            if len(syms):
+                names = symbol_cache.get(section.sh_link)
+                if names is None:
+                    symtab = elf.get_section(section.sh_link) if section.sh_link else None
+                    names = symbol_cache[section.sh_link] = SymbolNames(elf, symtab)
+                indices, counts = np.unique(syms, return_counts=True)
+                for index, c in zip(indices.tolist(), counts.tolist()):
+                    name = names.get(index)
+                    sym_counts[name] = sym_counts.get(name, 0) + c
+
+        by_type = []
+        by_kind = {}
+        for t, c in sorted(type_counts.items(), key=lambda item: -item[1]):
+            type_name = reloc_type_name(elf.e_machine_value, t)
+            kind = reloc_kind(type_name)
+            by_type.append({
+                'type': type_name,
+                'kind': kind,
+                'count': c,
+            })
+            by_kind[kind] = by_kind.get(kind, 0) + c
+
+        # RELR 只能表示按字长对齐的偏移，其余的仍留在 .rela.dyn
+        relative = np.concatenate(relative_offsets) if relative_offsets else np.empty(0, np.uint64)
+        relative = np.unique(relative)
+        aligned = relative[relative % word == 0]
+        entries = relr_entry_count(aligned, word)
+        current = len(relative) * relative_entsize
+        estimated = entries * word + (len(relative) - len(aligned)) * relative_entsize
+        table_after = table_bytes - current + estimated
+
+        return {
+            'file': filename,
+            'machine': machine,
+            'class': elf.elfclass,
+            'total': total,
+            'symbol_lookups': lookups,
+            'by_kind': by_kind,
+            'by_type': by_type,
+            'by_section': sections,
+            'top_symbols': sorted(sym_counts.items(), key=lambda item: (-item[1], item[0]))[:top],
+            'relr': {
+                'already_packed': packed,
+                'already_packed_bytes': relr_bytes,
+                'relative': len(relative),
+                'unaligned': len(relative) - len(aligned),
+                'relative_bytes': current,
+                'relr_entries': entries,
+                'relr_bytes': estimated,
+                'saved_bytes': current - estimated,
+                # 启动时动态链接器要逐项读取的重定位记录数和重定位表页数
+                'records_before': total - packed + relr_bytes // word,
+                'records_after': total - packed - len(aligned) + entries + relr_bytes // word,
+                'table_pages_before': -(-table_bytes // PAGE_SIZE),
+                'table_pages_after': -(-table_after // PAGE_SIZE),
+            },
+        }
+
+def print_summary(summary):
+    """用 rich 表格显示 summarize_relocations 的结果"""
+    console.print(Panel(
+        f"[bold white]Relocation Summary: [green]{summary['file']}[/green][/bold white]\n"
+        f"[dim]Machine: {summary['machine']}[/dim]\n"
+        f"[dim]Class: {summary['class']}[/dim]\n"
+        f"Total relocations: [bold]{summary['total']}[/bold] | "
+        f"Symbol lookups: [bold]{summary['symbol_lookups']}[/bold]",
+        title="[bold blue]File Information[/bold blue]",
+        box=box.DOUBLE
+    ))
+
+    total = max(summary['total'], 1)
+    table = Table(title="[bold cyan]By type[/bold cyan]", box=box.ROUNDED, header_style="bold magenta")
+    table.add_column("Type", style="yellow")
+    table.add_column("Kind", style="cyan")
+    table.add_column("Count", justify="right")
+    table.add_column("%", justify="right")
+    for row in summary['by_type']:
+        table.add_row(row['type'], row['kind'], str(row['count']), f"{row['count'] * 100 / total:.1f}")
+    console.print(table)
+
+    table = Table(title="[bold cyan]By section[/bold cyan]", box=box.ROUNDED, header_style="bold magenta")
+    table.add_column("Section", style="green")
+    table.add_column("Format", style="cyan")
+    table.add_column("Relocations", justify="right")
+    table.add_column("Bytes", justify="right")
+    for row in summary['by_section']:
+        table.add_row(row['name'], row['format'], str(row['relocations']), str(row['bytes']))
+    console.print(table)
+
+    if summary['top_symbols']:
+        table = Table(title="[bold cyan]Top symbols[/bold cyan]", box=box.ROUNDED, header_style="bold magenta")
+        table.add_column("Symbol", style="green")
+        table.add_column("Relocations", justify="right")
+        for name, count in summary['top_symbols']:
+            table.add_row(name, str(count))
+        console.print(table)
+
+    relr = summary['relr']
+    lines = []
+    if relr['already_packed']:
+        lines.append(
+            f"Already packed: [bold]{relr['already_packed']}[/bold] relative relocations "
+            f"in {relr['already_packed_bytes']} bytes of RELR"
+        )
+    if relr['relative']:
+        lines.append(
+            f"RELATIVE in REL/RELA: [bold]{relr['relative']}[/bold] "
+            f"({relr['relative_bytes']} bytes, {relr['unaligned']} unaligned)"
+        )
+        lines.append(
+            f"With DT_RELR: [bold]{relr['relr_entries']}[/bold] words, "
+            f"{relr['relr_bytes']} bytes, saves [bold green]{relr['saved_bytes']}[/bold green] bytes"
+        )
+        lines.append(
+            f"Records read at startup: {relr['records_before']} -> {relr['records_after']}, "
+            f"relocation table pages: {relr['table_pages_before']} -> {relr['table_pages_after']}"
+        )
+    elif not relr['already_packed']:
+        lines.append("No RELATIVE relocations")
+    console.print(Panel("\n".join(lines), title="[bold blue]DT_RELR[/bold blue]", box=box.ROUNDED))
 
 def print_relocations(filename):
     try:
-        with open(filename, 'rb') as f:
-            elf = ELFFile(f)
-
+        with ELFReader(filename) as elf:
             # 显示文件信息
-            machine = elf['e_machine']
+            machine = elf.header['e_machine']
             console.print(Panel(
                 f"[bold white]ELF Relocation Analysis: [green]{filename}[/green][/bold white]\n"
                 f"[dim]Architecture: {elf.get_machine_arch()}[/dim]\n"
@@ -43,12 +355,8 @@ def print_relocations(filename):
                 box=box.DOUBLE
             ))
 
-            relocation_sections = []
-
             # 查找所有重定位节
-            for section in elf.iter_sections():
-                if is_relocation_section(section):
-                    relocation_sections.append(section)
+            relocation_sections = find_relocation_sections(elf)
 
             if not relocation_sections:
                 console.print("\n[yellow]No relocation sections found[/yellow]")
@@ -56,6 +364,9 @@ def print_relocations(filename):
 
             console.print(f"\n[bold blue]Found {len(relocation_sections)} Relocation Section(s)[/bold blue]")
 
+            # 符号表下标 -> SymbolNames，.rela.dyn 和 .rela.plt 共用 .dynsym 的缓存
+            symbol_cache = {}
+
             for i, section in enumerate(relocation_sections):
                 if i > 0:
                     console.print()
@@ -74,34 +385,17 @@ def print_relocations(filename):
                 table.add_column("Addend", style="cyan", justify="right")
 
                 reloc_count = 0
-                is_rela = section['sh_type'] == 'SHT_RELA'
-
-                for relocation in section.iter_relocations():
-                    offset = f"0x{relocation['r_offset']:08x}"
-                    reloc_type = relocation['r_info_type']
-                    type_name = get_relocation_type_name(reloc_type, machine)
-
-                    # 获取符号信息
-                    symbol_name = "None"
-                    if relocation['r_info_sym'] != 0:
-                        try:
-                            # 获取符号表
-                            symtab = elf.get_section(section['sh_link'])
-                            if symtab:
-                                symbol = symtab.get_symbol(relocation['r_info_sym'])
-                                if symbol and symbol.name:
-                                    symbol_name = symbol.name
-                                else:
-                                    symbol_name = f"Symbol_{relocation['r_info_sym']}"
-                        except:
-                            symbol_name = f"Symbol_{relocation['r_info_sym']}"
+                is_rela = section.sh_type == 'SHT_RELA'
+
+                for r_offset, type_name, symbol_name, addend_val in iter_relocation_rows(
+                    elf, section, symbol_cache
+                ):
+                    offset = f"0x{r_offset:08x}"
 
                     # 获取addend（如果存在）
                     addend = ""
-                    if is_rela and 'r_addend' in relocation.entry:
-                        addend_val = relocation['r_addend']
-                        if addend_val != 0:
-                            addend = f"{addend_val:+d}"
+                    if is_rela and addend_val != 0:
+                        addend = f"{addend_val:+d}"
 
                     # 为不同类型的符号添加样式
                     symbol_style = "green"
@@ -124,6 +418,8 @@ def print_relocations(filename):
                 stats_text = f"Total relocations: [bold]{reloc_count}[/bold]"
                 if is_rela:
                     stats_text += " | Type: [bold]RELA[/bold] (with addend)"
+                elif section.sh_type == 'SHT_RELR':
+                    stats_text += " | Type: [bold]RELR[/bold] (packed relative)"
                 else:
                     stats_text += " | Type: [bold]REL[/bold] (without addend)"
 
@@ -137,7 +433,34 @@ def print_relocations(filename):
         sys.exit(1)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        console.print("[bold red]Usage:[/bold red] python relocs.py <elf-file>")
-        sys.exit(1)
-    print_relocations(sys.argv[1])
+    parser = argparse.ArgumentParser(description="Show ELF relocations")
+    parser.add_argument("filenames", nargs="+", metavar="filename", help="ELF file(s) to analyze")
+    parser.add_argument(
+        "-f", "--format",
+        choices=["table", "tsv"],
+        default="table",
+        help="Output format; tsv streams rows without building rich tables",
+    )
+    parser.add_argument(
+        "-s", "--summary",
+        action="store_true",
+        help="Show counts by type, section and symbol plus a DT_RELR estimate",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the summary as JSON, one line per file",
+    )
+    parser.add_argument(
+        "--top", type=int, default=20, help="Number of symbols in the summary (default: 20)"
+    )
+    args = parser.parse_args()
+    for filename in args.filenames:
+        if args.json:
+            print(json.dumps(summarize_relocations(filename, args.top)))
+        elif args.summary:
+            print_summary(summarize_relocations(filename, args.top))
+        elif args.format == "tsv":
+            stream_relocations(filename)
+        else:
+            print_relocations(filename)